@@ -0,0 +1,275 @@
+# api.py
+"""
+Lokal JSON HTTP-tjeneste for å beregne kampplaner uten nettleser.
+
+Start med:
+    python api.py --port 8765
+
+Alle POST-endepunkter tar enten ett oppsett som JSON-objekt, eller en
+bunke på formen {"bunke": [oppsett, ...]}. Bunker deles opp og beregnes i
+en prosesspool, og svaret er {"resultat": ...} eller {"resultater": [...]}.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+import tornado.web
+from tornado.ioloop import IOLoop
+from kamparkiv import NDJSON_STI, aapne_kamparkiv
+from kampplan import generer_perioder, kalkuler_spilletid, generer_detaljert_kampoppsett
+from kompakt import posisjoner_til_maske, normaliser_spilletid_df
+from posisjoner import Posisjonsoverstyringer
+from tropp import TROPP_STI, Tropp, kamp_med_navn
+from validering import valider_plan
+
+logger = logging.getLogger(__name__)
+
+MAKS_BUNKESTORRELSE = 10000
+OPPSETT_PER_JOBB = 50  # Antall oppsett som sendes til én arbeidsprosess om gangen
+GRENSER = {            # Tillatte verdier, slik at ett oppsett ikke kan binde opp en arbeidsprosess
+    'kamptid': (1, 200),
+    'antall_paa_banen': (1, 11)
+}
+
+
+def oppstilling_til_df(oppsett):
+    """
+    Lager en spilletid_df fra et JSON-oppsett på formen:
+
+        {
+            "perioder": ["0-15", "15-25"],
+            "spillere": [
+                {"navn": "Susanne", "aktiv_posisjon": "Keeper", "posisjoner": ["Keeper"],
+                 "tilgjengelig": true, "mal_spilletid": 25, "paa_banen": ["0-15", "15-25"],
+                 "posisjon_per_periode": {"15-25": "Back"}}
+            ]
+        }
+
+    posisjon_per_periode er valgfri og leses av oppsett_overstyringer.
+    """
+    perioder = oppsett['perioder']
+    spillere = oppsett['spillere']
+    df = pd.DataFrame(
+        {
+            'Posisjoner': [posisjoner_til_maske(s.get('posisjoner', [s['aktiv_posisjon']])) for s in spillere],
+            'Aktiv posisjon': [s['aktiv_posisjon'] for s in spillere],
+            'Tilgjengelig': [s.get('tilgjengelig', True) for s in spillere],
+            'Total spilletid': 0,
+            'Differanse': 0,
+            'Mål spilletid': [s.get('mal_spilletid', 0) for s in spillere]
+        },
+        index=[s['navn'] for s in spillere]
+    )
+    for periode in perioder:
+        df[periode] = [periode in s.get('paa_banen', []) for s in spillere]
+    return normaliser_spilletid_df(df, perioder)
+
+
+def oppsett_overstyringer(oppsett):
+    """Posisjonsoverstyringene i et JSON-oppsett, fra posisjon_per_periode per spiller"""
+    overstyringer = Posisjonsoverstyringer()
+    for s in oppsett['spillere']:
+        for periode, posisjon in s.get('posisjon_per_periode', {}).items():
+            overstyringer.sett(s['navn'], periode, posisjon, s['aktiv_posisjon'])
+    return overstyringer
+
+
+def _perioder(oppsett):
+    return generer_perioder(int(oppsett['kamptid']))
+
+
+def _spilletid(oppsett):
+    df = kalkuler_spilletid(oppstilling_til_df(oppsett), oppsett['perioder'])
+    return {
+        spiller: {
+            'total_spilletid': int(rad['Total spilletid']),
+            'mal_spilletid': int(rad['Mål spilletid']),
+            'differanse': int(rad['Differanse'])
+        }
+        for spiller, rad in df.iterrows()
+    }
+
+
+def _valider(oppsett):
+    brudd = valider_plan(
+        oppstilling_til_df(oppsett),
+        oppsett['perioder'],
+        int(oppsett['antall_paa_banen']),
+        int(oppsett['kamptid']),
+        oppsett_overstyringer(oppsett)
+    )
+    return [{**b, 'spillere': [str(s) for s in b['spillere']]} for b in brudd]
+
+
+def _kampoppsett(oppsett):
+    df = oppstilling_til_df(oppsett)
+    return generer_detaljert_kampoppsett(
+        df, oppsett['perioder'], oppsett_overstyringer(oppsett)
+    ).to_dict('records')
+
+
+BEREGNINGER = {
+    'perioder': _perioder,
+    'spilletid': _spilletid,
+    'valider': _valider,
+    'kampoppsett': _kampoppsett
+}
+
+
+def utenfor_grensene(oppsett):
+    """Feilmelding hvis kamptid eller antall_paa_banen er utenfor GRENSER, ellers None"""
+    if not isinstance(oppsett, dict):
+        return None
+    for felt, (minst, maks) in GRENSER.items():
+        if felt not in oppsett:
+            continue
+        try:
+            verdi = int(oppsett[felt])
+        except (TypeError, ValueError):
+            return f"{felt} må være et heltall"
+        if not minst <= verdi <= maks:
+            return f"{felt} må være mellom {minst} og {maks}"
+    return None
+
+
+def beregn_bunke(beregning, oppsett_liste):
+    """
+    Kjører én beregning for en liste med oppsett. Kjøres i en arbeidsprosess.
+    Feil i ett oppsett gir {"feil": ...} for det oppsettet uten å stoppe resten.
+    """
+    funksjon = BEREGNINGER[beregning]
+    resultater = []
+    for oppsett in oppsett_liste:
+        try:
+            resultater.append(funksjon(oppsett))
+        except Exception as e:
+            resultater.append({'feil': f"{type(e).__name__}: {e}"})
+    return resultater
+
+
+class JsonHandler(tornado.web.RequestHandler):
+    def set_default_headers(self):
+        self.set_header('Content-Type', 'application/json; charset=utf-8')
+
+    def skriv_json(self, data, status=200):
+        self.set_status(status)
+        self.finish(json.dumps(data, ensure_ascii=False, default=str))
+
+    def write_error(self, status_code, **kwargs):
+        self.finish(json.dumps({'feil': self._reason}, ensure_ascii=False))
+
+
+class BeregningHandler(JsonHandler):
+    """POST-endepunkt som kjører en beregning for ett oppsett eller en bunke"""
+
+    def initialize(self, beregning, executor):
+        self.beregning = beregning
+        self.executor = executor
+
+    async def post(self):
+        try:
+            body = json.loads(self.request.body or b'{}')
+        except json.JSONDecodeError as e:
+            return self.skriv_json({'feil': f"Ugyldig JSON: {e}"}, 400)
+
+        er_bunke = isinstance(body, dict) and 'bunke' in body
+        oppsett_liste = body['bunke'] if er_bunke else [body]
+        if not isinstance(oppsett_liste, list) or len(oppsett_liste) > MAKS_BUNKESTORRELSE:
+            return self.skriv_json({'feil': f"Bunken må være en liste med maks {MAKS_BUNKESTORRELSE} oppsett"}, 400)
+
+        # Oppsett utenfor grensene avvises her og sendes ikke til prosesspoolen
+        resultater = [None] * len(oppsett_liste)
+        gyldige = []
+        for i, oppsett in enumerate(oppsett_liste):
+            feil = utenfor_grensene(oppsett)
+            if feil is None:
+                gyldige.append(i)
+            else:
+                resultater[i] = {'feil': feil}
+
+        loop = IOLoop.current()
+        deler = [
+            gyldige[i:i + OPPSETT_PER_JOBB]
+            for i in range(0, len(gyldige), OPPSETT_PER_JOBB)
+        ]
+        svar = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, beregn_bunke, self.beregning, [oppsett_liste[j] for j in del_])
+            for del_ in deler
+        ])
+        for del_, del_resultater in zip(deler, svar):
+            for j, resultat in zip(del_, del_resultater):
+                resultater[j] = resultat
+        logger.info(f"{self.beregning}: {len(resultater)} oppsett beregnet")
+
+        if er_bunke:
+            self.skriv_json({'resultater': resultater})
+        elif isinstance(resultater[0], dict) and 'feil' in resultater[0]:
+            self.skriv_json(resultater[0], 400)
+        else:
+            self.skriv_json({'resultat': resultater[0]})
+
+
+class KamperHandler(JsonHandler):
+    """
+    GET /api/kamper lister kampene, GET /api/kamper/<navn> returnerer én kamp
+    med spillernavn i stedet for spiller-ID-ene i arkivet
+    """
+
+    def initialize(self, kamparkiv, tropp):
+        self.kamparkiv = kamparkiv
+        self.tropp = tropp
+
+    async def get(self, navn=None):
+        kamper = await IOLoop.current().run_in_executor(None, self.kamparkiv.gjeldende)
+        if navn is None:
+            self.skriv_json({'kamper': [
+                {'navn': n, 'motstander': k.get('motstander', ''), 'dato': k.get('dato')}
+                for n, k in kamper.items()
+            ]})
+        elif navn in kamper:
+            kamp = await IOLoop.current().run_in_executor(None, kamp_med_navn, kamper[navn], self.tropp)
+            self.skriv_json({'resultat': kamp})
+        else:
+            self.skriv_json({'feil': f"Fant ikke kamp: {navn}"}, 404)
+
+
+def lag_app(executor, arkiv_sti=NDJSON_STI, tropp_sti=TROPP_STI):
+    """Lager tornado-applikasjonen med beregningene kjørt i executor"""
+    kamparkiv = aapne_kamparkiv(arkiv_sti)
+    tropp = Tropp(tropp_sti)
+    ruter = [
+        (rf'/api/{beregning}', BeregningHandler, {'beregning': beregning, 'executor': executor})
+        for beregning in BEREGNINGER
+    ]
+    ruter += [
+        (r'/api/kamper', KamperHandler, {'kamparkiv': kamparkiv, 'tropp': tropp}),
+        (r'/api/kamper/(.+)', KamperHandler, {'kamparkiv': kamparkiv, 'tropp': tropp})
+    ]
+    return tornado.web.Application(ruter)
+
+
+async def _kjor(port, adresse, arbeidere, arkiv_sti):
+    with ProcessPoolExecutor(max_workers=arbeidere) as executor:
+        app = lag_app(executor, arkiv_sti)
+        app.listen(port, address=adresse)
+        logger.info(f"API lytter på http://{adresse}:{port}")
+        await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokal JSON-API for kampplanlegging")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--adresse', default='127.0.0.1')
+    parser.add_argument('--arbeidere', type=int, default=os.cpu_count())
+    parser.add_argument('--arkiv', default=NDJSON_STI)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    asyncio.run(_kjor(args.port, args.adresse, args.arbeidere, args.arkiv))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,40 @@
 import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
 import numpy as np
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 import os
+import time
+import uuid
 from database import DatabaseHandler
-import json
+from validering import valider_plan, valider_endring, effektive_posisjoner
+from byttforslag import hent_byttforslag
+from historikk import Oppstillingshistorikk
+from tidslinje import Tidslinje
+from posisjoner import Posisjonsoverstyringer
+from tropp import SPILLER_ID, Tropp, arkivider, kamp_med_ider, kamp_med_navn
+from rapportjobber import Rapportjobber, jobbnokkel
+from belastning import Belastning, juster_mal_spilletid, AKUTT_DAGER, KRONISK_DAGER, TRYGG_SONE
+from livemodus import (
+    LiveKamp, HENDELSE_START, start_hendelse, bytte_hendelse, slutt_hendelse, hendelse_med_ider, hendelse_med_navn
+)
+from kamparkiv import aapne_kamparkiv, spilletid_df_til_arkiv, spilletid_df_fra_arkiv
+from kampversjoner import Kampversjoner
+from kampsok import Kampsok, PER_SIDE
+from sesonganalyse import Sesonganalyse
+from lignende import Lignendeindeks, tilpass_kamp
+from turneringsdag import planlegg_turneringsdag, eksporter_turneringsdag
+from simulering import STANDARD_FRAVAER, simuler_tilgjengelighet
+from profilering import PROFIL_PARAMETER, PROFIL_MILJOVARIABEL, antall_kjoringer, profiler
+from kompakt import (
+    POSISJONER, maske_til_posisjoner, kan_spille,
+    normaliser_spilletid_df, komprimer_for_arkiv, pakk_ut_fra_arkiv, pakk_perioder
+)
+from kampplan import (
+    generer_perioder, beregn_mal_spilletid, kalkuler_spilletid, telle_spillere_pa_banen, generer_kamprapport,
+    generer_detaljert_kampoppsett, posisjon_i_periode
+)
 
 # Oppsett av logging
 def setup_logging():
@@ -27,123 +56,456 @@ def setup_logging():
 
 logger = setup_logging()
 
+# Spillerregisteret deles av alle sesjoner. Oppstillinger og kamper lagres med spiller-ID-er.
+@st.cache_resource
+def hent_tropp():
+    return Tropp()
+
 # Legg til etter eksisterende imports
-db = DatabaseHandler()
+db = DatabaseHandler(tropp=hent_tropp())
+
+# Kamparkivet deles av alle sesjoner. Sesjonene holder bare navnet på kampen de har lastet.
+@st.cache_resource
+def hent_kamparkiv():
+    return aapne_kamparkiv()
+
+@st.cache_resource
+def hent_kampversjoner():
+    return Kampversjoner()
+
+@st.cache_resource
+def hent_kampsok():
+    return Kampsok(tropp=hent_tropp())
+
+@st.cache_resource
+def hent_lignendeindeks():
+    return Lignendeindeks(hent_tropp())
+
+@st.cache_resource
+def hent_sesonganalyse():
+    return Sesonganalyse(tropp=hent_tropp())
+
+@st.cache_resource
+def hent_rapportjobber():
+    return Rapportjobber()
 
-# Legg til i SessionState initialiseringen
-if 'kamper' not in st.session_state:
-    st.session_state.kamper = {}  # Dictionary med kampnavn som nøkkel
+@st.cache_resource
+def hent_belastning():
+    return Belastning(hent_tropp())
 
 # I initialiseringen av session state (på toppen av filen)
 if 'spillere' not in st.session_state:
     st.session_state.spillere = []  # eller en standardliste med spillere
 
+def _oppdater_avledet(beskrivelse, navn, oppdatering):
+    """
+    Oppdaterer et lager som er avledet fra kamparkivet. En feil her logges
+    bare, siden kampen allerede er lagret. Søkeindeksen, sesonganalysen og
+    belastningen tar igjen arkivet ved neste synkronisering; en versjon som
+    mangler, kommer med ved neste lagring av kampen.
+    """
+    try:
+        return oppdatering()
+    except Exception as e:
+        logger.warning(f"Kunne ikke oppdatere {beskrivelse} for {navn}: {e}")
+        return None
+
 # Legg til ny funksjon for å lagre kamp
 def lagre_kampoppsett(navn, motstander):
-    """Lagrer gjeldende kampoppsett"""
+    """
+    Lagrer gjeldende kampoppsett. Lagringen lykkes når kampen er skrevet til
+    arkivet; versjoner, søkeindeks, sesonganalyse og belastning oppdateres
+    etterpå hver for seg.
+    """
     try:
-        # Konverter DataFrame til dict på en sikker måte
-        spilletid_dict = {
-            'data': st.session_state.spilletid_df.to_dict('split'),
-            'index': st.session_state.spilletid_df.index.tolist(),
-            'columns': st.session_state.spilletid_df.columns.tolist()
-        }
+        # Konverter DataFrame til kompakt dict med pakkede periodebiter
+        df = st.session_state.spilletid_df
+        arkiv_df = komprimer_for_arkiv(df.drop(columns=SPILLER_ID), st.session_state.perioder)
+        spilletid_dict = spilletid_df_til_arkiv(arkiv_df)
         
         kamp_data = {
             'motstander': motstander,
-            'dato': datetime.now().strftime("%Y-%m-%d"),
+            'dato': st.session_state.kamp_info['dato'],
             'kamptid': st.session_state.kamptid,
-            'perioder': st.session_state.perioder,
+            'perioder': list(st.session_state.perioder),
             'spilletid_df': spilletid_dict,
-            'antall_paa_banen': st.session_state.antall_paa_banen
+            'antall_paa_banen': st.session_state.antall_paa_banen,
+            'tidslinje': hent_tidslinje().til_dict(),
+            'posisjoner': st.session_state.posisjonsoverstyringer.til_liste()
         }
+        # Arkivet refererer til spillerne med id-ene i oppstillingen; navnene slås opp når kampen vises
+        kamp_data = kamp_med_ider(kamp_data, hent_tropp(), dict(zip(df.index, df[SPILLER_ID])))
         
-        st.session_state.kamper[navn] = kamp_data
-        
-        # Lagre til fil
-        with open('kamper.json', 'w', encoding='utf-8') as f:
-            json.dump(st.session_state.kamper, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"Kampoppsett lagret: {navn}")
-        return True
+        # Lagre til det delte arkivet (legges til som en ny linje i kamper.ndjson)
+        hent_kamparkiv().lagre(navn, kamp_data)
+        arkivert = hent_kamparkiv().hent(navn)
+        live_id = None if st.session_state.kamp_info.get('navn') else live_kamp_id()
+        st.session_state.kamp_info['navn'] = navn
     except Exception as e:
         logger.error(f"Feil ved lagring av kampoppsett: {str(e)}")
         return False
 
+    if live_id is not None:
+        # Live-hendelser fra før kampen fikk navn følger med kampen
+        _oppdater_avledet("live-hendelsene", navn, lambda: db.flytt_hendelser(live_id, navn))
+
+    versjon = _oppdater_avledet("kampversjoner", navn, lambda: hent_kampversjoner().lagre(navn, kamp_data))
+    _oppdater_avledet("søkeindeksen", navn, lambda: hent_kampsok().indekser(navn, kamp_data))
+    _oppdater_avledet("sesonganalysen", navn, lambda: hent_sesonganalyse().eksporter(navn, arkivert))
+    _oppdater_avledet("belastningen", navn, lambda: hent_belastning().legg_til(navn, arkivert))
+    logger.info(f"Kampoppsett lagret: {navn} (versjon {versjon})")
+    return True
+
 # Legg til funksjon for å laste kamp
-def last_kampoppsett(navn):
-    """Laster et tidligere kampoppsett"""
+def last_kampoppsett(navn, versjon=None):
+    """Laster et tidligere kampoppsett, eventuelt en bestemt versjon"""
     try:
-        if navn in st.session_state.kamper:
-            kamp = st.session_state.kamper[navn]
-            
-            # Oppdater session state
+        if versjon is None:
+            kamp = hent_kamparkiv().hent(navn)
+        else:
+            kamp = hent_kampversjoner().hent(navn, versjon)
+        if kamp is not None:
+            ider = arkivider(kamp)
+            kamp = kamp_med_navn(kamp, hent_tropp())
+            # Oppdater session state. Kampen i arkivet deles mellom sesjonene,
+            # så sesjonen får egne kopier av det den kan endre.
             st.session_state.kamptid = kamp['kamptid']
-            st.session_state.perioder = kamp['perioder']
+            st.session_state.perioder = list(kamp['perioder'])
             st.session_state.antall_paa_banen = kamp.get('antall_paa_banen', 9)  # Default til 9 hvis ikke funnet
             
             # Gjenopprett DataFrame
-            spilletid_dict = kamp['spilletid_df']
-            df = pd.DataFrame(**spilletid_dict['data'])
-            df.index = spilletid_dict['index']
-            df.columns = spilletid_dict['columns']
+            df = spilletid_df_fra_arkiv(kamp['spilletid_df'])
             
-            # Oppdater spilletid_df
+            # Oppdater spilletid_df (pakker ut periodebiter fra arkivformatet).
+            # Eldre kamper har posisjonen per periode som kolonner.
+            df, overstyringer = Posisjonsoverstyringer.fra_kolonner(pakk_ut_fra_arkiv(df, kamp['perioder']))
+            overstyringer.update(Posisjonsoverstyringer.fra_liste(kamp.get('posisjoner')))
+            if ider is not None:
+                df[SPILLER_ID] = ider
+            else:
+                df = hent_tropp().med_ider(df)  # Eldre kamp med navn
             st.session_state.spilletid_df = df
+            st.session_state.posisjonsoverstyringer = overstyringer
+            
+            # Gjenopprett minuttbytter hvis kampen har en lagret tidslinje
+            if 'tidslinje' in kamp:
+                sett_tidslinje(Tidslinje.fra_dict(kamp['tidslinje']))
+            else:
+                st.session_state.pop('tidslinje', None)
             
             # Oppdater kamp_info
             st.session_state.kamp_info['motstander'] = kamp['motstander']
             st.session_state.kamp_info['dato'] = kamp['dato']
+            st.session_state.kamp_info['navn'] = navn
             
-            logger.info(f"Kampoppsett lastet: {navn}")
+            logger.info(f"Kampoppsett lastet: {navn}" + (f" (versjon {versjon})" if versjon else ""))
             return True
     except Exception as e:
         logger.error(f"Feil ved lasting av kampoppsett: {str(e)}")
     return False
 
+def vis_kampversjoner(navn):
+    """
+    Viser versjonene av en lagret kamp og endringene fra valgt versjon til
+    siste. Returnerer valgt versjon, eller None for siste versjon.
+    """
+    versjoner = hent_kampversjoner().versjoner(navn)
+    if len(versjoner) < 2:
+        return None
+    siste = versjoner[-1]['versjon']
+    valgt = st.selectbox(
+        "Versjon",
+        options=[v['versjon'] for v in reversed(versjoner)],
+        format_func=lambda v: f"{v} – {next(x['tidspunkt'] for x in versjoner if x['versjon'] == v)}"
+                              + (" (siste)" if v == siste else "")
+    )
+    if valgt == siste:
+        return None
+    endringer = hent_kampversjoner().diff(navn, valgt, siste)
+    st.caption(f"Endringer fra versjon {valgt} til {siste}")
+    for felt, (fra, til) in endringer['felter'].items():
+        if isinstance(fra, (dict, list)) or isinstance(til, (dict, list)):
+            st.caption(f"{felt}: endret")
+        else:
+            st.caption(f"{felt}: {fra} → {til}")
+    if endringer['celler']:
+        celler = pd.DataFrame(endringer['celler'])
+        celler.columns = ['Spiller', 'Kolonne', 'Fra', 'Til']
+        if pd.api.types.is_integer_dtype(celler['Spiller']):
+            celler['Spiller'] = hent_tropp().navn_for(celler['Spiller'])
+        celler = celler.astype(str)
+        st.dataframe(celler, hide_index=True)
+    return valgt
+
+def vis_kampsok():
+    """
+    Søk i lagrede kamper etter navn, motstander, dato, spiller og posisjon.
+    Returnerer navnene på kampene på valgt side.
+    """
+    kampsok = hent_kampsok()
+    kampsok.synkroniser(hent_kamparkiv())
+    tekst = st.text_input("Søk i kamper", placeholder="Kampnavn eller motstander")
+    datoer = st.date_input("Datoer", value=(), format="YYYY-MM-DD")
+    col1, col2, col3 = st.columns(3)
+    motstander = col1.selectbox("Motstander", options=[None] + kampsok.motstandere(), format_func=lambda m: m or "Alle")
+    spiller = col2.selectbox("Spiller", options=[None] + kampsok.spillere(), format_func=lambda s: s or "Alle")
+    posisjon = col3.selectbox("Posisjon", options=[None] + POSISJONER, format_func=lambda p: p or "Alle")
+    filtre = {
+        'tekst': tekst,
+        'fra_dato': datoer[0] if len(datoer) > 0 else None,
+        'til_dato': datoer[1] if len(datoer) > 1 else None,
+        'motstander': motstander,
+        'spiller': spiller,
+        'posisjon': posisjon
+    }
+    # Gå tilbake til første side når filtrene endres
+    if st.session_state.get('kampsok_filtre') != filtre:
+        st.session_state.kampsok_filtre = filtre
+        st.session_state.kampsok_side = 1
+    resultat = kampsok.sok(**filtre, side=st.session_state.get('kampsok_side', 1), per_side=PER_SIDE)
+    if resultat['antall_sider'] > 1:
+        st.number_input(
+            f"Side (av {resultat['antall_sider']})",
+            min_value=1, max_value=resultat['antall_sider'], key="kampsok_side"
+        )
+    st.caption(f"{resultat['totalt']} kamper funnet")
+    return [k['navn'] for k in resultat['kamper']]
+
+def vis_lignende_kamper():
+    """Viser tidligere kamper med nesten samme tropp, som kan brukes som utgangspunkt"""
+    with st.expander("Start fra lignende kamp"):
+        indeks = hent_lignendeindeks()
+        kamparkiv = hent_kamparkiv()
+        indeks.synkroniser(kamparkiv)
+        df = st.session_state.spilletid_df
+        tilgjengelige = df.index[df['Tilgjengelig']].tolist()
+        treff = indeks.finn(
+            df.loc[df['Tilgjengelig'], SPILLER_ID].tolist(), st.session_state.kamptid, st.session_state.antall_paa_banen
+        )
+        if not treff:
+            st.info("Ingen lagrede kamper med samme antall på banen")
+            return
+        for nummer, t in enumerate(treff):
+            kamp = kamparkiv.hent(t['navn'])
+            col1, col2 = st.columns([3, 1])
+            col1.markdown(
+                f"**{t['navn']}** ({kamp.get('dato', '')}, {t['kamptid']} min) – "
+                f"{t['felles']} av {len(tilgjengelige)} spillere felles, likhet {t['jaccard']:.0%}"
+            )
+            if col2.button("Bruk", key=f"lignende_{nummer}"):
+                sett_tidslinje(tilpass_kamp(kamp_med_navn(kamp, hent_tropp()), st.session_state.kamptid, tilgjengelige))
+                st.session_state.historikk.registrer(st.session_state.spilletid_df)
+                db.lagre_alt()  # Lagre før rerun, ellers lastes forrige oppstilling fra databasen
+                st.rerun()
+
+def vis_turneringsdag():
+    """Planlegger alle kampene på en turneringsdag samlet, med hvile mellom kampene"""
+    with st.expander("Turneringsdag"):
+        antall = st.session_state.antall_paa_banen
+        kamper_df = st.data_editor(
+            pd.DataFrame({
+                'Start (min)': [0, 45, 90],
+                'Kamptid': [20, 20, 20],
+                'Antall på banen': [antall, antall, antall]
+            }),
+            num_rows="dynamic",
+            hide_index=True,
+            key="turneringskamper"
+        )
+        col1, col2, col3 = st.columns(3)
+        maks_sammenhengende = col1.number_input("Maks minutter i strekk", min_value=5, max_value=60, value=20, step=5)
+        min_hvile = col2.number_input("Minste hvile mellom kamper", min_value=0, max_value=120, value=15, step=5)
+        tidsbudsjett = col3.number_input("Tidsbudsjett (sekunder)", min_value=1, max_value=60, value=5)
+
+        if st.button("Planlegg turneringsdag"):
+            kamper = [
+                {'start': int(rad['Start (min)']), 'kamptid': int(rad['Kamptid']),
+                 'antall_paa_banen': int(rad['Antall på banen'])}
+                for _, rad in kamper_df.dropna().iterrows()
+            ]
+            if kamper:
+                with st.spinner("Planlegger turneringsdagen..."):
+                    st.session_state.turneringsplan = planlegg_turneringsdag(
+                        st.session_state.spilletid_df, kamper,
+                        maks_sammenhengende=maks_sammenhengende,
+                        min_hvile=min_hvile,
+                        tidsbudsjett=tidsbudsjett
+                    )
+
+        plan = st.session_state.get('turneringsplan')
+        if plan is None:
+            return
+        brudd = {regel: antall for regel, antall in plan['brudd'].items() if antall}
+        if brudd:
+            st.warning("Fant ingen plan uten brudd: " + ", ".join(f"{regel} ({antall})" for regel, antall in brudd.items()))
+        else:
+            st.success("Planen oppfyller alle regler for turneringsdagen")
+        st.dataframe(plan['minutter'].to_frame())
+        nokkel = jobbnokkel('turneringsdag', *(
+            del_ for kamp in plan['kamper']
+            for del_ in (kamp['spilletid_df'], kamp['start'], kamp['perioder'], kamp['posisjoner'].til_liste())
+        ))
+        if st.button("Eksporter turneringsdag"):
+            # Planen byttes ut, men endres aldri, når dagen planlegges på nytt
+            start_rapportjobb('turneringsdag', nokkel, eksporter_turneringsdag, plan['kamper'])
+        vis_rapportjobb('turneringsdag', nokkel, _vis_turneringseksport)
+        for nummer, kamp in enumerate(plan['kamper'], start=1):
+            df = kamp['spilletid_df']
+            st.markdown(f"**Kamp {nummer}** – start {kamp['start']} min, {kamp['kamptid']} min")
+            visning = pd.DataFrame(index=df.index)
+            posisjoner = effektive_posisjoner(df, kamp['perioder'], kamp['posisjoner'])
+            for j, periode in enumerate(kamp['perioder']):
+                posisjon = posisjoner[:, j]
+                visning[periode] = np.where(df[periode], np.where(posisjon == 'Keeper', 'K', '✓'), '')
+            st.dataframe(visning)
+
+def start_rapportjobb(navn, nokkel, funksjon, *args):
+    """Sender en rapport eller eksport til bakgrunnsjobbene og husker jobb-id-en og nøkkelen i sesjonen"""
+    jobb_id = hent_rapportjobber().send_inn(navn, nokkel, funksjon, *args)
+    st.session_state.rapportjobber[navn] = (jobb_id, nokkel)
+
+def _hent_rapportjobb(navn):
+    jobb_id, _ = st.session_state.rapportjobber.get(navn, (None, None))
+    return hent_rapportjobber().hent(jobb_id) if jobb_id else None
+
+def vis_rapportjobb(navn, nokkel, visning):
+    """
+    Viser fremdriften til en bakgrunnsjobb og resultatet når den er ferdig.
+    Fragmentet spør etter status hvert sekund bare mens jobben kjører.
+    Er inndataene endret siden jobben ble startet (nokkel er jobbnøkkelen
+    for dagens inndata), vises ikke det gamle resultatet.
+    """
+    _, startet_med = st.session_state.rapportjobber.get(navn, (None, None))
+    if startet_med is not None and startet_med != nokkel:
+        st.info(f"Oppstillingen er endret siden {navn} ble laget. Lag den på nytt for å se den.")
+        return
+    jobb = _hent_rapportjobb(navn)
+    kjorer = jobb is not None and not jobb.ferdig
+    st.fragment(_vis_rapportjobb, run_every=1 if kjorer else None)(navn, visning, kjorer)
+
+def _vis_rapportjobb(navn, visning, kjorer):
+    jobb = _hent_rapportjobb(navn)
+    if jobb is None:
+        return
+    if not jobb.ferdig:
+        st.progress(jobb.andel, text=f"Lager {jobb.navn} ... {jobb.andel:.0%}")
+        return
+    if kjorer:
+        st.rerun()  # Tegn hele siden på nytt, ellers fortsetter fragmentet å spørre
+    if jobb.feil:
+        st.error(f"Kunne ikke lage {jobb.navn}: {jobb.feil}")
+    else:
+        visning(jobb.resultat)
+
+def _vis_kamprapport(rapport):
+    st.text_area("Kampplan", rapport, height=400)
+    st.download_button(
+        label="Last ned kamprapport",
+        data=rapport,
+        file_name="kamprapport.txt",
+        mime="text/plain"
+    )
+
+def _vis_turneringseksport(eksport):
+    col1, col2 = st.columns(2)
+    col1.download_button(
+        label="Last ned kamprapporter",
+        data=eksport['rapport'],
+        file_name="turneringsdag.txt",
+        mime="text/plain"
+    )
+    col2.download_button(
+        label="Last ned kampplaner som CSV",
+        data=eksport['csv'],
+        file_name="turneringsdag.csv",
+        mime="text/csv"
+    )
+
+def vis_simulering():
+    """Simulerer mange fraværsscenarier for å se hvor sårbar troppen er"""
+    with st.expander("Troppsdybde (simulering av fravær)"):
+        df = st.session_state.spilletid_df
+        fravaer_df = st.data_editor(
+            pd.DataFrame({'Fravær (%)': round(STANDARD_FRAVAER * 100)}, index=df.index),
+            column_config={'Fravær (%)': st.column_config.NumberColumn(min_value=0, max_value=100, step=5)},
+            key="fravaer"
+        )
+        scenarier = st.number_input("Antall scenarier", min_value=100, max_value=100000, value=5000, step=1000)
+
+        if st.button("Simuler fravær"):
+            if not st.session_state.perioder:
+                st.warning("Ingen perioder er definert ennå")
+                return
+            with st.spinner("Simulerer..."):
+                st.session_state.simulering = simuler_tilgjengelighet(
+                    df, st.session_state.perioder, st.session_state.kamptid,
+                    st.session_state.antall_paa_banen,
+                    fravaer=fravaer_df['Fravær (%)'].fillna(0) / 100,
+                    scenarier=int(scenarier)
+                )
+
+        resultat = st.session_state.get('simulering')
+        if resultat is None:
+            return
+        col1, col2 = st.columns(2)
+        col1.metric("For få spillere", f"{resultat['for_faa']:.1%}")
+        col2.metric("Formasjonen kan ikke fylles", f"{resultat['formasjon_umulig']:.1%}")
+        st.caption("Sannsynlighet for at en posisjonsgruppe mangler spillere")
+        st.dataframe((resultat['mangel'] * 100).round(1).rename('Prosent').to_frame())
+        st.caption(f"Minutter per spiller over {resultat['scenarier']} scenarier")
+        st.dataframe(resultat['minutter'])
+
+def vis_belastning():
+    """Belastningen inn i kampen per spiller, fra de arkiverte kampene"""
+    with st.expander("Belastning"):
+        belastning = hent_belastning()
+        belastning.synkroniser(hent_kamparkiv())
+        df = st.session_state.spilletid_df
+        dato = st.session_state.kamp_info['dato']
+        kamp = st.session_state.kamp_info.get('navn')
+        ider = df[SPILLER_ID].to_numpy()
+        status = belastning.status(ider, dato, unntatt=kamp)
+        status['Justering'] = belastning.justeringer(ider, dato, unntatt=kamp)
+        status.index = pd.Index(df.index, name='Spiller')
+        st.caption(
+            f"Minutter siste {AKUTT_DAGER} og {KRONISK_DAGER} dager før {dato}. ACWR er forholdet mellom "
+            f"siste uke og ukesnittet over {KRONISK_DAGER} dager; {TRYGG_SONE[0]}–{TRYGG_SONE[1]} regnes som trygt."
+        )
+        st.dataframe(status.round(2), use_container_width=True)
+
+def vis_sesonganalyse():
+    """Sammendrag over alle lagrede kamper, fra Parquet-eksporten av kamparkivet"""
+    with st.expander("Sesonganalyse"):
+        analyse = hent_sesonganalyse()
+        analyse.synkroniser(hent_kamparkiv())
+        sesonger = analyse.sesonger()
+        if not sesonger:
+            st.info("Ingen lagrede kamper ennå")
+            return
+        sesong = st.selectbox("Sesong", options=[None] + sesonger[::-1], format_func=lambda s: s or "Alle")
+        st.caption("Minutter per posisjon")
+        st.dataframe(analyse.minutter_per_posisjon(sesong))
+        st.caption("Benk (perioder på benken når spilleren var tilgjengelig)")
+        st.dataframe(analyse.benkfrekvens(sesong))
+        if sesong is None:
+            st.caption("Minutter per sesong")
+            st.dataframe(analyse.minutter_per_sesong())
+
 # Forenklet initialisering av session state
 def initialize_session_state():
     if 'kamp_info' not in st.session_state:
         st.session_state.kamp_info = {
             'motstander': '',
-            'dato': datetime.now().strftime("%Y-%m-%d")
+            'dato': datetime.now().strftime("%Y-%m-%d"),
+            'navn': None        # Kampen som er lastet eller lagret, se vis_belastning
         }
     
     if 'spilletid_df' not in st.session_state:
         logger.info("Initialiserer ny session state")
-        # Standard spillerliste som utgangspunkt
-        spillere = {
-            'Susanne': 'Keeper',
-            'Tuva': 'Midtstopper',
-            'Adele': 'Back',
-            'Sarah': 'Back',
-            'Madelen': 'Sentral midtbane',
-            'Ingrid': 'Sentral midtbane',
-            'Karen': 'Spiss',
-            'Diyana': 'Ving',
-            'Martine': 'Back',
-            'Hanna': 'Back',
-            'Veslemøy': 'Ving',
-            'Emilie': 'Ving',
-            'Lilly': 'Ving'
-        }
-        
-        # Opprett DataFrame
-        df = pd.DataFrame(index=spillere.keys())
-        df['Posisjoner'] = pd.Series({navn: [pos] for navn, pos in spillere.items()})
-        df['Aktiv posisjon'] = pd.Series(spillere)
-        df['Tilgjengelig'] = True
-        df['Total spilletid'] = 0
-        df['Differanse'] = 0
-        df['Mål spilletid'] = 0
-        
-        # Legg til periodekolonner
+        # Spillerne i troppen fra spillerregisteret som utgangspunkt
         perioder = generer_perioder(st.session_state.get('kamptid', 80))
-        for periode in perioder:
-            df[periode] = False
-        
-        st.session_state.spilletid_df = df
-        logger.info(f"Opprettet ny spilletid_df med {len(spillere)} spillere")
+        st.session_state.spilletid_df = hent_tropp().spilletid_df(perioder)
+        logger.info(f"Opprettet ny spilletid_df med {len(st.session_state.spilletid_df)} spillere")
     
     if 'antall_paa_banen' not in st.session_state:
         st.session_state.antall_paa_banen = 9
@@ -154,30 +516,21 @@ def initialize_session_state():
     if 'perioder' not in st.session_state:
         st.session_state.perioder = generer_perioder(st.session_state.kamptid)
     
-    db.last_alt()
+    if 'posisjonsoverstyringer' not in st.session_state:
+        st.session_state.posisjonsoverstyringer = Posisjonsoverstyringer()
 
-def generer_perioder(total_tid):
-    """Genererer bytteperioder basert på total kamptid"""
-    perioder = []
-    omgang_tid = total_tid // 2
-    
-    # Første omgang
-    tid = 0
-    perioder.append(f'0-15')  # Første periode er alltid 15 min
-    tid += 15
-    while tid < omgang_tid:
-        neste_tid = min(tid + 10, omgang_tid)
-        perioder.append(f'{tid}-{neste_tid}')
-        tid = neste_tid
-        
-    # Andre omgang
-    tid = omgang_tid
-    while tid < total_tid:
-        neste_tid = min(tid + 10, total_tid)
-        perioder.append(f'{tid}-{neste_tid}')
-        tid = neste_tid
+    if 'rapportjobber' not in st.session_state:
+        st.session_state.rapportjobber = {}  # (jobb-id, nøkkel) per rapport, se hent_rapportjobber
     
-    return perioder
+    db.last_alt()
+    st.session_state.spilletid_df = normaliser_spilletid_df(st.session_state.spilletid_df)
+    
+    # Start ny historikk hvis spillerne eller periodene er endret
+    historikk = st.session_state.get('historikk')
+    if historikk is None or not historikk.passer_til(st.session_state.spilletid_df, st.session_state.perioder):
+        st.session_state.historikk = Oppstillingshistorikk.fra_df(
+            st.session_state.spilletid_df, st.session_state.perioder
+        )
 
 def oppdater_perioder():
     logger.info(f"Oppdaterer perioder for kamptid {st.session_state.kamptid} minutter")
@@ -192,86 +545,265 @@ def oppdater_perioder():
         st.session_state.spilletid_df[periode] = False
     
     st.session_state.perioder = nye_perioder
+    st.session_state.posisjonsoverstyringer = st.session_state.posisjonsoverstyringer.behold(perioder=nye_perioder)
+    st.session_state.historikk = Oppstillingshistorikk.fra_df(st.session_state.spilletid_df, nye_perioder)
     logger.info(f"Nye perioder generert: {nye_perioder}")
 
-def kalkuler_spilletid(df, perioder):
-    logger.debug("Starter kalkulering av spilletid")
-    total_spilletid = 0
-    
+def bruk_historikkendringer(endringer):
+    """
+    Skriver endrede celler fra en versjon i historikken tilbake til spilletid_df.
+    Checkbox-tilstanden for cellene fjernes slik at rutenettet viser de nye verdiene.
+    """
+    df = st.session_state.spilletid_df
+    for spiller, periode, verdi in endringer:
+        df.at[spiller, periode] = verdi
+        st.session_state.pop(f"{periode}_{spiller}", None)
+    logger.info(f"Historikk: {len(endringer)} celler endret")
+
+def _periodefingeravtrykk(df, perioder):
+    """Fingeravtrykk av periodekolonnene, brukt for å se om rutenettet er endret"""
+    return tuple(perioder), tuple(df.index), pakk_perioder(df, perioder).tobytes()
+
+def sett_tidslinje(tidslinje):
+    """Lagrer tidslinjen i session state sammen med periodekolonnene den tilsvarer"""
+    df = st.session_state.spilletid_df
+    perioder = st.session_state.perioder
+    paa_banen = tidslinje.til_perioder(perioder, df.index.tolist())
     for periode in perioder:
-        start, slutt = map(int, periode.split('-'))
-        varighet = slutt - start
-        total_spilletid += df[periode].astype(int) * varighet
-    
-    df['Total spilletid'] = total_spilletid
-    df['Differanse'] = df['Total spilletid'] - df['Mål spilletid']
-    logger.info(f"Total spilletid kalkulert. Gjennomsnitt: {df['Total spilletid'].mean():.1f} minutter")
-    return df
+        for spiller in df.index[df[periode] != paa_banen[periode]]:
+            st.session_state.pop(f"{periode}_{spiller}", None)
+        df[periode] = paa_banen[periode]
+    st.session_state.tidslinje = tidslinje
+    st.session_state.tidslinje_fingeravtrykk = _periodefingeravtrykk(df, perioder)
+
+def hent_tidslinje():
+    """
+    Returnerer tidslinjen for gjeldende oppstilling. Endrede celler i
+    rutenettet skrives inn i tidslinjen, slik at bytter midt i periodene
+    beholdes. Den bygges på nytt fra kolonnene bare når periodene er nye.
+    """
+    df = st.session_state.spilletid_df
+    perioder = st.session_state.perioder
+    fingeravtrykk = _periodefingeravtrykk(df, perioder)
+    tidslinje = st.session_state.get('tidslinje')
+    forrige = st.session_state.get('tidslinje_fingeravtrykk')
+    if tidslinje is None or forrige is None or forrige[0] != fingeravtrykk[0] or tidslinje.kamptid != st.session_state.kamptid:
+        st.session_state.tidslinje = Tidslinje.fra_perioder(df, perioder, st.session_state.kamptid)
+    elif forrige != fingeravtrykk:
+        tidslinje.oppdater_fra_perioder(df, perioder)
+    st.session_state.tidslinje_fingeravtrykk = fingeravtrykk
+    return st.session_state.tidslinje
+
+def gi_spiller_nytt_navn(spiller_id, nytt):
+    """
+    Gir en spiller nytt navn i spillerregisteret. Lagrede kamper refererer til
+    id og trenger ingen endring; bare navnene i denne sesjonen og i søkeindeksen
+    byttes ut. Spilleren finnes i oppstillingen på id, så navnet byttes også om
+    sesjonen fortsatt har et eldre navn.
+    """
+    tropp = hent_tropp()
+    i_registeret = tropp.navn_for_id(spiller_id)
+    tropp.gi_nytt_navn(spiller_id, nytt)
+    nytt = tropp.navn_for_id(spiller_id)
+
+    df = st.session_state.spilletid_df
+    i_oppstillingen = df.index[df[SPILLER_ID] == spiller_id]
+    if len(i_oppstillingen):
+        gammelt = i_oppstillingen[0]
+        tidslinje = hent_tidslinje().til_dict()
+        for periode in st.session_state.perioder:
+            st.session_state.pop(f"{periode}_{gammelt}", None)
+        st.session_state.spilletid_df = df.rename(index={gammelt: nytt})
+        st.session_state.posisjonsoverstyringer = Posisjonsoverstyringer({
+            (nytt if spiller == gammelt else spiller, periode): posisjon
+            for (spiller, periode), posisjon in st.session_state.posisjonsoverstyringer.items()
+        })
+        if gammelt in tidslinje['intervaller']:
+            tidslinje['intervaller'][nytt] = tidslinje['intervaller'].pop(gammelt)
+        sett_tidslinje(Tidslinje.fra_dict(tidslinje))
+        st.session_state.historikk = Oppstillingshistorikk.fra_df(
+            st.session_state.spilletid_df, st.session_state.perioder
+        )
+    hent_kampsok().gi_nytt_navn(i_registeret, nytt)
+
+def live_kamp_id():
+    """
+    Nøkkelen live-hendelsene lagres under: navnet kampen er lagret eller
+    lastet med, ellers en id laget for kampen i denne sesjonen. Hendelsene
+    flyttes til navnet når kampen lagres, se lagre_kampoppsett.
+    """
+    info = st.session_state.kamp_info
+    if info.get('navn'):
+        return info['navn']
+    if not info.get('live_id'):
+        info['live_id'] = f"live-{uuid.uuid4().hex[:12]}"
+    return info['live_id']
+
+def _live_navn_for(spiller_id):
+    """Navnet til en spiller i live-hendelsene: fra oppstillingen, ellers fra registeret"""
+    df = st.session_state.spilletid_df
+    i_oppstillingen = df.index[df[SPILLER_ID] == spiller_id]
+    return i_oppstillingen[0] if len(i_oppstillingen) else hent_tropp().navn_for_id(spiller_id)
 
-def telle_spillere_pa_banen(df, periode):
+def hent_live_kamp():
     """
-    Teller antall spillere på banen i en gitt periode og returnerer detaljert info.
+    Returnerer live-tilstanden for gjeldende kamp. Ved første kall spilles
+    lagrede hendelser av igjen, slik at en omlastet side kan fortsette kampen.
+    """
+    kamp_id = live_kamp_id()
+    live = st.session_state.get('live_kamp')
+    if live is None or st.session_state.get('live_kamp_id') != kamp_id:
+        df = st.session_state.spilletid_df
+        live = LiveKamp(df[df['Tilgjengelig']], st.session_state.perioder, st.session_state.kamptid)
+        klokke_start = None
+        for hendelse in db.last_hendelser(kamp_id):
+            hendelse = hendelse_med_navn(hendelse, _live_navn_for)
+            live.bruk(hendelse)
+            if hendelse['type'] == HENDELSE_START:
+                klokke_start = klokkestart_fra_hendelse(hendelse)
+        st.session_state.live_kamp = live
+        st.session_state.live_kamp_id = kamp_id
+        if klokke_start is None:
+            klokke_start = time.time() - live.sist_minutt * 60
+        st.session_state.live_klokke_start = klokke_start
+    return live
+
+def klokkestart_fra_hendelse(hendelse):
+    """
+    Når kampklokken startet, regnet fra det lagrede tidspunktet for
+    starthendelsen. Da går klokken videre også når siden lastes på nytt.
+    """
+    if not hendelse.get('tidspunkt'):
+        return None
+    lagret = datetime.strptime(hendelse['tidspunkt'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc)
+    return lagret.timestamp() - float(hendelse['minutt']) * 60
+
+def live_minutt(live):
+    """Gjeldende minutt på kampklokken"""
+    if not live.startet or live.avsluttet:
+        return live.sist_minutt
+    return min(live.kamptid, (time.time() - st.session_state.live_klokke_start) / 60)
+
+def registrer_live_hendelse(live, hendelse):
+    """
+    Sjekker hendelsen, legger den til som én rad i databasen (med
+    spiller-id-er) og oppdaterer så live-tilstanden, slik at minnet aldri er
+    foran databasen. Feil lagres
+    i live_feil og vises av vis_live_kamp, siden dette kjøres fra callbacks.
+    """
+    try:
+        live.sjekk(hendelse)
+        df = st.session_state.spilletid_df
+        lagres = hendelse_med_ider(hendelse, dict(zip(df.index, df[SPILLER_ID])))
+        start = time.perf_counter()
+        db.lagre_hendelse(
+            live_kamp_id(), lagres['type'], lagres['minutt'],
+            lagres['ut'], lagres['inn'], lagres['data']
+        )
+        logger.info(f"Live-hendelse {hendelse['type']} lagret på {(time.perf_counter() - start) * 1000:.1f} ms")
+    except ValueError as e:
+        st.session_state.live_feil = str(e)
+        return False
+    except Exception as e:
+        logger.error(f"Kunne ikke lagre live-hendelse: {e}")
+        st.session_state.live_feil = f"Kunne ikke lagre hendelsen: {e}"
+        return False
+    live.bruk(hendelse)
+    return True
+
+def _start_live_kamp():
+    live = hent_live_kamp()
+    if registrer_live_hendelse(live, start_hendelse(0.0, st.session_state.live_startoppstilling)):
+        st.session_state.live_klokke_start = time.time()
+
+def _registrer_live_bytte():
+    live = hent_live_kamp()
+    registrer_live_hendelse(
+        live, bytte_hendelse(round(live_minutt(live), 1), st.session_state.live_ut, st.session_state.live_inn)
+    )
+
+def _avslutt_live_kamp():
+    live = hent_live_kamp()
+    registrer_live_hendelse(live, slutt_hendelse(round(live_minutt(live), 1)))
+
+def _nullstill_live_kamp():
+    db.slett_hendelser(live_kamp_id())
+    st.session_state.pop('live_kamp', None)
+
+@st.fragment(run_every=5)
+def vis_live_kamp():
+    """
+    Live-modus. Kjøres som fragment slik at bytter og klokke oppdateres uten
+    at resten av siden kjøres på nytt. Knappene bruker callbacks, slik at
+    hendelsen er registrert før fragmentet tegnes.
+    """
+    live = hent_live_kamp()
+    if 'live_feil' in st.session_state:
+        st.error(st.session_state.pop('live_feil'))
+    minutt = live_minutt(live)
+    st.metric("Kampklokke", f"{int(minutt):02d}:{int(minutt * 60) % 60:02d}")
     
-    Args:
-        df (pd.DataFrame): Spillerdataframe
-        periode (str): Perioden som skal telles
+    if not live.startet:
+        st.multiselect(
+            "Startoppstilling",
+            options=live.spillere,
+            default=live.planlagt_startoppstilling(),
+            key="live_startoppstilling"
+        )
+        st.button("Start kamp", on_click=_start_live_kamp)
+    elif not live.avsluttet:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            ut = st.selectbox("Ut", options=sorted(live.paa_banen), key="live_ut")
+        with col2:
+            inn = st.selectbox(
+                "Inn",
+                options=[s for s in live.spillere if s not in live.paa_banen],
+                key="live_inn"
+            )
+        with col3:
+            st.button("Registrer bytte", key="live_bytte", disabled=not (ut and inn), on_click=_registrer_live_bytte)
+            st.button("Avslutt kamp", on_click=_avslutt_live_kamp)
+    else:
+        st.success("Kampen er avsluttet")
     
-    Returns:
-        tuple: (antall, liste med spillere)
-    """
-    spillere_pa_banen = df[df[periode] == True]
-    return len(spillere_pa_banen), spillere_pa_banen.index.tolist()
+    st.dataframe(live.sammenligning(minutt), use_container_width=True)
+    st.button("Nullstill live-kamp", on_click=_nullstill_live_kamp)
 
-def oppdater_mal_spilletid():
-    """Oppdaterer mål spilletid basert på kamptid og antall tilgjengelige spillere"""
+def oppdater_mal_spilletid(justeringer=None):
+    """
+    Oppdaterer mål spilletid basert på kamptid og antall tilgjengelige spillere.
+    justeringer er en valgfri faktor per spiller (pd.Series på navn), f.eks. fra
+    belastningsjusteringer(); den totale spilletiden er den samme.
+    """
     df = st.session_state.spilletid_df
     tilgjengelige_spillere = df[df['Tilgjengelig']].shape[0]
     if tilgjengelige_spillere > 0:
-        gjennomsnittlig_tid = (st.session_state.kamptid * st.session_state.antall_paa_banen) / tilgjengelige_spillere
-        df.loc[df['Tilgjengelig'], 'Mål spilletid'] = round(gjennomsnittlig_tid)
+        mal = beregn_mal_spilletid(
+            st.session_state.kamptid, st.session_state.antall_paa_banen, tilgjengelige_spillere
+        )
+        if justeringer is not None:
+            faktorer = justeringer.reindex(df.index[df['Tilgjengelig']]).fillna(1.0)
+            mal = juster_mal_spilletid(mal, faktorer, maks=st.session_state.kamptid).astype(df['Mål spilletid'].dtype)
+        df.loc[df['Tilgjengelig'], 'Mål spilletid'] = mal
     return df
 
-def generer_kamprapport(df, perioder):
-    """Genererer en detaljert kamprapport med bytter, oppstillinger og benk"""
-    rapport = []
-    forrige_periode_spillere = set()
-    
-    for periode in perioder:
-        periode_spillere = set(df[df[periode] == True].index)
-        tilgjengelige_spillere = set(df[df['Tilgjengelig'] == True].index)
-        spillere_pa_benk = tilgjengelige_spillere - periode_spillere
-        
-        inn = periode_spillere - forrige_periode_spillere
-        ut = forrige_periode_spillere - periode_spillere
-        
-        rapport.append(f"\nPeriode {periode}")
-        rapport.append("-" * 40)
-        
-        if inn:
-            rapport.append("Inn:")
-            for spiller in sorted(inn):
-                pos = df.at[spiller, 'Aktiv posisjon']
-                rapport.append(f"- {spiller} ({pos})")
-        
-        if ut:
-            rapport.append("\nUt:")
-            for spiller in sorted(ut):
-                pos = df.at[spiller, 'Aktiv posisjon']
-                rapport.append(f"- {spiller} ({pos})")
-        
-        rapport.append("\nPå banen:")
-        for spiller in sorted(periode_spillere):
-            pos = df.at[spiller, 'Aktiv posisjon']
-            rapport.append(f"- {spiller} ({pos})")
-            
-        rapport.append("\nPå benken:")
-        for spiller in sorted(spillere_pa_benk):
-            pos = df.at[spiller, 'Aktiv posisjon']
-            rapport.append(f"- {spiller} ({pos})")
-        
-        forrige_periode_spillere = periode_spillere
-    
-    return "\n".join(rapport)
+def belastningsjusteringer():
+    """
+    Faktor per tilgjengelig spiller for mål spilletid ut fra belastningen inn
+    i kampen, eller None hvis justering etter belastning ikke er slått på
+    """
+    if not st.session_state.get('belastningsjustering'):
+        return None
+    df = st.session_state.spilletid_df
+    tilgjengelige = df.index[df['Tilgjengelig']]
+    belastning = hent_belastning()
+    belastning.synkroniser(hent_kamparkiv())
+    info = st.session_state.kamp_info
+    faktorer = belastning.justeringer(
+        df.loc[tilgjengelige, SPILLER_ID].to_numpy(), info['dato'], unntatt=info.get('navn')
+    )
+    return pd.Series(faktorer, index=tilgjengelige)
 
 def propager_valg(df, periode_index, perioder, original_spiller):
     try:
@@ -321,9 +853,13 @@ def propager_valg(df, periode_index, perioder, original_spiller):
             
             logger.info(f"Vurderer periode {neste_periode}: {antall_pa_banen} spillere på banen")
             
-            # Hvis vi setter på spiller, sjekk at det er plass
-            if valgt_status and antall_pa_banen >= st.session_state.antall_paa_banen and not df.at[original_spiller, neste_periode]:
-                logger.info(f"Stopper propagering i periode {neste_periode} - for mange spillere")
+            # Hvis vi setter på spiller, sjekk at endringen er gyldig
+            brudd = valider_endring(
+                df, neste_periode, original_spiller, valgt_status, st.session_state.antall_paa_banen,
+                st.session_state.posisjonsoverstyringer
+            )
+            if brudd:
+                logger.info(f"Stopper propagering i periode {neste_periode} - {brudd[0]['melding']}")
                 break
             
             # Oppdater status
@@ -340,116 +876,21 @@ def propager_valg(df, periode_index, perioder, original_spiller):
 
 def valider_bytte(df, periode, ny_spiller, gammel_status, ny_status):
     """
-    Validerer om et bytte er tillatt basert på antall spillere på banen.
+    Validerer om et bytte er tillatt basert på antall spillere på banen og posisjonsgrenser.
     """
     try:
-        current_count = df[periode].sum()
-        
         if gammel_status and not ny_status:  # Tar av en spiller
             return True
         elif not gammel_status and ny_status:  # Setter på en spiller
-            if current_count >= st.session_state.antall_paa_banen:
-                return False
+            return not valider_endring(
+                df, periode, ny_spiller, ny_status, st.session_state.antall_paa_banen,
+                st.session_state.posisjonsoverstyringer
+            )
         return True
     except Exception as e:
         logger.error(f"Feil ved validering av bytte: {str(e)}")
         return False
 
-def format_spillere_i_posisjon(spillere_per_posisjon, posisjoner):
-    """
-    Helper funksjon for å formatere spillerliste.
-    Håndterer nå spillere med flere posisjoner ved å kun vise dem i deres aktive posisjon.
-    """
-    if isinstance(posisjoner, str):
-        posisjoner = [posisjoner]
-    
-    # Hold styr på allerede viste spillere
-    viste_spillere = set()
-    spillere = []
-    
-    for pos, spiller_liste in spillere_per_posisjon.items():
-        if any(p in pos for p in posisjoner):
-            for spiller in spiller_liste:
-                if spiller not in viste_spillere:
-                    spillere.append(spiller)
-                    viste_spillere.add(spiller)
-    
-    return ', '.join(sorted(spillere)) if spillere else '-'
-
-def generer_formasjon(spillere_per_posisjon):
-    """
-    Helper funksjon for å generere formasjonsstreng.
-    Oppdatert for å kun telle spillere basert på deres aktive posisjon.
-    """
-    forsvar = sum(1 for pos, spillere in spillere_per_posisjon.items() 
-                 if any(p in pos for p in ['Back', 'Midtstopper']))
-    
-    midtbane = sum(1 for pos, spillere in spillere_per_posisjon.items() 
-                  if any(p in pos for p in ['Sentral midtbane', 'Ving']))
-    
-    angrep = sum(1 for pos, spillere in spillere_per_posisjon.items() 
-                if 'Spiss' in pos)
-    
-    return f"{forsvar}-{midtbane}-{angrep}"
-
-def generer_detaljert_kampoppsett(df, perioder):
-    """
-    Genererer et detaljert kampoppsett som viser bytter, formasjoner, spillere på banen og benk.
-    """
-    kampoppsett_data = []
-    forrige_spillere = set()
-    
-    for periode in perioder:
-        # Finn spillere på banen i denne perioden
-        spillere_i_periode = set(df[df[periode] == True].index)
-        tilgjengelige_spillere = set(df[df['Tilgjengelig'] == True].index)
-        spillere_pa_benk = tilgjengelige_spillere - spillere_i_periode
-        
-        # Beregn bytter
-        inn = spillere_i_periode - forrige_spillere
-        ut = forrige_spillere - spillere_i_periode
-        
-        # Organiser spillere etter deres aktive posisjon
-        spillere_per_posisjon = {}
-        for spiller in spillere_i_periode:
-            aktiv_posisjon = df.at[spiller, 'Aktiv posisjon']
-            if aktiv_posisjon not in spillere_per_posisjon:
-                spillere_per_posisjon[aktiv_posisjon] = []
-            spillere_per_posisjon[aktiv_posisjon].append(spiller)
-        
-        # Formater formasjon basert på aktive posisjoner
-        formasjon = generer_formasjon(spillere_per_posisjon)
-        
-        kampoppsett_data.append({
-            'Periode': periode,
-            'Formasjon': formasjon,
-            'Bytter Inn': ', '.join(sorted(inn)) if inn else '-',
-            'Bytter Ut': ', '.join(sorted(ut)) if ut else '-',
-            'Keeper': format_spillere_i_posisjon(spillere_per_posisjon, 'Keeper'),
-            'Forsvar': format_spillere_i_posisjon(spillere_per_posisjon, ['Back', 'Midtstopper']),
-            'Midtbane': format_spillere_i_posisjon(spillere_per_posisjon, ['Sentral midtbane', 'Ving']),
-            'Angrep': format_spillere_i_posisjon(spillere_per_posisjon, ['Spiss']),
-            'På benken': ', '.join(sorted(spillere_pa_benk)) if spillere_pa_benk else '-'
-        })
-        
-        forrige_spillere = spillere_i_periode
-    
-    return pd.DataFrame(kampoppsett_data)
-
-def get_max_spillere_per_posisjon(posisjon):
-    """
-    Returnerer maksimalt antall spillere tillatt i hver posisjon basert på formasjon.
-    """
-    max_spillere = {
-        'Keeper': 1,
-        'Back': 4,        # Økt til 4 for å tillate både høyre og venstre back
-        'Midtstopper': 2,
-        'Sentral midtbane': 2,
-        'Ving': 4,        # Økt til 4 for å tillate både høyre og venstre ving
-        'Spiss': 2        # Økt til 2 for mer fleksibilitet
-    }
-    return max_spillere.get(posisjon, 2)  # Standard 2 hvis ukjent posisjon
-
 def valider_bytte_med_posisjoner(df, periode, ny_spiller, gammel_status, ny_status):
     """
     Validerer bytter - returnerer bare True/False og posisjon.
@@ -474,12 +915,13 @@ def valider_bytte_med_posisjoner(df, periode, ny_spiller, gammel_status, ny_stat
 
         # Håndter innbytte (setter på spiller)
         elif not gammel_status and ny_status:
-            # Sjekk om laget er fullt
-            if antall_pa_banen >= maks_spillere:
+            # Sjekk om laget er fullt eller posisjonen er full
+            overstyringer = st.session_state.posisjonsoverstyringer
+            if valider_endring(df, periode, ny_spiller, ny_status, maks_spillere, overstyringer):
                 return False, None
 
-            # Hvis det er plass, tillat bytte med aktiv posisjon
-            return True, df.at[ny_spiller, 'Aktiv posisjon']
+            # Hvis det er plass, tillat bytte med posisjonen spilleren har i perioden
+            return True, posisjon_i_periode(df, ny_spiller, periode, overstyringer)
 
         return True, None
 
@@ -489,11 +931,14 @@ def valider_bytte_med_posisjoner(df, periode, ny_spiller, gammel_status, ny_stat
 
 def oppdater_spillerposisjon(df, spiller, periode, ny_posisjon):
     """
-    Oppdaterer spillerens posisjon for en spesifikk periode.
+    Oppdaterer spillerens posisjon for en spesifikk periode,
+    forutsatt at spilleren kan spille posisjonen. Posisjonen lagres som en
+    overstyring for (spiller, periode); df endres ikke.
     """
-    if f'posisjon_{periode}' not in df.columns:
-        df[f'posisjon_{periode}'] = df['Aktiv posisjon']
-    df.at[spiller, f'posisjon_{periode}'] = ny_posisjon
+    if not kan_spille(df.at[spiller, 'Posisjoner'], ny_posisjon):
+        logger.warning(f"{spiller} kan ikke spille {ny_posisjon}")
+        return df
+    st.session_state.posisjonsoverstyringer.sett(spiller, periode, ny_posisjon, df.at[spiller, 'Aktiv posisjon'])
     return df
 
 def main():
@@ -543,14 +988,42 @@ def main():
         
         if ny_antall_paa_banen != st.session_state.antall_paa_banen:
             st.session_state.antall_paa_banen = ny_antall_paa_banen
-            oppdater_mal_spilletid()
+            oppdater_mal_spilletid(belastningsjusteringer())
         
         # Vis total tilgjengelig spilletid
         total_tilgjengelig_tid = st.session_state.kamptid * st.session_state.antall_paa_banen
         st.info(f"Total tilgjengelig spilletid: {total_tilgjengelig_tid} minutter")
+        
+        st.toggle("Live-modus", key="live_modus", help="Registrer faktiske bytter under kampen")
+        st.toggle(
+            "Juster mål etter belastning", key="belastningsjustering",
+            help="Lavere mål spilletid for spillere med høy belastning siste uke, høyere for dem med lav"
+        )
+        
+        # Angre og gjør om endringer i oppstillingen
+        historikk = st.session_state.historikk
+        angre_col, gjenta_col = st.columns(2)
+        with angre_col:
+            if st.button("↩ Angre", disabled=not historikk.kan_angre, use_container_width=True):
+                bruk_historikkendringer(historikk.endrede_celler(*historikk.angre()))
+        with gjenta_col:
+            if st.button("↪ Gjør om", disabled=not historikk.kan_gjenta, use_container_width=True):
+                bruk_historikkendringer(historikk.endrede_celler(*historikk.gjenta()))
+
+        statistikk = db.mellomlager_statistikk()
+        st.caption(
+            f"Databasemellomlager: {statistikk['treffrate']:.0%} treff, "
+            f"spart {statistikk['sist_spart'] * 1000:.1f} ms denne kjøringen "
+            f"({statistikk['spart_tid'] * 1000:.0f} ms totalt)"
+        )
 
     # Oppdater mål spilletid før visning
-    st.session_state.spilletid_df = oppdater_mal_spilletid()
+    st.session_state.spilletid_df = oppdater_mal_spilletid(belastningsjusteringer())
+    
+    # Live-modus vises øverst og oppdateres uten å kjøre resten av siden
+    if st.session_state.get('live_modus'):
+        st.header("Live kamp")
+        vis_live_kamp()
     
         # Hovedområde
     st.header("Kampplanlegging")
@@ -560,8 +1033,9 @@ def main():
     perioder_omgang1 = st.session_state.perioder[:halvtid_idx]
     perioder_omgang2 = st.session_state.perioder[halvtid_idx:]
     
-    # Vis bare tilgjengelige spillere
-    edited_df = st.session_state.spilletid_df[st.session_state.spilletid_df['Tilgjengelig']].copy()
+    # Rediger spilletid_df direkte og vis bare tilgjengelige spillere
+    df = st.session_state.spilletid_df
+    tilgjengelige_spillere = df.index[df['Tilgjengelig']]
     
     col1, col2 = st.columns(2)
     
@@ -580,11 +1054,11 @@ def main():
                     st.write(periode)
 
             # Vis spillere og deres checkboxer
-            for spiller_idx, spiller_row in edited_df.iterrows():
+            for spiller_idx in tilgjengelige_spillere:
                 cols_spillere = st.columns([3] + [1] * len(perioder))
                 with cols_spillere[0]:
-                    aktiv_pos = spiller_row['Aktiv posisjon']
-                    alle_pos = ', '.join(spiller_row['Posisjoner'])
+                    aktiv_pos = df.at[spiller_idx, 'Aktiv posisjon']
+                    alle_pos = ', '.join(maske_til_posisjoner(df.at[spiller_idx, 'Posisjoner']))
                     st.write(f"{spiller_idx} ({aktiv_pos})")
                     st.caption(f"Kan spille: {alle_pos}")
                 
@@ -592,35 +1066,38 @@ def main():
                 for i, periode in enumerate(perioder):
                     with cols_spillere[i + 1]:
                         # Sjekk først om byttet ville være gyldig
-                        antall_pa_banen, _ = telle_spillere_pa_banen(edited_df, periode)
-                        kan_settes_pa = (antall_pa_banen < st.session_state.antall_paa_banen) or edited_df.at[spiller_idx, periode]
+                        kan_settes_pa = not valider_endring(
+                            df, periode, spiller_idx, True, st.session_state.antall_paa_banen,
+                            st.session_state.posisjonsoverstyringer
+                        )
                         
                         # Opprett checkbox
                         ny_status = st.checkbox(
                             "På banen",
-                            value=edited_df.at[spiller_idx, periode],
+                            value=df.at[spiller_idx, periode],
                             key=f"{periode}_{spiller_idx}",
                             label_visibility="collapsed",
-                            disabled=not kan_settes_pa and not edited_df.at[spiller_idx, periode]
+                            disabled=not kan_settes_pa and not df.at[spiller_idx, periode]
                         )
                         
                         # Hvis status endres, valider og oppdater
-                        if ny_status != edited_df.at[spiller_idx, periode]:
-                            if ny_status and antall_pa_banen >= st.session_state.antall_paa_banen:
-                                # Ikke tillat endringen hvis det blir for mange spillere
+                        if ny_status != df.at[spiller_idx, periode]:
+                            if ny_status and not kan_settes_pa:
+                                # Ikke tillat endringen hvis den bryter reglene
                                 continue
-                            edited_df.at[spiller_idx, periode] = ny_status
+                            df.at[spiller_idx, periode] = ny_status
                             periode_index = perioder.index(periode)
-                            edited_df = propager_valg(edited_df, periode_index, perioder, spiller_idx)
+                            df = propager_valg(df, periode_index, perioder, spiller_idx)
 
-    # Oppdater beregninger
-    edited_df = kalkuler_spilletid(edited_df, st.session_state.perioder)
+    # Registrer eventuelle endringer i historikken og oppdater beregninger
+    st.session_state.historikk.registrer(df)
+    df = kalkuler_spilletid(df, st.session_state.perioder, hent_tidslinje())
     
     # Validering og oversikt
     st.header("Oversikt og validering")
     
     # Total spilletidsvalidering
-    total_spilletid = edited_df['Total spilletid'].sum()
+    total_spilletid = df['Total spilletid'].sum()
     total_tilgjengelig_tid = st.session_state.kamptid * st.session_state.antall_paa_banen
     
     col1, col2 = st.columns(2)
@@ -629,16 +1106,63 @@ def main():
     with col2:
         st.metric("Total tilgjengelig spilletid", total_tilgjengelig_tid)
     
-    if total_spilletid != total_tilgjengelig_tid:
-        st.warning(f"Total spilletid ({total_spilletid} min) samsvarer ikke med tilgjengelig spilletid ({total_tilgjengelig_tid} min)")
+    # Valider hele planen i én gjennomgang
+    brudd = valider_plan(
+        st.session_state.spilletid_df,
+        st.session_state.perioder,
+        st.session_state.antall_paa_banen,
+        st.session_state.kamptid,
+        st.session_state.posisjonsoverstyringer
+    )
+    if brudd:
+        st.warning(f"Planen har {len(brudd)} brudd på reglene")
+        with st.expander("Vis brudd"):
+            st.dataframe(
+                pd.DataFrame([
+                    {
+                        'Periode': b['periode'] or '-',
+                        'Regel': b['regel'],
+                        'Spillere': ', '.join(b['spillere']) or '-',
+                        'Melding': b['melding']
+                    }
+                    for b in brudd
+                ]),
+                use_container_width=True
+            )
     else:
-        st.success("Total spilletid samsvarer med tilgjengelig spilletid")
+        st.success("Planen oppfyller alle regler")
     
     # Vis spilletidsoversikt
     st.subheader("Spilletidsoversikt")
-    oversikt_df = edited_df[['Total spilletid', 'Mål spilletid', 'Differanse']].copy()
+    oversikt_df = df.loc[tilgjengelige_spillere, ['Total spilletid', 'Mål spilletid', 'Differanse']]
     st.dataframe(oversikt_df)
     
+    # Vis forslag til bytter som reduserer avviket fra mål spilletid
+    st.subheader("Forslag til bytter")
+    forslag, totalt_avvik = hent_byttforslag(
+        st.session_state,
+        st.session_state.spilletid_df,
+        st.session_state.perioder,
+        st.session_state.antall_paa_banen,
+        overstyringer=st.session_state.posisjonsoverstyringer
+    )
+    st.caption(f"Totalt avvik fra mål spilletid: {totalt_avvik} minutter")
+    if forslag:
+        st.dataframe(
+            pd.DataFrame([
+                {
+                    'Periode': f['periode'],
+                    'Ut': f['ut'],
+                    'Inn': f['inn'],
+                    'Forbedring (min)': f['forbedring']
+                }
+                for f in forslag
+            ]),
+            use_container_width=True
+        )
+    else:
+        st.info("Ingen enkeltbytter reduserer avviket")
+    
     # Vis status for hver periode
     st.subheader("Periodestatus")
     # Sjekk at det finnes perioder før vi lager kolonner
@@ -647,7 +1171,7 @@ def main():
         
         for i, periode in enumerate(st.session_state.perioder):
             with status_cols[i]:
-                spillere_pa_banen, _ = telle_spillere_pa_banen(edited_df, periode)
+                spillere_pa_banen, _ = telle_spillere_pa_banen(df, periode)
                 st.metric(
                     periode,
                     spillere_pa_banen,
@@ -656,29 +1180,59 @@ def main():
     else:
         st.warning("Ingen perioder er definert ennå")
     
-    st.session_state.spilletid_df.update(edited_df)
+    # Bytter på vilkårlige minutter via tidslinjen
+    with st.expander("Bytte på vilkårlig minutt"):
+        tidslinje = hent_tidslinje()
+        minutt = st.number_input(
+            "Minutt",
+            min_value=1,
+            max_value=max(1, st.session_state.kamptid - 1),
+            value=1,
+            key="minuttbytte_minutt"
+        )
+        paa_banen = sorted(tidslinje.paa_banen(minutt))
+        paa_benken = [s for s in tilgjengelige_spillere if s not in paa_banen]
+        col1, col2 = st.columns(2)
+        with col1:
+            ut = st.selectbox("Ut", options=paa_banen, key="minuttbytte_ut")
+        with col2:
+            inn = st.selectbox("Inn", options=paa_benken, key="minuttbytte_inn")
+        if st.button("Registrer bytte", disabled=not (ut and inn)):
+            tidslinje.bytt(minutt, ut, inn)
+            sett_tidslinje(tidslinje)
+            st.session_state.historikk.registrer(st.session_state.spilletid_df)
+            db.lagre_alt()  # Lagre før rerun, ellers lastes forrige oppstilling fra databasen
+            st.rerun()
+        
+        bytter = tidslinje.bytter_i_vindu(0, st.session_state.kamptid)
+        st.caption(f"{len(bytter)} innbytter i kampen")
+        st.dataframe(
+            pd.DataFrame(
+                {'Minutter': tidslinje.minutter_per_spiller()}
+            ).reindex(tilgjengelige_spillere, fill_value=0),
+            use_container_width=True
+        )
     
     # Legg til kamprapport-seksjon
     st.header("Kamprapport")
+    perioder = list(st.session_state.perioder)
+    overstyringer = Posisjonsoverstyringer(st.session_state.posisjonsoverstyringer)
+    tidslinje = hent_tidslinje().til_dict()
+    nokkel = jobbnokkel('kamprapport', df, perioder, overstyringer.til_liste(), tidslinje)
     if st.button("Generer kamprapport"):
         logger.info("Genererer kamprapport")
-        rapport = generer_kamprapport(edited_df, st.session_state.perioder)
-        logger.debug(f"Kamprapport generert:\n{rapport}")
-        st.text_area("Kampplan", rapport, height=400)
-        
-        # Last ned rapport som tekstfil
-        st.download_button(
-            label="Last ned kamprapport",
-            data=rapport,
-            file_name="kamprapport.txt",
-            mime="text/plain"
+        start_rapportjobb(
+            'kamprapport', nokkel, generer_kamprapport, df.copy(), perioder, overstyringer, Tidslinje.fra_dict(tidslinje)
         )
+    vis_rapportjobb('kamprapport', nokkel, _vis_kamprapport)
 
     # Erstatt den eksisterende kampoppsett-seksjonen med:
     st.header("Detaljert Kampoppsett")
     
     # Generer detaljert kampoppsett
-    detaljert_oppsett = generer_detaljert_kampoppsett(edited_df, st.session_state.perioder)
+    detaljert_oppsett = generer_detaljert_kampoppsett(
+        df, st.session_state.perioder, st.session_state.posisjonsoverstyringer
+    )
     
     # Vis som ekspanderbar tabell for hver periode
     for _, rad in detaljert_oppsett.iterrows():
@@ -714,9 +1268,16 @@ def main():
         mime="text/csv"
     )
 
+    vis_lignende_kamper()
+    vis_turneringsdag()
+    vis_simulering()
+    vis_sesonganalyse()
+    vis_belastning()
+
     # I sidebar, oppdater lagre/laste-seksjonen:
     with st.sidebar:
         with st.expander("Lagre/Last kampoppsett"):
+            kampnavn = vis_kampsok()
             col1, col2 = st.columns(2)
             
             with col1:
@@ -728,25 +1289,67 @@ def main():
                         st.error("Kunne ikke lagre kampoppsettet")
             
             with col2:
-                if st.session_state.kamper:
+                if kampnavn:
                     valgt_kamp = st.selectbox(
                         "Velg tidligere kampoppsett",
-                        options=list(st.session_state.kamper.keys())
+                        options=kampnavn
                     )
+                    valgt_versjon = vis_kampversjoner(valgt_kamp)
                     if st.button("Last kampoppsett"):
-                        if last_kampoppsett(valgt_kamp):
+                        if last_kampoppsett(valgt_kamp, valgt_versjon):
+                            db.lagre_alt()  # Lagre før rerun, ellers lastes forrige oppstilling fra databasen
                             st.rerun()  # Oppdater siden for å vise endringene
                         else:
                             st.error("Kunne ikke laste kampoppsettet")
 
+        with st.expander("Tropp"):
+            tropp = hent_tropp().tabell()
+            spiller_id = st.selectbox(
+                "Spiller", options=tropp.index.tolist(), format_func=lambda i: tropp.at[i, 'Navn'], key="tropp_spiller"
+            )
+            nytt = st.text_input("Nytt navn", key="tropp_nytt_navn")
+            if st.button("Endre navn") and spiller_id is not None and nytt:
+                try:
+                    gi_spiller_nytt_navn(spiller_id, nytt)
+                except ValueError as e:
+                    st.error(str(e))
+                else:
+                    db.lagre_alt()  # Lagre før rerun, ellers lastes det gamle navnet fra databasen
+                    st.rerun()
+
     # I hovedområdet, etter at endringer er gjort:
-    if edited_df is not None:
-        st.session_state.spilletid_df.update(edited_df)
-        db.lagre_alt()  # Lagre til database
-        
-        # Hvis det finnes et aktivt kampnavn, oppdater også kampoppsettet
-        if 'aktivt_kamp_navn' in st.session_state and st.session_state.aktivt_kamp_navn:
-            lagre_kampoppsett(st.session_state.aktivt_kamp_navn, st.session_state.kamp_info['motstander'])
+    db.lagre_alt()  # Lagre til database
+
+def sesjon_id():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else 'ukjent'
+
+def _husk_profil(sti, topp):
+    st.session_state.profilresultat = {'sti': sti, 'topp': topp}
+
+def kjor_app():
+    """
+    Kjører main(), under cProfile hvis sesjonen har bedt om profilering
+    med ?profil=N eller KAMPPLAN_PROFIL=N. Uten profilering er dette bare
+    noen få oppslag i session_state.
+    """
+    if 'profil_gjenstaar' not in st.session_state:
+        st.session_state.profil_gjenstaar = antall_kjoringer(os.environ.get(PROFIL_MILJOVARIABEL))
+    if PROFIL_PARAMETER in st.query_params:
+        st.session_state.profil_gjenstaar = antall_kjoringer(st.query_params[PROFIL_PARAMETER])
+        del st.query_params[PROFIL_PARAMETER]  # Ellers startes profileringen på nytt ved hver rerun
+
+    if st.session_state.profil_gjenstaar > 0:
+        st.session_state.profil_gjenstaar -= 1
+        profiler(main, 'logs', sesjon_id(), ved_ferdig=_husk_profil)
+    else:
+        main()
+
+    if 'profilresultat' in st.session_state:
+        resultat = st.session_state.profilresultat
+        with st.sidebar.expander("Profilering"):
+            st.caption(f"Lagret i {resultat['sti']}")
+            st.dataframe(resultat['topp'], hide_index=True)
 
 if __name__ == "__main__":
-    main()
+    kjor_app()
@@ -0,0 +1,326 @@
+# belastning.py
+"""
+Belastning over tid per spiller fra de arkiverte kampene.
+
+Minuttene fra hver kamp legges i en tett matrise med én rad per dag og én
+kolonne per spiller-id. Matrisen holdes kumulativt (rad t + 1 er summen til
+og med dag t), så summen over et vindu på 7 eller 28 dager er en
+differanse mellom to rader, for alle dager og spillere på en gang.
+
+Akutt belastning er minuttene siste 7 dager og kronisk belastning minuttene
+siste 28 dager. Forholdet akutt:kronisk (ACWR) er akutt belastning delt på
+ukesnittet over 28 dager. En kamp som lagres legges til (eller byttes ut)
+ved å oppdatere radene fra kampdagen og utover.
+
+Belastningen kan gi en faktor per spiller for mål spilletid: spillere over
+den trygge sonen får lavere mål, spillere under får høyere, og den totale
+spilletiden er den samme.
+"""
+import logging
+import threading
+from datetime import date
+import numpy as np
+import pandas as pd
+from kampsok import fingeravtrykk
+from kompakt import PERIODEBITS
+from tidslinje import Tidslinje
+from tropp import Tropp, spillerider
+from validering import periode_varighet
+
+logger = logging.getLogger(__name__)
+
+AKUTT_DAGER = 7
+KRONISK_DAGER = 28
+TRYGG_SONE = (0.8, 1.3)     # ACWR der målet ikke justeres
+MIN_FAKTOR = 0.5            # Mål spilletid justeres aldri mer enn dette ned ...
+MAKS_FAKTOR = 1.25          # ... eller opp
+
+
+def minutter_i_kamp(kamp, tropp):
+    """
+    Minutter per spiller i en arkivert kamp, lest rett fra arkivformatet.
+    Har kampen en tidslinje, telles minuttene fra den.
+
+    Returns:
+        tuple: (dato som np.datetime64[D], spiller-ID-er, minutter), eller
+            None for kamper uten dato eller perioder
+    """
+    perioder = kamp.get('perioder') or []
+    spilletid = kamp.get('spilletid_df')
+    if not spilletid or not perioder or not kamp.get('dato'):
+        return None
+    try:
+        dato = np.datetime64(str(kamp['dato'])[:10], 'D')
+    except ValueError:
+        logger.warning(f"Ugyldig dato i kamp: {kamp['dato']}")
+        return None
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    if not spilletid['data']:
+        return None
+    ider = np.asarray(spillerider(spilletid['index'], tropp), dtype=np.int64)
+    if kamp.get('tidslinje'):
+        tidslinje = Tidslinje.fra_dict(kamp['tidslinje'])
+        return dato, ider, np.array([tidslinje.minutter(str(s)) for s in spilletid['index']], dtype=np.int64)
+    kolonner = {kolonne: j for j, kolonne in enumerate(spilletid['columns'])}
+    varigheter = np.array([periode_varighet(p) for p in perioder], dtype=np.int64)
+    if PERIODEBITS in kolonner:
+        bits = np.array([int(rad[kolonner[PERIODEBITS]]) for rad in spilletid['data']], dtype=np.int64)
+        paa_banen = (bits[:, None] >> np.arange(len(perioder))) & 1
+    else:
+        paa_banen = np.array([
+            [bool(rad[kolonner[p]]) if p in kolonner else False for p in perioder]
+            for rad in spilletid['data']
+        ], dtype=np.int64)
+    return dato, ider, paa_banen @ varigheter
+
+
+def juster_mal_spilletid(mal, faktorer, maks=None):
+    """
+    Fordeler lik andel (mal) per spiller etter faktorer, med samme totale
+    spilletid, avrundet til hele minutter. Ingen får mer enn maks (f.eks.
+    kamptiden); det som er til overs fordeles på de andre.
+    """
+    faktorer = np.asarray(faktorer, dtype=float)
+    if len(faktorer) == 0 or faktorer.sum() <= 0:
+        return np.full(len(faktorer), mal)
+    total = mal * len(faktorer)
+    fordelt = total * faktorer / faktorer.sum()
+    if maks is not None:
+        fulle = np.zeros(len(faktorer), dtype=bool)
+        while (fordelt > maks + 1e-9).any() and not fulle.all():
+            fulle |= fordelt >= maks
+            rest = total - maks * fulle.sum()
+            fordelt = np.where(fulle, maks, rest * faktorer / max(faktorer[~fulle].sum(), 1e-12))
+    return np.rint(fordelt).astype(int)
+
+
+class Belastning:
+    """
+    Rullerende belastning per spiller. Deles av alle sesjoner og holdes i
+    takt med kamparkivet med synkroniser, eller med legg_til når en kamp
+    lagres.
+    """
+
+    def __init__(self, tropp=None):
+        self.tropp = tropp if tropp is not None else Tropp()
+        self._laas = threading.Lock()
+        self._kamper = {}           # navn -> (fingeravtrykk, dato, ider, minutter)
+        self._start = None          # Dato for dag 0
+        self._kolonner = {}         # spiller-id -> kolonne
+        self._kumulativ = np.zeros((1, 0), dtype=np.int64)
+        self._arkivversjon = None
+
+    @property
+    def antall_dager(self):
+        return len(self._kumulativ) - 1
+
+    def _bygg(self):
+        """Bygger matrisen på nytt fra alle kampene med dato. Kalles med låsen."""
+        kamper = [kamp for kamp in self._kamper.values() if kamp[1] is not None]
+        self._kolonner = {}
+        if not kamper:
+            self._start = None
+            self._kumulativ = np.zeros((1, 0), dtype=np.int64)
+            return
+        datoer = np.array([dato for _, dato, _, _ in kamper])
+        self._start = datoer.min()
+        for _, _, ider, _ in kamper:
+            for spiller_id in ider:
+                self._kolonner.setdefault(int(spiller_id), len(self._kolonner))
+        dager = (datoer - self._start).astype(int)
+        rader = np.concatenate([np.full(len(ider), dag) for dag, (_, _, ider, _) in zip(dager, kamper)])
+        kolonner = np.array([self._kolonner[int(s)] for _, _, ider, _ in kamper for s in ider], dtype=int)
+        minutter = np.concatenate([m for _, _, _, m in kamper])
+        daglig = np.zeros((dager.max() + 1, len(self._kolonner)), dtype=np.int64)
+        np.add.at(daglig, (rader, kolonner), minutter)
+        self._kumulativ = np.vstack([np.zeros((1, daglig.shape[1]), dtype=np.int64), daglig.cumsum(axis=0)])
+
+    def _endre(self, dato, ider, minutter, fortegn):
+        """Legger til (fortegn 1) eller trekker fra (-1) minuttene fra én kamp. Kalles med låsen."""
+        if self._start is None:
+            self._start = dato
+        if dato < self._start:
+            # Dagene før har ingen minutter; de kumulative radene er null
+            foran = int((self._start - dato).astype(int))
+            self._kumulativ = np.vstack([
+                np.zeros((foran, self._kumulativ.shape[1]), dtype=np.int64), self._kumulativ
+            ])
+            self._start = dato
+        dag = int((dato - self._start).astype(int))
+        if dag >= self.antall_dager:
+            self._kumulativ = np.vstack([
+                self._kumulativ, np.repeat(self._kumulativ[-1:], dag + 1 - self.antall_dager, axis=0)
+            ])
+        nye = [int(s) for s in ider if int(s) not in self._kolonner]
+        if nye:
+            for spiller_id in nye:
+                self._kolonner[spiller_id] = len(self._kolonner)
+            self._kumulativ = np.hstack([
+                self._kumulativ, np.zeros((len(self._kumulativ), len(nye)), dtype=np.int64)
+            ])
+        kolonner = [self._kolonner[int(s)] for s in ider]
+        self._kumulativ[dag + 1:, kolonner] += fortegn * np.asarray(minutter, dtype=np.int64)
+
+    def _oppdater(self, navn, kamp):
+        """Bytter ut én kamp. Returnerer False hvis den er uendret. Kalles med låsen."""
+        avtrykk = fingeravtrykk(kamp) if kamp is not None else None
+        gammel = self._kamper.get(navn)
+        if (gammel[0] if gammel else None) == avtrykk:
+            return False
+        if gammel is not None and gammel[1] is not None:
+            self._endre(gammel[1], gammel[2], gammel[3], -1)
+        if kamp is None:
+            del self._kamper[navn]
+            return True
+        minutter = minutter_i_kamp(kamp, self.tropp)
+        self._kamper[navn] = (avtrykk, *(minutter or (None, None, None)))
+        if minutter is not None:
+            self._endre(*minutter, 1)
+        return True
+
+    def legg_til(self, navn, kamp):
+        """Legger til eller oppdaterer én kamp, f.eks. rett etter at den er lagret"""
+        with self._laas:
+            self._oppdater(navn, kamp)
+
+    def synkroniser(self, kamparkiv):
+        """
+        Oppdaterer belastningen fra et DeltKamparkiv. Gjør ingenting hvis
+        arkivet ikke er endret siden sist; første gang bygges hele matrisen.
+
+        Returns:
+            int: Antall kamper som ble lagt til, endret eller fjernet
+        """
+        kamper = kamparkiv.gjeldende()
+        versjon = kamparkiv.versjon
+        if versjon is not None and versjon == self._arkivversjon:
+            return 0
+        with self._laas:
+            if not self._kamper:
+                for navn, kamp in kamper.items():
+                    minutter = minutter_i_kamp(kamp, self.tropp)
+                    self._kamper[navn] = (fingeravtrykk(kamp), *(minutter or (None, None, None)))
+                endret = len(self._kamper)
+                self._bygg()
+            else:
+                endret = sum(self._oppdater(navn, kamp) for navn, kamp in kamper.items())
+                endret += sum(self._oppdater(navn, None) for navn in list(self._kamper) if navn not in kamper)
+            self._arkivversjon = versjon
+        if endret:
+            logger.info(f"Belastning synkronisert: {endret} kamper, {self.antall_dager} dager, {len(self._kolonner)} spillere")
+        return endret
+
+    def _vindu(self, dager, lengde):
+        """Minutter i vinduet [dag - lengde + 1, dag] for hver dag i dager, alle spillere"""
+        siste = self.antall_dager
+        slutt = np.clip(np.asarray(dager) + 1, 0, siste)
+        start = np.clip(np.asarray(dager) + 1 - lengde, 0, siste)
+        return self._kumulativ[slutt] - self._kumulativ[start]
+
+    def rullerende(self):
+        """
+        Belastning for hver dag fra første kamp til siste kamp.
+
+        Returns:
+            dict: 'akutt', 'kronisk' og 'acwr' som DataFrames (dato × spiller-id)
+        """
+        with self._laas:
+            if self._start is None:
+                tom = pd.DataFrame(dtype=float)
+                return {'akutt': tom, 'kronisk': tom, 'acwr': tom}
+            dager = np.arange(self.antall_dager)
+            akutt = self._vindu(dager, AKUTT_DAGER)
+            kronisk = self._vindu(dager, KRONISK_DAGER)
+            index = pd.DatetimeIndex((self._start + dager).astype('datetime64[ns]'), name='dato')
+            ider = list(self._kolonner)
+        acwr = _acwr(akutt, kronisk, dager[:, None] + 1)
+        return {
+            'akutt': pd.DataFrame(akutt, index=index, columns=ider),
+            'kronisk': pd.DataFrame(kronisk, index=index, columns=ider),
+            'acwr': pd.DataFrame(acwr, index=index, columns=ider)
+        }
+
+    def _i_vindu(self, navn, dag, lengde, ider):
+        """
+        Minuttene fra kampen navn som ligger i vinduet [dag - lengde + 1, dag],
+        per spiller i ider. Kalles med låsen.
+        """
+        kamp = self._kamper.get(navn)
+        minutter = np.zeros(len(ider), dtype=np.int64)
+        if kamp is None or kamp[1] is None:
+            return minutter
+        kampdag = int((kamp[1] - self._start).astype(int))
+        if dag - lengde < kampdag <= dag:
+            i_kampen = dict(zip(map(int, kamp[2]), map(int, kamp[3])))
+            minutter[:] = [i_kampen.get(s, 0) for s in ider]
+        return minutter
+
+    def status(self, spiller_ider, dato=None, unntatt=None):
+        """
+        Belastningen inn i en kamp på dato (standard i dag): minuttene de
+        siste 7 og 28 dagene før dato, og ACWR. Spillere uten kamper har 0
+        minutter og ingen ACWR. ACWR regnes bare når arkivet dekker hele den
+        kroniske perioden; ellers er akutt og kronisk belastning de samme
+        kampene, og forholdet sier ingenting.
+
+        unntatt er navnet på en kamp som ikke regnes med, typisk kampen som
+        planlegges: er den lagret med en tidligere dato, er den ikke
+        belastning inn i seg selv.
+
+        Returns:
+            pd.DataFrame: 'Minutter 7 d', 'Minutter 28 d' og 'ACWR', indeksert på spiller-id
+        """
+        dato = np.datetime64(dato or date.today(), 'D')
+        ider = [int(s) for s in spiller_ider]
+        with self._laas:
+            if self._start is None:
+                dag = -1
+                akutt = kronisk = np.zeros(len(ider), dtype=np.int64)
+            else:
+                dag = int((dato - self._start).astype(int)) - 1
+                kolonner = [self._kolonner.get(s, -1) for s in ider]
+                akutt = _velg(self._vindu(dag, AKUTT_DAGER), kolonner)
+                kronisk = _velg(self._vindu(dag, KRONISK_DAGER), kolonner)
+                if unntatt is not None:
+                    akutt = akutt - self._i_vindu(unntatt, dag, AKUTT_DAGER, ider)
+                    kronisk = kronisk - self._i_vindu(unntatt, dag, KRONISK_DAGER, ider)
+        return pd.DataFrame({
+            'Minutter 7 d': akutt,
+            'Minutter 28 d': kronisk,
+            'ACWR': _acwr(akutt, kronisk, dag + 1)
+        }, index=pd.Index(ider, name='spiller_id'))
+
+    def justeringer(self, spiller_ider, dato=None, unntatt=None):
+        """
+        Faktor for mål spilletid per spiller: 1 i den trygge sonen og uten
+        historikk, ellers så mye som skal til for å komme tilbake til
+        grensen, begrenset til [MIN_FAKTOR, MAKS_FAKTOR]. unntatt som i status.
+
+        Returns:
+            np.ndarray: Faktorer i samme rekkefølge som spiller_ider
+        """
+        acwr = self.status(spiller_ider, dato, unntatt)['ACWR'].to_numpy()
+        nedre, ovre = TRYGG_SONE
+        faktorer = np.ones(len(acwr))
+        with np.errstate(divide='ignore'):
+            faktorer = np.where(acwr > ovre, ovre / acwr, faktorer)
+            faktorer = np.where(acwr < nedre, nedre / acwr, faktorer)
+        return np.clip(np.nan_to_num(faktorer, nan=1.0, posinf=MAKS_FAKTOR), MIN_FAKTOR, MAKS_FAKTOR)
+
+
+def _velg(rad, kolonner):
+    """Verdiene i kolonnene fra én rad, 0 for spillere uten kolonne (-1)"""
+    kolonner = np.asarray(kolonner, dtype=int)
+    return np.where(kolonner >= 0, rad[np.maximum(kolonner, 0)] if len(rad) else 0, 0)
+
+
+def _acwr(akutt, kronisk, dager_historikk):
+    """
+    Akutt belastning delt på ukesnittet over den kroniske perioden. NaN uten
+    kronisk belastning, eller med færre enn KRONISK_DAGER dager historikk.
+    """
+    ukesnitt = np.asarray(kronisk, dtype=float) * AKUTT_DAGER / KRONISK_DAGER
+    gyldig = (ukesnitt > 0) & (np.asarray(dager_historikk) >= KRONISK_DAGER)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(gyldig, np.asarray(akutt, dtype=float) / ukesnitt, np.nan)
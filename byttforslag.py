@@ -0,0 +1,165 @@
+# byttforslag.py
+import logging
+import numpy as np
+from validering import effektive_posisjoner, get_max_spillere_per_posisjon, periode_varighet
+
+logger = logging.getLogger(__name__)
+
+
+class ByttforslagMotor:
+    """
+    Holder avvik fra mål spilletid per spiller og ledig plass per periode
+    oppdatert inkrementelt, og foreslår enkeltbytter (periode, ut, inn) som
+    reduserer det totale avviket mest uten å bryte posisjonsgrensene.
+    """
+
+    def __init__(self, df, perioder, antall_paa_banen, overstyringer=None):
+        """Bygger opp motoren fra en spillerdataframe med periodekolonner"""
+        self.perioder = list(perioder)
+        self.antall_paa_banen = antall_paa_banen
+        self.spillere = df.index.to_numpy()
+        self._rad = {spiller: i for i, spiller in enumerate(self.spillere)}
+        self._kolonne = {periode: j for j, periode in enumerate(self.perioder)}
+
+        self.varigheter = np.array([periode_varighet(p) for p in self.perioder], dtype=int)
+        self.mal = df['Mål spilletid'].to_numpy(dtype=int)
+        self.tilgjengelig = df['Tilgjengelig'].to_numpy(dtype=bool)
+
+        posisjoner = effektive_posisjoner(df, self.perioder, overstyringer)
+        self._posisjonsnavn, koder = np.unique(posisjoner.astype(str), return_inverse=True)
+        self.posisjonskoder = koder.reshape(posisjoner.shape)
+        self.maks_per_posisjon = np.array(
+            [get_max_spillere_per_posisjon(p) for p in self._posisjonsnavn], dtype=int
+        )
+        self._keeperkode = (
+            int(np.flatnonzero(self._posisjonsnavn == 'Keeper')[0])
+            if 'Keeper' in self._posisjonsnavn else -1
+        )
+
+        self.paa_banen = df[self.perioder].to_numpy(dtype=bool).copy()
+        self.avvik = self.paa_banen @ self.varigheter - self.mal
+        self.slakk = self.antall_paa_banen - self.paa_banen.sum(axis=0)
+        self.posisjonstelling = np.zeros((len(self._posisjonsnavn), len(self.perioder)), dtype=int)
+        rader, kolonner = np.nonzero(self.paa_banen)
+        np.add.at(self.posisjonstelling, (self.posisjonskoder[rader, kolonner], kolonner), 1)
+
+    def passer_til(self, df, perioder, antall_paa_banen, overstyringer=None):
+        """Sjekker om motoren er bygget for samme spillere, perioder, mål og posisjoner"""
+        if list(perioder) != self.perioder or antall_paa_banen != self.antall_paa_banen:
+            return False
+        if not np.array_equal(df.index.to_numpy(), self.spillere):
+            return False
+        if not np.array_equal(df['Mål spilletid'].to_numpy(dtype=int), self.mal):
+            return False
+        if not np.array_equal(df['Tilgjengelig'].to_numpy(dtype=bool), self.tilgjengelig):
+            return False
+        posisjoner = effektive_posisjoner(df, self.perioder, overstyringer).astype(str)
+        return np.array_equal(posisjoner, self._posisjonsnavn[self.posisjonskoder])
+
+    def oppdater(self, spiller, periode, status):
+        """Registrerer at en spiller er satt på eller tatt av banen i en periode"""
+        i, j = self._rad[spiller], self._kolonne[periode]
+        if self.paa_banen[i, j] == status:
+            return
+        endring = 1 if status else -1
+        self.paa_banen[i, j] = status
+        self.avvik[i] += endring * self.varigheter[j]
+        self.slakk[j] -= endring
+        self.posisjonstelling[self.posisjonskoder[i, j], j] += endring
+
+    def synkroniser(self, df):
+        """
+        Oppdaterer motoren med cellene som er endret i df siden sist.
+
+        Returns:
+            int: Antall endrede celler
+        """
+        ny = df[self.perioder].to_numpy(dtype=bool)
+        rader, kolonner = np.nonzero(ny != self.paa_banen)
+        for i, j in zip(rader, kolonner):
+            self.oppdater(self.spillere[i], self.perioder[j], bool(ny[i, j]))
+        return len(rader)
+
+    def totalt_avvik(self):
+        """Summen av absolutt avvik fra mål spilletid for tilgjengelige spillere"""
+        return int(np.abs(self.avvik[self.tilgjengelig]).sum())
+
+    def forslag(self, k=5):
+        """
+        Finner de k enkeltbyttene som reduserer totalt avvik mest.
+
+        Returns:
+            list: Dicts med nøklene 'periode', 'ut', 'inn' og 'forbedring' (minutter)
+        """
+        if not self.perioder or len(self.spillere) == 0:
+            return []
+
+        d = np.where(self.tilgjengelig, self.avvik, 0)
+        w = self.varigheter[:, None, None]  # periode × ut × inn
+        forbedring = (
+            np.abs(d)[None, :, None] + np.abs(d)[None, None, :]
+            - np.abs(d[None, :, None] - w) - np.abs(d[None, None, :] + w)
+        )
+
+        ut = self.paa_banen.T[:, :, None]
+        inn = (~self.paa_banen & self.tilgjengelig[:, None]).T[:, None, :]
+        gyldig = ut & inn & (forbedring > 0)
+
+        # Posisjonsgrenser: innbytteren må få plass i sin posisjon etter byttet
+        kode_ut = self.posisjonskoder.T[:, :, None]
+        kode_inn = self.posisjonskoder.T[:, None, :]
+        telling_inn = np.take_along_axis(self.posisjonstelling.T, self.posisjonskoder.T, axis=1)[:, None, :]
+        samme_posisjon = kode_ut == kode_inn
+        gyldig &= samme_posisjon | (telling_inn + 1 <= self.maks_per_posisjon[kode_inn])
+
+        # Siste keeper kan bare byttes med en annen keeper
+        if self._keeperkode >= 0:
+            keepere = self.posisjonstelling[self._keeperkode][:, None, None]
+            gyldig &= ~((kode_ut == self._keeperkode) & ~samme_posisjon & (keepere <= 1))
+
+        kandidater = np.flatnonzero(gyldig)
+        if len(kandidater) == 0:
+            return []
+        verdier = forbedring.ravel()[kandidater]
+        if len(kandidater) > k:
+            utvalg = np.argpartition(-verdier, k - 1)[:k]
+            kandidater, verdier = kandidater[utvalg], verdier[utvalg]
+        rekkefolge = np.argsort(-verdier, kind='stable')
+
+        resultat = []
+        for indeks in kandidater[rekkefolge]:
+            j, i_ut, i_inn = np.unravel_index(indeks, gyldig.shape)
+            resultat.append({
+                'periode': self.perioder[j],
+                'ut': self.spillere[i_ut],
+                'inn': self.spillere[i_inn],
+                'forbedring': int(forbedring[j, i_ut, i_inn])
+            })
+        return resultat
+
+
+def hent_byttforslag(tilstand, df, perioder, antall_paa_banen, k=5, overstyringer=None):
+    """
+    Gjenbruker motoren i tilstand['byttforslag_motor'] hvis den passer til
+    planen, og bygger den på nytt ellers.
+
+    Args:
+        tilstand: Session state eller annen dict-lignende lagring
+        df (pd.DataFrame): Spillerdataframe med periodekolonner
+        perioder (list): Periodene i kampen
+        antall_paa_banen (int): Antall spillere på banen
+        k (int): Antall forslag som returneres
+        overstyringer (Posisjonsoverstyringer): Posisjon per (spiller, periode)
+
+    Returns:
+        tuple: (liste med forslag, totalt avvik)
+    """
+    motor = tilstand.get('byttforslag_motor')
+    if motor is not None and motor.passer_til(df, perioder, antall_paa_banen, overstyringer):
+        endringer = motor.synkroniser(df)
+        logger.debug(f"Byttforslag oppdatert inkrementelt med {endringer} endringer")
+    else:
+        motor = ByttforslagMotor(df, perioder, antall_paa_banen, overstyringer)
+        tilstand['byttforslag_motor'] = motor
+        logger.debug("Byttforslag-motor bygget på nytt")
+    return motor.forslag(k), motor.totalt_avvik()
@@ -6,17 +6,65 @@ import json
 import os
 from pathlib import Path
 import logging
+import time
 from io import StringIO  # Legg til denne importen øverst
+from posisjoner import Posisjonsoverstyringer
+from tropp import SPILLER_ID, Tropp
 
 logger = logging.getLogger(__name__)
 
+MELLOMLAGER_NOKKEL = 'db_mellomlager'  # Nøkkel i session_state
+
+# Siste målte tid for en full lasting per seksjon, delt av alle sesjoner i
+# prosessen. Brukes til å anslå hvor mye tid et treff i mellomlageret sparer.
+_lastetid = {}
+
+
+class Mellomlager:
+    """
+    Siste verdi denne sesjonen har lagret eller lastet per seksjon
+    ('spillere', 'kampinnstillinger', 'perioder', 'posisjoner'), sammen med versjonen i
+    databasen den tilsvarer. Ligger i session_state fordi DatabaseHandler
+    opprettes på nytt ved hver rerun.
+
+    For spilletid_df er verdien et øyeblikksbilde som ikke endres. Det
+    sammenlignes med rammen i session_state, og kopieres bare når sesjonen
+    har endret rammen (se _husk_df og _bruk_lagret_df).
+    """
+
+    def __init__(self):
+        self.verdier = {}    # seksjon -> (versjon, verdi)
+        self.treff = 0
+        self.bom = 0
+        self.spart_tid = 0.0
+        self.sist_spart = 0.0
+
+    def statistikk(self):
+        oppslag = self.treff + self.bom
+        return {
+            'treff': self.treff,
+            'bom': self.bom,
+            'treffrate': self.treff / oppslag if oppslag else 0.0,
+            'spart_tid': self.spart_tid,
+            'sist_spart': self.sist_spart
+        }
+
+
 class DatabaseHandler:
-    def __init__(self, data_dir=Path("data"), session_state=None):
-        """Initialiserer DatabaseHandler med valgfri session_state"""
+    def __init__(self, data_dir=Path("data"), session_state=None, tropp=None):
+        """
+        Initialiserer DatabaseHandler med valgfri session_state. Spillerne
+        lagres med id-en i kolonnen spiller_id (se tropp.SPILLER_ID), og får
+        navnene fra spillerregisteret (tropp) tilbake når de lastes.
+        """
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
         self.db_path = self.data_dir / "kampdata.db"
+        self.tropp = tropp if tropp is not None else Tropp(self.data_dir / "tropp.db")
         self.session_state = session_state if session_state is not None else st.session_state
+        if MELLOMLAGER_NOKKEL not in self.session_state:
+            self.session_state[MELLOMLAGER_NOKKEL] = Mellomlager()
+        self.mellomlager = self.session_state[MELLOMLAGER_NOKKEL]
         self._opprett_tabeller()
 
     def _opprett_tabeller(self):
@@ -47,12 +95,156 @@ class DatabaseHandler:
                         perioder TEXT NOT NULL
                     )
                 """)
+                
+                # Posisjonsoverstyringer: bare (spiller, periode) der posisjonen
+                # avviker fra aktiv posisjon
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS posisjonsoverstyringer (
+                        spiller_id INTEGER NOT NULL,
+                        periode TEXT NOT NULL,
+                        posisjon TEXT NOT NULL,
+                        PRIMARY KEY (spiller_id, periode)
+                    )
+                """)
+                
+                # Kamphendelser tabell (én rad per hendelse i live-modus)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS kamphendelser (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        kamp TEXT NOT NULL,
+                        type TEXT NOT NULL,
+                        minutt REAL NOT NULL,
+                        ut TEXT,
+                        inn TEXT,
+                        data TEXT,
+                        tidspunkt TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                cursor.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_kamphendelser_kamp ON kamphendelser (kamp, id)"
+                )
+                
+                # Versjonsteller per seksjon, økes ved hver lagring
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS versjoner (
+                        seksjon TEXT PRIMARY KEY,
+                        versjon INTEGER NOT NULL
+                    )
+                """)
+                
+                # WAL gir raske enkeltinnsettinger og lar lesere jobbe mens det skrives
+                cursor.execute("PRAGMA journal_mode=WAL")
 
                 conn.commit()
         except sqlite3.Error as e:
             logging.error(f"Feil ved opprettelse av tabeller: {e}")
             raise
 
+    def _ny_versjon(self, conn, seksjon):
+        """Øker versjonen for en seksjon i samme transaksjon som lagringen"""
+        conn.execute(
+            "INSERT INTO versjoner (seksjon, versjon) VALUES (?, 1) "
+            "ON CONFLICT(seksjon) DO UPDATE SET versjon = versjon + 1",
+            (seksjon,)
+        )
+        return conn.execute("SELECT versjon FROM versjoner WHERE seksjon = ?", (seksjon,)).fetchone()[0]
+
+    def _versjon(self, conn, seksjon):
+        row = conn.execute("SELECT versjon FROM versjoner WHERE seksjon = ?", (seksjon,)).fetchone()
+        return row[0] if row else 0
+
+    def hent_versjoner(self):
+        """Henter versjonen til alle seksjoner med én spørring"""
+        with sqlite3.connect(self.db_path) as conn:
+            return dict(conn.execute("SELECT seksjon, versjon FROM versjoner").fetchall())
+
+    def _husk(self, seksjon, versjon, verdi, lastetid=None):
+        self.mellomlager.verdier[seksjon] = (versjon, verdi)
+        if lastetid is not None:
+            _lastetid[seksjon] = lastetid
+            self.mellomlager.bom += 1
+
+    def _fra_mellomlager(self, seksjon, versjoner=None):
+        """
+        Returnerer (True, verdi) hvis sesjonen allerede har versjonen som ligger
+        i databasen, slik at SELECT og parsing kan hoppes over.
+        """
+        start = time.perf_counter()
+        lagret = self.mellomlager.verdier.get(seksjon)
+        if lagret is None:
+            return False, None
+        try:
+            if versjoner is None:
+                with sqlite3.connect(self.db_path) as conn:
+                    versjon = self._versjon(conn, seksjon)
+            else:
+                versjon = versjoner.get(seksjon, 0)
+        except sqlite3.Error:
+            return False, None
+        if versjon != lagret[0]:
+            return False, None
+
+        self.mellomlager.treff += 1
+        spart = max(0.0, _lastetid.get(seksjon, 0.0) - (time.perf_counter() - start))
+        self.mellomlager.spart_tid += spart
+        self.mellomlager.sist_spart += spart
+        return True, lagret[1]
+
+    def _husk_df(self, versjon, df, lastetid=None):
+        """
+        Husker spilletid_df som et øyeblikksbilde som aldri gis ut. Er rammen
+        lik bildet som allerede ligger i mellomlageret, beholdes det, så en
+        lagring uten endringer ikke koster en kopi.
+        """
+        lagret = self.mellomlager.verdier.get('spillere')
+        bilde = lagret[1] if lagret is not None and lagret[1] is not None and df.equals(lagret[1]) else df.copy()
+        self._husk('spillere', versjon, bilde, lastetid)
+
+    def _bruk_lagret_df(self, bilde):
+        """
+        Setter spilletid_df fra øyeblikksbildet i mellomlageret. Rammen i
+        session_state kopieres bare på nytt hvis sesjonen har endret den.
+        """
+        if bilde is None:
+            return
+        df = self.session_state.get('spilletid_df')
+        if df is None or not df.equals(bilde):
+            self.session_state.spilletid_df = bilde.copy()
+
+    def _til_lagring(self, df):
+        """
+        spilletid_df med spiller-ID-ene fra SPILLER_ID i index, slik den lagres.
+        Navnene slås ikke opp, så et navn som er byttet i en annen sesjon,
+        lagres fortsatt på riktig spiller.
+        """
+        if df.empty and len(df.columns) == 0:
+            return df
+        if SPILLER_ID not in df.columns:
+            raise ValueError(f"spilletid_df mangler kolonnen {SPILLER_ID}")
+        ider = df[SPILLER_ID].to_numpy(dtype='int64')
+        lagring = df.drop(columns=SPILLER_ID)
+        lagring.index = ider
+        self.tropp.oppdater_posisjoner(ider, df.get('Posisjoner'), df.get('Aktiv posisjon'))
+        return lagring
+
+    def _fra_lagring(self, df):
+        """
+        Lastet spilletid_df med navn i index og id-en i SPILLER_ID. Eldre data
+        med navn får ID-er fra registeret, og ukjente navn registreres.
+        """
+        if not len(df):
+            return df
+        if pd.api.types.is_integer_dtype(df.index):
+            ider = df.index.to_numpy(dtype='int64')
+            df.index = pd.Index(self.tropp.navn_for(ider))
+            df[SPILLER_ID] = ider
+            return df
+        return self.tropp.med_ider(df)
+
+    def mellomlager_statistikk(self):
+        """Treffrate og spart tid for lesemellomlageret i denne sesjonen"""
+        return self.mellomlager.statistikk()
+
     def lagre_spillere(self):
         """Lagrer spillerdata"""
         try:
@@ -60,19 +252,29 @@ class DatabaseHandler:
                 logging.warning("Ingen spilletid_df funnet i session_state")
                 return
                 
-            df_json = self.session_state.spilletid_df.to_json(orient='split')
+            df = self.session_state.spilletid_df
+            df_json = self._til_lagring(df).to_json(orient='split')
             with sqlite3.connect(self.db_path) as conn:
                 conn.execute("DELETE FROM spillere")
                 conn.execute("INSERT INTO spillere (data) VALUES (?)", (df_json,))
+                versjon = self._ny_versjon(conn, 'spillere')
                 conn.commit()
+            self._husk_df(versjon, df)
         except Exception as e:
             logging.error(f"Feil ved lagring av spillere: {e}")
             raise
 
-    def last_spillere(self):
-        """Laster spillerdata"""
+    def last_spillere(self, versjoner=None):
+        """Laster spillerdata. Hopper over lesingen hvis sesjonen allerede har gjeldende versjon."""
+        funnet, df = self._fra_mellomlager('spillere', versjoner)
+        if funnet:
+            self._bruk_lagret_df(df)
+            return
+        start = time.perf_counter()
         try:
             with sqlite3.connect(self.db_path) as conn:
+                conn.execute("BEGIN")
+                versjon = self._versjon(conn, 'spillere')
                 cursor = conn.execute("SELECT data FROM spillere LIMIT 1")
                 row = cursor.fetchone()
                 if row:
@@ -81,7 +283,9 @@ class DatabaseHandler:
                         bool_columns = df.select_dtypes(include=['bool']).columns
                         for col in bool_columns:
                             df[col] = df[col].astype(bool)
+                        df = self._migrer_posisjonskolonner(self._fra_lagring(df))
                         self.session_state.spilletid_df = df
+                        self._husk_df(versjon, df, time.perf_counter() - start)
                     except ValueError as e:
                         logging.error(f"Feil ved parsing av spillerdata: {e}")
                         self.session_state.spilletid_df = pd.DataFrame()
@@ -94,24 +298,33 @@ class DatabaseHandler:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 conn.execute("DELETE FROM kampinnstillinger")
+                verdi = (self.session_state.kamptid, self.session_state.antall_paa_banen)
                 conn.execute(
                     "INSERT INTO kampinnstillinger (kamptid, antall_paa_banen) VALUES (?, ?)",
-                    (self.session_state.kamptid, self.session_state.antall_paa_banen)
+                    verdi
                 )
+                versjon = self._ny_versjon(conn, 'kampinnstillinger')
                 conn.commit()
+            self._husk('kampinnstillinger', versjon, verdi)
         except Exception as e:
             logging.error(f"Feil ved lagring av kampinnstillinger: {e}")
             raise
 
-    def last_kampinnstillinger(self):
+    def last_kampinnstillinger(self, versjoner=None):
         """Laster kampinnstillinger"""
+        funnet, row = self._fra_mellomlager('kampinnstillinger', versjoner)
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute("SELECT kamptid, antall_paa_banen FROM kampinnstillinger LIMIT 1")
-                row = cursor.fetchone()
-                if row:
-                    self.session_state.kamptid = row[0]
-                    self.session_state.antall_paa_banen = row[1]
+            if not funnet:
+                start = time.perf_counter()
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.execute("BEGIN")
+                    versjon = self._versjon(conn, 'kampinnstillinger')
+                    cursor = conn.execute("SELECT kamptid, antall_paa_banen FROM kampinnstillinger LIMIT 1")
+                    row = cursor.fetchone()
+                self._husk('kampinnstillinger', versjon, row, time.perf_counter() - start)
+            if row:
+                self.session_state.kamptid = row[0]
+                self.session_state.antall_paa_banen = row[1]
         except Exception as e:
             logging.error(f"Feil ved lasting av kampinnstillinger: {e}")
             raise
@@ -129,20 +342,31 @@ class DatabaseHandler:
                     "INSERT INTO perioder (perioder) VALUES (?)",
                     (json.dumps(self.session_state.perioder),)
                 )
+                versjon = self._ny_versjon(conn, 'perioder')
                 conn.commit()
+            self._husk('perioder', versjon, list(self.session_state.perioder))
         except Exception as e:
             logging.error(f"Feil ved lagring av perioder: {e}")
             raise
 
-    def last_perioder(self):
+    def last_perioder(self, versjoner=None):
         """Laster perioder"""
+        funnet, perioder = self._fra_mellomlager('perioder', versjoner)
+        if funnet:
+            self.session_state.perioder = list(perioder)
+            return
+        start = time.perf_counter()
         try:
             with sqlite3.connect(self.db_path) as conn:
+                conn.execute("BEGIN")
+                versjon = self._versjon(conn, 'perioder')
                 cursor = conn.execute("SELECT perioder FROM perioder LIMIT 1")
                 row = cursor.fetchone()
                 if row:
                     try:
                         self.session_state.perioder = json.loads(row[0])
+                        self._husk('perioder', versjon, list(self.session_state.perioder),
+                                   time.perf_counter() - start)
                     except json.JSONDecodeError as e:
                         logging.error(f"Feil ved parsing av perioder: {e}")
                         self.session_state.perioder = []
@@ -152,22 +376,102 @@ class DatabaseHandler:
             logging.error(f"Database feil ved lasting av perioder: {e}")
             self.session_state.perioder = []
 
+    def lagre_posisjoner(self):
+        """Lagrer posisjonsoverstyringene, én rad per (spiller, periode)"""
+        try:
+            if not hasattr(self.session_state, 'posisjonsoverstyringer'):
+                logging.warning("Ingen posisjonsoverstyringer funnet i session_state")
+                return
+
+            overstyringer = Posisjonsoverstyringer(self.session_state.posisjonsoverstyringer)
+            # ID-ene tas fra sesjonens oppstilling, ikke fra navnene i registeret
+            df = self.session_state.get('spilletid_df')
+            id_for = dict(zip(df.index, df[SPILLER_ID])) if df is not None and SPILLER_ID in df.columns else {}
+            rader = [
+                (id_for[spiller], periode, posisjon)
+                for spiller, periode, posisjon in overstyringer.til_liste() if spiller in id_for
+            ]
+            if len(rader) < len(overstyringer):
+                logging.warning(
+                    f"{len(overstyringer) - len(rader)} posisjonsoverstyringer gjelder spillere "
+                    f"som ikke er i oppstillingen, og lagres ikke"
+                )
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("DELETE FROM posisjonsoverstyringer")
+                conn.executemany(
+                    "INSERT INTO posisjonsoverstyringer (spiller_id, periode, posisjon) VALUES (?, ?, ?)",
+                    [(int(spiller_id), periode, posisjon) for spiller_id, periode, posisjon in rader]
+                )
+                versjon = self._ny_versjon(conn, 'posisjoner')
+                conn.commit()
+            self._husk('posisjoner', versjon, overstyringer)
+        except Exception as e:
+            logging.error(f"Feil ved lagring av posisjonsoverstyringer: {e}")
+            raise
+
+    def last_posisjoner(self, versjoner=None):
+        """Laster posisjonsoverstyringene"""
+        funnet, overstyringer = self._fra_mellomlager('posisjoner', versjoner)
+        if funnet:
+            self.session_state.posisjonsoverstyringer = Posisjonsoverstyringer(overstyringer)
+            return
+        start = time.perf_counter()
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("BEGIN")
+                versjon = self._versjon(conn, 'posisjoner')
+                rader = conn.execute("SELECT spiller_id, periode, posisjon FROM posisjonsoverstyringer").fetchall()
+            navn = self.tropp.navn_for([spiller_id for spiller_id, _, _ in rader])
+            overstyringer = Posisjonsoverstyringer.fra_liste(
+                [(spiller, periode, posisjon) for spiller, (_, periode, posisjon) in zip(navn, rader)]
+            )
+            self.session_state.posisjonsoverstyringer = overstyringer
+            self._husk('posisjoner', versjon, Posisjonsoverstyringer(overstyringer), time.perf_counter() - start)
+        except sqlite3.Error as e:
+            logging.error(f"Database feil ved lasting av posisjonsoverstyringer: {e}")
+            self.session_state.posisjonsoverstyringer = Posisjonsoverstyringer()
+
+    def _migrer_posisjonskolonner(self, df):
+        """
+        Flytter gamle posisjon_<periode>-kolonner i en lastet spilletid_df over
+        i posisjonsoverstyringene. Overstyringer som allerede finnes beholdes.
+        """
+        df, fra_kolonner = Posisjonsoverstyringer.fra_kolonner(df)
+        if fra_kolonner:
+            overstyringer = Posisjonsoverstyringer(self.session_state.get('posisjonsoverstyringer') or {})
+            for nokkel, posisjon in fra_kolonner.items():
+                overstyringer.setdefault(nokkel, posisjon)
+            self.session_state.posisjonsoverstyringer = overstyringer
+        return df
+
     def lagre_alt(self):
         """Lagrer all data"""
         try:
             self.lagre_spillere()
             self.lagre_kampinnstillinger()
             self.lagre_perioder()
+            self.lagre_posisjoner()
         except Exception as e:
             logging.error(f"Feil ved lagring av all data: {e}")
             raise
 
     def last_alt(self):
-        """Laster all data"""
+        """
+        Laster all data. Versjonene hentes med én spørring, og bare seksjoner
+        som er endret siden sesjonen sist lagret eller lastet dem leses på nytt.
+        """
         try:
-            self.last_spillere()
-            self.last_kampinnstillinger()
-            self.last_perioder()
+            self.mellomlager.sist_spart = 0.0
+            try:
+                versjoner = self.hent_versjoner()
+            except sqlite3.Error:
+                versjoner = None
+            # Posisjonene lastes før spillerne, så gamle posisjonskolonner i
+            # spilletid_df kan flyttes over i overstyringene
+            self.last_posisjoner(versjoner)
+            self.last_spillere(versjoner)
+            self.last_kampinnstillinger(versjoner)
+            self.last_perioder(versjoner)
         except Exception as e:
             logging.error(f"Feil ved lasting av all data: {e}")
             raise
@@ -185,16 +489,19 @@ class DatabaseHandler:
                 logging.warning("Ingen spilletid_df funnet i session_state")
                 return
                 
-            df_json = self.session_state.spilletid_df.to_json(orient='split')
+            df = self.session_state.spilletid_df
+            df_json = self._til_lagring(df).to_json(orient='split')
             with sqlite3.connect(self.db_path) as conn:
                 conn.execute("DELETE FROM spillere")
                 conn.execute("INSERT INTO spillere (data) VALUES (?)", (df_json,))
+                versjon = self._ny_versjon(conn, 'spillere')
                 conn.commit()
+            self._husk_df(versjon, df)
         except Exception as e:
             logging.error(f"Feil ved lagring av spilletid: {e}")
             raise
 
-    def last_spilletid(self):
+    def last_spilletid(self, versjoner=None):
         """
         Laster spilletidsdata. Dette er en spesialisert versjon av last_spillere()
         som fokuserer på spilletidsrelaterte kolonner.
@@ -202,8 +509,15 @@ class DatabaseHandler:
         Note: Denne metoden er inkludert for bakoverkompatibilitet og 
         funksjonell likhet med last_spillere().
         """
+        funnet, df = self._fra_mellomlager('spillere', versjoner)
+        if funnet:
+            self._bruk_lagret_df(df)
+            return
+        start = time.perf_counter()
         try:
             with sqlite3.connect(self.db_path) as conn:
+                conn.execute("BEGIN")
+                versjon = self._versjon(conn, 'spillere')
                 cursor = conn.execute("SELECT data FROM spillere LIMIT 1")
                 row = cursor.fetchone()
                 if row:
@@ -212,7 +526,9 @@ class DatabaseHandler:
                         bool_columns = df.select_dtypes(include=['bool']).columns
                         for col in bool_columns:
                             df[col] = df[col].astype(bool)
+                        df = self._migrer_posisjonskolonner(self._fra_lagring(df))
                         self.session_state.spilletid_df = df
+                        self._husk_df(versjon, df, time.perf_counter() - start)
                     except ValueError as e:
                         logging.error(f"Feil ved parsing av spilletidsdata: {e}")
                         if 'spilletid_df' not in self.session_state:
@@ -221,3 +537,77 @@ class DatabaseHandler:
             logging.error(f"Database feil ved lasting av spilletid: {e}")
             if 'spilletid_df' not in self.session_state:
                 self.session_state.spilletid_df = pd.DataFrame()
+
+    def lagre_hendelse(self, kamp, hendelsestype, minutt, ut=None, inn=None, data=None):
+        """
+        Lagrer én kamphendelse som en ny rad. Brukes av live-modus og er
+        holdt så kort som mulig: én INSERT uten å lese eller skrive annen data.
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(
+                    "INSERT INTO kamphendelser (kamp, type, minutt, ut, inn, data) VALUES (?, ?, ?, ?, ?, ?)",
+                    (kamp, hendelsestype, minutt, ut, inn, json.dumps(data) if data is not None else None)
+                )
+        except Exception as e:
+            logging.error(f"Feil ved lagring av kamphendelse: {e}")
+            raise
+
+    def last_hendelser(self, kamp):
+        """
+        Laster alle hendelser for en kamp i rekkefølgen de ble lagret.
+        'tidspunkt' er når hendelsen ble lagret (UTC, 'YYYY-MM-DD HH:MM:SS').
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.execute(
+                    "SELECT type, minutt, ut, inn, data, tidspunkt FROM kamphendelser WHERE kamp = ? ORDER BY id",
+                    (kamp,)
+                )
+                return [
+                    {
+                        'type': row[0],
+                        'minutt': row[1],
+                        'ut': row[2],
+                        'inn': row[3],
+                        'data': json.loads(row[4]) if row[4] is not None else None,
+                        'tidspunkt': row[5]
+                    }
+                    for row in cursor.fetchall()
+                ]
+        except sqlite3.Error as e:
+            logging.error(f"Database feil ved lasting av kamphendelser: {e}")
+            return []
+
+    def flytt_hendelser(self, fra, til):
+        """
+        Flytter hendelsene fra én kampnøkkel til en annen, f.eks. når en kamp
+        som er spilt i live-modus lagres med navn. Gjør ingenting hvis til
+        allerede har hendelser.
+
+        Returns:
+            int: Antall hendelser som ble flyttet
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                cursor = conn.execute(
+                    "UPDATE kamphendelser SET kamp = ? WHERE kamp = ? "
+                    "AND NOT EXISTS (SELECT 1 FROM kamphendelser WHERE kamp = ?)",
+                    (til, fra, til)
+                )
+                conn.commit()
+                return cursor.rowcount
+        except Exception as e:
+            logging.error(f"Feil ved flytting av kamphendelser: {e}")
+            raise
+
+    def slett_hendelser(self, kamp):
+        """Sletter alle hendelser for en kamp"""
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("DELETE FROM kamphendelser WHERE kamp = ?", (kamp,))
+                conn.commit()
+        except Exception as e:
+            logging.error(f"Feil ved sletting av kamphendelser: {e}")
+            raise
@@ -0,0 +1,125 @@
+# historikk.py
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _skrivebeskyttet(kolonne):
+    """Lager en skrivebeskyttet kopi av en periodekolonne"""
+    kolonne = np.array(kolonne, dtype=bool, copy=True)
+    kolonne.flags.writeable = False
+    return kolonne
+
+
+class Oppstillingshistorikk:
+    """
+    Uforanderlig historikk over oppstillinger med angre/gjør om.
+
+    Hver versjon er en tuple med én skrivebeskyttet bool-array per periode.
+    En ny versjon deler alle uendrede periodekolonner med forrige versjon,
+    slik at minnebruken vokser med størrelsen på endringene og ikke med
+    antall versjoner × antall spillere.
+    """
+
+    def __init__(self, spillere, perioder, paa_banen, maks_lengde=200):
+        """
+        Args:
+            spillere (list): Spillerne i radrekkefølge
+            perioder (list): Periodene i kolonnerekkefølge
+            paa_banen (np.ndarray): Bool-matrise (spillere × perioder)
+            maks_lengde (int): Maksimalt antall versjoner som tas vare på
+        """
+        self.spillere = list(spillere)
+        self.perioder = list(perioder)
+        self.maks_lengde = maks_lengde
+        paa_banen = np.asarray(paa_banen, dtype=bool).reshape(len(self.spillere), len(self.perioder))
+        self._versjoner = [tuple(_skrivebeskyttet(paa_banen[:, j]) for j in range(len(self.perioder)))]
+        self._posisjon = 0
+
+    @classmethod
+    def fra_df(cls, df, perioder, **kwargs):
+        """Oppretter historikk med gjeldende oppstilling i df som første versjon"""
+        return cls(df.index.tolist(), perioder, df[list(perioder)].to_numpy(dtype=bool), **kwargs)
+
+    def passer_til(self, df, perioder):
+        """Sjekker om historikken gjelder de samme spillerne og periodene som df"""
+        return list(perioder) == self.perioder and df.index.tolist() == self.spillere
+
+    @property
+    def gjeldende(self):
+        """Gjeldende versjon som tuple med én kolonne per periode"""
+        return self._versjoner[self._posisjon]
+
+    @property
+    def kan_angre(self):
+        return self._posisjon > 0
+
+    @property
+    def kan_gjenta(self):
+        return self._posisjon < len(self._versjoner) - 1
+
+    def __len__(self):
+        return len(self._versjoner)
+
+    def registrer(self, df):
+        """
+        Registrerer oppstillingen i df som ny versjon hvis den er endret.
+        Uendrede periodekolonner deles med forrige versjon, og eventuelle
+        versjoner som kunne vært gjort om forkastes.
+
+        Returns:
+            bool: True hvis en ny versjon ble lagt til
+        """
+        forrige = self.gjeldende
+        ny = list(forrige)
+        endret = False
+        for j, periode in enumerate(self.perioder):
+            kolonne = df[periode].to_numpy(dtype=bool)
+            if not np.array_equal(kolonne, forrige[j]):
+                ny[j] = _skrivebeskyttet(kolonne)
+                endret = True
+        if not endret:
+            return False
+
+        del self._versjoner[self._posisjon + 1:]
+        self._versjoner.append(tuple(ny))
+        if len(self._versjoner) > self.maks_lengde:
+            del self._versjoner[0]
+        self._posisjon = len(self._versjoner) - 1
+        logger.debug(f"Ny versjon i historikken ({len(self._versjoner)} versjoner)")
+        return True
+
+    def angre(self):
+        """Går ett steg tilbake. Returnerer (fra, til) eller None"""
+        if not self.kan_angre:
+            return None
+        self._posisjon -= 1
+        return self._versjoner[self._posisjon + 1], self._versjoner[self._posisjon]
+
+    def gjenta(self):
+        """Går ett steg fram. Returnerer (fra, til) eller None"""
+        if not self.kan_gjenta:
+            return None
+        self._posisjon += 1
+        return self._versjoner[self._posisjon - 1], self._versjoner[self._posisjon]
+
+    def endrede_celler(self, fra, til):
+        """
+        Finner cellene som er ulike mellom to versjoner. Kolonner som deles
+        mellom versjonene hoppes over uten sammenligning.
+
+        Returns:
+            list: (spiller, periode, ny_verdi) for hver endret celle
+        """
+        endringer = []
+        for j, periode in enumerate(self.perioder):
+            if fra[j] is til[j]:
+                continue
+            for i in np.flatnonzero(fra[j] != til[j]):
+                endringer.append((self.spillere[i], periode, bool(til[j][i])))
+        return endringer
+
+    def antall_unike_kolonner(self):
+        """Antall distinkte periodekolonner som faktisk er lagret i historikken"""
+        return len({id(kolonne) for versjon in self._versjoner for kolonne in versjon})
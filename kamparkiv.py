@@ -0,0 +1,517 @@
+# kamparkiv.py
+"""
+Kamparkivet lagres som NDJSON (kamper.ndjson): én kamp per linje på formen
+
+    {"navn": "Brodd", "motstander": "", "dato": "2024-10-28", "kamptid": 70,
+     "perioder": [...], "antall_paa_banen": 9,
+     "spilletid_df": {"index": [...], "columns": [...], "data": [[...], ...]}}
+
+Lesing og skriving går gjennom generatorer, og en lagret kamp legges til
+som en ny linje. Finnes samme navn flere ganger, gjelder den siste linjen.
+
+De store delene av en kamp lagres adressert på innhold i en blokkfil ved
+siden av arkivet (kamper.blokker.ndjson, én blokk per linje med nøkkel og
+verdi): spillerne med metadata (index og kolonnene som ikke avhenger av
+oppstillingen), oppstillingen (periodebitene og spilletiden) og
+tidslinjen. Kamplinjen har bare nøklene under 'blokker'. En blokk som
+finnes fra før, skrives ikke på nytt, så arkivet vokser med antall ulike
+oppstillinger og ikke med antall lagringer. Blokkfilen skrives alltid før
+kamplinjene som bruker den. Kamper uten 'blokker' (eldre linjer) leses som
+før, og komprimer_ndjson skriver dem om og fjerner blokker ingen bruker.
+Blokkfilen leses aldri inn i sin helhet: den indekseres som {nøkkel:
+byteposisjon}, og blokkene leses fra disk når en kamp settes sammen
+(Blokkfil, med de sist brukte blokkene i en LRU).
+
+Det gamle formatet (ett objekt i kamper.json) kan konverteres med
+konverter_fra_json, eller fra kommandolinjen:
+
+    python kamparkiv.py kamper.json kamper.ndjson
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+import pandas as pd
+from kompakt import PERIODEBITS
+from posisjoner import KOLONNEPREFIKS
+
+logger = logging.getLogger(__name__)
+
+NDJSON_STI = 'kamper.ndjson'
+GAMMEL_JSON_STI = 'kamper.json'
+PERIODEKOLONNE = re.compile(r'^\d+-\d+$')
+# Starten av en linje skrevet av blokklinje, så nøkkelen kan leses uten å parse blokken
+BLOKKLINJE = re.compile(rb'^\{"n":"([0-9a-f]+)"')
+MAKS_BLOKKER_I_MINNET = 256  # Antall sist brukte blokker som holdes i minnet ved lesing
+# Kolonner i spilletid_df som hører til oppstillingen og ikke til spillerne
+OPPSTILLINGSKOLONNER = (PERIODEBITS, 'Total spilletid', 'Differanse')
+
+
+def spilletid_df_til_arkiv(df):
+    """Lagrer index og kolonner én gang sammen med radene"""
+    return df.to_dict('split')
+
+
+def spilletid_df_fra_arkiv(spilletid):
+    """
+    Gjenoppretter spilletid_df fra arkivet. Tåler også det gamle formatet der
+    index og kolonner lå både i 'data' og ved siden av.
+    """
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    return pd.DataFrame(spilletid['data'], index=spilletid['index'], columns=spilletid['columns'])
+
+
+def kompakt_kamp(kamp):
+    """Returnerer kampen med spilletid_df uten dobbelt lagret index og kolonner"""
+    spilletid = kamp.get('spilletid_df')
+    if isinstance(spilletid, dict) and isinstance(spilletid.get('data'), dict):
+        kamp = {**kamp, 'spilletid_df': spilletid['data']}
+    return kamp
+
+
+def blokksti(sti):
+    """Blokkfilen til et NDJSON-arkiv: kamper.ndjson -> kamper.blokker.ndjson"""
+    return os.path.splitext(sti)[0] + '.blokker.ndjson'
+
+
+def blokknokkel(verdi):
+    """Nøkkelen en blokk lagres under: hash av den kanoniske JSON-en"""
+    tekst = json.dumps(verdi, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.blake2b(tekst.encode('utf-8'), digest_size=12).hexdigest()
+
+
+@lru_cache(maxsize=64)
+def _oppstillingsmaske(kolonner):
+    """For hver kolonne i spilletid_df: True hvis den hører til oppstillingen"""
+    return tuple(
+        kolonne in OPPSTILLINGSKOLONNER or PERIODEKOLONNE.match(kolonne) is not None
+        or kolonne.startswith(KOLONNEPREFIKS)
+        for kolonne in map(str, kolonner)
+    )
+
+
+def del_opp_kamp(kamp):
+    """
+    Deler en kamp i en kamplinje med blokknøkler og blokkene den bruker.
+
+    Returns:
+        tuple: (kamp med 'blokker' i stedet for spilletid_df og tidslinje, {nøkkel: blokk})
+    """
+    kamp = kompakt_kamp(kamp)
+    if 'blokker' in kamp:
+        return kamp, {}
+    blokker = {}
+    nokler = {}
+
+    def legg_til(navn, verdi):
+        nokler[navn] = blokknokkel(verdi)
+        blokker[nokler[navn]] = verdi
+
+    spilletid = kamp.get('spilletid_df')
+    if isinstance(spilletid, dict) and 'index' in spilletid:
+        maske = _oppstillingsmaske(tuple(spilletid['columns']))
+        legg_til('spillere', {
+            'index': spilletid['index'],
+            'columns': spilletid['columns'],
+            'data': [[v for v, oppstilling in zip(rad, maske) if not oppstilling] for rad in spilletid['data']]
+        })
+        legg_til('oppstilling', [[v for v, oppstilling in zip(rad, maske) if oppstilling] for rad in spilletid['data']])
+    if kamp.get('tidslinje'):
+        legg_til('tidslinje', kamp['tidslinje'])
+    if not nokler:
+        return kamp, {}
+    linje = {k: v for k, v in kamp.items() if not (k == 'spilletid_df' and 'spillere' in nokler
+                                                   or k == 'tidslinje' and 'tidslinje' in nokler)}
+    linje['blokker'] = nokler
+    return linje, blokker
+
+
+def sett_sammen_kamp(linje, blokker):
+    """Gjenskaper en kamp fra en kamplinje og blokkene. Kaster KeyError hvis en blokk mangler."""
+    nokler = linje.get('blokker')
+    if not nokler:
+        return linje
+    kamp = {k: v for k, v in linje.items() if k != 'blokker'}
+    if 'spillere' in nokler:
+        spillere = blokker[nokler['spillere']]
+        oppstilling = blokker[nokler['oppstilling']]
+        maske = _oppstillingsmaske(tuple(spillere['columns']))
+        data = []
+        for metadata, verdier in zip(spillere['data'], oppstilling):
+            metadata, verdier = iter(metadata), iter(verdier)
+            data.append([next(verdier) if o else next(metadata) for o in maske])
+        kamp['spilletid_df'] = {'index': spillere['index'], 'columns': spillere['columns'], 'data': data}
+    if 'tidslinje' in nokler:
+        kamp['tidslinje'] = blokker[nokler['tidslinje']]
+    return kamp
+
+
+def _blokklinjer(sti, fra=0):
+    """
+    Generator som gir (posisjon, nøkkel, linje) for hver hele linje i en
+    blokkfil fra byte fra. Bare nøkkelen leses; blokken parses først når den
+    brukes. Ugyldige linjer hoppes over, og en halvskrevet siste linje gis ikke.
+    """
+    if not os.path.exists(sti):
+        return
+    with open(sti, 'rb') as f:
+        f.seek(fra)
+        while True:
+            posisjon = f.tell()
+            linje = f.readline()
+            if not linje.endswith(b"\n"):
+                break  # Slutten av filen, eller en linje som fortsatt skrives
+            treff = BLOKKLINJE.match(linje)
+            if treff:
+                yield posisjon, treff.group(1).decode('ascii'), linje
+                continue
+            try:
+                yield posisjon, json.loads(linje)['n'], linje
+            except (json.JSONDecodeError, UnicodeDecodeError, KeyError, TypeError):
+                continue
+
+
+class Blokkfil:
+    """
+    Oppslag i en blokkfil uten å lese den inn i minnet. Filen indekseres som
+    {nøkkel: byteposisjon}, og en blokk leses fra disk første gang den
+    brukes. De sist brukte blokkene holdes i en LRU med plass til maks_blokker.
+    Oppslag med en nøkkel som ikke finnes, kaster KeyError.
+    """
+
+    def __init__(self, sti, maks_blokker=MAKS_BLOKKER_I_MINNET):
+        self.sti = sti
+        self.maks_blokker = maks_blokker
+        self._posisjoner = {}           # nøkkel -> byteposisjon
+        self._lest_til = 0              # Antall byte av filen som er indeksert
+        self._fil = None                # (inode, størrelse) da filen sist ble indeksert
+        self._lru = OrderedDict()       # nøkkel -> blokk, sist brukte sist
+        self.antall_lest = 0
+        self.oppdater()
+
+    def oppdater(self):
+        """
+        Indekserer linjer lagt til siden sist, også av andre prosesser. Er
+        filen erstattet (f.eks. av komprimer_ndjson), indekseres den på nytt.
+        """
+        try:
+            stat = os.stat(self.sti)
+        except FileNotFoundError:
+            stat = None
+        if stat is None or self._fil is None or stat.st_ino != self._fil[0] or stat.st_size < self._fil[1]:
+            self._posisjoner = {}
+            self._lest_til = 0
+            self._lru.clear()
+        if stat is None:
+            self._fil = None
+            return
+        for posisjon, nokkel, linje in _blokklinjer(self.sti, self._lest_til):
+            self._posisjoner.setdefault(nokkel, posisjon)
+            self._lest_til = posisjon + len(linje)
+        self._fil = (stat.st_ino, stat.st_size)
+
+    def __contains__(self, nokkel):
+        return nokkel in self._posisjoner
+
+    def __len__(self):
+        return len(self._posisjoner)
+
+    def __getitem__(self, nokkel):
+        if nokkel in self._lru:
+            self._lru.move_to_end(nokkel)
+            return self._lru[nokkel]
+        posisjon = self._posisjoner[nokkel]
+        with open(self.sti, 'rb') as f:
+            f.seek(posisjon)
+            blokk = json.loads(f.readline())['v']
+        self.antall_lest += 1
+        self._lru[nokkel] = blokk
+        while len(self._lru) > self.maks_blokker:
+            self._lru.popitem(last=False)
+        return blokk
+
+
+def blokklinje(nokkel, blokk):
+    return json.dumps({'n': nokkel, 'v': blokk}, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+
+def til_linje(navn, kamp):
+    """Én NDJSON-linje for en kamp, inkludert linjeskift"""
+    return json.dumps({'navn': navn, **kompakt_kamp(kamp)}, ensure_ascii=False, separators=(',', ':')) + "\n"
+
+
+def les_ndjson(sti, sett_sammen=True):
+    """
+    Generator som gir (navn, kamp) for hver linje i arkivet. Tomme og
+    ugyldige linjer hoppes over, f.eks. en halvskrevet siste linje. Med
+    sett_sammen=False gis kamplinjene som de er, med blokknøkler.
+    """
+    if not os.path.exists(sti):
+        return
+    blokker = Blokkfil(blokksti(sti)) if sett_sammen else None
+    with open(sti, encoding='utf-8') as f:
+        for linjenummer, linje in enumerate(f, start=1):
+            if not linje.strip():
+                continue
+            try:
+                kamp = json.loads(linje)
+                navn = kamp.pop('navn')
+            except (json.JSONDecodeError, KeyError) as e:
+                logger.warning(f"Hopper over ugyldig linje {linjenummer} i {sti}: {e}")
+                continue
+            if blokker is not None:
+                try:
+                    kamp = sett_sammen_kamp(kamp, blokker)
+                except KeyError as e:
+                    logger.warning(f"Hopper over linje {linjenummer} i {sti}, mangler blokk {e}")
+                    continue
+            yield navn, kamp
+
+
+def _erstatt_fil(sti, biter, for_erstatning=None):
+    """
+    Skriver tekstbitene til en midlertidig fil som så erstatter sti, slik at
+    lesere aldri ser en halvskrevet fil. for_erstatning kalles rett før
+    filen erstattes. Returnerer antall biter skrevet.
+    """
+    katalog = os.path.dirname(os.path.abspath(sti))
+    fd, midlertidig = tempfile.mkstemp(dir=katalog, suffix='.tmp')
+    antall = 0
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for bit in biter:
+                f.write(bit)
+                antall += 1
+        if for_erstatning is not None:
+            for_erstatning()
+        os.replace(midlertidig, sti)
+    except Exception:
+        if os.path.exists(midlertidig):
+            os.remove(midlertidig)
+        raise
+    return antall
+
+
+def skriv_ndjson(sti, kamper):
+    """
+    Skriver alle kamper fra en iterator av (navn, kamp), som hele kamper
+    eller kamplinjer med blokknøkler. Blokkfilen skrives på nytt med bare
+    blokkene kampene bruker, før arkivet erstattes. Nye blokker skrives
+    etter hvert som kampene skrives, og til slutt kopieres blokkene som
+    fortsatt brukes, linje for linje fra den gamle blokkfilen. Bare nøklene
+    holdes i minnet. Returnerer antall kamper.
+    """
+    ny_blokksti = blokksti(sti)
+    brukte = set()      # Nøklene kampene bruker
+    skrevet = set()     # Nøklene som er skrevet til den nye blokkfilen
+    fd, midlertidig = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(ny_blokksti)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as blokkfil:
+            def linjer():
+                for navn, kamp in kamper:
+                    linje, blokker = del_opp_kamp(kamp)
+                    for nokkel, blokk in blokker.items():
+                        if nokkel not in skrevet:
+                            blokkfil.write(blokklinje(nokkel, blokk).encode('utf-8'))
+                            skrevet.add(nokkel)
+                    brukte.update(linje.get('blokker', {}).values())
+                    yield til_linje(navn, linje)
+
+            def skriv_blokker():
+                for _, nokkel, linje in _blokklinjer(ny_blokksti):
+                    if nokkel in brukte and nokkel not in skrevet:
+                        blokkfil.write(linje)
+                        skrevet.add(nokkel)
+                blokkfil.close()
+                os.replace(midlertidig, ny_blokksti)
+
+            return _erstatt_fil(sti, linjer(), for_erstatning=skriv_blokker)
+    finally:
+        if os.path.exists(midlertidig):
+            os.remove(midlertidig)
+
+
+def legg_til_ndjson(sti, navn, kamp):
+    """Legger til én kamp som en ny linje med ett enkelt skrivekall. Returnerer linjen."""
+    linje = til_linje(navn, kamp)
+    with open(sti, 'a', encoding='utf-8') as f:
+        f.write(linje)
+    return linje
+
+
+def siste_versjoner(sti):
+    """
+    Generator som gir bare siste linje for hvert kampnavn, i filrekkefølge.
+    Leser filen to ganger og holder bare navn og linjenumre i minnet.
+    """
+    siste = {}
+    for linjenummer, (navn, _) in enumerate(les_ndjson(sti, sett_sammen=False)):
+        siste[navn] = linjenummer
+    beholdes = set(siste.values())
+    for linjenummer, (navn, kamp) in enumerate(les_ndjson(sti, sett_sammen=False)):
+        if linjenummer in beholdes:
+            yield navn, kamp
+
+
+def komprimer_ndjson(sti):
+    """
+    Skriver arkivet på nytt uten eldre linjer for kamper som er lagret flere
+    ganger. Eldre linjer med hele kamper deles opp i blokker, og blokker som
+    ingen kamp bruker lenger, fjernes.
+    """
+    return skriv_ndjson(sti, siste_versjoner(sti))
+
+
+def konverter_fra_json(json_sti=GAMMEL_JSON_STI, ndjson_sti=NDJSON_STI):
+    """Konverterer det gamle kamper.json til NDJSON. Returnerer antall kamper."""
+    with open(json_sti, encoding='utf-8') as f:
+        kamper = json.load(f)
+    antall = skriv_ndjson(ndjson_sti, kamper.items())
+    logger.info(f"Konverterte {antall} kamper fra {json_sti} til {ndjson_sti}")
+    return antall
+
+
+class DeltKamparkiv:
+    """
+    Kamparkiv som deles av alle sesjoner i samme prosess.
+
+    Arkivet er skrivebeskyttet: gjeldende() returnerer et øyeblikksbilde som
+    ikke skal endres. Lagring lager et nytt øyeblikksbilde der uendrede kamper
+    deles med det forrige (kopi ved skriving), og versjonen følger filen på
+    disk slik at endringer fra andre prosesser lastes inn ved neste oppslag.
+    Sesjoner holder bare navnet på kampen de har lastet, og får egne kopier
+    først når de laster en kamp for redigering.
+
+    Filer som slutter på .ndjson leses linje for linje, og lagring legger til
+    en linje, og bare blokkene som ikke finnes fra før. En kamp som lagres
+    uendret, skrives ikke. Andre filer behandles som ett JSON-objekt i det
+    gamle formatet.
+    """
+
+    def __init__(self, sti=NDJSON_STI):
+        self.sti = sti
+        self.ndjson = sti.endswith('.ndjson')
+        self.blokksti = blokksti(sti) if self.ndjson else None
+        self._laas = threading.Lock()
+        self._kamper = MappingProxyType({})
+        self._blokker = None        # Blokkfil: indeks over blokkfilen og de sist brukte blokkene
+        self._versjon = None
+        self.antall_innlastinger = 0
+
+    def _filversjon(self):
+        """Versjonen til filen på disk, eller None hvis den ikke finnes"""
+        try:
+            stat = os.stat(self.sti)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _blokkfil(self):
+        """Blokkfilen, med indeksen oppdatert med blokker lagt til siden sist"""
+        if self._blokker is None:
+            self._blokker = Blokkfil(self.blokksti)
+        else:
+            self._blokker.oppdater()
+        return self._blokker
+
+    def _oppdater(self):
+        """Leser filen på nytt hvis versjonen er endret. Kalles med låsen holdt."""
+        versjon = self._filversjon()
+        if versjon == self._versjon:
+            return
+        if versjon is None:
+            kamper = {}
+        elif self.ndjson:
+            # Bare siste linje per kamp settes sammen; blokkene leses ved behov
+            blokker = self._blokkfil()
+            kamper = {}
+            for navn, linje in dict(les_ndjson(self.sti, sett_sammen=False)).items():
+                try:
+                    kamper[navn] = sett_sammen_kamp(linje, blokker)
+                except KeyError as e:
+                    logger.warning(f"Hopper over {navn} i {self.sti}, mangler blokk {e}")
+        else:
+            with open(self.sti, encoding='utf-8') as f:
+                kamper = json.load(f)
+        self._kamper = MappingProxyType(kamper)
+        self._versjon = versjon
+        self.antall_innlastinger += 1
+        logger.info(f"Kamparkiv lastet: {len(kamper)} kamper fra {self.sti}")
+
+    @property
+    def versjon(self):
+        return self._versjon
+
+    def gjeldende(self):
+        """Returnerer et skrivebeskyttet øyeblikksbilde av alle kamper"""
+        with self._laas:
+            self._oppdater()
+            return self._kamper
+
+    def navn(self):
+        return list(self.gjeldende().keys())
+
+    def hent(self, navn):
+        """Returnerer den delte kampen, eller None. Må ikke endres av kalleren."""
+        return self.gjeldende().get(navn)
+
+    def lagre(self, navn, kamp_data):
+        """
+        Lagrer eller erstatter én kamp. I NDJSON legges kampen til som en ny
+        linje; ellers skrives hele filen til en midlertidig fil som så
+        erstatter arkivet, slik at lesere aldri ser en halvskrevet fil.
+        """
+        with self._laas:
+            self._oppdater()
+            kamp_data = kompakt_kamp(kamp_data)
+            if self.ndjson and self._kamper.get(navn) == kamp_data:
+                return
+            kamper = dict(self._kamper)
+            kamper[navn] = kamp_data
+
+            if self.ndjson:
+                kamplinje, blokker = del_opp_kamp(kamp_data)
+                kjente = self._blokkfil()
+                nye = {nokkel: blokk for nokkel, blokk in blokker.items() if nokkel not in kjente}
+                if nye:
+                    with open(self.blokksti, 'a', encoding='utf-8') as f:
+                        f.write(''.join(blokklinje(nokkel, blokk) for nokkel, blokk in nye.items()))
+                    kjente.oppdater()
+                for_storrelse = self._versjon[1] if self._versjon else 0
+                linje = legg_til_ndjson(self.sti, navn, kamplinje)
+                versjon = self._filversjon()
+                # Har en annen prosess skrevet samtidig, leses filen på nytt ved neste oppslag
+                if versjon[1] != for_storrelse + len(linje.encode('utf-8')):
+                    versjon = None
+            else:
+                _erstatt_fil(self.sti, [json.dumps(kamper, ensure_ascii=False, indent=2)])
+                versjon = self._filversjon()
+
+            self._kamper = MappingProxyType(kamper)
+            self._versjon = versjon
+
+
+def aapne_kamparkiv(sti=NDJSON_STI, gammel_sti=GAMMEL_JSON_STI):
+    """
+    Åpner NDJSON-arkivet, og konverterer det gamle kamper.json første gang
+    hvis NDJSON-filen ikke finnes ennå.
+    """
+    if sti.endswith('.ndjson') and not os.path.exists(sti) and gammel_sti and os.path.exists(gammel_sti):
+        konverter_fra_json(gammel_sti, sti)
+    return DeltKamparkiv(sti)
+
+
+if __name__ == "__main__":
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    kilde = sys.argv[1] if len(sys.argv) > 1 else GAMMEL_JSON_STI
+    maal = sys.argv[2] if len(sys.argv) > 2 else NDJSON_STI
+    print(f"{konverter_fra_json(kilde, maal)} kamper skrevet til {maal}")
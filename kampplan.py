@@ -0,0 +1,218 @@
+# kampplan.py
+import logging
+import numpy as np
+import pandas as pd
+from kompakt import POSISJON_BIT, KEEPER, FORSVAR, MIDTBANE, ANGREP, posisjoner_til_maske
+
+logger = logging.getLogger(__name__)
+
+def generer_perioder(total_tid):
+    """Genererer bytteperioder basert på total kamptid"""
+    perioder = []
+    omgang_tid = total_tid // 2
+    
+    # Første omgang
+    tid = 0
+    perioder.append(f'0-15')  # Første periode er alltid 15 min
+    tid += 15
+    while tid < omgang_tid:
+        neste_tid = min(tid + 10, omgang_tid)
+        perioder.append(f'{tid}-{neste_tid}')
+        tid = neste_tid
+        
+    # Andre omgang
+    tid = omgang_tid
+    while tid < total_tid:
+        neste_tid = min(tid + 10, total_tid)
+        perioder.append(f'{tid}-{neste_tid}')
+        tid = neste_tid
+    
+    return perioder
+
+def beregn_mal_spilletid(kamptid, antall_paa_banen, antall_tilgjengelige):
+    """
+    Lik andel av spilletiden til hver tilgjengelige spiller, avrundet til
+    hele minutter. Tar også en NumPy-array med antall tilgjengelige (f.eks.
+    ett tall per scenario) og gir da en array tilbake, med 0 der ingen er
+    tilgjengelige.
+    """
+    antall = np.asarray(antall_tilgjengelige)
+    mal = np.rint(kamptid * antall_paa_banen / np.maximum(antall, 1))
+    mal = np.where(antall > 0, mal, 0)
+    return int(mal) if mal.ndim == 0 else mal
+
+def kalkuler_spilletid(df, perioder, tidslinje=None):
+    """
+    Regner ut total spilletid og differansen mot målet. Med en tidslinje
+    telles minuttene fra den, slik at bytter midt i en periode kommer med.
+    """
+    logger.debug("Starter kalkulering av spilletid")
+    total_spilletid = 0
+    
+    if tidslinje is not None:
+        total_spilletid = pd.Series([tidslinje.minutter(spiller) for spiller in df.index], index=df.index, dtype=int)
+    else:
+        for periode in perioder:
+            start, slutt = map(int, periode.split('-'))
+            varighet = slutt - start
+            total_spilletid += df[periode].astype(int) * varighet
+    
+    df['Total spilletid'] = np.int16(total_spilletid) if np.isscalar(total_spilletid) else total_spilletid.astype(np.int16)
+    df['Differanse'] = (df['Total spilletid'] - df['Mål spilletid']).astype(np.int16)
+    logger.info(f"Total spilletid kalkulert. Gjennomsnitt: {df['Total spilletid'].mean():.1f} minutter")
+    return df
+
+def telle_spillere_pa_banen(df, periode):
+    """
+    Teller antall spillere på banen i en gitt periode og returnerer detaljert info.
+    
+    Args:
+        df (pd.DataFrame): Spillerdataframe
+        periode (str): Perioden som skal telles
+    
+    Returns:
+        tuple: (antall, liste med spillere)
+    """
+    spillere_pa_banen = df[df[periode] == True]
+    return len(spillere_pa_banen), spillere_pa_banen.index.tolist()
+
+def posisjon_i_periode(df, spiller, periode, overstyringer=None):
+    """Posisjonen spilleren har i perioden: overstyringen hvis den finnes, ellers aktiv posisjon"""
+    aktiv = df.at[spiller, 'Aktiv posisjon']
+    return overstyringer.get((spiller, periode), aktiv) if overstyringer else aktiv
+
+def generer_kamprapport(df, perioder, overstyringer=None, tidslinje=None, fremdrift=None):
+    """
+    Genererer en detaljert kamprapport med bytter, oppstillinger og benk.
+    Med en tidslinje tas byttene midt i periodene med.
+    fremdrift kalles med andelen som er ferdig etter hver periode.
+    """
+    rapport = []
+    forrige_periode_spillere = set()
+    
+    for nummer, periode in enumerate(perioder, start=1):
+        periode_spillere = set(df[df[periode] == True].index)
+        tilgjengelige_spillere = set(df[df['Tilgjengelig'] == True].index)
+        spillere_pa_benk = tilgjengelige_spillere - periode_spillere
+        
+        inn = periode_spillere - forrige_periode_spillere
+        ut = forrige_periode_spillere - periode_spillere
+        
+        rapport.append(f"\nPeriode {periode}")
+        rapport.append("-" * 40)
+        
+        if inn:
+            rapport.append("Inn:")
+            for spiller in sorted(inn):
+                pos = posisjon_i_periode(df, spiller, periode, overstyringer)
+                rapport.append(f"- {spiller} ({pos})")
+        
+        if ut:
+            rapport.append("\nUt:")
+            for spiller in sorted(ut):
+                pos = posisjon_i_periode(df, spiller, periode, overstyringer)
+                rapport.append(f"- {spiller} ({pos})")
+        
+        if tidslinje is not None:
+            start, slutt = map(int, periode.split('-'))
+            underveis = tidslinje.endringer_i_vindu(start, slutt)
+            if underveis:
+                rapport.append("\nBytter underveis:")
+                for minutt, spillere_ut, spillere_inn in underveis:
+                    rapport.append(f"- {minutt} min: {', '.join(spillere_ut) or '-'} ut, {', '.join(spillere_inn) or '-'} inn")
+        
+        rapport.append("\nPå banen:")
+        for spiller in sorted(periode_spillere):
+            pos = posisjon_i_periode(df, spiller, periode, overstyringer)
+            rapport.append(f"- {spiller} ({pos})")
+            
+        rapport.append("\nPå benken:")
+        for spiller in sorted(spillere_pa_benk):
+            pos = posisjon_i_periode(df, spiller, periode, overstyringer)
+            rapport.append(f"- {spiller} ({pos})")
+        
+        forrige_periode_spillere = periode_spillere
+        if fremdrift is not None:
+            fremdrift(nummer / len(perioder))
+    
+    return "\n".join(rapport)
+
+def format_spillere_i_posisjon(spillere_per_posisjon, posisjoner):
+    """
+    Helper funksjon for å formatere spillerliste.
+    Håndterer nå spillere med flere posisjoner ved å kun vise dem i deres aktive posisjon.
+    Posisjonene kan gis som navn, liste med navn eller bitmaske.
+    """
+    maske = posisjoner_til_maske(posisjoner)
+    
+    # Hold styr på allerede viste spillere
+    viste_spillere = set()
+    spillere = []
+    
+    for pos, spiller_liste in spillere_per_posisjon.items():
+        if POSISJON_BIT.get(pos, 0) & maske:
+            for spiller in spiller_liste:
+                if spiller not in viste_spillere:
+                    spillere.append(spiller)
+                    viste_spillere.add(spiller)
+    
+    return ', '.join(sorted(spillere)) if spillere else '-'
+
+def generer_formasjon(spillere_per_posisjon):
+    """
+    Helper funksjon for å generere formasjonsstreng.
+    Oppdatert for å kun telle spillere basert på deres aktive posisjon.
+    """
+    def tell(gruppe):
+        return sum(len(spillere) for pos, spillere in spillere_per_posisjon.items()
+                   if POSISJON_BIT.get(pos, 0) & gruppe)
+    
+    forsvar = tell(FORSVAR)
+    midtbane = tell(MIDTBANE)
+    angrep = tell(ANGREP)
+    
+    return f"{forsvar}-{midtbane}-{angrep}"
+
+def generer_detaljert_kampoppsett(df, perioder, overstyringer=None):
+    """
+    Genererer et detaljert kampoppsett som viser bytter, formasjoner, spillere på banen og benk.
+    """
+    kampoppsett_data = []
+    forrige_spillere = set()
+    
+    for periode in perioder:
+        # Finn spillere på banen i denne perioden
+        spillere_i_periode = set(df[df[periode] == True].index)
+        tilgjengelige_spillere = set(df[df['Tilgjengelig'] == True].index)
+        spillere_pa_benk = tilgjengelige_spillere - spillere_i_periode
+        
+        # Beregn bytter
+        inn = spillere_i_periode - forrige_spillere
+        ut = forrige_spillere - spillere_i_periode
+        
+        # Organiser spillere etter posisjonen de har i perioden
+        spillere_per_posisjon = {}
+        for spiller in spillere_i_periode:
+            posisjon = posisjon_i_periode(df, spiller, periode, overstyringer)
+            if posisjon not in spillere_per_posisjon:
+                spillere_per_posisjon[posisjon] = []
+            spillere_per_posisjon[posisjon].append(spiller)
+        
+        # Formater formasjon basert på posisjonene i perioden
+        formasjon = generer_formasjon(spillere_per_posisjon)
+        
+        kampoppsett_data.append({
+            'Periode': periode,
+            'Formasjon': formasjon,
+            'Bytter Inn': ', '.join(sorted(inn)) if inn else '-',
+            'Bytter Ut': ', '.join(sorted(ut)) if ut else '-',
+            'Keeper': format_spillere_i_posisjon(spillere_per_posisjon, KEEPER),
+            'Forsvar': format_spillere_i_posisjon(spillere_per_posisjon, FORSVAR),
+            'Midtbane': format_spillere_i_posisjon(spillere_per_posisjon, MIDTBANE),
+            'Angrep': format_spillere_i_posisjon(spillere_per_posisjon, ANGREP),
+            'På benken': ', '.join(sorted(spillere_pa_benk)) if spillere_pa_benk else '-'
+        })
+        
+        forrige_spillere = spillere_i_periode
+    
+    return pd.DataFrame(kampoppsett_data)
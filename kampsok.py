@@ -0,0 +1,284 @@
+# kampsok.py
+"""
+Søkeindeks over kamparkivet i SQLite (data/kampsok.db).
+
+Hver kamp får én rad i kamper, med indekser på dato og motstander, og én
+rad per spiller og posisjon spilleren hadde i kamp_spillere. Kampnavn og
+motstander ligger i tillegg i FTS5-tabellen kamper_fts for fritekstsøk.
+Indeksen er bare en kopi: kamparkivet er fasiten, og indeksen oppdateres
+når en kamp lagres og når arkivet er endret av andre (synkroniser).
+"""
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+from pathlib import Path
+from kompakt import PERIODEBITS
+from tropp import er_ider
+from validering import periode_varighet
+
+logger = logging.getLogger(__name__)
+
+KAMPSOK_STI = Path("data") / "kampsok.db"
+PER_SIDE = 20
+
+
+def fingeravtrykk(kamp):
+    """Kort hash av kampen, brukes til å se om en indeksert kamp er endret"""
+    tekst = json.dumps(kamp, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(tekst.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def spillere_i_kamp(kamp, tropp=None):
+    """
+    Minutter per (spiller, posisjon) i en arkivert kamp. Posisjonen i hver
+    periode følger kampens posisjonsoverstyringer, eller posisjon_<periode>
+    i eldre kamper, og ellers 'Aktiv posisjon'. Spillere som ikke var på
+    banen tas ikke med. Kamper som refererer til spillerne med id får
+    navnene fra tropp.
+
+    Returns:
+        dict: {(spiller, posisjon): minutter}
+    """
+    perioder = kamp.get('perioder') or []
+    spilletid = kamp.get('spilletid_df')
+    if not spilletid or not perioder:
+        return {}
+    # Leser rett fra arkivformatet uten å bygge en DataFrame, så indeksering
+    # av tusenvis av kamper går raskt
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    kolonner = {kolonne: j for j, kolonne in enumerate(spilletid['columns'])}
+    overstyringer = {(spiller, periode): posisjon for spiller, periode, posisjon in kamp.get('posisjoner') or []}
+    navn = spilletid['index']
+    if tropp is not None and er_ider(navn):
+        navn = tropp.navn_for(navn)
+    minutter = {}
+    for spiller, visningsnavn, rad in zip(spilletid['index'], navn, spilletid['data']):
+        bits = int(rad[kolonner[PERIODEBITS]]) if PERIODEBITS in kolonner else None
+        for j, periode in enumerate(perioder):
+            if bits is not None:
+                paa = (bits >> j) & 1
+            else:
+                paa = periode in kolonner and rad[kolonner[periode]]
+            if not paa:
+                continue
+            kolonne = kolonner.get(f'posisjon_{periode}', kolonner['Aktiv posisjon'])
+            nokkel = (str(visningsnavn), str(overstyringer.get((spiller, periode), rad[kolonne])))
+            minutter[nokkel] = minutter.get(nokkel, 0) + periode_varighet(periode)
+    return minutter
+
+
+def fts_sporring(tekst):
+    """
+    Gjør fritekst om til en FTS5-spørring der hvert ord må finnes som
+    begynnelsen av et ord i navn eller motstander. Ord settes i anførselstegn
+    så tegn som - og : ikke tolkes som FTS-syntaks.
+    """
+    ord_ = [o.replace('"', '""') for o in tekst.split()]
+    return ' '.join(f'"{o}"*' for o in ord_)
+
+
+class Kampsok:
+    """
+    Søk i kamparkivet etter dato, motstander, spiller og posisjon, med
+    sidevis visning. Deles av alle sesjoner; hver operasjon åpner sin egen
+    tilkobling, og skriving skjer under en lås. Med tropp lagres navnene
+    til spillere som kampene refererer til med id.
+    """
+
+    def __init__(self, sti=KAMPSOK_STI, tropp=None):
+        self.sti = Path(sti)
+        self.tropp = tropp
+        self.sti.parent.mkdir(parents=True, exist_ok=True)
+        self._laas = threading.Lock()
+        self._arkivversjon = None
+        self._opprett_tabeller()
+
+    def _koble_til(self):
+        conn = sqlite3.connect(self.sti)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _opprett_tabeller(self):
+        with self._koble_til() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kamper (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    navn TEXT NOT NULL UNIQUE,
+                    motstander TEXT NOT NULL DEFAULT '',
+                    dato TEXT,
+                    kamptid INTEGER,
+                    antall_paa_banen INTEGER,
+                    fingeravtrykk TEXT NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kamp_spillere (
+                    kamp_id INTEGER NOT NULL REFERENCES kamper (id),
+                    spiller TEXT NOT NULL,
+                    posisjon TEXT NOT NULL,
+                    minutter INTEGER NOT NULL,
+                    PRIMARY KEY (kamp_id, spiller, posisjon)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_kamper_dato ON kamper (dato, navn)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_kamper_motstander ON kamper (motstander COLLATE NOCASE, dato)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_kamp_spillere_spiller ON kamp_spillere (spiller, posisjon, kamp_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_kamp_spillere_posisjon ON kamp_spillere (posisjon, kamp_id)")
+            # Fritekst på navn og motstander; rowid er kamper.id
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS kamper_fts USING fts5 (
+                    navn, motstander, tokenize = 'unicode61 remove_diacritics 2'
+                )
+            """)
+
+    def _indekser(self, conn, navn, kamp, avtrykk):
+        """Skriver én kamp til indeksen. Kalles med låsen holdt, i en transaksjon."""
+        try:
+            spillere = spillere_i_kamp(kamp, self.tropp)
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning(f"Kunne ikke lese spillerne i {navn}, indekserer bare kampinfo: {e}")
+            spillere = {}
+        conn.execute("""
+            INSERT INTO kamper (navn, motstander, dato, kamptid, antall_paa_banen, fingeravtrykk)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(navn) DO UPDATE SET
+                motstander = excluded.motstander, dato = excluded.dato, kamptid = excluded.kamptid,
+                antall_paa_banen = excluded.antall_paa_banen, fingeravtrykk = excluded.fingeravtrykk
+        """, (navn, kamp.get('motstander') or '', kamp.get('dato'), kamp.get('kamptid'),
+              kamp.get('antall_paa_banen'), avtrykk))
+        kamp_id = conn.execute("SELECT id FROM kamper WHERE navn = ?", (navn,)).fetchone()[0]
+        conn.execute("DELETE FROM kamp_spillere WHERE kamp_id = ?", (kamp_id,))
+        conn.executemany(
+            "INSERT INTO kamp_spillere (kamp_id, spiller, posisjon, minutter) VALUES (?, ?, ?, ?)",
+            [(kamp_id, spiller, posisjon, minutter) for (spiller, posisjon), minutter in spillere.items()]
+        )
+        conn.execute("DELETE FROM kamper_fts WHERE rowid = ?", (kamp_id,))
+        conn.execute(
+            "INSERT INTO kamper_fts (rowid, navn, motstander) VALUES (?, ?, ?)",
+            (kamp_id, navn, kamp.get('motstander') or '')
+        )
+
+    def indekser(self, navn, kamp):
+        """Legger til eller oppdaterer én kamp, f.eks. rett etter at den er lagret"""
+        with self._laas, self._koble_til() as conn:
+            self._indekser(conn, navn, kamp, fingeravtrykk(kamp))
+
+    def synkroniser(self, kamparkiv):
+        """
+        Oppdaterer indeksen fra et DeltKamparkiv. Gjør ingenting hvis arkivet
+        ikke er endret siden forrige synkronisering; ellers indekseres bare
+        kamper som er nye eller endret, og kamper som ikke lenger finnes fjernes.
+
+        Returns:
+            int: Antall kamper som ble indeksert eller fjernet
+        """
+        kamper = kamparkiv.gjeldende()
+        versjon = kamparkiv.versjon
+        if versjon is not None and versjon == self._arkivversjon:
+            return 0
+        with self._laas, self._koble_til() as conn:
+            indeksert = dict(conn.execute("SELECT navn, fingeravtrykk FROM kamper").fetchall())
+            endret = 0
+            for navn, kamp in kamper.items():
+                avtrykk = fingeravtrykk(kamp)
+                if indeksert.get(navn) != avtrykk:
+                    self._indekser(conn, navn, kamp, avtrykk)
+                    endret += 1
+            fjernet = [(navn,) for navn in indeksert if navn not in kamper]
+            if fjernet:
+                conn.executemany(
+                    "DELETE FROM kamper_fts WHERE rowid = (SELECT id FROM kamper WHERE navn = ?)", fjernet
+                )
+                conn.executemany("DELETE FROM kamp_spillere WHERE kamp_id = (SELECT id FROM kamper WHERE navn = ?)", fjernet)
+                conn.executemany("DELETE FROM kamper WHERE navn = ?", fjernet)
+            self._arkivversjon = versjon
+        if endret or fjernet:
+            logger.info(f"Kampsøk synkronisert: {endret} indeksert, {len(fjernet)} fjernet")
+        return endret + len(fjernet)
+
+    def sok(self, tekst=None, fra_dato=None, til_dato=None, motstander=None,
+            spiller=None, posisjon=None, side=1, per_side=PER_SIDE):
+        """
+        Søker etter kamper, nyeste først. Alle filtre er valgfrie og kombineres
+        med OG. Spiller og posisjon sammen betyr at spilleren spilte i den
+        posisjonen i kampen.
+
+        Args:
+            tekst: Fritekst i kampnavn eller motstander (prefikssøk per ord)
+            fra_dato, til_dato: Datoer på formen 'ÅÅÅÅ-MM-DD' (eller date), inklusive
+            motstander: Motstander, uten hensyn til store og små bokstaver
+            spiller: Spiller som var på banen
+            posisjon: Posisjon spilt (av spiller, hvis gitt)
+            side: Sidenummer, fra 1
+            per_side: Antall kamper per side
+
+        Returns:
+            dict: {'kamper': [...], 'totalt': int, 'side': int, 'antall_sider': int}
+        """
+        betingelser, parametre = [], []
+        if tekst and tekst.strip():
+            betingelser.append("k.id IN (SELECT rowid FROM kamper_fts WHERE kamper_fts MATCH ?)")
+            parametre.append(fts_sporring(tekst))
+        if fra_dato:
+            betingelser.append("k.dato >= ?")
+            parametre.append(str(fra_dato))
+        if til_dato:
+            betingelser.append("k.dato <= ?")
+            parametre.append(str(til_dato))
+        if motstander:
+            betingelser.append("k.motstander = ? COLLATE NOCASE")
+            parametre.append(motstander)
+        if spiller or posisjon:
+            delbetingelser = []
+            if spiller:
+                delbetingelser.append("ks.spiller = ?")
+                parametre.append(spiller)
+            if posisjon:
+                delbetingelser.append("ks.posisjon = ?")
+                parametre.append(posisjon)
+            betingelser.append(
+                "EXISTS (SELECT 1 FROM kamp_spillere ks WHERE ks.kamp_id = k.id AND "
+                + " AND ".join(delbetingelser) + ")"
+            )
+        hvor = ("WHERE " + " AND ".join(betingelser)) if betingelser else ""
+
+        per_side = max(1, int(per_side))
+        with self._koble_til() as conn:
+            totalt = conn.execute(f"SELECT COUNT(*) FROM kamper k {hvor}", parametre).fetchone()[0]
+            antall_sider = max(1, math.ceil(totalt / per_side))
+            side = min(max(1, int(side)), antall_sider)
+            rader = conn.execute(f"""
+                SELECT k.navn, k.motstander, k.dato, k.kamptid, k.antall_paa_banen,
+                       (SELECT COUNT(DISTINCT spiller) FROM kamp_spillere WHERE kamp_id = k.id) AS antall_spillere
+                FROM kamper k {hvor}
+                ORDER BY k.dato DESC, k.navn
+                LIMIT ? OFFSET ?
+            """, parametre + [per_side, (side - 1) * per_side]).fetchall()
+        return {
+            'kamper': [dict(rad) for rad in rader],
+            'totalt': totalt,
+            'side': side,
+            'antall_sider': antall_sider
+        }
+
+    def motstandere(self):
+        """Alle motstandere i indeksen, sortert"""
+        with self._koble_til() as conn:
+            return [rad[0] for rad in conn.execute(
+                "SELECT DISTINCT motstander FROM kamper WHERE motstander != '' ORDER BY motstander COLLATE NOCASE"
+            )]
+
+    def spillere(self):
+        """Alle spillere som har vært på banen i en indeksert kamp, sortert"""
+        with self._koble_til() as conn:
+            return [rad[0] for rad in conn.execute("SELECT DISTINCT spiller FROM kamp_spillere ORDER BY spiller")]
+
+    def gi_nytt_navn(self, gammelt_navn, nytt_navn):
+        """Bytter navn på en spiller i indeksen, etter at spilleren har fått nytt navn i registeret"""
+        with self._laas, self._koble_til() as conn:
+            conn.execute("UPDATE kamp_spillere SET spiller = ? WHERE spiller = ?", (nytt_navn, gammelt_navn))
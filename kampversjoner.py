@@ -0,0 +1,253 @@
+# kampversjoner.py
+"""
+Versjonshistorikk for lagrede kamper.
+
+Hver lagring under samme navn blir en ny versjon i kampversjoner.ndjson.
+En versjon er enten en nøkkelramme med hele kampen, eller en delta med bare
+feltene og cellene i spilletid_df som er endret siden forrige versjon. Det
+skrives en ny nøkkelramme minst hver NOKKELRAMME_INTERVALL. versjon, og når
+spillerne eller kolonnene er endret, så en versjon gjenskapes alltid fra
+høyst én nøkkelramme og NOKKELRAMME_INTERVALL - 1 deltaer.
+"""
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from kompakt import PERIODEBITS
+
+logger = logging.getLogger(__name__)
+
+VERSJONER_STI = 'kampversjoner.ndjson'
+NOKKELRAMME_INTERVALL = 10
+MAKS_SISTE = 8  # Antall sist lagrede kamper som holdes gjenskapt i minnet
+
+
+def lag_delta(forrige, ny):
+    """
+    Lager en delta fra forrige til ny kamp. Returnerer None hvis spillerne
+    eller kolonnene i spilletid_df er endret, da må det lagres en nøkkelramme.
+    """
+    forrige_df, ny_df = forrige.get('spilletid_df'), ny.get('spilletid_df')
+    if (forrige_df is None or ny_df is None
+            or forrige_df['index'] != ny_df['index'] or forrige_df['columns'] != ny_df['columns']):
+        return None
+    celler = [
+        [i, j, verdi]
+        for i, (forrige_rad, ny_rad) in enumerate(zip(forrige_df['data'], ny_df['data']))
+        for j, (forrige_verdi, verdi) in enumerate(zip(forrige_rad, ny_rad))
+        if forrige_verdi != verdi
+    ]
+    return {
+        'felter': {k: v for k, v in ny.items() if k != 'spilletid_df' and forrige.get(k) != v},
+        'fjernet': [k for k in forrige if k not in ny],
+        'celler': celler
+    }
+
+
+def er_tom(delta):
+    return not (delta['felter'] or delta['fjernet'] or delta['celler'])
+
+
+def bruk_delta(kamp, delta):
+    """Bruker en delta på en kamp og returnerer en ny kamp. Bare endrede rader kopieres."""
+    ny = {k: v for k, v in kamp.items() if k not in delta['fjernet']}
+    ny.update(delta['felter'])
+    if delta['celler']:
+        data = list(kamp['spilletid_df']['data'])
+        kopierte = set()
+        for i, j, verdi in delta['celler']:
+            if i not in kopierte:
+                data[i] = list(data[i])
+                kopierte.add(i)
+            data[i][j] = verdi
+        ny['spilletid_df'] = {**kamp['spilletid_df'], 'data': data}
+    return ny
+
+
+def _celleverdier(kamp):
+    """
+    Gjør om spilletid_df i en kamp til {(spiller, kolonne): verdi}. Pakkede
+    periodebiter pakkes ut til én verdi per periode, så diffen viser perioder.
+    """
+    spilletid = kamp.get('spilletid_df') or {'index': [], 'columns': [], 'data': []}
+    perioder = kamp.get('perioder', [])
+    celler = {}
+    for spiller, rad in zip(spilletid['index'], spilletid['data']):
+        for kolonne, verdi in zip(spilletid['columns'], rad):
+            if kolonne == PERIODEBITS:
+                for j, periode in enumerate(perioder):
+                    celler[(spiller, periode)] = bool((int(verdi) >> j) & 1)
+            else:
+                celler[(spiller, kolonne)] = verdi
+    return celler
+
+
+def diff_kamper(fra, til):
+    """
+    Sammenligner to kamper.
+
+    Returns:
+        dict: {'felter': {felt: (fra, til)}, 'celler': [{'spiller', 'kolonne', 'fra', 'til'}]}
+    """
+    felter = {
+        k: (fra.get(k), til.get(k))
+        for k in sorted(set(fra) | set(til), key=str)
+        if k != 'spilletid_df' and fra.get(k) != til.get(k)
+    }
+    fra_celler, til_celler = _celleverdier(fra), _celleverdier(til)
+    celler = [
+        {'spiller': spiller, 'kolonne': kolonne, 'fra': fra_celler.get((spiller, kolonne)),
+         'til': til_celler.get((spiller, kolonne))}
+        for spiller, kolonne in list(fra_celler) + [n for n in til_celler if n not in fra_celler]
+        if fra_celler.get((spiller, kolonne)) != til_celler.get((spiller, kolonne))
+    ]
+    return {'felter': felter, 'celler': celler}
+
+
+class Kampversjoner:
+    """
+    Append-only lager for kampversjoner. Holder en indeks over versjonene
+    (navn, versjonsnummer, filposisjon og om det er en nøkkelramme) i minnet,
+    og leser linjene som trengs for å gjenskape en versjon. I tillegg holdes
+    siste versjon av de maks_siste sist brukte kampene, slik at neste delta
+    kan lages uten å lese filen.
+    """
+
+    def __init__(self, sti=VERSJONER_STI, nokkelramme_intervall=NOKKELRAMME_INTERVALL, maks_siste=MAKS_SISTE):
+        self.sti = sti
+        self.nokkelramme_intervall = nokkelramme_intervall
+        self.maks_siste = maks_siste
+        self._laas = threading.Lock()
+        self._indeks = {}      # navn -> liste med versjonsinfo
+        self._lest_til = 0     # Antall byte av filen som er indeksert
+        self._siste = OrderedDict()  # navn -> (versjon, gjenskapt kamp), sist brukte sist
+
+    def _oppdater_indeks(self):
+        """Indekserer linjer lagt til siden sist, også av andre prosesser"""
+        if not os.path.exists(self.sti):
+            return
+        with open(self.sti, 'rb') as f:
+            f.seek(self._lest_til)
+            while True:
+                posisjon = f.tell()
+                linje = f.readline()
+                if not linje.endswith(b"\n"):
+                    break  # Slutten av filen, eller en linje som fortsatt skrives
+                self._lest_til = f.tell()
+                try:
+                    post = json.loads(linje)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Hopper over ugyldig versjonslinje ved byte {posisjon}: {e}")
+                    continue
+                delta = post.get('delta')
+                self._indeks.setdefault(post['navn'], []).append({
+                    'versjon': post['versjon'],
+                    'tidspunkt': post['tidspunkt'],
+                    'nokkelramme': delta is None,
+                    'antall_celler': len(delta['celler']) if delta else None,
+                    'posisjon': posisjon
+                })
+
+    def versjoner(self, navn):
+        """Liste med versjonsinfo for en kamp, eldste først"""
+        with self._laas:
+            self._oppdater_indeks()
+            return [
+                {k: v for k, v in info.items() if k != 'posisjon'}
+                for info in self._indeks.get(navn, [])
+            ]
+
+    def _gjenskap(self, navn, versjon=None):
+        """Gjenskaper en versjon fra nærmeste nøkkelramme. Kalles med låsen holdt."""
+        oppforinger = self._indeks.get(navn)
+        if not oppforinger:
+            return None, None
+        if versjon is None:
+            slutt = len(oppforinger) - 1
+        else:
+            slutt = next((i for i, info in enumerate(oppforinger) if info['versjon'] == versjon), None)
+            if slutt is None:
+                return None, None
+
+        siste = self._siste.get(navn)
+        if siste is not None and siste[0] == oppforinger[slutt]['versjon']:
+            self._siste.move_to_end(navn)
+            return siste
+
+        start = slutt
+        while not oppforinger[start]['nokkelramme']:
+            start -= 1
+        kamp = None
+        with open(self.sti, 'rb') as f:
+            for info in oppforinger[start:slutt + 1]:
+                f.seek(info['posisjon'])
+                post = json.loads(f.readline())
+                kamp = post['kamp'] if info['nokkelramme'] else bruk_delta(kamp, post['delta'])
+        return oppforinger[slutt]['versjon'], kamp
+
+    def hent(self, navn, versjon=None):
+        """Gjenskaper en versjon av en kamp (siste hvis versjon er None), eller None"""
+        with self._laas:
+            self._oppdater_indeks()
+            return self._gjenskap(navn, versjon)[1]
+
+    def lagre(self, navn, kamp):
+        """
+        Lagrer kampen som en ny versjon. Er ingenting endret siden forrige
+        versjon, lagres ingenting og forrige versjonsnummer returneres.
+
+        Returns:
+            int: Versjonsnummeret
+        """
+        with self._laas:
+            self._oppdater_indeks()
+            forrige_versjon, forrige = self._gjenskap(navn)
+            oppforinger = self._indeks.get(navn, [])
+
+            delta = None
+            if forrige is not None:
+                siden_nokkelramme = 0
+                for info in reversed(oppforinger):
+                    if info['nokkelramme']:
+                        break
+                    siden_nokkelramme += 1
+                delta = lag_delta(forrige, kamp)
+                if delta is not None and er_tom(delta):
+                    return forrige_versjon
+                if delta is not None and siden_nokkelramme + 1 >= self.nokkelramme_intervall:
+                    delta = None
+
+            versjon = (forrige_versjon or 0) + 1
+            post = {'navn': navn, 'versjon': versjon, 'tidspunkt': datetime.now().isoformat(timespec='seconds')}
+            if delta is None:
+                post['kamp'] = kamp
+            else:
+                post['delta'] = delta
+            linje = (json.dumps(post, ensure_ascii=False, separators=(',', ':')) + "\n").encode('utf-8')
+
+            with open(self.sti, 'ab') as f:
+                f.write(linje)
+            self._oppdater_indeks()
+            self._husk_siste(navn, versjon, kamp)
+            type_ = 'nøkkelramme' if delta is None else f"delta med {len(delta['celler'])} celler"
+            logger.info(f"Lagret versjon {versjon} av {navn} ({type_})")
+            return versjon
+
+    def _husk_siste(self, navn, versjon, kamp):
+        """Holder på siste versjon av kampen og glemmer de minst brukte. Kalles med låsen."""
+        self._siste[navn] = (versjon, kamp)
+        self._siste.move_to_end(navn)
+        while len(self._siste) > self.maks_siste:
+            self._siste.popitem(last=False)
+
+    def diff(self, navn, fra_versjon, til_versjon=None):
+        """Endringene fra én versjon til en annen (siste hvis til_versjon er None)"""
+        with self._laas:
+            self._oppdater_indeks()
+            _, fra = self._gjenskap(navn, fra_versjon)
+            _, til = self._gjenskap(navn, til_versjon)
+        if fra is None or til is None:
+            raise ValueError(f"Fant ikke versjonene av {navn}")
+        return diff_kamper(fra, til)
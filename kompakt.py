@@ -0,0 +1,166 @@
+# kompakt.py
+import logging
+import sys
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Kjente posisjoner. Rekkefølgen bestemmer bitnummeret i posisjonsmaskene.
+POSISJONER = ['Keeper', 'Back', 'Midtstopper', 'Sentral midtbane', 'Ving', 'Spiss']
+POSISJON_BIT = {posisjon: 1 << i for i, posisjon in enumerate(POSISJONER)}
+
+PERIODEBITS = 'Periodebits'  # Kolonnenavn for pakkede periodebiter i arkivet
+HELTALLSKOLONNER = ['Total spilletid', 'Differanse', 'Mål spilletid']
+
+
+def posisjoner_til_maske(posisjoner):
+    """
+    Gjør om en posisjon, en liste med posisjoner eller en eksisterende maske
+    til en bitmaske over POSISJONER. Ukjente posisjoner ignoreres.
+    """
+    if isinstance(posisjoner, (int, np.integer)):
+        return int(posisjoner)
+    if isinstance(posisjoner, str):
+        posisjoner = [posisjoner]
+    maske = 0
+    for posisjon in posisjoner:
+        maske |= POSISJON_BIT.get(posisjon, 0)
+    return maske
+
+
+# Posisjonsgrupper brukt i formasjon og kampoppsett
+KEEPER = posisjoner_til_maske('Keeper')
+FORSVAR = posisjoner_til_maske(['Back', 'Midtstopper'])
+MIDTBANE = posisjoner_til_maske(['Sentral midtbane', 'Ving'])
+ANGREP = posisjoner_til_maske('Spiss')
+
+
+def maske_til_posisjoner(maske):
+    """Gjør om en bitmaske til en liste med posisjonsnavn"""
+    return [posisjon for posisjon, bit in POSISJON_BIT.items() if int(maske) & bit]
+
+
+def kan_spille(maske, posisjon):
+    """Sjekker om en spiller med gitt posisjonsmaske kan spille posisjonen"""
+    return bool(int(maske) & POSISJON_BIT.get(posisjon, 0))
+
+
+def normaliser_spilletid_df(df, perioder=None):
+    """
+    Gjør om spilletid_df til kompakte datatyper:
+    - 'Posisjoner' som uint8-bitmaske over POSISJONER
+    - 'Aktiv posisjon' som kategori
+    - 'Tilgjengelig' og periodekolonner som bool
+    - spilletidskolonner som int16
+
+    Tåler både gammelt format (lister med posisjoner) og nytt format.
+    """
+    if df.empty and len(df.columns) == 0:
+        return df
+    df = df.copy(deep=False)
+
+    if 'Posisjoner' in df.columns and df['Posisjoner'].dtype != np.uint8:
+        df['Posisjoner'] = np.array(
+            [posisjoner_til_maske(p) for p in df['Posisjoner']], dtype=np.uint8
+        )
+    if 'Aktiv posisjon' in df.columns and not isinstance(df['Aktiv posisjon'].dtype, pd.CategoricalDtype):
+        ekstra = sorted(set(df['Aktiv posisjon'].dropna()) - set(POSISJONER))
+        df['Aktiv posisjon'] = pd.Categorical(df['Aktiv posisjon'], categories=POSISJONER + ekstra)
+    if 'Tilgjengelig' in df.columns:
+        df['Tilgjengelig'] = df['Tilgjengelig'].astype(bool)
+    for kolonne in HELTALLSKOLONNER:
+        if kolonne in df.columns:
+            df[kolonne] = df[kolonne].fillna(0).astype(np.int16)
+
+    if perioder is None:
+        perioder = [k for k in df.columns if '-' in k and not k.startswith('posisjon_')]
+    for periode in perioder:
+        if periode in df.columns and df[periode].dtype != bool:
+            df[periode] = df[periode].fillna(False).astype(bool)
+    return df
+
+
+def pakk_perioder(df, perioder):
+    """Pakker periodekolonnene til ett heltall per spiller (bit j = periode j)"""
+    if len(perioder) > 63:
+        raise ValueError("Kan ikke pakke mer enn 63 perioder")
+    paa_banen = df[perioder].to_numpy(dtype=np.int64)
+    vekter = np.left_shift(np.int64(1), np.arange(len(perioder), dtype=np.int64))
+    return paa_banen @ vekter
+
+
+def pakk_ut_perioder(bits, antall_perioder):
+    """Pakker ut heltall fra pakk_perioder til en bool-matrise (spillere × perioder)"""
+    bits = np.asarray(bits, dtype=np.int64)
+    return (bits[:, None] >> np.arange(antall_perioder, dtype=np.int64)) & 1 == 1
+
+
+def komprimer_for_arkiv(df, perioder):
+    """
+    Lager en kompakt kopi av spilletid_df for arkivet, der periodekolonnene
+    er erstattet av én kolonne med pakkede periodebiter.
+    """
+    kompakt = normaliser_spilletid_df(df, perioder).drop(columns=list(perioder))
+    kompakt[PERIODEBITS] = pakk_perioder(df, perioder)
+    kompakt['Aktiv posisjon'] = kompakt['Aktiv posisjon'].astype(object)
+    kompakt['Posisjoner'] = kompakt['Posisjoner'].astype(int)
+    return kompakt
+
+
+def pakk_ut_fra_arkiv(df, perioder):
+    """Gjenoppretter periodekolonnene fra et arkivert spilletid_df"""
+    if PERIODEBITS not in df.columns:
+        return normaliser_spilletid_df(df, perioder)
+    paa_banen = pakk_ut_perioder(df[PERIODEBITS].to_numpy(), len(perioder))
+    df = df.drop(columns=[PERIODEBITS])
+    for j, periode in enumerate(perioder):
+        df[periode] = paa_banen[:, j]
+    return normaliser_spilletid_df(df, perioder)
+
+
+def objektstorrelse(obj, sett=None):
+    """
+    Estimerer minnebruken til et objekt rekursivt i byte. Håndterer dict,
+    lister, sett, DataFrame, NumPy-arrays og vanlige objekter. Objekter som
+    deles flere steder telles bare én gang.
+    """
+    if sett is None:
+        sett = set()
+    if id(obj) in sett:
+        return 0
+    sett.add(id(obj))
+
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(np.sum(obj.memory_usage(deep=True)))
+    if isinstance(obj, np.ndarray):
+        return sys.getsizeof(obj) if obj.base is None else obj.nbytes
+    storrelse = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        storrelse += sum(objektstorrelse(k, sett) + objektstorrelse(v, sett) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        storrelse += sum(objektstorrelse(v, sett) for v in obj)
+    elif hasattr(obj, '__dict__') and not isinstance(obj, type):
+        storrelse += objektstorrelse(vars(obj), sett)
+    return storrelse
+
+
+if __name__ == "__main__":
+    # Rapporter minnebruk før og etter komprimering for arkivet i kamper.json
+    import json
+
+    with open('kamper.json', encoding='utf-8') as f:
+        kamper = json.load(f)
+
+    for navn, kamp in kamper.items():
+        data = kamp['spilletid_df']['data']
+        gammel = pd.DataFrame(data['data'], index=data['index'], columns=data['columns'])
+        ny = normaliser_spilletid_df(gammel, kamp['perioder'])
+        arkiv = komprimer_for_arkiv(ny, kamp['perioder'])
+        arkiv_dict = {
+            'data': arkiv.to_dict('split'),
+            'index': arkiv.index.tolist(),
+            'columns': arkiv.columns.tolist()
+        }
+        print(f"{navn}: sesjon {objektstorrelse(gammel)} -> {objektstorrelse(ny)} byte, "
+              f"arkivert kamp {objektstorrelse(kamp['spilletid_df'])} -> {objektstorrelse(arkiv_dict)} byte")
@@ -0,0 +1,307 @@
+# lasttest.py
+"""
+Lasttest av appen med mange samtidige sesjoner, fordelt på arbeidsprosesser med
+Streamlits AppTest. Krever ikke nettverk.
+
+Kjør med:
+    python lasttest.py --sesjoner 20 --runder 5
+
+Hver sesjon gjør en realistisk sekvens: endre kamptid, sette spillere på
+banen, lagre kampoppsettet og laste det igjen. Rapporten viser p50/p95/p99
+for rerun-latens per handling, tid brukt i databasekall, tid i hvert
+sqlite3-kall (connect, execute og commit, der ventingen på SQLite-låser
+skjer), antall låsefeil og minnebruk per sesjon.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from streamlit.testing.v1 import AppTest
+import database
+from kompakt import objektstorrelse
+
+APP_STI = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+DB_METODER = ['last_alt', 'lagre_alt', 'lagre_hendelse', 'last_hendelser']
+
+
+class Maalinger:
+    """Samling av målinger. Slås sammen på tvers av arbeidsprosessene."""
+
+    def __init__(self):
+        self.latens = defaultdict(list)      # handling -> sekunder per rerun
+        self.db_tid = defaultdict(list)      # metode -> sekunder per kall
+        self.sqlite_tid = defaultdict(list)  # connect/execute/commit -> sekunder per kall
+        self.laasefeil = 0
+        self.minne = []                      # byte per sesjon
+        self.feil = []
+
+    def registrer_latens(self, handling, sekunder):
+        self.latens[handling].append(sekunder)
+
+    def registrer_db(self, metode, sekunder, laast):
+        self.db_tid[metode].append(sekunder)
+        self.laasefeil += int(laast)
+
+    def registrer_sqlite(self, kall, sekunder):
+        self.sqlite_tid[kall].append(sekunder)
+
+    def til_dict(self):
+        """Vanlige typer som kan sendes tilbake fra en arbeidsprosess"""
+        return {
+            'latens': dict(self.latens),
+            'db_tid': dict(self.db_tid),
+            'sqlite_tid': dict(self.sqlite_tid),
+            'laasefeil': self.laasefeil,
+            'minne': self.minne,
+            'feil': self.feil
+        }
+
+    def slaa_sammen(self, andre):
+        """Legger til målinger fra til_dict() i en annen prosess"""
+        for handling, verdier in andre['latens'].items():
+            self.latens[handling].extend(verdier)
+        for metode, verdier in andre['db_tid'].items():
+            self.db_tid[metode].extend(verdier)
+        for kall, verdier in andre['sqlite_tid'].items():
+            self.sqlite_tid[kall].extend(verdier)
+        self.laasefeil += andre['laasefeil']
+        self.minne.extend(andre['minne'])
+        self.feil.extend(andre['feil'])
+
+
+def persentiler(verdier, nivaaer=(50, 95, 99)):
+    """Returnerer dict med persentiler, eller tom dict hvis det ikke finnes verdier"""
+    if not verdier:
+        return {}
+    return {p: float(np.percentile(verdier, p)) for p in nivaaer}
+
+
+def instrumenter_database(maalinger):
+    """Pakker DatabaseHandler-metodene inn med tidtaking og telling av låsefeil"""
+    for metode in DB_METODER:
+        original = getattr(database.DatabaseHandler, metode)
+
+        def maalt(self, *args, _original=original, _metode=metode, **kwargs):
+            start = time.perf_counter()
+            laast = False
+            try:
+                return _original(self, *args, **kwargs)
+            except sqlite3.OperationalError as e:
+                laast = 'locked' in str(e)
+                raise
+            finally:
+                maalinger.registrer_db(_metode, time.perf_counter() - start, laast)
+
+        setattr(database.DatabaseHandler, metode, maalt)
+
+
+def instrumenter_sqlite(maalinger):
+    """
+    Tar tid på sqlite3.connect og på execute og commit på forbindelsene den
+    gir. Det er i disse kallene en prosess venter når en annen holder
+    skrivelåsen, så tidene viser låseventingen direkte. Gjelder alle moduler
+    i arbeidsprosessen (database, tropp, kampsøk), siden de deler sqlite3.
+    """
+    def maal(kall, funksjon, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return funksjon(*args, **kwargs)
+        finally:
+            maalinger.registrer_sqlite(kall, time.perf_counter() - start)
+
+    class MaaltCursor(sqlite3.Cursor):
+        def execute(self, *args, **kwargs):
+            return maal('execute', super().execute, *args, **kwargs)
+
+        def executemany(self, *args, **kwargs):
+            return maal('execute', super().executemany, *args, **kwargs)
+
+    class MaaltConnection(sqlite3.Connection):
+        def cursor(self, factory=MaaltCursor):
+            return super().cursor(factory)
+
+        def execute(self, *args, **kwargs):
+            return self.cursor().execute(*args, **kwargs)
+
+        def executemany(self, *args, **kwargs):
+            return self.cursor().executemany(*args, **kwargs)
+
+        def commit(self):
+            return maal('commit', super().commit)
+
+        def __exit__(self, *args):
+            return maal('commit', super().__exit__, *args)
+
+    original = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        kwargs.setdefault('factory', MaaltConnection)
+        return maal('connect', original, *args, **kwargs)
+
+    sqlite3.connect = connect
+
+
+def sesjonsminne(at):
+    """Estimerer minnebruken til en sesjons session_state"""
+    state = at.session_state
+    return sum(objektstorrelse(state[nokkel]) for nokkel in state.filtered_state)
+
+
+def sesjonssteg(sesjon_nr, runder, maalinger, tidsavbrudd):
+    """
+    Generator som kjører én simulert sesjon med realistiske handlinger og
+    gir fra seg kontrollen etter hver rerun, slik at flere sesjoner kan
+    flettes i samme prosess.
+    """
+    rng = random.Random(sesjon_nr)
+    at = AppTest.from_file(APP_STI, default_timeout=tidsavbrudd)
+
+    def kjor(handling, element=None):
+        start = time.perf_counter()
+        (element or at).run()
+        maalinger.registrer_latens(handling, time.perf_counter() - start)
+        if at.exception:
+            maalinger.feil.append(f"Sesjon {sesjon_nr}, {handling}: {at.exception[0].message}")
+
+    kjor('oppstart')
+    yield
+    kamptid = [n for n in at.number_input if n.label.startswith("Total kamptid")][0]
+    kjor('kamptid', kamptid.set_value(rng.choice([60, 70, 80])))
+    yield
+
+    for runde in range(runder):
+        perioder = at.session_state.perioder
+        spillere = at.session_state.spilletid_df.index.tolist()
+        for _ in range(3):
+            nokkel = f"{rng.choice(perioder)}_{rng.choice(spillere)}"
+            try:
+                checkbox = at.checkbox(key=nokkel)
+            except KeyError:
+                continue
+            if checkbox.disabled:
+                continue
+            kjor('toggle', checkbox.set_value(not checkbox.value))
+            yield
+
+        kamp_navn = f"Lasttest {sesjon_nr}-{runde}"
+        [t for t in at.text_input if t.label == "Navn på kamp"][0].input(kamp_navn)
+        lagre = [b for b in at.button if b.label == "Lagre kampoppsett"][0]
+        kjor('lagre', lagre.click())
+        yield
+
+        # Listen over lagrede kamper tegnes før lagringen, så etter den første
+        # lagringen vises «Last kampoppsett» først etter neste rerun
+        laste = [b for b in at.button if b.label == "Last kampoppsett"]
+        if not laste:
+            kjor('oppfrisk')
+            yield
+            laste = [b for b in at.button if b.label == "Last kampoppsett"]
+        if laste:
+            kjor('last', laste[0].click())
+            yield
+        else:
+            maalinger.feil.append(f"Sesjon {sesjon_nr}, runde {runde}: fant ikke «Last kampoppsett»")
+
+    maalinger.minne.append(sesjonsminne(at))
+
+
+def kjor_sesjoner(sesjon_numre, runder, tidsavbrudd, katalog):
+    """
+    Kjører en gruppe sesjoner i én prosess. Sesjonene flettes steg for steg,
+    mens gruppene i ulike prosesser kjører samtidig mot samme SQLite-fil.
+    """
+    os.chdir(katalog)
+    maalinger = Maalinger()
+    instrumenter_database(maalinger)
+    instrumenter_sqlite(maalinger)
+    aktive = {nr: sesjonssteg(nr, runder, maalinger, tidsavbrudd) for nr in sesjon_numre}
+    while aktive:
+        for nr, steg in list(aktive.items()):
+            try:
+                next(steg)
+            except StopIteration:
+                del aktive[nr]
+            except Exception as e:
+                maalinger.feil.append(f"Sesjon {nr}: {type(e).__name__}: {e}")
+                del aktive[nr]
+    return maalinger.til_dict()
+
+
+def kjor_lasttest(sesjoner=10, runder=3, prosesser=None, tidsavbrudd=60):
+    """
+    Kjører lasttesten i en midlertidig katalog slik at database, logger og
+    kamparkiv ikke blandes med ekte data. Sesjonene fordeles på prosesser
+    fordi AppTest ikke kan kjøres fra flere tråder samtidig.
+
+    Returns:
+        Maalinger: Alle målinger fra kjøringen
+    """
+    prosesser = min(sesjoner, prosesser or os.cpu_count() or 1)
+    grupper = [list(range(sesjoner))[i::prosesser] for i in range(prosesser)]
+    maalinger = Maalinger()
+    with tempfile.TemporaryDirectory() as katalog:
+        with ProcessPoolExecutor(max_workers=prosesser) as executor:
+            for resultat in executor.map(
+                kjor_sesjoner, grupper, [runder] * prosesser, [tidsavbrudd] * prosesser, [katalog] * prosesser
+            ):
+                maalinger.slaa_sammen(resultat)
+    return maalinger
+
+
+def formater_rapport(maalinger, sesjoner, varighet):
+    """Lager en tekstrapport av målingene"""
+    linjer = [f"Lasttest: {sesjoner} sesjoner, {varighet:.1f} s totalt", ""]
+    linjer.append(f"{'Rerun-latens (ms)':<22}{'antall':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    alle = [v for verdier in maalinger.latens.values() for v in verdier]
+    for handling, verdier in sorted(maalinger.latens.items()) + [('alle', alle)]:
+        p = persentiler(verdier)
+        if p:
+            linjer.append(f"{handling:<22}{len(verdier):>8}{p[50] * 1000:>10.1f}{p[95] * 1000:>10.1f}{p[99] * 1000:>10.1f}")
+
+    linjer += ["", f"{'Databasekall (ms)':<22}{'antall':>8}{'p50':>10}{'p95':>10}{'p99':>10}"]
+    for metode, verdier in sorted(maalinger.db_tid.items()):
+        p = persentiler(verdier)
+        linjer.append(f"{metode:<22}{len(verdier):>8}{p[50] * 1000:>10.2f}{p[95] * 1000:>10.2f}{p[99] * 1000:>10.2f}")
+
+    linjer += ["", f"{'SQLite-kall (ms)':<22}{'antall':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'sum':>10}"]
+    for kall, verdier in sorted(maalinger.sqlite_tid.items()):
+        p = persentiler(verdier)
+        linjer.append(
+            f"{kall:<22}{len(verdier):>8}{p[50] * 1000:>10.2f}{p[95] * 1000:>10.2f}{p[99] * 1000:>10.2f}"
+            f"{sum(verdier) * 1000:>10.0f}"
+        )
+    linjer.append(f"SQLite-låsefeil: {maalinger.laasefeil}")
+
+    if maalinger.minne:
+        linjer += ["", f"Minne per sesjon: snitt {np.mean(maalinger.minne) / 1024:.1f} KiB, "
+                       f"maks {np.max(maalinger.minne) / 1024:.1f} KiB"]
+    if maalinger.feil:
+        linjer += ["", f"Feil ({len(maalinger.feil)}):"] + [f"- {f}" for f in maalinger.feil[:20]]
+    return "\n".join(linjer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lasttest med samtidige Streamlit-sesjoner")
+    parser.add_argument('--sesjoner', type=int, default=10)
+    parser.add_argument('--runder', type=int, default=3)
+    parser.add_argument('--prosesser', type=int, help="Antall arbeidsprosesser (standard: antall CPU-er)")
+    parser.add_argument('--tidsavbrudd', type=int, default=60, help="Sekunder per rerun før tidsavbrudd")
+    parser.add_argument('--utfil', help="Skriv rapporten også til denne filen")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    maalinger = kjor_lasttest(args.sesjoner, args.runder, args.prosesser, args.tidsavbrudd)
+    rapport = formater_rapport(maalinger, args.sesjoner, time.perf_counter() - start)
+    print(rapport)
+    if args.utfil:
+        with open(args.utfil, 'w', encoding='utf-8') as f:
+            f.write(rapport + "\n")
+
+
+if __name__ == "__main__":
+    main()
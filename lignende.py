@@ -0,0 +1,163 @@
+# lignende.py
+"""
+Oppslag av lignende tidligere kampoppsett, som utgangspunkt for en ny plan.
+
+Indeksen holder én rad per lagret kamp med hvilke spillere som var
+tilgjengelige (som en bool-matrise kamper × spillere), kamptid og antall på
+banen. Nærmeste kamper finnes med Jaccard-avstand mellom
+tilgjengelighetsmengdene, regnet for alle kamper i én matriseoperasjon, og
+den valgte kampen tilpasses gjeldende kamptid og spillere via Tidslinje.
+"""
+import logging
+import threading
+import numpy as np
+from kamparkiv import spilletid_df_fra_arkiv
+from kompakt import pakk_ut_fra_arkiv
+from tidslinje import Tidslinje
+from tropp import spillerider
+
+logger = logging.getLogger(__name__)
+
+VEKT_KAMPTID = 0.25 # Straff for ulik kamptid, som andel av relativ forskjell
+
+
+def tilgjengelige_i_kamp(kamp):
+    """Spillerne som var tilgjengelige i en arkivert kamp, lest rett fra arkivformatet"""
+    spilletid = kamp.get('spilletid_df')
+    if not spilletid:
+        return []
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    if 'Tilgjengelig' not in spilletid['columns']:
+        return list(spilletid['index'])
+    j = spilletid['columns'].index('Tilgjengelig')
+    return [spiller for spiller, rad in zip(spilletid['index'], spilletid['data']) if rad[j]]
+
+
+def tidslinje_for_kamp(kamp):
+    """Tidslinjen til en arkivert kamp: den lagrede, ellers bygget fra periodekolonnene"""
+    if kamp.get('tidslinje'):
+        return Tidslinje.fra_dict(kamp['tidslinje'])
+    perioder = kamp['perioder']
+    df = pakk_ut_fra_arkiv(spilletid_df_fra_arkiv(kamp['spilletid_df']), perioder)
+    return Tidslinje.fra_perioder(df, perioder, kamp.get('kamptid'))
+
+
+def tilpass_kamp(kamp, kamptid, tilgjengelige):
+    """
+    Tilpasser en tidligere kamp til gjeldende kamptid og tropp. Intervallene
+    skaleres til ny kamptid, og spillere som ikke er tilgjengelige nå tas ut.
+    Tilgjengelige spillere som ikke var med står på benken.
+
+    Returns:
+        Tidslinje: Ny tidslinje som kan legges inn med sett_tidslinje
+    """
+    gammel = tidslinje_for_kamp(kamp)
+    skala = kamptid / gammel.kamptid if gammel.kamptid else 1.0
+    intervaller = {}
+    for spiller in tilgjengelige:
+        liste = [(round(a * skala), round(b * skala)) for a, b in gammel.intervaller(spiller)]
+        intervaller[spiller] = [(a, min(b, kamptid)) for a, b in liste if a < kamptid]
+    return Tidslinje(kamptid, intervaller)
+
+
+class Lignendeindeks:
+    """
+    Indeks over tilgjengelighet i lagrede kamper. Deles av alle sesjoner og
+    bygges på nytt fra kamparkivet når arkivet er endret. Med tropp er
+    spillerne ID-er fra spillerregisteret, også for eldre kamper med navn.
+    """
+
+    def __init__(self, tropp=None):
+        self.tropp = tropp
+        self._laas = threading.Lock()
+        self._arkivversjon = None
+        self.navn = []
+        self.spillere = {}                        # spiller (eller id) -> kolonne i matrisen
+        self.matrise = np.zeros((0, 0), dtype=bool)
+        self.kamptid = np.zeros(0)
+        self.antall_paa_banen = np.zeros(0, dtype=int)
+
+    def bygg(self, kamper):
+        """Bygger indeksen fra en mapping navn -> kamp"""
+        navn, mengder, kamptid, antall = [], [], [], []
+        spillere = {}
+        for kampnavn, kamp in kamper.items():
+            tilgjengelige = tilgjengelige_i_kamp(kamp)
+            if not tilgjengelige or not kamp.get('perioder'):
+                continue
+            if self.tropp is not None:
+                tilgjengelige = spillerider(tilgjengelige, self.tropp)
+            navn.append(kampnavn)
+            mengder.append([spillere.setdefault(s, len(spillere)) for s in tilgjengelige])
+            kamptid.append(kamp.get('kamptid') or 0)
+            antall.append(kamp.get('antall_paa_banen') or 0)
+        matrise = np.zeros((len(navn), len(spillere)), dtype=bool)
+        for i, kolonner in enumerate(mengder):
+            matrise[i, kolonner] = True
+        self.navn, self.spillere, self.matrise = navn, spillere, matrise
+        self.kamptid = np.array(kamptid, dtype=float)
+        self.antall_paa_banen = np.array(antall, dtype=int)
+
+    def synkroniser(self, kamparkiv):
+        """Bygger indeksen på nytt hvis arkivet er endret siden sist. Returnerer True hvis bygget."""
+        with self._laas:
+            kamper = kamparkiv.gjeldende()
+            versjon = kamparkiv.versjon
+            if versjon is not None and versjon == self._arkivversjon:
+                return False
+            self.bygg(kamper)
+            self._arkivversjon = versjon
+        logger.info(f"Indeks for lignende kamper bygget: {len(self.navn)} kamper, {len(self.spillere)} spillere")
+        return True
+
+    def finn(self, tilgjengelige, kamptid, antall_paa_banen, k=5, samme_antall=True):
+        """
+        Finner de k kampene som ligner mest på gjeldende tropp.
+
+        Avstanden er Jaccard-avstanden mellom mengdene av tilgjengelige
+        spillere, pluss VEKT_KAMPTID ganger relativ forskjell i kamptid.
+
+        Args:
+            tilgjengelige (list): Spillerne som er tilgjengelige nå (ID-er hvis indeksen har tropp)
+            kamptid (int): Gjeldende kamptid
+            antall_paa_banen (int): Gjeldende antall på banen
+            k (int): Antall kamper
+            samme_antall (bool): Bare kamper med samme antall på banen
+
+        Returns:
+            list: Dicts med 'navn', 'avstand', 'jaccard', 'felles' og 'kamptid', nærmeste først
+        """
+        with self._laas:
+            navn, spillere, matrise = self.navn, self.spillere, self.matrise
+            kamptider, antall = self.kamptid, self.antall_paa_banen
+        if not navn:
+            return []
+        sporring = np.zeros(len(spillere), dtype=bool)
+        kolonner = [spillere[s] for s in tilgjengelige if s in spillere]
+        sporring[kolonner] = True
+        ukjente = len(set(tilgjengelige)) - len(set(kolonner))
+
+        felles = matrise.astype(np.int32) @ sporring.astype(np.int32)
+        union = matrise.sum(axis=1) + len(set(tilgjengelige)) - felles
+        jaccard = np.divide(felles, union, out=np.zeros(len(navn)), where=union > 0)
+        avstand = 1 - jaccard + VEKT_KAMPTID * np.abs(kamptider - kamptid) / max(kamptid, 1)
+        if samme_antall:
+            avstand = np.where(antall == antall_paa_banen, avstand, np.inf)
+
+        k = min(k, int(np.isfinite(avstand).sum()))
+        if k == 0:
+            return []
+        utvalg = np.argpartition(avstand, k - 1)[:k]
+        utvalg = utvalg[np.argsort(avstand[utvalg], kind='stable')]
+        logger.debug(f"Lignende kamper: {k} treff, {ukjente} spillere uten tidligere kamper")
+        return [
+            {
+                'navn': navn[i],
+                'avstand': float(avstand[i]),
+                'jaccard': float(jaccard[i]),
+                'felles': int(felles[i]),
+                'kamptid': int(kamptider[i])
+            }
+            for i in utvalg
+        ]
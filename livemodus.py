@@ -0,0 +1,161 @@
+# livemodus.py
+import logging
+import pandas as pd
+from tidslinje import Tidslinje
+
+logger = logging.getLogger(__name__)
+
+# Hendelsestyper som lagres i kamphendelser
+HENDELSE_START = 'start'
+HENDELSE_BYTTE = 'bytte'
+HENDELSE_SLUTT = 'slutt'
+
+
+class LiveKamp:
+    """
+    Holder styr på faktisk spilletid under kampen ut fra strømmen av
+    hendelser, og sammenligner med den planlagte oppstillingen.
+
+    Hver hendelse oppdaterer bare spillerne som er på banen, slik at
+    sammenligningen mellom plan og faktisk spilletid er inkrementell.
+    """
+
+    def __init__(self, plan_df, perioder, kamptid):
+        self.kamptid = kamptid
+        self.plan = Tidslinje.fra_perioder(plan_df, perioder, kamptid)
+        self.spillere = plan_df.index.tolist()
+        self.paa_banen = set()
+        self.faktiske_minutter = dict.fromkeys(self.spillere, 0.0)
+        self.sist_minutt = 0.0
+        self.startet = False
+        self.avsluttet = False
+        self.antall_hendelser = 0
+
+    def _fremskriv(self, minutt):
+        """Legger til spilletid for spillerne på banen fram til minutt"""
+        if minutt < self.sist_minutt:
+            raise ValueError(f"Minutt {minutt} er før forrige hendelse ({self.sist_minutt})")
+        varighet = minutt - self.sist_minutt
+        for spiller in self.paa_banen:
+            self.faktiske_minutter[spiller] = self.faktiske_minutter.get(spiller, 0.0) + varighet
+        self.sist_minutt = minutt
+
+    def planlagt_startoppstilling(self):
+        """Spillerne som etter planen starter kampen"""
+        return sorted(self.plan.paa_banen(0))
+
+    def sjekk(self, hendelse):
+        """
+        Kaster ValueError hvis hendelsen ikke kan brukes på gjeldende
+        tilstand. Endrer ikke tilstanden, slik at hendelsen kan sjekkes
+        før den lagres.
+        """
+        if hendelse['type'] not in (HENDELSE_START, HENDELSE_BYTTE, HENDELSE_SLUTT):
+            raise ValueError(f"Ukjent hendelsestype: {hendelse['type']}")
+        minutt = float(hendelse['minutt'])
+        if minutt < self.sist_minutt:
+            raise ValueError(f"Minutt {minutt} er før forrige hendelse ({self.sist_minutt})")
+        if hendelse['type'] == HENDELSE_BYTTE:
+            if hendelse['ut'] not in self.paa_banen:
+                raise ValueError(f"{hendelse['ut']} er ikke på banen")
+            if hendelse['inn'] in self.paa_banen:
+                raise ValueError(f"{hendelse['inn']} er allerede på banen")
+
+    def bruk(self, hendelse):
+        """
+        Oppdaterer tilstanden med én hendelse.
+
+        Args:
+            hendelse (dict): Med nøklene 'type', 'minutt', 'ut', 'inn' og 'data'
+        """
+        self.sjekk(hendelse)
+        minutt = float(hendelse['minutt'])
+        if hendelse['type'] == HENDELSE_START:
+            self._fremskriv(minutt)
+            self.paa_banen = set(hendelse['data'] or [])
+            self.startet = True
+        elif hendelse['type'] == HENDELSE_BYTTE:
+            self._fremskriv(minutt)
+            self.paa_banen.discard(hendelse['ut'])
+            self.paa_banen.add(hendelse['inn'])
+        elif hendelse['type'] == HENDELSE_SLUTT:
+            self._fremskriv(minutt)
+            self.paa_banen = set()
+            self.avsluttet = True
+        self.antall_hendelser += 1
+
+    def faktiske_minutter_naa(self, minutt):
+        """Faktisk spilletid per spiller fram til minutt, uten å endre tilstanden"""
+        ekstra = max(0.0, minutt - self.sist_minutt)
+        return {
+            spiller: tid + (ekstra if spiller in self.paa_banen else 0.0)
+            for spiller, tid in self.faktiske_minutter.items()
+        }
+
+    def sammenligning(self, minutt):
+        """
+        Sammenligner planlagt og faktisk spilletid fram til minutt.
+
+        Returns:
+            pd.DataFrame: Kolonnene 'Planlagt totalt', 'Planlagt hittil',
+                'Faktisk hittil' og 'Avvik' per spiller
+        """
+        faktisk = self.faktiske_minutter_naa(minutt)
+        spillere = self.spillere + [s for s in faktisk if s not in self.spillere]
+        rader = []
+        for spiller in spillere:
+            planlagt_hittil = self.plan.minutter(spiller, 0, minutt)
+            rader.append({
+                'Spiller': spiller,
+                'På banen': spiller in self.paa_banen,
+                'Planlagt totalt': self.plan.minutter(spiller),
+                'Planlagt hittil': planlagt_hittil,
+                'Faktisk hittil': round(faktisk.get(spiller, 0.0), 1),
+                'Avvik': round(faktisk.get(spiller, 0.0) - planlagt_hittil, 1)
+            })
+        return pd.DataFrame(rader).set_index('Spiller')
+
+
+def hendelse_med_ider(hendelse, id_for):
+    """
+    Hendelsen slik den lagres: ut, inn og startoppstillingen som spiller-id-er.
+    id_for slår opp id-en til et navn i oppstillingen.
+    """
+    ider = dict(hendelse)
+    for felt in ('ut', 'inn'):
+        if ider[felt] is not None:
+            ider[felt] = int(id_for[ider[felt]])
+    if ider['type'] == HENDELSE_START:
+        ider['data'] = sorted(int(id_for[s]) for s in ider['data'] or [])
+    return ider
+
+
+def hendelse_med_navn(hendelse, navn_for):
+    """
+    Hendelsen slik LiveKamp bruker den: spiller-id-ene byttet ut med navn via
+    navn_for. Eldre hendelser har navn og brukes som de er.
+    """
+    def navn(spiller):
+        if isinstance(spiller, int) or (isinstance(spiller, str) and spiller.isdigit()):
+            return navn_for(int(spiller))
+        return spiller
+
+    hendelse = dict(hendelse)
+    for felt in ('ut', 'inn'):
+        if hendelse[felt] is not None:
+            hendelse[felt] = navn(hendelse[felt])
+    if hendelse['type'] == HENDELSE_START:
+        hendelse['data'] = [navn(s) for s in hendelse['data'] or []]
+    return hendelse
+
+
+def start_hendelse(minutt, startoppstilling):
+    return {'type': HENDELSE_START, 'minutt': minutt, 'ut': None, 'inn': None, 'data': sorted(startoppstilling)}
+
+
+def bytte_hendelse(minutt, ut, inn):
+    return {'type': HENDELSE_BYTTE, 'minutt': minutt, 'ut': ut, 'inn': inn, 'data': None}
+
+
+def slutt_hendelse(minutt):
+    return {'type': HENDELSE_SLUTT, 'minutt': minutt, 'ut': None, 'inn': None, 'data': None}
@@ -0,0 +1,72 @@
+# posisjoner.py
+"""
+Posisjon per periode som glisne overstyringer.
+
+En spiller har 'Aktiv posisjon' i alle perioder, unntatt der det finnes en
+overstyring for (spiller, periode). Bare overstyringene lagres, i stedet for
+en hel posisjon_<periode>-kolonne per periode som er endret. Gamle data med
+slike kolonner gjøres om med fra_kolonner.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+KOLONNEPREFIKS = 'posisjon_'
+
+
+class Posisjonsoverstyringer(dict):
+    """{(spiller, periode): posisjon} for perioder der spilleren ikke har aktiv posisjon"""
+
+    def sett(self, spiller, periode, posisjon, aktiv_posisjon=None):
+        """Setter posisjonen i en periode. Er den lik aktiv posisjon, fjernes overstyringen."""
+        if posisjon == aktiv_posisjon:
+            self.pop((spiller, periode), None)
+        else:
+            self[(spiller, periode)] = posisjon
+
+    def hent(self, spiller, periode, aktiv_posisjon=None):
+        """Posisjonen spilleren har i perioden"""
+        return self.get((spiller, periode), aktiv_posisjon)
+
+    def for_periode(self, periode):
+        """{spiller: posisjon} for overstyringene i én periode"""
+        return {spiller: posisjon for (spiller, p), posisjon in self.items() if p == periode}
+
+    def behold(self, spillere=None, perioder=None):
+        """Ny samling uten overstyringer for spillere eller perioder som ikke finnes lenger"""
+        spillere = None if spillere is None else set(spillere)
+        perioder = None if perioder is None else set(perioder)
+        return Posisjonsoverstyringer({
+            (spiller, periode): posisjon for (spiller, periode), posisjon in self.items()
+            if (spillere is None or spiller in spillere) and (perioder is None or periode in perioder)
+        })
+
+    def til_liste(self):
+        """JSON-vennlig liste med [spiller, periode, posisjon], sortert"""
+        return [[spiller, periode, posisjon] for (spiller, periode), posisjon in sorted(self.items())]
+
+    @classmethod
+    def fra_liste(cls, liste):
+        return cls({(spiller, periode): posisjon for spiller, periode, posisjon in liste or []})
+
+    @classmethod
+    def fra_kolonner(cls, df):
+        """
+        Gjør om gamle posisjon_<periode>-kolonner til overstyringer. Bare
+        celler som avviker fra 'Aktiv posisjon' tas med.
+
+        Returns:
+            tuple: (df uten posisjonskolonnene, Posisjonsoverstyringer)
+        """
+        kolonner = [k for k in df.columns if str(k).startswith(KOLONNEPREFIKS)]
+        overstyringer = cls()
+        if not kolonner:
+            return df, overstyringer
+        aktiv = df['Aktiv posisjon'].astype(object)
+        for kolonne in kolonner:
+            periode = kolonne[len(KOLONNEPREFIKS):]
+            posisjoner = df[kolonne].astype(object)
+            for spiller in df.index[posisjoner.notna() & (posisjoner != aktiv)]:
+                overstyringer[(spiller, periode)] = posisjoner[spiller]
+        logger.info(f"Gjorde om {len(kolonner)} posisjonskolonner til {len(overstyringer)} overstyringer")
+        return df.drop(columns=kolonner), overstyringer
@@ -0,0 +1,89 @@
+# profilering.py
+"""
+Profilering av enkeltkjøringer av appen med cProfile.
+
+Slås på med spørreparameteren ?profil=N eller miljøvariabelen
+KAMPPLAN_PROFIL=N, der N er antall påfølgende reruns som skal profileres
+(standard 1). Statistikken skrives til logs/ og kan åpnes med pstats eller
+snakeviz.
+"""
+import cProfile
+import logging
+import os
+import pstats
+from datetime import datetime
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PROFIL_PARAMETER = 'profil'
+PROFIL_MILJOVARIABEL = 'KAMPPLAN_PROFIL'
+ANTALL_TOPPFUNKSJONER = 20
+
+
+def antall_kjoringer(verdi):
+    """
+    Tolker verdien fra spørreparameteren eller miljøvariabelen.
+    Tom verdi eller '1'/'true' gir én kjøring, '0'/'false' eller ugyldig verdi gir ingen.
+    """
+    if verdi is None:
+        return 0
+    verdi = str(verdi).strip().lower()
+    if verdi in ('', 'true', 'ja', 'on'):
+        return 1
+    try:
+        return max(0, int(verdi))
+    except ValueError:
+        return 0
+
+
+def filsti(katalog, sesjon_id, tidspunkt=None):
+    """Filnavn med tidsstempel og sesjons-id, f.eks. logs/profil_20241028_181500_123456_ab12cd34.prof"""
+    tidspunkt = tidspunkt or datetime.now()
+    return os.path.join(katalog, f"profil_{tidspunkt.strftime('%Y%m%d_%H%M%S_%f')}_{sesjon_id[:8]}.prof")
+
+
+def topp_funksjoner(profil, antall=ANTALL_TOPPFUNKSJONER):
+    """
+    Returnerer de tyngste funksjonene sortert på kumulativ tid.
+
+    Returns:
+        pd.DataFrame: Kolonnene 'Funksjon', 'Kall', 'Egen tid (ms)' og 'Kumulativ tid (ms)'
+    """
+    statistikk = pstats.Stats(profil)
+    rader = []
+    for (fil, linje, navn), (_, kall, egen, kumulativ, _) in statistikk.stats.items():
+        rader.append({
+            'Funksjon': f"{os.path.basename(fil)}:{linje}({navn})" if linje else navn,
+            'Kall': kall,
+            'Egen tid (ms)': round(egen * 1000, 2),
+            'Kumulativ tid (ms)': round(kumulativ * 1000, 2)
+        })
+    df = pd.DataFrame(rader, columns=['Funksjon', 'Kall', 'Egen tid (ms)', 'Kumulativ tid (ms)'])
+    return df.sort_values('Kumulativ tid (ms)', ascending=False).head(antall).reset_index(drop=True)
+
+
+def profiler(funksjon, katalog='logs', sesjon_id='ukjent', ved_ferdig=None):
+    """
+    Kjører funksjon under cProfile og skriver statistikken til katalog.
+    Statistikken skrives og ved_ferdig(filsti, topp) kalles også når
+    funksjonen avbrytes av et unntak, for eksempel når Streamlit starter en
+    ny rerun.
+
+    Returns:
+        tuple: (filsti, topp_funksjoner) for kjøringen
+    """
+    os.makedirs(katalog, exist_ok=True)
+    profil = cProfile.Profile()
+    sti = filsti(katalog, sesjon_id)
+    profil.enable()
+    try:
+        funksjon()
+    finally:
+        profil.disable()
+        profil.dump_stats(sti)
+        topp = topp_funksjoner(profil)
+        logger.info(f"Profil lagret: {sti}")
+        if ved_ferdig is not None:
+            ved_ferdig(sti, topp)
+    return sti, topp
@@ -0,0 +1,129 @@
+# rapportjobber.py
+"""
+Rapporter og eksporter som bakgrunnsjobber.
+
+Jobbene kjøres i en trådpool som deles av alle sesjoner, slik at siden er
+interaktiv mens en lang rapport lages. Hver jobb får en id som sesjonen
+holder på og spør etter status med. Jobbfunksjonen får en fremdrift-
+callback som oppdaterer andelen som er ferdig.
+
+Ferdige resultater caches på en nøkkel laget fra inndataene. Sendes samme
+jobb inn på nytt (samme oppstilling), returneres id-en til den som kjører
+eller er ferdig i stedet for å starte en ny.
+"""
+import hashlib
+import json
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAKS_ARBEIDERE = 2       # Rapportene er korte; flere tråder gir bare mer konkurranse om GIL
+MAKS_RESULTATER = 32     # Antall ferdige jobber som holdes i cachen
+
+
+def jobbnokkel(*deler):
+    """
+    Nøkkel for cachen fra inndataene til en jobb. DataFrames hashes på
+    innholdet (med index og kolonnenavn), alt annet som JSON.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for del_ in deler:
+        if isinstance(del_, pd.DataFrame):
+            h.update(json.dumps(list(map(str, del_.columns))).encode('utf-8'))
+            h.update(pd.util.hash_pandas_object(del_.astype(str), index=True).to_numpy().tobytes())
+        else:
+            h.update(json.dumps(del_, sort_keys=True, default=str).encode('utf-8'))
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class Rapportjobb:
+    """Status for én jobb. Feltene skrives av arbeidertråden og leses av sesjonene."""
+
+    def __init__(self, jobb_id, navn):
+        self.id = jobb_id
+        self.navn = navn
+        self.andel = 0.0
+        self.resultat = None
+        self.feil = None
+        self.ferdig = False
+        self._fremtid = None
+
+    def oppdater(self, andel):
+        """Fremdrift-callback for jobbfunksjonen"""
+        self.andel = min(max(float(andel), 0.0), 1.0)
+
+
+class Rapportjobber:
+    """Trådpool med jobbstatus og resultatcache. Én instans deles av alle sesjoner."""
+
+    def __init__(self, maks_arbeidere=MAKS_ARBEIDERE, maks_resultater=MAKS_RESULTATER):
+        self._executor = ThreadPoolExecutor(max_workers=maks_arbeidere, thread_name_prefix='rapport')
+        self._maks_resultater = maks_resultater
+        self._laas = threading.Lock()
+        self._jobber = {}                   # jobb-id -> Rapportjobb
+        self._nokler = OrderedDict()        # nøkkel -> jobb-id, eldste først
+
+    def send_inn(self, navn, nokkel, funksjon, *args, **kwargs):
+        """
+        Starter funksjon(*args, fremdrift=..., **kwargs) i bakgrunnen.
+        Inndataene må ikke endres av kalleren mens jobben kjører.
+
+        Returns:
+            str: jobb-id
+        """
+        with self._laas:
+            jobb_id = self._nokler.get(nokkel)
+            if jobb_id is not None and self._jobber[jobb_id].feil is None:
+                self._nokler.move_to_end(nokkel)
+                logger.debug(f"Jobb {navn} finnes allerede: {jobb_id}")
+                return jobb_id
+            if jobb_id is not None:
+                del self._jobber[jobb_id]  # Feilet; nøkkelen får en ny jobb
+
+            jobb = Rapportjobb(uuid.uuid4().hex[:12], navn)
+            self._jobber[jobb.id] = jobb
+            self._nokler[nokkel] = jobb.id
+            self._nokler.move_to_end(nokkel)
+            self._rydd()
+        jobb._fremtid = self._executor.submit(self._kjor, jobb, funksjon, args, kwargs)
+        logger.info(f"Startet jobb {navn} ({jobb.id})")
+        return jobb.id
+
+    def _rydd(self):
+        """Fjerner de eldste ferdige jobbene når cachen er full. Kalles med låsen."""
+        for nokkel in list(self._nokler):
+            if len(self._nokler) <= self._maks_resultater:
+                break
+            jobb_id = self._nokler[nokkel]
+            if self._jobber[jobb_id].ferdig:
+                del self._nokler[nokkel]
+                del self._jobber[jobb_id]
+
+    def _kjor(self, jobb, funksjon, args, kwargs):
+        try:
+            jobb.resultat = funksjon(*args, fremdrift=jobb.oppdater, **kwargs)
+            jobb.andel = 1.0
+            logger.info(f"Jobb {jobb.navn} ({jobb.id}) ferdig")
+        except Exception as e:
+            logger.exception(f"Jobb {jobb.navn} ({jobb.id}) feilet")
+            jobb.feil = str(e)
+        finally:
+            jobb.ferdig = True
+
+    def hent(self, jobb_id):
+        """Jobben med id-en, eller None hvis den er ukjent eller fjernet fra cachen"""
+        with self._laas:
+            return self._jobber.get(jobb_id)
+
+    def vent(self, jobb_id, timeout=None):
+        """Venter til jobben er ferdig og returnerer den"""
+        jobb = self.hent(jobb_id)
+        if jobb is not None:
+            jobb._fremtid.exception(timeout)
+        return jobb
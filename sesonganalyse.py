@@ -0,0 +1,362 @@
+# sesonganalyse.py
+"""
+Eksport av kamparkivet til et Parquet-datasett for analyser over flere sesonger.
+
+Hver kamp flates ut til én rad per tilgjengelig spiller og periode (kamp,
+dato, motstander, spiller-id, periode, minutter, posisjon, på banen), og radene
+skrives til data/sesonganalyse/ partisjonert på sesong (sesong=2024/...).
+Nye kamper legges til som nye filer i sesongen sin; endrede eller slettede
+kamper fører til at bare de berørte sesongene skrives om. Får en sesong mer
+enn MAKS_DELER filer, skrives den om til én fil. Hvilke kamper som er
+eksportert, og med hvilket fingeravtrykk, ligger i eksportert.json.
+
+Datasettet leses inn i minnet én gang etter hver endring, og
+sammendragene regnes med pyarrow sin group_by rett på tabellen. Spillerne
+ligger som ID-er fra spillerregisteret, og navnene slås opp i
+sammendragene.
+
+Eksporten og sammendragene kan kjøres fra kommandolinjen:
+
+    python sesonganalyse.py --sesong 2024
+"""
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from kampsok import fingeravtrykk
+from kompakt import PERIODEBITS
+from tidslinje import Tidslinje
+from tropp import Tropp, spillerider
+from validering import periode_varighet
+
+logger = logging.getLogger(__name__)
+
+ANALYSE_STI = Path("data") / "sesonganalyse"
+MANIFEST = 'eksportert.json'
+FORMAT = 3  # Økes når SKJEMA eller utflatingen endres; datasettet eksporteres da på nytt
+UKJENT_SESONG = 'ukjent'
+MAKS_DELER = 16  # Filer per sesong før sesongen slås sammen til én fil
+
+SKJEMA = pa.schema([
+    ('kamp', pa.string()),
+    ('dato', pa.string()),
+    ('motstander', pa.string()),
+    ('spiller_id', pa.int32()),
+    ('periode', pa.string()),
+    ('periode_nr', pa.int16()),
+    ('minutter', pa.int16()),
+    ('posisjon', pa.string()),
+    ('paa_banen', pa.bool_()),
+])
+PARTISJONERING = ds.partitioning(pa.schema([('sesong', pa.string())]), flavor='hive')
+
+
+def sesong_for_dato(dato):
+    """Sesongen en kamp hører til: året i datoen (YYYY-MM-DD)"""
+    if dato and len(dato) >= 4 and dato[:4].isdigit():
+        return dato[:4]
+    return UKJENT_SESONG
+
+
+def rader_for_kamp(navn, kamp, tropp):
+    """
+    Flater ut en arkivert kamp til kolonnelister, én rad per tilgjengelig
+    spiller og periode. Posisjonen følger kampens posisjonsoverstyringer,
+    eller posisjon_<periode> i eldre kamper, og ellers 'Aktiv posisjon'.
+    Har kampen en tidslinje, telles minuttene fra den, slik at bytter midt
+    i en periode kommer med. Leser rett fra arkivformatet uten å bygge en
+    DataFrame. Navn i eldre kamper gjøres om til ID-er med tropp.
+
+    Returns:
+        dict: kolonnenavn -> liste, med kolonnene i SKJEMA
+    """
+    rader = {felt: [] for felt in SKJEMA.names}
+    perioder = kamp.get('perioder') or []
+    spilletid = kamp.get('spilletid_df')
+    if not spilletid or not perioder:
+        return rader
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    kolonner = {kolonne: j for j, kolonne in enumerate(spilletid['columns'])}
+    overstyringer = {(spiller, periode): posisjon for spiller, periode, posisjon in kamp.get('posisjoner') or []}
+    varigheter = [periode_varighet(p) for p in perioder]
+    dato = kamp.get('dato')
+    motstander = kamp.get('motstander') or ''
+    tidslinje = Tidslinje.fra_dict(kamp['tidslinje']) if kamp.get('tidslinje') else None
+
+    ider = spillerider(spilletid['index'], tropp)
+    for spiller, spiller_id, rad in zip(spilletid['index'], ider, spilletid['data']):
+        if 'Tilgjengelig' in kolonner and not rad[kolonner['Tilgjengelig']]:
+            continue
+        bits = int(rad[kolonner[PERIODEBITS]]) if PERIODEBITS in kolonner else None
+        if tidslinje is not None:
+            # Nøklene i tidslinjen er strenger etter JSON
+            minutter = tidslinje.minutter_per_periode(perioder, [str(spiller)])[0]
+        for j, periode in enumerate(perioder):
+            if tidslinje is not None:
+                paa = bool(minutter[j])
+            elif bits is not None:
+                paa = bool((bits >> j) & 1)
+            else:
+                paa = bool(periode in kolonner and rad[kolonner[periode]])
+            kolonne = kolonner.get(f'posisjon_{periode}', kolonner['Aktiv posisjon'])
+            rader['kamp'].append(navn)
+            rader['dato'].append(dato)
+            rader['motstander'].append(motstander)
+            rader['spiller_id'].append(spiller_id)
+            rader['periode'].append(periode)
+            rader['periode_nr'].append(j)
+            rader['minutter'].append(int(minutter[j]) if tidslinje is not None else varigheter[j] if paa else 0)
+            rader['posisjon'].append(str(overstyringer.get((spiller, periode), rad[kolonne])))
+            rader['paa_banen'].append(paa)
+    return rader
+
+
+def _til_tabell(kamper, tropp):
+    """Én Arrow-tabell for en liste med (navn, kamp)"""
+    rader = {felt: [] for felt in SKJEMA.names}
+    for navn, kamp in kamper:
+        try:
+            for felt, verdier in rader_for_kamp(navn, kamp, tropp).items():
+                rader[felt].extend(verdier)
+        except (KeyError, ValueError, TypeError) as e:
+            logger.warning(f"Kunne ikke eksportere {navn}: {e}")
+    return pa.table(rader, schema=SKJEMA)
+
+
+class Sesonganalyse:
+    """
+    Parquet-datasett med alle lagrede kamper, partisjonert på sesong. Deles
+    av alle sesjoner; skriving skjer under en lås, og tabellen som leses
+    inn byttes ut i sin helhet etter hver skriving.
+    """
+
+    def __init__(self, sti=ANALYSE_STI, tropp=None, maks_deler=MAKS_DELER):
+        self.sti = Path(sti)
+        self.sti.mkdir(parents=True, exist_ok=True)
+        self.tropp = tropp if tropp is not None else Tropp()
+        self.maks_deler = maks_deler
+        self._laas = threading.Lock()
+        self._arkivversjon = None
+        self._tabell = None
+        self.eksportert = self._les_manifest()  # navn -> {'fingeravtrykk', 'sesong'}
+
+    def _les_manifest(self):
+        """Kampene som er eksportert. Er datasettet i et annet format, slettes det."""
+        try:
+            with open(self.sti / MANIFEST, encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            manifest = {}
+        except json.JSONDecodeError as e:
+            logger.error(f"Ugyldig {MANIFEST}, eksporterer alt på nytt: {e}")
+            manifest = {}
+        if manifest.get('format') == FORMAT:
+            return manifest['kamper']
+        for mappe in self.sti.glob('sesong=*'):
+            shutil.rmtree(mappe)
+        return {}
+
+    def _skriv_manifest(self):
+        midlertidig = self.sti / f'{MANIFEST}.tmp'
+        with open(midlertidig, 'w', encoding='utf-8') as f:
+            json.dump({'format': FORMAT, 'kamper': self.eksportert}, f, ensure_ascii=False)
+        os.replace(midlertidig, self.sti / MANIFEST)
+
+    def _sesongmappe(self, sesong):
+        return self.sti / f'sesong={sesong}'
+
+    def _legg_til(self, sesong, tabell):
+        """Skriver nye rader som en egen fil i sesongen"""
+        if tabell.num_rows == 0:
+            return
+        mappe = self._sesongmappe(sesong)
+        mappe.mkdir(exist_ok=True)
+        pq.write_table(tabell, mappe / f'del-{uuid.uuid4().hex}.parquet')
+
+    def _skriv_om(self, sesong, fjern, nye):
+        """
+        Skriver en sesong på nytt som én fil, uten kampene i fjern og med
+        radene i nye. Gamle filer slettes først når den nye er skrevet.
+        """
+        mappe = self._sesongmappe(sesong)
+        gamle = sorted(mappe.glob('*.parquet')) if mappe.exists() else []
+        deler = [pq.read_table(fil, schema=SKJEMA) for fil in gamle]
+        if deler:
+            eksisterende = pa.concat_tables(deler)
+            fjernes = pc.is_in(eksisterende['kamp'], pa.array(sorted(fjern), type=pa.string()))
+            eksisterende = eksisterende.filter(pc.invert(fjernes))
+        else:
+            eksisterende = SKJEMA.empty_table()
+        tabell = pa.concat_tables([eksisterende, nye])
+        self._legg_til(sesong, tabell)
+        for fil in gamle:
+            fil.unlink()
+        if mappe.exists() and not any(mappe.iterdir()):
+            mappe.rmdir()
+
+    def _eksporter(self, endrede, fjernede):
+        """
+        Eksporterer endrede kamper {navn: (kamp, fingeravtrykk)} og fjerner
+        kampene i fjernede. Kalles med låsen holdt.
+        """
+        per_sesong = {}
+        berorte = set()
+        for navn, (kamp, avtrykk) in endrede.items():
+            sesong = sesong_for_dato(kamp.get('dato'))
+            per_sesong.setdefault(sesong, []).append((navn, kamp))
+            if navn in self.eksportert:
+                berorte.add(self.eksportert[navn]['sesong'])
+                berorte.add(sesong)
+        for navn in fjernede:
+            berorte.add(self.eksportert[navn]['sesong'])
+
+        fjern = set(fjernede) | {navn for navn in endrede if navn in self.eksportert}
+        for sesong in berorte:
+            self._skriv_om(sesong, fjern, _til_tabell(per_sesong.pop(sesong, []), self.tropp))
+        for sesong, kamper in per_sesong.items():
+            self._legg_til(sesong, _til_tabell(kamper, self.tropp))
+            if len(list(self._sesongmappe(sesong).glob('*.parquet'))) > self.maks_deler:
+                self._skriv_om(sesong, set(), SKJEMA.empty_table())
+                logger.info(f"Sesong {sesong} slått sammen til én fil")
+
+        for navn in fjernede:
+            del self.eksportert[navn]
+        for navn, (kamp, avtrykk) in endrede.items():
+            self.eksportert[navn] = {'fingeravtrykk': avtrykk, 'sesong': sesong_for_dato(kamp.get('dato'))}
+        self._skriv_manifest()
+        self._tabell = None
+        return len(berorte)
+
+    def eksporter(self, navn, kamp):
+        """Legger til eller oppdaterer én kamp, f.eks. rett etter at den er lagret"""
+        avtrykk = fingeravtrykk(kamp)
+        with self._laas:
+            if self.eksportert.get(navn, {}).get('fingeravtrykk') == avtrykk:
+                return
+            self._eksporter({navn: (kamp, avtrykk)}, [])
+
+    def synkroniser(self, kamparkiv):
+        """
+        Oppdaterer datasettet fra et DeltKamparkiv. Gjør ingenting hvis
+        arkivet ikke er endret siden forrige synkronisering; ellers
+        eksporteres bare kamper som er nye eller endret.
+
+        Returns:
+            int: Antall kamper som ble eksportert eller fjernet
+        """
+        kamper = kamparkiv.gjeldende()
+        versjon = kamparkiv.versjon
+        if versjon is not None and versjon == self._arkivversjon:
+            return 0
+        with self._laas:
+            endrede = {}
+            for navn, kamp in kamper.items():
+                avtrykk = fingeravtrykk(kamp)
+                if self.eksportert.get(navn, {}).get('fingeravtrykk') != avtrykk:
+                    endrede[navn] = (kamp, avtrykk)
+            fjernede = [navn for navn in self.eksportert if navn not in kamper]
+            if endrede or fjernede:
+                omskrevet = self._eksporter(endrede, fjernede)
+                logger.info(
+                    f"Sesonganalyse synkronisert: {len(endrede)} eksportert, {len(fjernede)} fjernet, "
+                    f"{omskrevet} sesonger skrevet om"
+                )
+            self._arkivversjon = versjon
+        return len(endrede) + len(fjernede)
+
+    def tabell(self, sesong=None):
+        """Hele datasettet som en Arrow-tabell, eventuelt bare én sesong"""
+        with self._laas:
+            if self._tabell is None:
+                filer = sorted(str(f) for f in self.sti.glob('sesong=*/*.parquet'))
+                if filer:
+                    datasett = ds.dataset(filer, schema=SKJEMA.append(pa.field('sesong', pa.string())),
+                                          format='parquet', partitioning=PARTISJONERING,
+                                          partition_base_dir=str(self.sti))
+                    self._tabell = datasett.to_table()
+                else:
+                    self._tabell = SKJEMA.append(pa.field('sesong', pa.string())).empty_table()
+            tabell = self._tabell
+        if sesong is not None:
+            tabell = tabell.filter(pc.equal(tabell['sesong'], sesong))
+        return tabell
+
+    def sesonger(self):
+        """Sesongene i datasettet, sortert"""
+        return sorted({info['sesong'] for info in self.eksportert.values()})
+
+    def _med_navn(self, df):
+        """Gjør om spiller-ID-ene i index til navn"""
+        df.index = pd.Index(self.tropp.navn_for(df.index), name='spiller')
+        return df
+
+    def minutter_per_posisjon(self, sesong=None):
+        """Minutter per spiller og posisjon, som en DataFrame spillere × posisjoner"""
+        tabell = self.tabell(sesong)
+        tabell = tabell.filter(tabell['paa_banen'])
+        sum_ = tabell.group_by(['spiller_id', 'posisjon']).aggregate([('minutter', 'sum')]).to_pandas()
+        if sum_.empty:
+            return sum_
+        return self._med_navn(
+            sum_.pivot(index='spiller_id', columns='posisjon', values='minutter_sum').fillna(0).astype(int)
+        )
+
+    def benkfrekvens(self, sesong=None):
+        """
+        Hvor ofte hver spiller satt på benken når spilleren var tilgjengelig.
+
+        Returns:
+            pd.DataFrame: 'Kamper', 'Perioder', 'På benken' og 'Andel benk' per spiller
+        """
+        tabell = self.tabell(sesong)
+        tabell = tabell.append_column('benk', pc.cast(pc.invert(tabell['paa_banen']), pa.int32()))
+        resultat = tabell.group_by('spiller_id').aggregate([
+            ('kamp', 'count_distinct'), ('periode', 'count'), ('benk', 'sum')
+        ]).to_pandas()
+        resultat = resultat.rename(columns={
+            'kamp_count_distinct': 'Kamper', 'periode_count': 'Perioder', 'benk_sum': 'På benken'
+        }).set_index('spiller_id')
+        resultat = self._med_navn(resultat)
+        resultat['Andel benk'] = (resultat['På benken'] / resultat['Perioder']).round(3)
+        return resultat.sort_values('Andel benk', ascending=False)
+
+    def minutter_per_sesong(self):
+        """Minutter per spiller og sesong, som en DataFrame spillere × sesonger"""
+        sum_ = self.tabell().group_by(['spiller_id', 'sesong']).aggregate([('minutter', 'sum')]).to_pandas()
+        if sum_.empty:
+            return sum_
+        return self._med_navn(
+            sum_.pivot(index='spiller_id', columns='sesong', values='minutter_sum').fillna(0).astype(int)
+        )
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+    from kamparkiv import aapne_kamparkiv
+
+    parser = argparse.ArgumentParser(description="Eksporter kamparkivet til Parquet og vis sammendrag")
+    parser.add_argument('--sesong', help="Vis bare én sesong")
+    parser.add_argument('--sti', default=str(ANALYSE_STI))
+    args = parser.parse_args()
+
+    analyse = Sesonganalyse(args.sti)
+    start = time.perf_counter()
+    antall = analyse.synkroniser(aapne_kamparkiv())
+    print(f"{antall} kamper eksportert på {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    minutter = analyse.minutter_per_posisjon(args.sesong)
+    benk = analyse.benkfrekvens(args.sesong)
+    print(f"Sammendrag beregnet på {(time.perf_counter() - start) * 1000:.1f} ms\n")
+    print(minutter.to_string())
+    print()
+    print(benk.to_string())
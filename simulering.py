@@ -0,0 +1,299 @@
+# simulering.py
+"""
+Monte Carlo-simulering av tilgjengelighet for å planlegge troppsdybde.
+
+Hvert scenario trekker hvilke spillere som er borte ut fra en
+fraværssannsynlighet per spiller. For hvert scenario regnes mål spilletid
+på nytt (som oppdater_mal_spilletid), det lages en gyldig oppstilling, og
+det sjekkes om hver posisjonsgruppe har nok spillere til formasjonen.
+
+Scenariene vurderes i bunker der alle scenarier i bunken behandles samtidig
+som NumPy-matriser (scenarier × spillere), og bunkene fordeles på en
+prosesspool. Hver bunke har sitt eget frø fra SeedSequence, så resultatet
+er det samme uansett antall prosesser.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+import numpy as np
+import pandas as pd
+from kampplan import beregn_mal_spilletid
+from kompakt import POSISJONER, POSISJON_BIT, KEEPER, FORSVAR, MIDTBANE, ANGREP, posisjoner_til_maske
+from validering import get_max_spillere_per_posisjon, periode_varighet
+
+logger = logging.getLogger(__name__)
+
+GRUPPER = {'Keeper': KEEPER, 'Forsvar': FORSVAR, 'Midtbane': MIDTBANE, 'Angrep': ANGREP}
+STANDARD_FRAVAER = 0.1
+SCENARIER_PER_BUNKE = 500
+
+
+def standard_formasjon(df, perioder, antall_paa_banen):
+    """
+    Antall spillere per posisjonsgruppe som trengs på banen. Tas fra første
+    periode med spillere på banen i gjeldende oppstilling (etter aktiv
+    posisjon), ellers fordeles utespillerne jevnt på gruppene.
+
+    Returns:
+        dict: {gruppe: antall}, med 'Keeper': 1
+    """
+    for periode in perioder:
+        paa = df.index[df[periode].astype(bool)]
+        if len(paa):
+            bits = df.loc[paa, 'Aktiv posisjon'].astype(object).map(POSISJON_BIT).fillna(0).astype(int)
+            formasjon = {gruppe: int(((bits & maske) != 0).sum()) for gruppe, maske in GRUPPER.items() if gruppe != 'Keeper'}
+            return {'Keeper': 1, **formasjon}
+    ute = max(0, int(antall_paa_banen) - 1)
+    deler = np.array_split(np.arange(ute), 3)
+    return {'Keeper': 1, 'Forsvar': len(deler[0]), 'Midtbane': len(deler[1]), 'Angrep': len(deler[2])}
+
+
+def lag_oppsett(df, perioder, kamptid, antall_paa_banen, formasjon=None):
+    """
+    Gjør om spillerdataframen til NumPy-matriser som kan sendes til
+    arbeidsprosessene.
+    """
+    formasjon = formasjon or standard_formasjon(df, perioder, antall_paa_banen)
+    aktiv = df['Aktiv posisjon'].astype(object).to_numpy()
+    masker = np.array([
+        posisjoner_til_maske(p) | POSISJON_BIT.get(a, 0) for p, a in zip(df['Posisjoner'], aktiv)
+    ], dtype=np.int64)
+    grupper = list(formasjon)
+    behov = np.array([formasjon[g] for g in grupper])
+
+    # Posisjonen en spiller har som utespiller, som i Turneringsdag: aktiv
+    # posisjon, eller første posisjon i masken for keepere
+    uteposisjon = np.array([
+        a if a != 'Keeper' else next((p for p in POSISJONER[1:] if POSISJON_BIT[p] & m), '')
+        for a, m in zip(aktiv, masker)
+    ], dtype=object)
+    posisjonsnavn, posisjonskode = np.unique(uteposisjon.astype(str), return_inverse=True)
+    # Gruppen til uteposisjonen, med formasjonens antall som grense. Posisjoner
+    # utenfor gruppene i formasjonen får en egen gruppe uten grense.
+    gruppekode = np.array([
+        next((k for k, g in enumerate(grupper) if POSISJON_BIT.get(p, 0) & GRUPPER.get(g, 0)), len(grupper))
+        for p in uteposisjon
+    ])
+    return {
+        'varighet': np.array([periode_varighet(p) for p in perioder], dtype=float),
+        'kamptid': int(kamptid),
+        'antall_paa_banen': int(antall_paa_banen),
+        'kan_keeper': (masker & KEEPER) != 0,
+        'fast_keeper': aktiv == 'Keeper',
+        'kan_ute': (masker & ~KEEPER) != 0,
+        # spillere × grupper: om spilleren kan dekke gruppen
+        'dekker': np.stack([(masker & GRUPPER[g]) != 0 for g in grupper], axis=1),
+        'behov': behov,
+        'grupper': grupper,
+        'posisjonskode': posisjonskode,
+        'maks_per_posisjon': np.array([get_max_spillere_per_posisjon(p) for p in posisjonsnavn]),
+        'gruppekode': gruppekode,
+        'maks_per_gruppe': np.append(behov, np.iinfo(np.int64).max)
+    }
+
+
+def mangler_grupper(tilgjengelig, dekker, behov):
+    """
+    Sjekker om posisjonsgruppene kan fylles i hvert scenario.
+
+    En gruppe mangler spillere når færre tilgjengelige spillere kan dekke den
+    enn formasjonen trenger. Siden en spiller bare kan stå i én gruppe om
+    gangen, kan formasjonen likevel være umulig selv om ingen gruppe mangler
+    alene. Det sjekkes for hver mengde grupper at minst like mange
+    tilgjengelige spillere kan dekke en av dem som mengden trenger (Halls
+    betingelse).
+
+    Args:
+        tilgjengelig: scenarier × spillere (bool)
+        dekker: spillere × grupper (bool)
+        behov: antall per gruppe
+
+    Returns:
+        tuple: (scenarier × grupper med manglende grupper, scenarier der
+            formasjonen ikke kan fylles)
+    """
+    antall_grupper = len(behov)
+    tilgjengelig = tilgjengelig.astype(np.int32)
+    mangler = tilgjengelig @ dekker.astype(np.int32) < behov
+    umulig = mangler.any(axis=1)
+    for storrelse in range(2, antall_grupper + 1):
+        for mengde in combinations(range(antall_grupper), storrelse):
+            mengde = list(mengde)
+            kan = dekker[:, mengde].any(axis=1).astype(np.int32)
+            umulig |= tilgjengelig @ kan < behov[mengde].sum()
+    return mangler, umulig
+
+
+def simuler_bunke(oppsett, tilgjengelig, rng):
+    """
+    Lager en oppstilling for alle scenarier i en bunke samtidig, og gir
+    minutter per spiller og kostnad per scenario.
+
+    Keeperen velges én gang per kamp (fast keeper først) og står hele
+    kampen. Utespillerne velges periode for periode etter størst underskudd
+    i forhold til mål spilletid, med litt støy så like spillere roterer.
+    Som i Turneringsdag.konstruer hoppes spillere over når posisjonen deres
+    har get_max_spillere_per_posisjon på banen, eller gruppen har så mange
+    som formasjonen trenger. Bare hvis det da ikke blir nok spillere, fylles
+    resten opp uten grensene.
+
+    Args:
+        oppsett: Fra lag_oppsett
+        tilgjengelig: scenarier × spillere (bool)
+        rng: np.random.Generator
+
+    Returns:
+        dict: 'minutter' (scenarier × spillere), 'mal' (per scenario) og
+            'kostnad' (kvadratsum av avvik fra mål per scenario)
+    """
+    antall_scenarier, antall_spillere = tilgjengelig.shape
+    rader = np.arange(antall_scenarier)
+    mal = beregn_mal_spilletid(oppsett['kamptid'], oppsett['antall_paa_banen'], tilgjengelig.sum(axis=1))
+
+    keeperverdi = np.where(
+        tilgjengelig & oppsett['kan_keeper'],
+        1.0 + oppsett['fast_keeper'] + rng.random((antall_scenarier, antall_spillere)) * 0.5,
+        -np.inf
+    )
+    keeper = keeperverdi.argmax(axis=1)
+    har_keeper = np.isfinite(keeperverdi[rader, keeper])
+
+    kan_ute = tilgjengelig & oppsett['kan_ute']
+    kan_ute[rader[har_keeper], keeper[har_keeper]] = False
+    antall_ute = oppsett['antall_paa_banen'] - 1
+
+    minutter = np.zeros((antall_scenarier, antall_spillere))
+    for varighet in oppsett['varighet']:
+        minutter[rader[har_keeper], keeper[har_keeper]] += varighet
+        prioritet = np.where(
+            kan_ute,
+            (mal[:, None] - minutter) + rng.random((antall_scenarier, antall_spillere)),
+            -np.inf
+        )
+        rekkefolge = np.argsort(-prioritet, axis=1)
+        paa = _velg_utespillere(oppsett, kan_ute, rekkefolge, antall_ute)
+        minutter += paa * varighet
+
+    avvik = np.where(tilgjengelig, minutter - mal[:, None], 0.0)
+    return {'minutter': minutter, 'mal': mal, 'kostnad': np.einsum('ij,ij->i', avvik, avvik)}
+
+
+def _velg_utespillere(oppsett, kan_ute, rekkefolge, antall_ute):
+    """
+    Velger utespillere for én periode i alle scenarier samtidig. Går gjennom
+    spillerne i rekkefølge og tar med dem som har plass innenfor posisjons-
+    og gruppegrensene, og fyller deretter opp med de neste uten grensene.
+
+    Returns:
+        np.ndarray: scenarier × spillere (bool)
+    """
+    antall_scenarier = kan_ute.shape[0]
+    rader = np.arange(antall_scenarier)
+    paa = np.zeros_like(kan_ute)
+    valgt = np.zeros(antall_scenarier, dtype=int)
+    per_posisjon = np.zeros((antall_scenarier, len(oppsett['maks_per_posisjon'])), dtype=int)
+    per_gruppe = np.zeros((antall_scenarier, len(oppsett['maks_per_gruppe'])), dtype=int)
+
+    for i in rekkefolge.T:
+        posisjon = oppsett['posisjonskode'][i]
+        gruppe = oppsett['gruppekode'][i]
+        ok = (
+            kan_ute[rader, i]
+            & (valgt < antall_ute)
+            & (per_posisjon[rader, posisjon] < oppsett['maks_per_posisjon'][posisjon])
+            & (per_gruppe[rader, gruppe] < oppsett['maks_per_gruppe'][gruppe])
+        )
+        paa[rader[ok], i[ok]] = True
+        valgt += ok
+        per_posisjon[rader[ok], posisjon[ok]] += 1
+        per_gruppe[rader[ok], gruppe[ok]] += 1
+
+    for i in rekkefolge.T:
+        if (valgt >= antall_ute).all():
+            break
+        ok = kan_ute[rader, i] & ~paa[rader, i] & (valgt < antall_ute)
+        paa[rader[ok], i[ok]] = True
+        valgt += ok
+    return paa
+
+
+def _kjor_bunke(oppsett, fravaer, antall, frosekvens):
+    """Trekker og simulerer én bunke med scenarier. Kjøres i en arbeidsprosess."""
+    rng = np.random.default_rng(frosekvens)
+    tilgjengelig = rng.random((antall, len(fravaer))) >= fravaer
+    resultat = simuler_bunke(oppsett, tilgjengelig, rng)
+    mangler, umulig = mangler_grupper(tilgjengelig, oppsett['dekker'], oppsett['behov'])
+    return {
+        'tilgjengelig': tilgjengelig,
+        'minutter': resultat['minutter'].astype(np.float32),
+        'kostnad': resultat['kostnad'],
+        'mangler': mangler,
+        'formasjon_umulig': umulig,
+        'for_faa': tilgjengelig.sum(axis=1) < oppsett['antall_paa_banen']
+    }
+
+
+def simuler_tilgjengelighet(df, perioder, kamptid, antall_paa_banen, fravaer=None,
+                            scenarier=5000, formasjon=None, fro=0,
+                            per_bunke=SCENARIER_PER_BUNKE, arbeidere=None):
+    """
+    Simulerer mange scenarier for hvem som er tilgjengelige.
+
+    Args:
+        df (pd.DataFrame): Spillerdataframe (alle spillere i troppen)
+        perioder (list): Periodene i kampen
+        kamptid (int): Total kamptid
+        antall_paa_banen (int): Antall spillere på banen
+        fravaer (dict | pd.Series): Fraværssannsynlighet (0-1) per spiller,
+            STANDARD_FRAVAER for spillere som mangler
+        scenarier (int): Antall scenarier
+        formasjon (dict): Antall per posisjonsgruppe, se standard_formasjon
+        fro (int): Frø for trekningene
+        per_bunke (int): Scenarier per bunke
+        arbeidere (int): Antall prosesser. 0 kjører alt i denne prosessen.
+
+    Returns:
+        dict: 'minutter' (DataFrame med fordeling per spiller), 'mangel'
+            (sannsynlighet for for få spillere per posisjonsgruppe),
+            'formasjon_umulig' (sannsynlighet for at formasjonen ikke kan
+            fylles), 'for_faa' (sannsynlighet for færre tilgjengelige enn antall
+            på banen), 'snitt_kostnad' og 'scenarier'
+    """
+    fravaer = pd.Series(fravaer if fravaer is not None else {}, dtype=float)
+    sannsynlighet = fravaer.reindex(df.index).fillna(STANDARD_FRAVAER).clip(0, 1).to_numpy()
+    oppsett = lag_oppsett(df, perioder, kamptid, antall_paa_banen, formasjon)
+
+    storrelser = [min(per_bunke, scenarier - start) for start in range(0, scenarier, per_bunke)]
+    frosekvenser = np.random.SeedSequence(fro).spawn(len(storrelser))
+    argumenter = [(oppsett, sannsynlighet, antall, frosekvens) for antall, frosekvens in zip(storrelser, frosekvenser)]
+    if arbeidere == 0 or len(argumenter) == 1:
+        bunker = [_kjor_bunke(*a) for a in argumenter]
+    else:
+        with ProcessPoolExecutor(max_workers=arbeidere) as executor:
+            bunker = list(executor.map(_kjor_bunke, *zip(*argumenter)))
+
+    tilgjengelig = np.concatenate([b['tilgjengelig'] for b in bunker])
+    minutter = np.concatenate([b['minutter'] for b in bunker])
+    mangler = np.concatenate([b['mangler'] for b in bunker])
+    antall_med = tilgjengelig.sum(axis=0)
+    fordeling = pd.DataFrame({
+        'Fravær': sannsynlighet,
+        'Snitt': minutter.mean(axis=0),
+        'Snitt når med': (minutter * tilgjengelig).sum(axis=0) / np.maximum(antall_med, 1),
+        'P10': np.percentile(minutter, 10, axis=0),
+        'P50': np.percentile(minutter, 50, axis=0),
+        'P90': np.percentile(minutter, 90, axis=0)
+    }, index=df.index).round(1)
+    resultat = {
+        'minutter': fordeling,
+        'mangel': pd.Series(mangler.mean(axis=0), index=oppsett['grupper'], name='Sannsynlighet'),
+        'formasjon_umulig': float(np.concatenate([b['formasjon_umulig'] for b in bunker]).mean()),
+        'for_faa': float(np.concatenate([b['for_faa'] for b in bunker]).mean()),
+        'snitt_kostnad': float(np.concatenate([b['kostnad'] for b in bunker]).mean()),
+        'scenarier': int(minutter.shape[0])
+    }
+    logger.info(
+        f"Simulerte {resultat['scenarier']} scenarier i {len(bunker)} bunker, "
+        f"for få spillere i {resultat['for_faa']:.1%}"
+    )
+    return resultat
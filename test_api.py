@@ -0,0 +1,117 @@
+import unittest
+import json
+import os
+import tempfile
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from tornado.testing import AsyncHTTPTestCase
+from api import lag_app, oppstilling_til_df
+
+class TestApi(AsyncHTTPTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.executor = ProcessPoolExecutor(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.arkiv_sti = os.path.join(self.temp_dir, 'kamper.json')
+        with open(self.arkiv_sti, 'w', encoding='utf-8') as f:
+            json.dump({'Kamp1': {'motstander': 'Brodd', 'dato': '2024-10-28', 'kamptid': 25}}, f)
+        self.oppsett = {
+            'kamptid': 25,
+            'antall_paa_banen': 2,
+            'perioder': ['0-15', '15-25'],
+            'spillere': [
+                {'navn': 'Spiller1', 'aktiv_posisjon': 'Keeper', 'mal_spilletid': 25, 'paa_banen': ['0-15', '15-25']},
+                {'navn': 'Spiller2', 'aktiv_posisjon': 'Back', 'mal_spilletid': 15, 'paa_banen': ['0-15']},
+                {'navn': 'Spiller3', 'aktiv_posisjon': 'Spiss', 'mal_spilletid': 10, 'paa_banen': ['15-25']}
+            ]
+        }
+        super().setUp()
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        super().tearDown()
+        shutil.rmtree(self.temp_dir)
+
+    def get_app(self):
+        return lag_app(self.executor, self.arkiv_sti, os.path.join(self.temp_dir, 'tropp.db'))
+
+    def post_json(self, sti, data):
+        respons = self.fetch(sti, method='POST', body=json.dumps(data))
+        return respons.code, json.loads(respons.body)
+
+    def test_oppstilling_til_df(self):
+        """Tester konvertering fra JSON-oppsett til spilletid_df"""
+        df = oppstilling_til_df(self.oppsett)
+        self.assertEqual(df.index.tolist(), ['Spiller1', 'Spiller2', 'Spiller3'])
+        self.assertEqual(df['0-15'].tolist(), [True, True, False])
+
+    def test_perioder(self):
+        """Tester generering av perioder"""
+        kode, svar = self.post_json('/api/perioder', {'kamptid': 40})
+        self.assertEqual(kode, 200)
+        self.assertEqual(svar['resultat'], ['0-15', '15-20', '20-30', '30-40'])
+
+    def test_spilletid(self):
+        """Tester kalkulering av spilletid"""
+        kode, svar = self.post_json('/api/spilletid', self.oppsett)
+        self.assertEqual(kode, 200)
+        self.assertEqual(svar['resultat']['Spiller1']['total_spilletid'], 25)
+        self.assertEqual(svar['resultat']['Spiller3']['differanse'], 0)
+
+    def test_valider(self):
+        """Tester validering av en gyldig plan og en plan med brudd"""
+        kode, svar = self.post_json('/api/valider', self.oppsett)
+        self.assertEqual(svar['resultat'], [])
+        self.oppsett['spillere'][0]['paa_banen'] = ['0-15']
+        kode, svar = self.post_json('/api/valider', self.oppsett)
+        self.assertIn('keeper', [b['regel'] for b in svar['resultat']])
+
+    def test_kampoppsett(self):
+        """Tester detaljert kampoppsett"""
+        kode, svar = self.post_json('/api/kampoppsett', self.oppsett)
+        self.assertEqual(kode, 200)
+        self.assertEqual(svar['resultat'][1]['Bytter Inn'], 'Spiller3')
+
+    def test_bunke(self):
+        """Tester at en bunke med mange oppsett gir ett resultat per oppsett i rekkefølge"""
+        bunke = [{'kamptid': 40 + 5 * (i % 10)} for i in range(120)]
+        bunke[7] = {}
+        kode, svar = self.post_json('/api/perioder', {'bunke': bunke})
+        self.assertEqual(kode, 200)
+        self.assertEqual(len(svar['resultater']), 120)
+        self.assertIn('feil', svar['resultater'][7])
+        self.assertEqual(svar['resultater'][10][-1], '30-40')
+
+    def test_ugyldig_foresporsel(self):
+        """Tester feilhåndtering for ugyldig JSON og manglende felter"""
+        respons = self.fetch('/api/perioder', method='POST', body='ikke json')
+        self.assertEqual(respons.code, 400)
+        kode, svar = self.post_json('/api/spilletid', {'perioder': []})
+        self.assertEqual(kode, 400)
+        self.assertIn('feil', svar)
+        # Verdier utenfor grensene avvises uten å beregnes
+        kode, svar = self.post_json('/api/perioder', {'kamptid': 10 ** 9})
+        self.assertEqual(kode, 400)
+        self.assertIn('kamptid', svar['feil'])
+        kode, svar = self.post_json('/api/perioder', {'bunke': [{'kamptid': 40}, {'kamptid': -5}, 'ikke et oppsett']})
+        self.assertEqual(svar['resultater'][0][-1], '30-40')
+        self.assertIn('kamptid', svar['resultater'][1]['feil'])
+        self.assertIn('feil', svar['resultater'][2])
+
+    def test_kamparkiv(self):
+        """Tester listing og henting av arkiverte kamper"""
+        svar = json.loads(self.fetch('/api/kamper').body)
+        self.assertEqual(svar['kamper'][0]['navn'], 'Kamp1')
+        svar = json.loads(self.fetch('/api/kamper/Kamp1').body)
+        self.assertEqual(svar['resultat']['motstander'], 'Brodd')
+        self.assertEqual(self.fetch('/api/kamper/Ukjent').code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
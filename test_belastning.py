@@ -0,0 +1,141 @@
+import unittest
+import os
+import tempfile
+import shutil
+import numpy as np
+import pandas as pd
+from belastning import Belastning, juster_mal_spilletid
+from kamparkiv import DeltKamparkiv, spilletid_df_til_arkiv
+from kompakt import komprimer_for_arkiv, posisjoner_til_maske
+from tropp import Tropp
+
+PERIODER = ['0-15', '15-25']
+
+class TestBelastning(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.arkiv = DeltKamparkiv(os.path.join(self.temp_dir, 'kamper.ndjson'))
+        self.arkiv.lagre('Trening', self.lag_kamp('Sola', '2024-08-01', {'Lilly': ('Ving', PERIODER)}))
+        self.arkiv.lagre('Kamp 1', self.lag_kamp('Brodd', '2024-09-01', {
+            'Susanne': ('Keeper', PERIODER), 'Tuva': ('Back', ['0-15'])
+        }))
+        self.arkiv.lagre('Kamp 2', self.lag_kamp('Viking', '2024-09-20', {
+            'Susanne': ('Keeper', PERIODER), 'Adele': ('Spiss', ['15-25'])
+        }))
+        self.arkiv.lagre('Kamp 3', self.lag_kamp('Bryne', '2024-09-25', {
+            'Susanne': ('Keeper', PERIODER), 'Tuva': ('Back', PERIODER)
+        }))
+        self.tropp = Tropp(os.path.join(self.temp_dir, 'tropp.db'))
+        self.belastning = Belastning(self.tropp)
+        self.assertEqual(self.belastning.synkroniser(self.arkiv), 4)
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def lag_kamp(self, motstander, dato, paa_banen):
+        """Lager en arkivert kamp. paa_banen er {spiller: (aktiv posisjon, [perioder])}."""
+        df = pd.DataFrame({
+            'Posisjoner': [posisjoner_til_maske(posisjon) for posisjon, _ in paa_banen.values()],
+            'Aktiv posisjon': [posisjon for posisjon, _ in paa_banen.values()],
+            'Tilgjengelig': True,
+            'Mål spilletid': 0
+        }, index=list(paa_banen))
+        for periode in PERIODER:
+            df[periode] = [periode in perioder for _, perioder in paa_banen.values()]
+        return {
+            'motstander': motstander,
+            'dato': dato,
+            'kamptid': 25,
+            'perioder': PERIODER,
+            'spilletid_df': spilletid_df_til_arkiv(komprimer_for_arkiv(df, PERIODER))
+        }
+
+    def forventet(self, kamper, vindu):
+        """Rullerende sum regnet med pandas fra minutter per (dato, spiller)"""
+        daglig = pd.DataFrame(kamper, columns=['dato', 'spiller', 'minutter'])
+        daglig = daglig.pivot_table(index='dato', columns='spiller', values='minutter', aggfunc='sum')
+        daglig.index = pd.to_datetime(daglig.index)
+        daglig = daglig.asfreq('D').fillna(0)
+        return daglig.rolling(vindu, min_periods=1).sum()
+
+    def test_rullerende_og_inkrementell(self):
+        """Tester rullerende summer mot pandas, og at lagring av kamper gir samme matrise som ny bygging"""
+        navn = ['Susanne', 'Tuva', 'Adele', 'Lilly']
+        ider = dict(zip(navn, self.tropp.ider_for(navn)))
+        kamper = [
+            ('2024-08-01', 'Lilly', 25), ('2024-09-01', 'Susanne', 25), ('2024-09-01', 'Tuva', 15), ('2024-09-20', 'Susanne', 25),
+            ('2024-09-20', 'Adele', 10), ('2024-09-25', 'Susanne', 25), ('2024-09-25', 'Tuva', 25)
+        ]
+        rullerende = self.belastning.rullerende()
+        for vindu, navn in [(7, 'akutt'), (28, 'kronisk')]:
+            forventet = self.forventet(kamper, vindu).rename(columns=ider)
+            pd.testing.assert_frame_equal(
+                rullerende[navn][forventet.columns].astype(float), forventet,
+                check_names=False, check_freq=False
+            )
+        self.assertAlmostEqual(rullerende['acwr'].at[pd.Timestamp('2024-09-25'), ider['Susanne']], 50 / (75 / 4))
+        # For lite historikk de første 28 dagene
+        self.assertTrue(rullerende['acwr'].loc[:'2024-08-27'].isna().all().all())
+
+        # Kamper før første og etter siste dato, en ny spiller og en kamp som flyttes
+        self.belastning.legg_til('Kamp 0', self.lag_kamp('Sola', '2024-07-15', {'Lilly': ('Ving', PERIODER)}))
+        self.belastning.legg_til('Kamp 4', self.lag_kamp('Vidar', '2024-10-10', {'Tuva': ('Back', PERIODER)}))
+        self.belastning.legg_til('Kamp 2', self.lag_kamp('Viking', '2024-09-22', {'Susanne': ('Keeper', ['0-15'])}))
+        self.arkiv.lagre('Kamp 0', self.lag_kamp('Sola', '2024-07-15', {'Lilly': ('Ving', PERIODER)}))
+        self.arkiv.lagre('Kamp 4', self.lag_kamp('Vidar', '2024-10-10', {'Tuva': ('Back', PERIODER)}))
+        self.arkiv.lagre('Kamp 2', self.lag_kamp('Viking', '2024-09-22', {'Susanne': ('Keeper', ['0-15'])}))
+        self.assertEqual(self.belastning.synkroniser(self.arkiv), 0)
+
+        ny = Belastning(self.tropp)
+        ny.synkroniser(self.arkiv)
+        inkrementell = self.belastning.rullerende()
+        for navn in ['akutt', 'kronisk']:
+            pd.testing.assert_frame_equal(inkrementell[navn][ny.rullerende()[navn].columns], ny.rullerende()[navn])
+        self.assertEqual(inkrementell['akutt'].index[0], pd.Timestamp('2024-07-15'))
+        self.assertEqual(inkrementell['akutt'].at[pd.Timestamp('2024-09-22'), ider['Adele']], 0)
+
+    def test_status_og_justeringer(self):
+        """Tester belastningen inn i en kamp og justering av mål spilletid"""
+        ider = self.tropp.ider_for(['Susanne', 'Tuva', 'Adele', 'Ukjent'])
+        status = self.belastning.status(ider, '2024-09-26')
+        self.assertEqual(status['Minutter 7 d'].tolist(), [50, 25, 10, 0])
+        self.assertEqual(status['Minutter 28 d'].tolist(), [75, 40, 10, 0])
+        # Kampen på selve dagen regnes ikke med
+        self.assertEqual(self.belastning.status(ider, '2024-09-25')['Minutter 7 d'].tolist(), [25, 0, 10, 0])
+        self.assertTrue(np.isnan(status['ACWR'].iloc[3]))
+
+        faktorer = self.belastning.justeringer(ider, '2024-09-26')
+        self.assertAlmostEqual(faktorer[1], 1.3 / (25 / (40 / 4)))     # Over den trygge sonen
+        self.assertEqual(faktorer[0], 0.5)                              # ACWR 2.7 gir laveste faktor
+        self.assertEqual(faktorer[3], 1.0)                              # Ingen historikk
+        # Uten kamper siste uke er ACWR 0, og Adele har ingen kamper siste 28 dager
+        self.assertEqual(self.belastning.justeringer(ider, '2024-10-20').tolist(), [1.25, 1.25, 1.0, 1.0])
+
+        mal = juster_mal_spilletid(20, [0.5, 1.0, 1.0, 1.5])
+        self.assertEqual(mal.tolist(), [10, 20, 20, 30])
+        self.assertEqual(juster_mal_spilletid(20, np.ones(3)).tolist(), [20, 20, 20])
+        # Ingen får mer enn kamptiden; resten fordeles på de andre etter faktor
+        self.assertEqual(juster_mal_spilletid(20, [0.5, 0.5, 4.0], maks=30).tolist(), [15, 15, 30])
+
+    def test_uten_kampen_som_planlegges(self):
+        """Tester at kampen som planlegges ikke regnes som belastning inn i seg selv"""
+        ider = self.tropp.ider_for(['Susanne', 'Tuva', 'Adele'])
+        # Kamp 3 (25. september) planlegges på nytt for 26. september
+        status = self.belastning.status(ider, '2024-09-26', unntatt='Kamp 3')
+        self.assertEqual(status['Minutter 7 d'].tolist(), [25, 0, 10])
+        self.assertEqual(status['Minutter 28 d'].tolist(), [50, 15, 10])
+        self.assertEqual(
+            self.belastning.justeringer(ider, '2024-09-26', unntatt='Kamp 3').tolist(),
+            self.belastning.justeringer(ider, '2024-09-25').tolist()
+        )
+        # Kamper utenfor vinduet og ukjente kamper endrer ingenting
+        for unntatt in ['Kamp 1', 'Finnes ikke']:
+            pd.testing.assert_frame_equal(
+                self.belastning.status(ider, '2024-10-20', unntatt=unntatt)[['Minutter 7 d']],
+                self.belastning.status(ider, '2024-10-20')[['Minutter 7 d']]
+            )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import numpy as np
+import pandas as pd
+from byttforslag import ByttforslagMotor, hent_byttforslag
+
+class TestByttforslag(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-10', '10-20']
+        self.df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Back', 'Back', 'Spiss'],
+            'Tilgjengelig': [True, True, True, True],
+            'Mål spilletid': [20, 15, 15, 10],
+            '0-10': [True, True, True, False],
+            '10-20': [True, True, True, False]
+        }, index=['Keeper1', 'Back1', 'Back2', 'Spiss1'])
+
+    def test_beste_bytte(self):
+        """Tester at beste bytte foreslås først"""
+        motor = ByttforslagMotor(self.df, self.perioder, 3)
+        self.assertEqual(motor.totalt_avvik(), 20)
+        forslag = motor.forslag(k=3)
+        self.assertEqual(forslag[0]['inn'], 'Spiss1')
+        self.assertIn(forslag[0]['ut'], ['Back1', 'Back2'])
+        self.assertEqual(forslag[0]['forbedring'], 10)
+        # Keeperen skal aldri byttes ut med en utespiller
+        self.assertNotIn('Keeper1', [f['ut'] for f in forslag])
+
+    def test_posisjonsgrense(self):
+        """Tester at forslag ikke bryter posisjonsgrensene"""
+        df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Spiss', 'Spiss', 'Back', 'Spiss'],
+            'Tilgjengelig': True,
+            'Mål spilletid': [20, 10, 10, 0, 20],
+            '0-10': [True, True, True, True, False],
+            '10-20': [True, True, True, True, False]
+        }, index=['Keeper1', 'Spiss1', 'Spiss2', 'Back1', 'Spiss3'])
+        motor = ByttforslagMotor(df, self.perioder, 4)
+        forslag = motor.forslag(k=10)
+        self.assertTrue(forslag)
+        for f in forslag:
+            # En tredje spiss kan bare komme inn for en annen spiss
+            self.assertEqual(f['inn'], 'Spiss3')
+            self.assertIn(f['ut'], ['Spiss1', 'Spiss2'])
+
+    def test_inkrementell_lik_full(self):
+        """Tester at inkrementell oppdatering gir samme tilstand som ny oppbygging"""
+        rng = np.random.default_rng(1)
+        spillere = [f'Spiller{i}' for i in range(25)]
+        perioder = [f'{i * 5}-{i * 5 + 5}' for i in range(16)]
+        df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Keeper'] + ['Back', 'Ving', 'Spiss', 'Midtstopper', 'Sentral midtbane'] * 4 + ['Back'] * 3,
+            'Tilgjengelig': True,
+            'Mål spilletid': 29
+        }, index=spillere)
+        for periode in perioder:
+            df[periode] = rng.random(len(spillere)) < 0.4
+
+        tilstand = {}
+        hent_byttforslag(tilstand, df, perioder, 9)
+        for _ in range(50):
+            spiller, periode = rng.choice(spillere), rng.choice(perioder)
+            df.at[spiller, periode] = not df.at[spiller, periode]
+            forslag, avvik = hent_byttforslag(tilstand, df, perioder, 9)
+
+        ny = ByttforslagMotor(df, perioder, 9)
+        motor = tilstand['byttforslag_motor']
+        np.testing.assert_array_equal(motor.avvik, ny.avvik)
+        np.testing.assert_array_equal(motor.slakk, ny.slakk)
+        np.testing.assert_array_equal(motor.posisjonstelling, ny.posisjonstelling)
+        self.assertEqual(forslag, ny.forslag())
+
+    def test_ny_motor_ved_endret_plan(self):
+        """Tester at motoren bygges på nytt når perioder eller mål endres"""
+        tilstand = {}
+        hent_byttforslag(tilstand, self.df, self.perioder, 3)
+        motor = tilstand['byttforslag_motor']
+        self.df['Mål spilletid'] = 15
+        hent_byttforslag(tilstand, self.df, self.perioder, 3)
+        self.assertIsNot(tilstand['byttforslag_motor'], motor)
+
+if __name__ == '__main__':
+    unittest.main()
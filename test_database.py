@@ -2,6 +2,8 @@ import unittest
 import pandas as pd
 import streamlit as st
 from database import DatabaseHandler
+from posisjoner import Posisjonsoverstyringer
+from tropp import Tropp
 import os
 from pathlib import Path
 import tempfile
@@ -52,13 +54,18 @@ class TestDatabaseHandler(unittest.TestCase):
         # Legg til periodekolonner
         for periode in self.perioder:
             self.test_df[periode] = False
+
+        # Spillerne får id fra spillerregisteret, slik oppstillingen har det i appen
+        self.tropp = Tropp(self.test_dir / "tropp.db", {})
+        self.test_df = self.tropp.med_ider(self.test_df)
             
         # Opprett en mock session state
         self.mock_session_state = MockSessionState({
             'spilletid_df': self.test_df.copy(),
             'kamptid': 80,
             'antall_paa_banen': 9,
-            'perioder': self.perioder.copy()
+            'perioder': self.perioder.copy(),
+            'posisjonsoverstyringer': Posisjonsoverstyringer()
         })
         
         # Mock st.session_state
@@ -69,7 +76,8 @@ class TestDatabaseHandler(unittest.TestCase):
         # Opprett DatabaseHandler med mock session state
         self.db = DatabaseHandler(
             data_dir=self.test_dir,
-            session_state=self.mock_session_state
+            session_state=self.mock_session_state,
+            tropp=self.tropp
         )
         
         # Opprett tabeller
@@ -152,6 +160,51 @@ class TestDatabaseHandler(unittest.TestCase):
         # Sjekk at periodene er like
         self.assertEqual(self.mock_session_state.perioder, original_perioder)
 
+    def test_posisjonsoverstyringer(self):
+        """Tester at bare overstyringene lagres, og at gamle posisjonskolonner flyttes over"""
+        self.mock_session_state.posisjonsoverstyringer.sett('Spiller2', '15-25', 'Keeper', 'Back')
+        self.db.lagre_posisjoner()
+        self.mock_session_state.posisjonsoverstyringer = Posisjonsoverstyringer()
+        self.db.last_posisjoner()
+        self.assertEqual(self.mock_session_state.posisjonsoverstyringer, {('Spiller2', '15-25'): 'Keeper'})
+
+        gammel = self.test_df.copy()
+        gammel['posisjon_0-15'] = ['Back', 'Back']
+        self.mock_session_state.spilletid_df = gammel
+        self.db.lagre_spillere()
+        self.db.mellomlager.verdier.clear()
+        self.db.last_alt()
+        self.assertNotIn('posisjon_0-15', self.mock_session_state.spilletid_df.columns)
+        self.assertEqual(self.mock_session_state.posisjonsoverstyringer, {
+            ('Spiller1', '0-15'): 'Back',
+            ('Spiller2', '15-25'): 'Keeper'
+        })
+
+    def test_nytt_navn_i_annen_sesjon(self):
+        """Tester at en sesjon med det gamle navnet lagrer på samme spiller etter at en annen sesjon har byttet navn"""
+        self.mock_session_state.posisjonsoverstyringer.sett('Spiller2', '15-25', 'Keeper', 'Back')
+        self.db.lagre_alt()
+        spiller_id = int(self.test_df.at['Spiller2', 'spiller_id'])
+
+        # Sesjon A laster, gir Spiller2 nytt navn og lagrer
+        sesjon_a = MockSessionState({'posisjonsoverstyringer': Posisjonsoverstyringer()})
+        db_a = DatabaseHandler(data_dir=self.test_dir, session_state=sesjon_a, tropp=self.tropp)
+        db_a.last_alt()
+        self.tropp.gi_nytt_navn(spiller_id, 'Tuva B')
+        sesjon_a.spilletid_df = sesjon_a.spilletid_df.rename(index={'Spiller2': 'Tuva B'})
+        db_a.lagre_alt()
+
+        # Denne sesjonen har fortsatt det gamle navnet og lagrer etterpå
+        self.db.lagre_alt()
+        self.assertEqual(self.tropp.tabell()['Navn'].tolist(), ['Spiller1', 'Tuva B'])
+
+        sesjon_b = MockSessionState()
+        db_b = DatabaseHandler(data_dir=self.test_dir, session_state=sesjon_b, tropp=self.tropp)
+        db_b.last_alt()
+        self.assertEqual(sesjon_b.spilletid_df.index.tolist(), ['Spiller1', 'Tuva B'])
+        self.assertEqual(int(sesjon_b.spilletid_df.at['Tuva B', 'spiller_id']), spiller_id)
+        self.assertEqual(sesjon_b.posisjonsoverstyringer, {('Tuva B', '15-25'): 'Keeper'})
+
     def test_lagre_alt(self):
         """Tester lagring av all data samtidig"""
         original_df = self.test_df.copy()
@@ -250,5 +303,71 @@ class TestDatabaseHandler(unittest.TestCase):
         self.db.last_perioder()
         self.assertEqual(self.mock_session_state.perioder, [])
 
+    def test_kamphendelser(self):
+        """Tester at kamphendelser legges til som egne rader og lastes i rekkefølge"""
+        self.db.lagre_hendelse('Kamp1', 'start', 0.0, data=['Spiller1'])
+        self.db.lagre_hendelse('Kamp1', 'bytte', 12.5, ut='Spiller1', inn='Spiller2')
+        self.db.lagre_hendelse('Kamp2', 'start', 0.0, data=[])
+        
+        hendelser = self.db.last_hendelser('Kamp1')
+        self.assertEqual([h['type'] for h in hendelser], ['start', 'bytte'])
+        self.assertEqual(hendelser[0]['data'], ['Spiller1'])
+        self.assertEqual(hendelser[1]['minutt'], 12.5)
+        self.assertEqual((hendelser[1]['ut'], hendelser[1]['inn']), ('Spiller1', 'Spiller2'))
+        
+        self.db.slett_hendelser('Kamp1')
+        self.assertEqual(self.db.last_hendelser('Kamp1'), [])
+        self.assertEqual(len(self.db.last_hendelser('Kamp2')), 1)
+
+    def test_flytt_kamphendelser(self):
+        """Tester at hendelsene flyttes til kampnavnet, men ikke over en kamp som har egne hendelser"""
+        self.db.lagre_hendelse('live-1', 'start', 0.0, data=[1])
+        self.db.lagre_hendelse('live-1', 'bytte', 5.0, ut='1', inn='2')
+        self.db.lagre_hendelse('Kamp2', 'start', 0.0, data=[])
+        self.assertEqual(self.db.flytt_hendelser('live-1', 'Kamp1'), 2)
+        self.assertEqual([h['type'] for h in self.db.last_hendelser('Kamp1')], ['start', 'bytte'])
+        self.assertEqual(self.db.last_hendelser('live-1'), [])
+        self.assertEqual(self.db.flytt_hendelser('Kamp1', 'Kamp2'), 0)
+        self.assertEqual(len(self.db.last_hendelser('Kamp1')), 2)
+
+    def test_mange_kamphendelser(self):
+        """Tester at hver kamphendelse blir én rad, i rekkefølgen de ble lagret"""
+        for i in range(20):
+            self.db.lagre_hendelse('Kamp1', 'bytte', float(i), ut='Spiller1', inn='Spiller2')
+        hendelser = self.db.last_hendelser('Kamp1')
+        self.assertEqual([h['minutt'] for h in hendelser], [float(i) for i in range(20)])
+        self.assertTrue(all(h['tidspunkt'] for h in hendelser))
+
+    def test_mellomlager_hopper_over_uendret_data(self):
+        """Tester at last_alt ikke leser på nytt når ingen andre har skrevet"""
+        self.db.lagre_alt()
+        self.mock_session_state.spilletid_df.at['Spiller1', 'Aktiv posisjon'] = 'Midtbane'
+        with patch('database.pd.read_json') as read_json:
+            self.db.last_alt()
+            read_json.assert_not_called()
+        pd.testing.assert_frame_equal(self.mock_session_state.spilletid_df, self.test_df)
+        self.assertEqual(self.db.mellomlager_statistikk()['treff'], 4)
+
+        # En rerun uten endringer kopierer ikke rammen, verken ved lasting eller lagring
+        df = self.mock_session_state.spilletid_df
+        with patch.object(pd.DataFrame, 'copy', autospec=True, side_effect=pd.DataFrame.copy) as copy:
+            self.db.last_alt()
+            self.db.lagre_alt()
+            self.db.last_alt()
+        self.assertEqual([c for c in copy.call_args_list if c.kwargs.get('deep', True)], [])
+        self.assertIs(self.mock_session_state.spilletid_df, df)
+
+    def test_mellomlager_laster_bare_endret_seksjon(self):
+        """Tester at bare seksjonen en annen prosess har skrevet lastes på nytt"""
+        self.db.lagre_alt()
+        annen_sesjon = MockSessionState({'kamptid': 60, 'antall_paa_banen': 7})
+        DatabaseHandler(data_dir=self.test_dir, session_state=annen_sesjon).lagre_kampinnstillinger()
+
+        self.db.last_alt()
+        statistikk = self.db.mellomlager_statistikk()
+        self.assertEqual((statistikk['treff'], statistikk['bom']), (3, 1))
+        self.assertEqual(self.mock_session_state.kamptid, 60)
+        self.assertEqual(self.mock_session_state.perioder, self.perioder)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,75 @@
+import unittest
+import pandas as pd
+from historikk import Oppstillingshistorikk
+
+class TestOppstillingshistorikk(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-15', '15-25', '25-35']
+        self.df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Back'],
+            '0-15': [True, False],
+            '15-25': [True, False],
+            '25-35': [False, False]
+        }, index=['Spiller1', 'Spiller2'])
+        self.historikk = Oppstillingshistorikk.fra_df(self.df, self.perioder)
+
+    def test_uendret_gir_ingen_versjon(self):
+        """Tester at registrering uten endringer ikke gir ny versjon"""
+        self.assertFalse(self.historikk.registrer(self.df))
+        self.assertEqual(len(self.historikk), 1)
+        self.assertFalse(self.historikk.kan_angre)
+
+    def test_angre_og_gjenta(self):
+        """Tester angre og gjør om med endrede celler"""
+        self.df.at['Spiller2', '25-35'] = True
+        self.assertTrue(self.historikk.registrer(self.df))
+
+        endringer = self.historikk.endrede_celler(*self.historikk.angre())
+        self.assertEqual(endringer, [('Spiller2', '25-35', False)])
+        self.assertFalse(self.historikk.kan_angre)
+        self.assertIsNone(self.historikk.angre())
+
+        endringer = self.historikk.endrede_celler(*self.historikk.gjenta())
+        self.assertEqual(endringer, [('Spiller2', '25-35', True)])
+        self.assertFalse(self.historikk.kan_gjenta)
+
+    def test_ny_endring_forkaster_gjenta(self):
+        """Tester at en ny endring etter angre forkaster versjonene som kunne gjøres om"""
+        self.df.at['Spiller2', '25-35'] = True
+        self.historikk.registrer(self.df)
+        self.historikk.angre()
+        self.df.at['Spiller2', '25-35'] = False
+        self.df.at['Spiller2', '0-15'] = True
+        self.historikk.registrer(self.df)
+        self.assertEqual(len(self.historikk), 2)
+        self.assertFalse(self.historikk.kan_gjenta)
+
+    def test_strukturell_deling(self):
+        """Tester at uendrede kolonner deles mellom versjonene"""
+        for i in range(10):
+            self.df.at['Spiller2', '25-35'] = i % 2 == 0
+            self.historikk.registrer(self.df)
+        self.assertEqual(len(self.historikk), 11)
+        # Bare kolonnen som endres får nye arrays
+        self.assertEqual(self.historikk.antall_unike_kolonner(), len(self.perioder) + 10)
+        forrige, gjeldende = self.historikk.angre()
+        self.assertIs(forrige[0], gjeldende[0])
+        self.assertFalse(gjeldende[0].flags.writeable)
+
+    def test_maks_lengde(self):
+        """Tester at eldste versjoner forkastes når historikken er full"""
+        historikk = Oppstillingshistorikk.fra_df(self.df, self.perioder, maks_lengde=3)
+        for i in range(5):
+            self.df.at['Spiller2', '25-35'] = i % 2 == 0
+            historikk.registrer(self.df)
+        self.assertEqual(len(historikk), 3)
+        self.assertTrue(historikk.kan_angre)
+
+    def test_passer_til(self):
+        """Tester at historikken kjenner igjen spillere og perioder"""
+        self.assertTrue(self.historikk.passer_til(self.df, self.perioder))
+        self.assertFalse(self.historikk.passer_til(self.df, self.perioder[:2]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import unittest
+import json
+import os
+import tempfile
+import shutil
+from kamparkiv import (
+    DeltKamparkiv, aapne_kamparkiv, les_ndjson, legg_til_ndjson, komprimer_ndjson,
+    konverter_fra_json, spilletid_df_fra_arkiv, blokksti, Blokkfil, sett_sammen_kamp
+)
+
+class TestDeltKamparkiv(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.sti = os.path.join(self.temp_dir, 'kamper.json')
+        with open(self.sti, 'w', encoding='utf-8') as f:
+            json.dump({'Kamp1': {'motstander': 'Brodd', 'perioder': ['0-15']}}, f)
+        self.arkiv = DeltKamparkiv(self.sti)
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_gjeldende_er_skrivebeskyttet_og_deles(self):
+        """Tester at gjentatte oppslag gir samme øyeblikksbilde uten ny innlasting"""
+        kamper = self.arkiv.gjeldende()
+        self.assertEqual(self.arkiv.navn(), ['Kamp1'])
+        self.assertIs(self.arkiv.gjeldende(), kamper)
+        self.assertEqual(self.arkiv.antall_innlastinger, 1)
+        with self.assertRaises(TypeError):
+            kamper['Kamp2'] = {}
+
+    def test_lagre_deler_uendrede_kamper(self):
+        """Tester at lagring gir ny versjon der uendrede kamper deles"""
+        kamp1 = self.arkiv.hent('Kamp1')
+        gammel_versjon = self.arkiv.versjon
+        self.arkiv.lagre('Kamp2', {'motstander': 'Viking'})
+
+        self.assertNotEqual(self.arkiv.versjon, gammel_versjon)
+        self.assertIs(self.arkiv.hent('Kamp1'), kamp1)
+        self.assertEqual(self.arkiv.antall_innlastinger, 1)
+        with open(self.sti, encoding='utf-8') as f:
+            self.assertEqual(sorted(json.load(f)), ['Kamp1', 'Kamp2'])
+
+    def test_endring_fra_annen_prosess(self):
+        """Tester at arkivet lastes på nytt når filen endres utenfra"""
+        self.arkiv.gjeldende()
+        annet = DeltKamparkiv(self.sti)
+        annet.lagre('Kamp3', {'motstander': 'Bryne'})
+        self.assertIn('Kamp3', self.arkiv.navn())
+        self.assertEqual(self.arkiv.antall_innlastinger, 2)
+
+    def test_manglende_fil(self):
+        """Tester at et arkiv uten fil er tomt og kan lagres til"""
+        arkiv = DeltKamparkiv(os.path.join(self.temp_dir, 'ny.json'))
+        self.assertEqual(arkiv.navn(), [])
+        arkiv.lagre('Kamp1', {})
+        self.assertEqual(arkiv.navn(), ['Kamp1'])
+
+    def test_konverter_fra_json(self):
+        """Tester konvertering til NDJSON uten dobbelt lagret index og kolonner, med spillerne som blokk"""
+        split = {'index': ['Spiller1'], 'columns': ['0-15'], 'data': [[True]]}
+        with open(self.sti, 'w', encoding='utf-8') as f:
+            json.dump({'Kamp1': {'kamptid': 40, 'spilletid_df': {'data': split, **split}}}, f)
+        ndjson_sti = os.path.join(self.temp_dir, 'kamper.ndjson')
+
+        self.assertEqual(konverter_fra_json(self.sti, ndjson_sti), 1)
+        with open(ndjson_sti, encoding='utf-8') as f:
+            linjer = f.read().splitlines()
+        self.assertEqual(len(linjer), 1)
+        self.assertNotIn('spilletid_df', json.loads(linjer[0]))
+        self.assertEqual(len(Blokkfil(blokksti(ndjson_sti))), 2)
+
+        navn, kamp = next(les_ndjson(ndjson_sti))
+        self.assertEqual(navn, 'Kamp1')
+        self.assertTrue(spilletid_df_fra_arkiv(kamp['spilletid_df']).at['Spiller1', '0-15'])
+        self.assertEqual(kamp['spilletid_df'], split)
+
+    def test_ndjson_blokker_deles(self):
+        """Tester at like spillere, oppstillinger og tidslinjer lagres én gang, og at ubrukte blokker ryddes"""
+        ndjson_sti = os.path.join(self.temp_dir, 'kamper.ndjson')
+        arkiv = DeltKamparkiv(ndjson_sti)
+        kolonner = ['Aktiv posisjon', 'Tilgjengelig', 'Total spilletid', 'Periodebits']
+        spillere = ['Spiller1', 'Spiller2']
+
+        def kamp(bits, tidslinje=None, **felter):
+            spilletid = {'index': spillere, 'columns': kolonner,
+                         'data': [['Keeper', True, 15, bits[0]], ['Back', True, 10, bits[1]]]}
+            return {'kamptid': 25, 'perioder': ['0-15', '15-25'], 'spilletid_df': spilletid,
+                    'tidslinje': tidslinje, **felter}
+
+        tidslinje = {'kamptid': 25, 'intervaller': {'Spiller1': [[0, 15]], 'Spiller2': [[15, 25]]}}
+        arkiv.lagre('Kamp1', kamp([1, 2], tidslinje, motstander='Brodd'))
+        arkiv.lagre('Kamp2', kamp([1, 2], tidslinje, motstander='Viking'))
+        arkiv.lagre('Kamp2', kamp([1, 2], tidslinje, motstander='Viking'))  # Uendret, skrives ikke
+        arkiv.lagre('Kamp1', kamp([3, 0], motstander='Brodd'))
+        arkiv.lagre('Kamp2', kamp([1, 2], motstander='Viking'))
+        self.assertEqual(len(Blokkfil(blokksti(ndjson_sti))), 4)
+        with open(ndjson_sti, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 4)
+
+        # Eldre linje med hele kampen, skrevet uten blokker
+        legg_til_ndjson(ndjson_sti, 'Kamp3', kamp([2, 1], motstander='Bryne'))
+        ny = DeltKamparkiv(ndjson_sti)
+        for navn, forventet in [('Kamp1', kamp([3, 0], motstander='Brodd')),
+                                ('Kamp2', kamp([1, 2], motstander='Viking')),
+                                ('Kamp3', kamp([2, 1], motstander='Bryne'))]:
+            self.assertEqual(ny.hent(navn), forventet)
+
+        self.assertEqual(komprimer_ndjson(ndjson_sti), 3)
+        # Tidslinjen brukes ikke lenger; Kamp3 sin oppstilling er ny
+        self.assertEqual(len(Blokkfil(blokksti(ndjson_sti))), 4)
+        self.assertEqual(dict(les_ndjson(ndjson_sti))['Kamp3'], kamp([2, 1], motstander='Bryne'))
+
+    def test_blokker_leses_ved_behov(self):
+        """Tester at blokkene leses fra disk når de brukes, med et begrenset antall i minnet"""
+        ndjson_sti = os.path.join(self.temp_dir, 'kamper.ndjson')
+        arkiv = DeltKamparkiv(ndjson_sti)
+
+        def kamp(i):
+            return {'kamptid': 25, 'spilletid_df': {'index': ['Spiller1'], 'columns': ['Aktiv posisjon', 'Periodebits'],
+                                                    'data': [['Keeper', i]]}}
+
+        for i in range(6):
+            arkiv.lagre(f"Kamp{i}", kamp(i))
+        arkiv.lagre('Kamp0', kamp(10))
+        # Én spillerblokk som deles, og én oppstilling per lagring
+        blokker = Blokkfil(blokksti(ndjson_sti), maks_blokker=2)
+        self.assertEqual((len(blokker), blokker.antall_lest), (8, 0))
+        with self.assertRaises(KeyError):
+            blokker['finnes ikke']
+
+        kamper = list(les_ndjson(ndjson_sti))
+        self.assertEqual([k['spilletid_df']['data'][0][1] for _, k in kamper], [0, 1, 2, 3, 4, 5, 10])
+        for navn, linje in les_ndjson(ndjson_sti, sett_sammen=False):
+            sett_sammen_kamp(linje, blokker)
+        self.assertEqual(len(blokker._lru), 2)
+        self.assertEqual(blokker.antall_lest, 8)     # Spillerblokken leses bare én gang
+
+        # Komprimering kopierer blokkene som brukes, og arkivet indekserer den nye filen
+        self.assertEqual(komprimer_ndjson(ndjson_sti), 6)
+        self.assertEqual(len(Blokkfil(blokksti(ndjson_sti))), 7)
+        arkiv.lagre('Kamp6', kamp(6))
+        self.assertEqual(len(Blokkfil(blokksti(ndjson_sti))), 8)
+        self.assertEqual(DeltKamparkiv(ndjson_sti).hent('Kamp0'), kamp(10))
+        self.assertEqual(DeltKamparkiv(ndjson_sti).hent('Kamp6'), kamp(6))
+
+    def test_ndjson_legger_til_og_siste_gjelder(self):
+        """Tester at lagring legger til linjer og at siste linje per kamp gjelder"""
+        ndjson_sti = os.path.join(self.temp_dir, 'kamper.ndjson')
+        arkiv = aapne_kamparkiv(ndjson_sti, self.sti)
+        self.assertEqual(arkiv.navn(), ['Kamp1'])
+
+        arkiv.lagre('Kamp2', {'motstander': 'Viking'})
+        arkiv.lagre('Kamp1', {'motstander': 'Bryne'})
+        self.assertEqual(arkiv.antall_innlastinger, 1)
+        self.assertEqual(arkiv.hent('Kamp1')['motstander'], 'Bryne')
+        with open(ndjson_sti, encoding='utf-8') as f:
+            self.assertEqual(len(f.readlines()), 3)
+
+        self.assertEqual(komprimer_ndjson(ndjson_sti), 2)
+        self.assertEqual(dict(les_ndjson(ndjson_sti))['Kamp1']['motstander'], 'Bryne')
+        self.assertEqual(sorted(DeltKamparkiv(ndjson_sti).navn()), ['Kamp1', 'Kamp2'])
+
+    def test_ndjson_samtidig_skriving(self):
+        """Tester at linjer lagt til av en annen prosess oppdages, og at ugyldige linjer hoppes over"""
+        ndjson_sti = os.path.join(self.temp_dir, 'kamper.ndjson')
+        arkiv = DeltKamparkiv(ndjson_sti)
+        arkiv.lagre('Kamp1', {})
+        legg_til_ndjson(ndjson_sti, 'Kamp2', {})
+        with open(ndjson_sti, 'a', encoding='utf-8') as f:
+            f.write('{"navn": "halvskrevet"')
+        self.assertEqual(arkiv.navn(), ['Kamp1', 'Kamp2'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+import os
+import tempfile
+import shutil
+import pandas as pd
+from kamparkiv import DeltKamparkiv, spilletid_df_til_arkiv
+from kampsok import Kampsok, spillere_i_kamp, fts_sporring
+from kompakt import komprimer_for_arkiv, posisjoner_til_maske
+
+PERIODER = ['0-15', '15-25']
+
+def lag_kamp(motstander, dato, paa_banen, posisjon_15_25=None):
+    """Lager en arkivert kamp. paa_banen er {spiller: (aktiv posisjon, [perioder])}."""
+    df = pd.DataFrame({
+        'Posisjoner': [posisjoner_til_maske(posisjon) for posisjon, _ in paa_banen.values()],
+        'Aktiv posisjon': [posisjon for posisjon, _ in paa_banen.values()],
+        'Tilgjengelig': True,
+        'Total spilletid': 0,
+        'Differanse': 0,
+        'Mål spilletid': 0
+    }, index=list(paa_banen))
+    for periode in PERIODER:
+        df[periode] = [periode in perioder for _, perioder in paa_banen.values()]
+    if posisjon_15_25:
+        df['posisjon_15-25'] = [posisjon_15_25.get(s, p) for s, (p, _) in paa_banen.items()]
+    return {
+        'motstander': motstander,
+        'dato': dato,
+        'kamptid': 25,
+        'perioder': PERIODER,
+        'antall_paa_banen': 2,
+        'spilletid_df': spilletid_df_til_arkiv(komprimer_for_arkiv(df, PERIODER))
+    }
+
+class TestKampsok(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.arkiv = DeltKamparkiv(os.path.join(self.temp_dir, 'kamper.ndjson'))
+        self.arkiv.lagre('Seriekamp 1', lag_kamp('Brodd', '2024-09-01', {
+            'Susanne': ('Keeper', PERIODER), 'Tuva': ('Back', ['0-15']), 'Adele': ('Spiss', ['15-25'])
+        }, posisjon_15_25={'Tuva': 'Spiss'}))
+        self.arkiv.lagre('Cup Viking', lag_kamp('Viking', '2024-10-12', {
+            'Susanne': ('Keeper', PERIODER), 'Tuva': ('Back', PERIODER)
+        }))
+        self.arkiv.lagre('Seriekamp 2', lag_kamp('Bryne FK', '2024-10-28', {
+            'Adele': ('Keeper', PERIODER), 'Tuva': ('Spiss', PERIODER)
+        }))
+        self.sok = Kampsok(os.path.join(self.temp_dir, 'kampsok.db'))
+        self.assertEqual(self.sok.synkroniser(self.arkiv), 3)
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def navn(self, **filtre):
+        return [k['navn'] for k in self.sok.sok(**filtre)['kamper']]
+
+    def test_spillere_i_kamp(self):
+        """Tester minutter per spiller og posisjon, med posisjon per periode"""
+        minutter = spillere_i_kamp(self.arkiv.hent('Seriekamp 1'))
+        self.assertEqual(minutter, {
+            ('Susanne', 'Keeper'): 25, ('Tuva', 'Back'): 15, ('Adele', 'Spiss'): 10
+        })
+        self.assertEqual(fts_sporring('bryne "fk'), '"bryne"* """fk"*')
+
+    def test_filtre(self):
+        """Tester fritekst, dato, motstander, spiller og posisjon, nyeste først"""
+        self.assertEqual(self.navn(), ['Seriekamp 2', 'Cup Viking', 'Seriekamp 1'])
+        self.assertEqual(self.navn(tekst='serie'), ['Seriekamp 2', 'Seriekamp 1'])
+        self.assertEqual(self.navn(tekst='bryne'), ['Seriekamp 2'])
+        self.assertEqual(self.navn(fra_dato='2024-10-01', til_dato='2024-10-28'), ['Seriekamp 2', 'Cup Viking'])
+        self.assertEqual(self.navn(motstander='viking'), ['Cup Viking'])
+        self.assertEqual(self.navn(spiller='Adele'), ['Seriekamp 2', 'Seriekamp 1'])
+        self.assertEqual(self.navn(spiller='Adele', posisjon='Keeper'), ['Seriekamp 2'])
+        self.assertEqual(self.navn(spiller='Tuva', posisjon='Back', tekst='serie'), ['Seriekamp 1'])
+        self.assertEqual(self.navn(spiller='Tuva', posisjon='Keeper'), [])
+        self.assertEqual(self.sok.motstandere(), ['Brodd', 'Bryne FK', 'Viking'])
+        self.assertEqual(self.sok.spillere(), ['Adele', 'Susanne', 'Tuva'])
+
+    def test_sider(self):
+        """Tester sidevis visning og at siden holdes innenfor antall sider"""
+        resultat = self.sok.sok(side=2, per_side=2)
+        self.assertEqual([k['navn'] for k in resultat['kamper']], ['Seriekamp 1'])
+        self.assertEqual((resultat['totalt'], resultat['antall_sider']), (3, 2))
+        self.assertEqual(resultat['kamper'][0]['antall_spillere'], 3)
+        self.assertEqual(self.sok.sok(side=9, per_side=2)['side'], 2)
+
+    def test_synkroniser_bare_endringer(self):
+        """Tester at bare nye og endrede kamper indekseres på nytt"""
+        self.assertEqual(self.sok.synkroniser(self.arkiv), 0)
+        self.arkiv.lagre('Cup Viking', lag_kamp('Viking 2', '2024-10-12', {'Susanne': ('Keeper', PERIODER)}))
+        self.assertEqual(self.sok.synkroniser(self.arkiv), 1)
+        self.assertEqual(self.navn(spiller='Tuva', motstander='Viking 2'), [])
+        self.assertEqual(self.navn(tekst='viking 2'), ['Cup Viking'])
+
+if __name__ == '__main__':
+    unittest.main()
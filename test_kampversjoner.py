@@ -0,0 +1,88 @@
+import unittest
+import os
+import tempfile
+import shutil
+from kampversjoner import Kampversjoner, lag_delta, bruk_delta
+
+def lag_kamp(paa_banen, motstander='Brodd'):
+    """Kamp med to perioder der paa_banen er periodebitene per spiller"""
+    return {
+        'motstander': motstander,
+        'perioder': ['0-15', '15-25'],
+        'spilletid_df': {
+            'index': ['Spiller1', 'Spiller2', 'Spiller3'],
+            'columns': ['Aktiv posisjon', 'Periodebits'],
+            'data': [['Keeper', paa_banen[0]], ['Back', paa_banen[1]], ['Spiss', paa_banen[2]]]
+        }
+    }
+
+class TestKampversjoner(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.sti = os.path.join(self.temp_dir, 'kampversjoner.ndjson')
+        self.versjoner = Kampversjoner(self.sti, nokkelramme_intervall=3)
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_delta_inneholder_bare_endrede_celler(self):
+        """Tester at en delta bare har endrede celler og felter, og kan brukes igjen"""
+        forrige, ny = lag_kamp([3, 1, 2]), lag_kamp([3, 2, 2], motstander='Viking')
+        delta = lag_delta(forrige, ny)
+        self.assertEqual(delta['celler'], [[1, 1, 2]])
+        self.assertEqual(delta['felter'], {'motstander': 'Viking'})
+        self.assertEqual(bruk_delta(forrige, delta), ny)
+        self.assertEqual(forrige['spilletid_df']['data'][1][1], 1)
+
+        ny['spilletid_df']['index'] = ['Spiller1', 'Spiller2', 'Spiller4']
+        self.assertIsNone(lag_delta(forrige, ny))
+
+    def test_versjoner_med_nokkelrammer(self):
+        """Tester at alle versjoner kan gjenskapes, og at nøkkelrammer skrives med fast intervall"""
+        kamper = [lag_kamp([3, i % 4, 2]) for i in range(7)]
+        for kamp in kamper:
+            self.versjoner.lagre('Kamp1', kamp)
+
+        info = self.versjoner.versjoner('Kamp1')
+        self.assertEqual([v['versjon'] for v in info], list(range(1, 8)))
+        self.assertEqual([v['nokkelramme'] for v in info], [True, False, False, True, False, False, True])
+
+        # Nytt objekt leser fra fil uten å ha noe i minnet
+        fra_fil = Kampversjoner(self.sti, nokkelramme_intervall=3)
+        for versjon, kamp in enumerate(kamper, start=1):
+            self.assertEqual(fra_fil.hent('Kamp1', versjon), kamp)
+        self.assertIsNone(fra_fil.hent('Kamp1', 99))
+
+    def test_begrenset_antall_i_minnet(self):
+        """Tester at bare de sist brukte kampene holdes i minnet, og at de andre leses fra fil"""
+        versjoner = Kampversjoner(self.sti, nokkelramme_intervall=3, maks_siste=2)
+        for navn in ['Kamp1', 'Kamp2', 'Kamp3']:
+            versjoner.lagre(navn, lag_kamp([3, 1, 2]))
+        self.assertEqual(list(versjoner._siste), ['Kamp2', 'Kamp3'])
+        self.assertEqual(versjoner.lagre('Kamp1', lag_kamp([3, 2, 2])), 2)
+        self.assertEqual(list(versjoner._siste), ['Kamp3', 'Kamp1'])
+        self.assertEqual(versjoner.hent('Kamp1', 1), lag_kamp([3, 1, 2]))
+        self.assertEqual(versjoner.hent('Kamp2'), lag_kamp([3, 1, 2]))
+
+    def test_uendret_lagres_ikke(self):
+        """Tester at lagring uten endringer ikke gir ny versjon"""
+        self.assertEqual(self.versjoner.lagre('Kamp1', lag_kamp([3, 1, 2])), 1)
+        self.assertEqual(self.versjoner.lagre('Kamp1', lag_kamp([3, 1, 2])), 1)
+        self.assertEqual(len(self.versjoner.versjoner('Kamp1')), 1)
+
+    def test_diff(self):
+        """Tester at diffen viser endrede perioder og felter"""
+        self.versjoner.lagre('Kamp1', lag_kamp([3, 1, 2]))
+        self.versjoner.lagre('Kamp1', lag_kamp([3, 2, 1], motstander='Viking'))
+        endringer = self.versjoner.diff('Kamp1', 1, 2)
+        self.assertEqual(endringer['felter'], {'motstander': ('Brodd', 'Viking')})
+        self.assertEqual(
+            {(c['spiller'], c['kolonne'], c['fra'], c['til']) for c in endringer['celler']},
+            {('Spiller2', '0-15', True, False), ('Spiller2', '15-25', False, True),
+             ('Spiller3', '0-15', False, True), ('Spiller3', '15-25', True, False)}
+        )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+import pandas as pd
+from kompakt import (
+    POSISJON_BIT, FORSVAR, posisjoner_til_maske, maske_til_posisjoner, kan_spille,
+    normaliser_spilletid_df, pakk_perioder, pakk_ut_perioder,
+    komprimer_for_arkiv, pakk_ut_fra_arkiv, PERIODEBITS
+)
+
+class TestKompakt(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-15', '15-25', '25-35']
+        self.df = pd.DataFrame({
+            'Posisjoner': [['Keeper'], ['Back', 'Midtstopper'], ['Spiss']],
+            'Aktiv posisjon': ['Keeper', 'Back', 'Spiss'],
+            'Tilgjengelig': [True, True, False],
+            'Mål spilletid': [35, 35, 0],
+            '0-15': [True, True, False],
+            '15-25': [True, False, False],
+            '25-35': [False, True, False]
+        }, index=['Spiller1', 'Spiller2', 'Spiller3'])
+
+    def test_posisjonsmasker(self):
+        """Tester konvertering mellom posisjonslister og bitmasker"""
+        maske = posisjoner_til_maske(['Back', 'Midtstopper'])
+        self.assertEqual(maske, FORSVAR)
+        self.assertEqual(maske_til_posisjoner(maske), ['Back', 'Midtstopper'])
+        self.assertEqual(posisjoner_til_maske('Keeper'), POSISJON_BIT['Keeper'])
+        self.assertEqual(posisjoner_til_maske(maske), maske)
+        self.assertTrue(kan_spille(maske, 'Back'))
+        self.assertFalse(kan_spille(maske, 'Spiss'))
+        self.assertFalse(kan_spille(maske, 'Ukjent'))
+
+    def test_normaliser(self):
+        """Tester at spilletid_df får kompakte datatyper"""
+        df = normaliser_spilletid_df(self.df, self.perioder)
+        self.assertEqual(df['Posisjoner'].dtype, np.uint8)
+        self.assertIsInstance(df['Aktiv posisjon'].dtype, pd.CategoricalDtype)
+        self.assertEqual(df['Mål spilletid'].dtype, np.int16)
+        self.assertEqual(df.at['Spiller2', 'Posisjoner'], FORSVAR)
+        # Normalisering av en allerede normalisert frame endrer ingenting
+        pd.testing.assert_frame_equal(normaliser_spilletid_df(df, self.perioder), df)
+
+    def test_pakk_perioder(self):
+        """Tester pakking og utpakking av periodebiter"""
+        bits = pakk_perioder(self.df, self.perioder)
+        self.assertEqual(bits.tolist(), [3, 5, 0])
+        np.testing.assert_array_equal(
+            pakk_ut_perioder(bits, len(self.perioder)),
+            self.df[self.perioder].to_numpy()
+        )
+
+    def test_arkiv_rundtur(self):
+        """Tester at arkivformatet gjenoppretter den samme DataFrame"""
+        df = normaliser_spilletid_df(self.df, self.perioder)
+        arkiv = komprimer_for_arkiv(df, self.perioder)
+        self.assertIn(PERIODEBITS, arkiv.columns)
+        self.assertNotIn('0-15', arkiv.columns)
+        gjenopprettet = pakk_ut_fra_arkiv(
+            pd.DataFrame(**arkiv.to_dict('split')), self.perioder
+        )
+        pd.testing.assert_frame_equal(gjenopprettet, df)
+
+    def test_gammelt_arkivformat(self):
+        """Tester at arkiv uten periodebiter fortsatt kan lastes"""
+        df = pakk_ut_fra_arkiv(self.df, self.perioder)
+        self.assertEqual(df['Posisjoner'].dtype, np.uint8)
+        self.assertTrue(df.at['Spiller1', '0-15'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import unittest
+from lasttest import kjor_lasttest, formater_rapport
+
+class TestLasttest(unittest.TestCase):
+    def test_en_sesjon(self):
+        """Røyktest: én sesjon lagrer og laster i hver runde, og SQLite-kallene tas tid på"""
+        maalinger = kjor_lasttest(sesjoner=1, runder=2, prosesser=1)
+        self.assertEqual(maalinger.feil, [])
+        self.assertEqual(len(maalinger.latens['lagre']), 2)
+        self.assertEqual(len(maalinger.latens['last']), 2)
+        self.assertTrue(maalinger.db_tid['lagre_alt'])
+        for kall in ['connect', 'execute', 'commit']:
+            self.assertTrue(maalinger.sqlite_tid[kall])
+        self.assertEqual(len(maalinger.minne), 1)
+        self.assertIn('SQLite-kall', formater_rapport(maalinger, 1, 1.0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import unittest
+import os
+import tempfile
+import shutil
+import pandas as pd
+from kamparkiv import DeltKamparkiv, spilletid_df_til_arkiv
+from kompakt import komprimer_for_arkiv
+from lignende import Lignendeindeks, tilgjengelige_i_kamp, tilpass_kamp
+
+def lag_kamp(kamptid, perioder, paa_banen, tilgjengelige, antall_paa_banen=2):
+    """Lager en arkivert kamp. paa_banen er {spiller: [perioder]}."""
+    spillere = sorted(set(paa_banen) | set(tilgjengelige))
+    df = pd.DataFrame({
+        'Posisjoner': 0,
+        'Aktiv posisjon': 'Back',
+        'Tilgjengelig': [s in tilgjengelige for s in spillere],
+        'Total spilletid': 0,
+        'Differanse': 0,
+        'Mål spilletid': 0
+    }, index=spillere)
+    for periode in perioder:
+        df[periode] = [periode in paa_banen.get(s, []) for s in spillere]
+    return {
+        'kamptid': kamptid,
+        'perioder': perioder,
+        'antall_paa_banen': antall_paa_banen,
+        'spilletid_df': spilletid_df_til_arkiv(komprimer_for_arkiv(df, perioder))
+    }
+
+class TestLignende(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.arkiv = DeltKamparkiv(os.path.join(self.temp_dir, 'kamper.ndjson'))
+        perioder = ['0-10', '10-20']
+        self.arkiv.lagre('ABC', lag_kamp(20, perioder, {'A': perioder, 'B': ['0-10'], 'C': ['10-20']}, 'ABC'))
+        self.arkiv.lagre('ABD', lag_kamp(20, perioder, {'A': perioder, 'B': perioder}, 'ABD'))
+        self.arkiv.lagre('DEF', lag_kamp(20, perioder, {'D': perioder, 'E': perioder}, 'DEF'))
+        self.arkiv.lagre('ABC lang', lag_kamp(40, ['0-20', '20-40'], {'A': ['0-20', '20-40'], 'B': ['0-20']}, 'ABC'))
+        self.arkiv.lagre('ABC 3', lag_kamp(20, perioder, {'A': perioder}, 'ABC', antall_paa_banen=3))
+        self.indeks = Lignendeindeks()
+        self.assertTrue(self.indeks.synkroniser(self.arkiv))
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_nærmeste_først(self):
+        """Tester Jaccard-rangering med straff for ulik kamptid og filter på antall på banen"""
+        self.assertEqual(tilgjengelige_i_kamp(self.arkiv.hent('ABD')), ['A', 'B', 'D'])
+        treff = self.indeks.finn(['A', 'B', 'C'], 20, 2, k=3)
+        self.assertEqual([t['navn'] for t in treff], ['ABC', 'ABC lang', 'ABD'])
+        self.assertEqual(treff[0]['avstand'], 0)
+        self.assertAlmostEqual(treff[2]['jaccard'], 0.5)
+        self.assertEqual(self.indeks.finn(['A', 'B', 'C'], 20, 3, k=3)[0]['navn'], 'ABC 3')
+        self.assertEqual(self.indeks.finn(['X'], 20, 7), [])
+        self.assertFalse(self.indeks.synkroniser(self.arkiv))
+
+    def test_tilpass_til_nye_perioder(self):
+        """Tester at en lengre kamp skaleres til ny kamptid og at fraværende tas ut"""
+        tidslinje = tilpass_kamp(self.arkiv.hent('ABC lang'), 20, ['A', 'C'])
+        paa_banen = tidslinje.til_perioder(['0-5', '5-10', '10-15', '15-20'], ['A', 'B', 'C'])
+        self.assertTrue(paa_banen.loc['A'].all())
+        self.assertFalse(paa_banen.loc['B'].any())
+        self.assertFalse(paa_banen.loc['C'].any())
+        self.assertEqual(tidslinje.intervaller('A'), [(0, 20)])
+
+if __name__ == '__main__':
+    unittest.main()
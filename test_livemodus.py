@@ -0,0 +1,73 @@
+import unittest
+import pandas as pd
+from livemodus import LiveKamp, start_hendelse, bytte_hendelse, slutt_hendelse, hendelse_med_ider, hendelse_med_navn
+
+class TestLiveKamp(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-15', '15-25']
+        self.plan_df = pd.DataFrame({
+            '0-15': [True, True, False],
+            '15-25': [True, False, True]
+        }, index=['Spiller1', 'Spiller2', 'Spiller3'])
+        self.live = LiveKamp(self.plan_df, self.perioder, 25)
+
+    def test_start_fra_plan(self):
+        """Tester at planlagt startoppstilling hentes fra planen"""
+        self.assertEqual(self.live.planlagt_startoppstilling(), ['Spiller1', 'Spiller2'])
+        self.assertFalse(self.live.startet)
+
+    def test_plan_mot_faktisk(self):
+        """Tester sammenligning av planlagt og faktisk spilletid underveis"""
+        self.live.bruk(start_hendelse(0.0, ['Spiller1', 'Spiller2']))
+        self.live.bruk(bytte_hendelse(10.0, 'Spiller2', 'Spiller3'))
+
+        sammenligning = self.live.sammenligning(20)
+        self.assertEqual(sammenligning.at['Spiller1', 'Faktisk hittil'], 20.0)
+        self.assertEqual(sammenligning.at['Spiller2', 'Faktisk hittil'], 10.0)
+        self.assertEqual(sammenligning.at['Spiller2', 'Planlagt hittil'], 15)
+        self.assertEqual(sammenligning.at['Spiller2', 'Avvik'], -5.0)
+        self.assertEqual(sammenligning.at['Spiller3', 'Avvik'], 5.0)
+        self.assertTrue(sammenligning.at['Spiller3', 'På banen'])
+
+    def test_avslutt(self):
+        """Tester at spilletiden stopper når kampen avsluttes"""
+        self.live.bruk(start_hendelse(0.0, ['Spiller1', 'Spiller2']))
+        self.live.bruk(slutt_hendelse(25.0))
+        self.assertTrue(self.live.avsluttet)
+        self.assertEqual(self.live.faktiske_minutter_naa(40)['Spiller1'], 25.0)
+
+    def test_ugyldige_hendelser(self):
+        """Tester at ugyldige bytter og hendelser i feil rekkefølge avvises"""
+        self.live.bruk(start_hendelse(0.0, ['Spiller1', 'Spiller2']))
+        with self.assertRaises(ValueError):
+            self.live.bruk(bytte_hendelse(5.0, 'Spiller3', 'Spiller1'))
+        with self.assertRaises(ValueError):
+            self.live.bruk(bytte_hendelse(5.0, 'Spiller1', 'Spiller2'))
+        self.live.bruk(bytte_hendelse(10.0, 'Spiller2', 'Spiller3'))
+        with self.assertRaises(ValueError):
+            self.live.bruk(bytte_hendelse(5.0, 'Spiller3', 'Spiller2'))
+        # Sjekken endrer ikke tilstanden
+        with self.assertRaises(ValueError):
+            self.live.sjekk(bytte_hendelse(12.0, 'Spiller2', 'Spiller1'))
+        self.live.sjekk(bytte_hendelse(12.0, 'Spiller3', 'Spiller2'))
+        self.assertEqual((self.live.sist_minutt, self.live.paa_banen), (10.0, {'Spiller1', 'Spiller3'}))
+
+    def test_hendelser_med_ider(self):
+        """Tester at hendelsene lagres med spiller-id-er og spilles av med gjeldende navn"""
+        id_for = {'Spiller1': 1, 'Spiller2': 2, 'Spiller3': 3}
+        start = hendelse_med_ider(start_hendelse(0.0, ['Spiller2', 'Spiller1']), id_for)
+        bytte = hendelse_med_ider(bytte_hendelse(10.0, 'Spiller2', 'Spiller3'), id_for)
+        self.assertEqual((start['data'], bytte['ut'], bytte['inn']), ([1, 2], 2, 3))
+
+        # SQLite gir id-ene tilbake som tekst; Spiller3 har fått nytt navn
+        navn_for = {1: 'Spiller1', 2: 'Spiller2', 3: 'Tredje'}.get
+        lagret = dict(bytte, ut='2', inn='3')
+        self.assertEqual(hendelse_med_navn(lagret, navn_for)['inn'], 'Tredje')
+        self.assertEqual(hendelse_med_navn(start, navn_for)['data'], ['Spiller1', 'Spiller2'])
+        # Eldre hendelser med navn brukes som de er
+        eldre = bytte_hendelse(10.0, 'Spiller2', 'Spiller3')
+        self.assertEqual(hendelse_med_navn(eldre, navn_for), eldre)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+import pandas as pd
+from kampplan import generer_detaljert_kampoppsett, generer_kamprapport
+from posisjoner import Posisjonsoverstyringer
+
+class TestPosisjoner(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-15', '15-25']
+        self.df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Back', 'Spiss'],
+            'Tilgjengelig': [True, True, True],
+            '0-15': [True, True, True],
+            '15-25': [True, True, True]
+        }, index=['Spiller1', 'Spiller2', 'Spiller3'])
+
+    def test_sett_og_lagringsformat(self):
+        """Tester at bare avvik fra aktiv posisjon lagres, og at listeformatet går begge veier"""
+        overstyringer = Posisjonsoverstyringer()
+        overstyringer.sett('Spiller2', '15-25', 'Midtstopper', 'Back')
+        overstyringer.sett('Spiller3', '0-15', 'Spiss', 'Spiss')
+        self.assertEqual(overstyringer, {('Spiller2', '15-25'): 'Midtstopper'})
+        self.assertEqual(overstyringer.hent('Spiller2', '0-15', 'Back'), 'Back')
+
+        overstyringer.sett('Spiller2', '15-25', 'Back', 'Back')
+        self.assertEqual(overstyringer, {})
+
+        overstyringer.sett('Spiller3', '0-15', 'Ving', 'Spiss')
+        overstyringer.sett('Spiller3', '25-35', 'Ving', 'Spiss')
+        liste = overstyringer.til_liste()
+        self.assertEqual(liste, [['Spiller3', '0-15', 'Ving'], ['Spiller3', '25-35', 'Ving']])
+        self.assertEqual(Posisjonsoverstyringer.fra_liste(liste), overstyringer)
+        self.assertEqual(overstyringer.behold(perioder=self.perioder), {('Spiller3', '0-15'): 'Ving'})
+
+    def test_fra_kolonner_og_rapporter(self):
+        """Tester migrering av posisjonskolonner og at rapportene bruker posisjonen i perioden"""
+        gammel = self.df.copy()
+        gammel['posisjon_15-25'] = ['Keeper', 'Spiss', 'Spiss']
+        df, overstyringer = Posisjonsoverstyringer.fra_kolonner(gammel)
+        self.assertNotIn('posisjon_15-25', df.columns)
+        self.assertEqual(overstyringer, {('Spiller2', '15-25'): 'Spiss'})
+
+        oppsett = generer_detaljert_kampoppsett(df, self.perioder, overstyringer)
+        self.assertEqual(list(oppsett['Formasjon']), ['1-0-1', '0-0-2'])
+        self.assertEqual(oppsett.at[1, 'Angrep'], 'Spiller2, Spiller3')
+        rapport = generer_kamprapport(df, self.perioder, overstyringer)
+        self.assertIn('- Spiller2 (Back)', rapport)
+        self.assertIn('- Spiller2 (Spiss)', rapport)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+import os
+import tempfile
+import shutil
+import pstats
+from profilering import antall_kjoringer, profiler
+
+def tung_funksjon():
+    return sum(i * i for i in range(20000))
+
+class TestProfilering(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_antall_kjoringer(self):
+        """Tester tolking av spørreparameter og miljøvariabel"""
+        self.assertEqual(antall_kjoringer(None), 0)
+        self.assertEqual(antall_kjoringer(''), 1)
+        self.assertEqual(antall_kjoringer('true'), 1)
+        self.assertEqual(antall_kjoringer('3'), 3)
+        self.assertEqual(antall_kjoringer('0'), 0)
+        self.assertEqual(antall_kjoringer('tull'), 0)
+
+    def test_profiler_skriver_fil_og_toppliste(self):
+        """Tester at profilen lagres med sesjons-id og gir topp 20 sortert på kumulativ tid"""
+        sti, topp = profiler(tung_funksjon, self.temp_dir, 'abcdef1234567890')
+        self.assertTrue(os.path.basename(sti).endswith('_abcdef12.prof'))
+        self.assertGreater(len(pstats.Stats(sti).stats), 0)
+        self.assertLessEqual(len(topp), 20)
+        self.assertTrue(topp['Kumulativ tid (ms)'].is_monotonic_decreasing)
+        self.assertTrue(any('tung_funksjon' in f for f in topp['Funksjon']))
+
+    def test_profiler_ved_unntak(self):
+        """Tester at profilen lagres også når kjøringen avbrytes"""
+        resultater = []
+        def avbryt():
+            raise RuntimeError("rerun")
+        with self.assertRaises(RuntimeError):
+            profiler(avbryt, self.temp_dir, ved_ferdig=lambda sti, topp: resultater.append(sti))
+        self.assertEqual(len(resultater), 1)
+        self.assertTrue(os.path.exists(resultater[0]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import threading
+import pandas as pd
+from kampplan import generer_kamprapport
+from rapportjobber import Rapportjobber, jobbnokkel
+
+class TestRapportjobber(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.jobber = Rapportjobber(maks_resultater=2)
+        self.df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Back'],
+            'Tilgjengelig': [True, True],
+            '0-15': [True, False],
+            '15-25': [True, True]
+        }, index=['Spiller1', 'Spiller2'])
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        self.jobber._executor.shutdown(wait=True)
+
+    def test_fremdrift_og_cache(self):
+        """Tester fremdrift mens jobben kjører, og at samme inndata gir samme jobb"""
+        fortsett = threading.Event()
+        halvveis = threading.Event()
+
+        def jobb(tekst, fremdrift):
+            fremdrift(0.5)
+            halvveis.set()
+            fortsett.wait(5)
+            return tekst.upper()
+
+        jobb_id = self.jobber.send_inn('test', 'a', jobb, 'rapport')
+        self.assertTrue(halvveis.wait(5))
+        status = self.jobber.hent(jobb_id)
+        self.assertFalse(status.ferdig)
+        self.assertEqual(status.andel, 0.5)
+        self.assertEqual(self.jobber.send_inn('test', 'a', jobb, 'rapport'), jobb_id)
+
+        fortsett.set()
+        status = self.jobber.vent(jobb_id, timeout=5)
+        self.assertTrue(status.ferdig)
+        self.assertEqual((status.resultat, status.andel), ('RAPPORT', 1.0))
+
+        # Nye nøkler skyver ut de eldste ferdige jobbene
+        for nokkel in 'bc':
+            self.jobber.vent(self.jobber.send_inn('test', nokkel, jobb, nokkel), timeout=5)
+        self.assertIsNone(self.jobber.hent(jobb_id))
+
+    def test_kamprapport_og_feil(self):
+        """Tester kamprapport som jobb, nøkler fra inndata og at en feilet jobb kan startes på nytt"""
+        andeler = []
+        nokkel = jobbnokkel('kamprapport', self.df, ['0-15', '15-25'], [])
+        jobb_id = self.jobber.send_inn(
+            'kamprapport', nokkel,
+            lambda *args, fremdrift: generer_kamprapport(*args, fremdrift=lambda a: (andeler.append(a), fremdrift(a))),
+            self.df, ['0-15', '15-25']
+        )
+        status = self.jobber.vent(jobb_id, timeout=5)
+        self.assertIn('Periode 15-25', status.resultat)
+        self.assertEqual(andeler, [0.5, 1.0])
+
+        endret = self.df.copy()
+        endret.loc['Spiller2', '0-15'] = True
+        self.assertNotEqual(jobbnokkel('kamprapport', endret, ['0-15', '15-25'], []), nokkel)
+        self.assertEqual(jobbnokkel('kamprapport', self.df.copy(), ['0-15', '15-25'], []), nokkel)
+
+        def feiler(fremdrift):
+            raise ValueError("Ingen perioder")
+        feilet = self.jobber.vent(self.jobber.send_inn('test', 'feil', feiler), timeout=5)
+        self.assertEqual(feilet.feil, "Ingen perioder")
+        ny_id = self.jobber.send_inn('test', 'feil', feiler)
+        self.assertNotEqual(ny_id, feilet.id)
+        # Den feilede jobben glemmes når nøkkelen får en ny
+        self.assertIsNone(self.jobber.hent(feilet.id))
+        self.jobber.vent(ny_id, timeout=5)
+        self.assertEqual(len(self.jobber._jobber), len(self.jobber._nokler))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import os
+import tempfile
+import shutil
+import pandas as pd
+from kamparkiv import DeltKamparkiv, spilletid_df_til_arkiv
+from kompakt import komprimer_for_arkiv, posisjoner_til_maske
+from sesonganalyse import Sesonganalyse, rader_for_kamp, sesong_for_dato
+from tropp import Tropp
+
+PERIODER = ['0-15', '15-25']
+
+class TestSesonganalyse(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.arkiv = DeltKamparkiv(os.path.join(self.temp_dir, 'kamper.ndjson'))
+        self.arkiv.lagre('Seriekamp 1', self.lag_kamp('Brodd', '2024-09-01', {
+            'Susanne': ('Keeper', PERIODER), 'Tuva': ('Back', ['0-15']), 'Adele': ('Spiss', ['15-25'])
+        }, posisjon_15_25={'Tuva': 'Spiss'}))
+        self.arkiv.lagre('Seriekamp 2', self.lag_kamp('Viking', '2025-04-12', {
+            'Susanne': ('Keeper', PERIODER), 'Tuva': ('Back', PERIODER)
+        }))
+        self.sti = os.path.join(self.temp_dir, 'sesonganalyse')
+        self.tropp = Tropp(os.path.join(self.temp_dir, 'tropp.db'))
+        self.analyse = Sesonganalyse(self.sti, self.tropp)
+        self.assertEqual(self.analyse.synkroniser(self.arkiv), 2)
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def lag_kamp(self, motstander, dato, paa_banen, posisjon_15_25=None):
+        """
+        Lager en arkivert kamp. paa_banen er {spiller: (aktiv posisjon, [perioder])},
+        og posisjon_15_25 gir eldre posisjon_<periode>-kolonner for 15-25.
+        """
+        df = pd.DataFrame({
+            'Posisjoner': [posisjoner_til_maske(posisjon) for posisjon, _ in paa_banen.values()],
+            'Aktiv posisjon': [posisjon for posisjon, _ in paa_banen.values()],
+            'Tilgjengelig': True,
+            'Mål spilletid': 0
+        }, index=list(paa_banen))
+        for periode in PERIODER:
+            df[periode] = [periode in perioder for _, perioder in paa_banen.values()]
+        if posisjon_15_25:
+            df['posisjon_15-25'] = [posisjon_15_25.get(s, p) for s, (p, _) in paa_banen.items()]
+        return {
+            'motstander': motstander,
+            'dato': dato,
+            'kamptid': 25,
+            'perioder': PERIODER,
+            'spilletid_df': spilletid_df_til_arkiv(komprimer_for_arkiv(df, PERIODER))
+        }
+
+    def test_rader_for_kamp(self):
+        """Tester utflating til én rad per tilgjengelig spiller og periode"""
+        kamp = dict(self.arkiv.hent('Seriekamp 2'), posisjoner=[['Tuva', '15-25', 'Spiss']])
+        rader = rader_for_kamp('Seriekamp 2', kamp, self.tropp)
+        self.assertEqual(self.tropp.navn_for(rader['spiller_id']), ['Susanne', 'Susanne', 'Tuva', 'Tuva'])
+        self.assertEqual(rader['minutter'], [15, 10, 15, 10])
+        self.assertEqual(rader['posisjon'], ['Keeper', 'Keeper', 'Back', 'Spiss'])
+        self.assertEqual(sesong_for_dato('2025-04-12'), '2025')
+        self.assertEqual(sesong_for_dato(None), 'ukjent')
+
+    def test_rader_fra_tidslinje(self):
+        """Tester at minuttene tas fra tidslinjen når kampen har en, også for bytter midt i en periode"""
+        kamp = dict(self.arkiv.hent('Seriekamp 2'), tidslinje={
+            'kamptid': 25, 'intervaller': {'Susanne': [[0, 25]], 'Tuva': [[0, 20]]}
+        })
+        rader = rader_for_kamp('Seriekamp 2', kamp, self.tropp)
+        self.assertEqual(rader['minutter'], [15, 10, 15, 5])
+        self.assertEqual(rader['paa_banen'], [True, True, True, True])
+
+    def test_sammendrag(self):
+        """Tester minutter per posisjon, benkfrekvens og filtrering på sesong"""
+        minutter = self.analyse.minutter_per_posisjon()
+        self.assertEqual(minutter.at['Tuva', 'Back'], 40)
+        self.assertEqual(minutter.at['Susanne', 'Keeper'], 50)
+        self.assertEqual(self.analyse.minutter_per_posisjon('2024').at['Tuva', 'Back'], 15)
+
+        benk = self.analyse.benkfrekvens('2024')
+        self.assertEqual(benk.at['Adele', 'På benken'], 1)
+        self.assertEqual(benk.at['Susanne', 'Andel benk'], 0)
+        self.assertEqual(self.analyse.benkfrekvens().at['Tuva', 'Kamper'], 2)
+
+    def test_inkrementell_eksport(self):
+        """Tester at nye kamper legges til og at en endret kamp flyttes til ny sesong"""
+        self.assertEqual(self.analyse.synkroniser(self.arkiv), 0)
+        self.arkiv.lagre('Seriekamp 3', self.lag_kamp('Bryne', '2025-05-01', {'Adele': ('Keeper', PERIODER)}))
+        self.assertEqual(self.analyse.synkroniser(self.arkiv), 1)
+        self.assertEqual(len(os.listdir(os.path.join(self.sti, 'sesong=2025'))), 2)
+
+        self.arkiv.lagre('Seriekamp 1', self.lag_kamp('Brodd', '2025-09-01', {'Susanne': ('Keeper', PERIODER)}))
+        self.assertEqual(self.analyse.synkroniser(self.arkiv), 1)
+        self.assertEqual(self.analyse.sesonger(), ['2025'])
+        self.assertFalse(os.path.exists(os.path.join(self.sti, 'sesong=2024')))
+        self.assertEqual(self.analyse.minutter_per_sesong().at['Susanne', '2025'], 50)
+
+        # En ny instans leser hva som er eksportert fra manifestet
+        ny = Sesonganalyse(self.sti, self.tropp)
+        self.assertEqual(ny.synkroniser(self.arkiv), 0)
+        self.assertEqual(ny.tabell().num_rows, self.analyse.tabell().num_rows)
+
+    def test_sammenslaaing(self):
+        """Tester at en sesong med for mange filer slås sammen til én uten å miste rader"""
+        self.analyse.maks_deler = 3
+        for i in range(3):
+            self.arkiv.lagre(f'Treningskamp {i}', self.lag_kamp('Sola', f'2025-06-0{i + 1}', {'Tuva': ('Back', PERIODER)}))
+            self.analyse.eksporter(f'Treningskamp {i}', self.arkiv.hent(f'Treningskamp {i}'))
+        mappe = os.path.join(self.sti, 'sesong=2025')
+        self.assertEqual(len(os.listdir(mappe)), 1)
+        self.assertEqual(self.analyse.minutter_per_posisjon('2025').at['Tuva', 'Back'], 25 + 3 * 25)
+        self.assertEqual(Sesonganalyse(self.sti, self.tropp).synkroniser(self.arkiv), 0)
+
+if __name__ == '__main__':
+    unittest.main()
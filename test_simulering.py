@@ -0,0 +1,90 @@
+import unittest
+import numpy as np
+import pandas as pd
+from kampplan import beregn_mal_spilletid
+from kompakt import posisjoner_til_maske
+from simulering import (
+    standard_formasjon, lag_oppsett, mangler_grupper, simuler_bunke, simuler_tilgjengelighet
+)
+
+class TestSimulering(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        posisjoner = ['Keeper', 'Back', 'Back', 'Midtstopper', 'Sentral midtbane', 'Ving', 'Spiss', 'Spiss']
+        self.df = pd.DataFrame({
+            'Posisjoner': [posisjoner_til_maske(p) for p in posisjoner],
+            'Aktiv posisjon': posisjoner,
+            'Tilgjengelig': True,
+        }, index=[f'Spiller{i}' for i in range(len(posisjoner))])
+        self.perioder = ['0-15', '15-25', '25-35', '35-40']
+        for periode in self.perioder:
+            self.df[periode] = False
+        self.df.loc[['Spiller0', 'Spiller1', 'Spiller3', 'Spiller4', 'Spiller6'], '0-15'] = True
+
+    def test_mal_og_formasjon(self):
+        """Tester mål spilletid per scenario og formasjon fra oppstillingen"""
+        self.assertEqual(beregn_mal_spilletid(40, 5, 8), 25)
+        np.testing.assert_array_equal(beregn_mal_spilletid(40, 5, np.array([8, 5, 0])), [25, 40, 0])
+        self.assertEqual(
+            standard_formasjon(self.df, self.perioder, 5),
+            {'Keeper': 1, 'Forsvar': 2, 'Midtbane': 1, 'Angrep': 1}
+        )
+
+    def test_mangler_grupper(self):
+        """Tester at formasjonen kan være umulig selv om hver gruppe har nok spillere alene"""
+        dekker = np.array([[True, True], [True, True], [False, True]])
+        behov = np.array([2, 2])
+        tilgjengelig = np.array([[True, True, True], [True, False, True]])
+        mangler, umulig = mangler_grupper(tilgjengelig, dekker, behov)
+        np.testing.assert_array_equal(mangler, [[False, False], [True, False]])
+        np.testing.assert_array_equal(umulig, [True, True])
+
+    def test_simuler_bunke_gir_gyldig_spilletid(self):
+        """Tester at fraværende ikke spiller og at all spilletid fordeles når det er nok spillere"""
+        oppsett = lag_oppsett(self.df, self.perioder, 40, 5)
+        tilgjengelig = np.ones((3, 8), dtype=bool)
+        tilgjengelig[1, [2, 5]] = False
+        tilgjengelig[2, 0] = False
+        resultat = simuler_bunke(oppsett, tilgjengelig, np.random.default_rng(0))
+        minutter = resultat['minutter']
+        self.assertTrue((minutter[~tilgjengelig] == 0).all())
+        np.testing.assert_array_equal(minutter[:2].sum(axis=1), [200, 200])
+        self.assertEqual(minutter[0, 0], 40)  # Fast keeper står hele kampen
+        self.assertEqual(minutter[2].sum(), 160)  # Ingen keeper tilgjengelig
+        np.testing.assert_array_equal(resultat['mal'], [25, 33, 29])
+
+    def test_simuler_bunke_folger_formasjonen(self):
+        """Tester at utespillerne fyller formasjonen i stedet for bare å velges etter underskudd"""
+        posisjoner = ['Keeper', 'Back', 'Back'] + ['Spiss'] * 5
+        df = pd.DataFrame({
+            'Posisjoner': [posisjoner_til_maske(p) for p in posisjoner],
+            'Aktiv posisjon': posisjoner,
+        }, index=[f'Spiller{i}' for i in range(len(posisjoner))])
+        for periode in self.perioder:
+            df[periode] = False
+        oppsett = lag_oppsett(df, self.perioder, 40, 4, {'Keeper': 1, 'Forsvar': 2, 'Angrep': 1})
+        minutter = simuler_bunke(oppsett, np.ones((20, 8), dtype=bool), np.random.default_rng(0))['minutter']
+        # Backene er over mål spilletid, men formasjonen trenger to forsvarere i hver periode
+        self.assertTrue((minutter[:, 1:3] == 40).all())
+        np.testing.assert_array_equal(minutter[:, 3:].sum(axis=1), 40)
+
+        # Finnes det ikke nok spillere innenfor grensene, fylles banen likevel
+        tilgjengelig = np.ones((1, 8), dtype=bool)
+        tilgjengelig[0, 2] = False
+        minutter = simuler_bunke(oppsett, tilgjengelig, np.random.default_rng(0))['minutter']
+        self.assertEqual(minutter.sum(), 160)
+
+    def test_simulering_uavhengig_av_prosesser(self):
+        """Tester at resultatet bare avhenger av frøet, ikke av antall prosesser"""
+        fravaer = {'Spiller0': 0.5}
+        serielt = simuler_tilgjengelighet(self.df, self.perioder, 40, 5, fravaer, scenarier=900,
+                                          per_bunke=200, arbeidere=0)
+        parallelt = simuler_tilgjengelighet(self.df, self.perioder, 40, 5, fravaer, scenarier=900,
+                                            per_bunke=200, arbeidere=2)
+        pd.testing.assert_frame_equal(serielt['minutter'], parallelt['minutter'])
+        self.assertEqual(serielt['scenarier'], 900)
+        self.assertAlmostEqual(serielt['mangel']['Keeper'], 0.5, delta=0.08)
+        self.assertEqual(serielt['minutter'].at['Spiller1', 'Fravær'], 0.1)
+
+if __name__ == '__main__':
+    unittest.main()
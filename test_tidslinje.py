@@ -0,0 +1,100 @@
+import unittest
+import pandas as pd
+from kampplan import generer_kamprapport, kalkuler_spilletid
+from tidslinje import Tidslinje
+
+class TestTidslinje(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-15', '15-25', '25-35']
+        self.df = pd.DataFrame({
+            '0-15': [True, True, False],
+            '15-25': [True, False, True],
+            '25-35': [True, True, False]
+        }, index=['Spiller1', 'Spiller2', 'Spiller3'])
+        self.tidslinje = Tidslinje.fra_perioder(self.df, self.perioder)
+
+    def test_fra_perioder(self):
+        """Tester at sammenhengende perioder blir ett intervall"""
+        self.assertEqual(self.tidslinje.kamptid, 35)
+        self.assertEqual(self.tidslinje.intervaller('Spiller1'), [(0, 35)])
+        self.assertEqual(self.tidslinje.intervaller('Spiller2'), [(0, 15), (25, 35)])
+
+    def test_paa_banen(self):
+        """Tester hvem som er på banen i et gitt minutt"""
+        self.assertEqual(self.tidslinje.paa_banen(0), {'Spiller1', 'Spiller2'})
+        self.assertEqual(self.tidslinje.paa_banen(15), {'Spiller1', 'Spiller3'})
+        self.assertEqual(self.tidslinje.paa_banen(24), {'Spiller1', 'Spiller3'})
+        self.assertEqual(self.tidslinje.paa_banen(35), set())
+
+    def test_minutter(self):
+        """Tester minutter per spiller totalt og i et vindu"""
+        self.assertEqual(self.tidslinje.minutter_per_spiller(), {'Spiller1': 35, 'Spiller2': 25, 'Spiller3': 10})
+        self.assertEqual(self.tidslinje.minutter('Spiller2', 10, 30), 10)
+        self.assertEqual(self.tidslinje.minutter('Spiller2', 15, 25), 0)
+        self.assertEqual(self.tidslinje.minutter('Ukjent'), 0)
+
+    def test_bytte_paa_minutt(self):
+        """Tester bytte på et vilkårlig minutt"""
+        self.tidslinje.bytt(20, 'Spiller3', 'Spiller2')
+        self.assertEqual(self.tidslinje.intervaller('Spiller2'), [(0, 15), (20, 35)])
+        self.assertEqual(self.tidslinje.intervaller('Spiller3'), [(15, 20)])
+        self.assertEqual(self.tidslinje.minutter('Spiller3'), 5)
+        self.assertEqual(self.tidslinje.bytter_i_vindu(15, 21), [(15, 'Spiller3'), (20, 'Spiller2')])
+        self.assertEqual(self.tidslinje.bytter_i_vindu(21, 35), [])
+        with self.assertRaises(ValueError):
+            self.tidslinje.bytt(20, 'Spiller3', 'Spiller1')
+
+    def test_til_perioder(self):
+        """Tester konvertering tilbake til periodekolonner"""
+        pd.testing.assert_frame_equal(self.tidslinje.til_perioder(self.perioder, self.df.index.tolist()), self.df)
+        self.tidslinje.bytt(20, 'Spiller3', 'Spiller2')
+        perioder = self.tidslinje.til_perioder(self.perioder, self.df.index.tolist())
+        # Spiller3 er på banen ved start av 15-25 og regnes med der
+        self.assertTrue(perioder.at['Spiller3', '15-25'])
+        self.assertEqual(perioder.sum().tolist(), [2, 2, 2])
+
+    def test_dict_rundtur(self):
+        """Tester lagring og gjenoppretting som dict"""
+        self.tidslinje.bytt(20, 'Spiller3', 'Spiller2')
+        kopi = Tidslinje.fra_dict(self.tidslinje.til_dict())
+        self.assertEqual(kopi.minutter_per_spiller(), self.tidslinje.minutter_per_spiller())
+
+    def test_endring_i_rutenettet_beholder_bytter(self):
+        """Tester at en endret celle skrives inn i tidslinjen uten å fjerne bytter midt i andre perioder"""
+        self.tidslinje.bytt(20, 'Spiller3', 'Spiller2')
+        df = self.tidslinje.til_perioder(self.perioder, self.df.index.tolist())
+        df.at['Spiller1', '25-35'] = False
+        self.assertEqual(self.tidslinje.oppdater_fra_perioder(df, self.perioder), 1)
+        self.assertEqual(self.tidslinje.intervaller('Spiller1'), [(0, 25)])
+        self.assertEqual(self.tidslinje.intervaller('Spiller2'), [(0, 15), (20, 35)])
+        self.assertEqual(self.tidslinje.oppdater_fra_perioder(df, self.perioder), 0)
+
+        df.at['Spiller1', '25-35'] = True
+        self.tidslinje.oppdater_fra_perioder(df, self.perioder)
+        self.assertEqual(self.tidslinje.intervaller('Spiller1'), [(0, 35)])
+        self.assertEqual(self.tidslinje.intervaller('Spiller3'), [(15, 20)])
+
+    def test_minutter_per_periode_og_endringer(self):
+        """Tester minutter per periode og byttene midt i en periode"""
+        self.tidslinje.bytt(20, 'Spiller3', 'Spiller2')
+        minutter = self.tidslinje.minutter_per_periode(self.perioder, ['Spiller2', 'Spiller3', 'Ukjent'])
+        self.assertEqual(minutter.tolist(), [[15, 5, 10], [0, 5, 0], [0, 0, 0]])
+        self.assertEqual(self.tidslinje.endringer_i_vindu(15, 25), [(20, ['Spiller3'], ['Spiller2'])])
+        self.assertEqual(self.tidslinje.endringer_i_vindu(0, 15), [])
+
+    def test_spilletid_og_rapport_fra_tidslinje(self):
+        """Tester at total spilletid og kamprapporten tar med bytter midt i en periode"""
+        self.tidslinje.bytt(20, 'Spiller3', 'Spiller2')
+        df = self.tidslinje.til_perioder(self.perioder, self.df.index.tolist())
+        df['Mål spilletid'] = 20
+        df['Tilgjengelig'] = True
+        df['Aktiv posisjon'] = 'Back'
+        df = kalkuler_spilletid(df, self.perioder, self.tidslinje)
+        self.assertEqual(df['Total spilletid'].tolist(), [35, 30, 5])
+        self.assertEqual(kalkuler_spilletid(df, self.perioder)['Total spilletid'].tolist(), [35, 25, 10])
+        rapport = generer_kamprapport(df, self.perioder, tidslinje=self.tidslinje)
+        self.assertIn("Bytter underveis:\n- 20 min: Spiller3 ut, Spiller2 inn", rapport)
+
+if __name__ == '__main__':
+    unittest.main()
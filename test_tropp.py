@@ -0,0 +1,63 @@
+import unittest
+import os
+import tempfile
+import shutil
+import pandas as pd
+from tropp import Tropp, kamp_med_ider, kamp_med_navn
+
+class TestTropp(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.tropp = Tropp(os.path.join(self.temp_dir, 'tropp.db'), {'Susanne': 'Keeper', 'Tuva': 'Back'})
+
+    def tearDown(self):
+        """Rydd opp etter testene"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_ider_og_nytt_navn(self):
+        """Tester registrering av ukjente spillere, navneoppslag og nytt navn"""
+        ider = self.tropp.ider_for(['Tuva', 'Adele', 'Susanne'])
+        self.assertEqual(len(set(ider)), 3)
+        self.assertEqual(self.tropp.navn_for(ider), ['Tuva', 'Adele', 'Susanne'])
+        # Spillere som registreres fra en kamp, er ikke i troppen
+        self.assertEqual(self.tropp.spilletid_df(['0-15']).index.tolist(), ['Susanne', 'Tuva'])
+
+        self.tropp.gi_nytt_navn(ider[0], 'Tuva H.')
+        self.assertEqual(self.tropp.navn_for_id(ider[0]), 'Tuva H.')
+        self.assertEqual(self.tropp.ider_for(['Tuva H.'])[0], ider[0])
+        with self.assertRaises(ValueError):
+            self.tropp.gi_nytt_navn(ider[0], 'Susanne')
+        self.assertEqual(self.tropp.navn_for([999]), ['Spiller 999'])
+
+        # En annen instans ser endringene
+        ny = Tropp(os.path.join(self.temp_dir, 'tropp.db'))
+        self.assertEqual(ny.navn_for(ider), ['Tuva H.', 'Adele', 'Susanne'])
+
+    def test_kamp_med_ider_og_navn(self):
+        """Tester at en kamp arkiveres med id-er og vises med gjeldende navn"""
+        df = pd.DataFrame({'Aktiv posisjon': ['Keeper', 'Spiss'], '0-15': [True, True]}, index=['Susanne', 'Adele'])
+        kamp = {
+            'motstander': 'Brodd',
+            'spilletid_df': df.to_dict(orient='split'),
+            'tidslinje': {'kamptid': 15, 'intervaller': {'Susanne': [[0, 15]], 'Adele': [[0, 15]]}},
+            'posisjoner': [['Adele', '0-15', 'Ving']]
+        }
+        arkivert = kamp_med_ider(kamp, self.tropp)
+        ider = arkivert['spilletid_df']['index']
+        self.assertEqual(self.tropp.navn_for(ider), ['Susanne', 'Adele'])
+        self.assertEqual(set(arkivert['tidslinje']['intervaller']), {str(i) for i in ider})
+        self.assertEqual(arkivert['posisjoner'], [[ider[1], '0-15', 'Ving']])
+        self.assertIs(kamp_med_ider(arkivert, self.tropp), arkivert)
+
+        self.tropp.gi_nytt_navn(ider[1], 'Adele S.')
+        vist = kamp_med_navn(arkivert, self.tropp)
+        self.assertEqual(vist['spilletid_df']['index'], ['Susanne', 'Adele S.'])
+        self.assertEqual(set(vist['tidslinje']['intervaller']), {'Susanne', 'Adele S.'})
+        self.assertEqual(vist['posisjoner'], [['Adele S.', '0-15', 'Ving']])
+
+        # Eldre kamper med navn i index vises som de er
+        self.assertIs(kamp_med_navn(kamp, self.tropp), kamp)
+
+if __name__ == '__main__':
+    unittest.main()
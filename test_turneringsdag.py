@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+import pandas as pd
+from turneringsdag import Turneringsdag, planlegg_turneringsdag, turneringsperioder, eksporter_turneringsdag
+from validering import valider_plan
+
+class TestTurneringsdag(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        spillere = ['Keeper1', 'Keeper2'] + [f'Spiller{i}' for i in range(1, 9)]
+        self.df = pd.DataFrame({
+            'Posisjoner': [['Keeper'], ['Keeper', 'Back']] + [['Back', 'Spiss']] * 8,
+            'Aktiv posisjon': ['Keeper', 'Keeper'] + ['Back', 'Spiss'] * 4,
+            'Tilgjengelig': True
+        }, index=spillere)
+        self.df.loc['Spiller8', 'Tilgjengelig'] = False
+        self.kamper = [
+            {'start': 0, 'kamptid': 20, 'antall_paa_banen': 5},
+            {'start': 40, 'kamptid': 20, 'antall_paa_banen': 5},
+            {'start': 80, 'kamptid': 20, 'antall_paa_banen': 5}
+        ]
+
+    def test_turneringsperioder(self):
+        """Tester at korte kamper deles i perioder på 5 minutter"""
+        self.assertEqual(turneringsperioder(20), ['0-5', '5-10', '10-15', '15-20'])
+        self.assertEqual(turneringsperioder(40), ['0-15', '15-20', '20-30', '30-40'])
+
+    def test_brudd(self):
+        """Tester telling av brudd på sammenhengende spilletid og hvile"""
+        dag = Turneringsdag(self.df, self.kamper[:2], maks_sammenhengende=10, min_hvile=25)
+        paa_banen = np.zeros((len(self.df), dag.antall_perioder), dtype=bool)
+        paa_banen[0, :] = True  # Keeper1 spiller alt
+        brudd = dag.brudd(paa_banen, np.zeros(dag.antall_perioder, dtype=int))
+        self.assertEqual(brudd['sammenhengende'], 4)  # 15 og 20 minutter i strekk i begge kamper
+        self.assertEqual(brudd['hvile'], 1)           # 20 minutter pause før kamp 2
+        self.assertEqual(brudd['antall_paa_banen'], 8)
+        self.assertEqual(brudd['keeper'], 0)
+
+    def test_planlegg_turneringsdag(self):
+        """Tester at planen overholder reglene og balanserer minuttene"""
+        resultat = planlegg_turneringsdag(
+            self.df, self.kamper, maks_sammenhengende=10, min_hvile=20,
+            tidsbudsjett=1.0, kandidater=4, arbeidere=2
+        )
+        self.assertEqual(sum(resultat['brudd'].values()), 0)
+        self.assertEqual(len(resultat['kamper']), 3)
+
+        minutter = resultat['minutter']
+        self.assertEqual(minutter['Spiller8'], 0)
+        tilgjengelige = minutter.drop('Spiller8')
+        self.assertEqual(tilgjengelige.sum(), 3 * 20 * 5)
+        self.assertLessEqual(tilgjengelige.max() - tilgjengelige.min(), 10)
+
+        for kamp in resultat['kamper']:
+            brudd = valider_plan(kamp['spilletid_df'], kamp['perioder'], 5, kamp['kamptid'], kamp['posisjoner'])
+            self.assertEqual(brudd, [])
+
+        andeler = []
+        eksport = eksporter_turneringsdag(resultat['kamper'], fremdrift=andeler.append)
+        self.assertEqual(eksport['rapport'].count('Periode 15-20'), 3)
+        self.assertEqual(eksport['csv'].count('\n'), 1 + 3 * 4)
+        self.assertEqual(andeler[-1], 1.0)
+        self.assertEqual(andeler, sorted(andeler))
+
+if __name__ == '__main__':
+    unittest.main()
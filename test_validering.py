@@ -0,0 +1,84 @@
+import unittest
+import pandas as pd
+from posisjoner import Posisjonsoverstyringer
+from validering import (
+    valider_plan, valider_endring, get_max_spillere_per_posisjon,
+    REGEL_ANTALL, REGEL_KEEPER, REGEL_POSISJON, REGEL_TILGJENGELIG, REGEL_SPILLETID
+)
+
+class TestValidering(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-15', '15-25']
+        self.kamptid = 25
+        self.antall_paa_banen = 3
+        self.df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Back', 'Spiss', 'Spiss', 'Back'],
+            'Tilgjengelig': [True, True, True, True, False],
+            '0-15': [True, True, True, False, False],
+            '15-25': [True, True, False, True, False]
+        }, index=['Keeper1', 'Back1', 'Spiss1', 'Spiss2', 'Back2'])
+
+    def valider(self):
+        return valider_plan(self.df, self.perioder, self.antall_paa_banen, self.kamptid)
+
+    def test_gyldig_plan(self):
+        """Tester at en gyldig plan ikke gir brudd"""
+        self.assertEqual(self.valider(), [])
+
+    def test_feil_antall(self):
+        """Tester at feil antall spillere gir brudd i riktig periode"""
+        self.df.at['Spiss2', '0-15'] = True
+        regler = {(b['periode'], b['regel']) for b in self.valider()}
+        self.assertIn(('0-15', REGEL_ANTALL), regler)
+        self.assertIn((None, REGEL_SPILLETID), regler)
+        self.assertNotIn(('15-25', REGEL_ANTALL), regler)
+
+    def test_keeper(self):
+        """Tester at perioder uten keeper gir brudd"""
+        self.df.at['Keeper1', '15-25'] = False
+        self.df.at['Spiss1', '15-25'] = True
+        brudd = [b for b in self.valider() if b['regel'] == REGEL_KEEPER]
+        self.assertEqual(len(brudd), 1)
+        self.assertEqual(brudd[0]['periode'], '15-25')
+
+    def test_posisjonsgrense(self):
+        """Tester at for mange spillere i en posisjon gir brudd med spillerne"""
+        self.df['Aktiv posisjon'] = ['Keeper', 'Spiss', 'Spiss', 'Spiss', 'Back']
+        self.df['15-25'] = [False, True, True, True, False]
+        brudd = [b for b in self.valider() if b['regel'] == REGEL_POSISJON]
+        self.assertEqual(len(brudd), 1)
+        self.assertEqual(brudd[0]['periode'], '15-25')
+        self.assertEqual(sorted(brudd[0]['spillere']), ['Back1', 'Spiss1', 'Spiss2'])
+        self.assertEqual(get_max_spillere_per_posisjon('Spiss'), 2)
+
+    def test_posisjon_per_periode(self):
+        """Tester at en posisjonsoverstyring gjelder bare i sin periode"""
+        overstyringer = Posisjonsoverstyringer({('Back1', '0-15'): 'Keeper'})
+        brudd = valider_plan(self.df, self.perioder, self.antall_paa_banen, self.kamptid, overstyringer)
+        self.assertEqual([b['periode'] for b in brudd if b['regel'] == REGEL_KEEPER], ['0-15'])
+        brudd = valider_endring(self.df, '15-25', 'Spiss1', True, 4, overstyringer)
+        self.assertNotIn(REGEL_KEEPER, [b['regel'] for b in brudd])
+
+    def test_utilgjengelig(self):
+        """Tester at utilgjengelige spillere på banen gir brudd"""
+        self.df.at['Back2', '0-15'] = True
+        self.df.at['Spiss1', '0-15'] = False
+        brudd = [b for b in self.valider() if b['regel'] == REGEL_TILGJENGELIG]
+        self.assertEqual(len(brudd), 1)
+        self.assertEqual(brudd[0]['spillere'], ['Back2'])
+
+    def test_valider_endring(self):
+        """Tester validering av én endring"""
+        # Laget er fullt
+        brudd = valider_endring(self.df, '0-15', 'Spiss2', True, self.antall_paa_banen)
+        self.assertIn(REGEL_ANTALL, [b['regel'] for b in brudd])
+        # Å ta av en spiller er alltid tillatt
+        self.assertEqual(valider_endring(self.df, '0-15', 'Spiss1', False, self.antall_paa_banen), [])
+        # Posisjonsgrense for keeper
+        self.df['Aktiv posisjon'] = ['Keeper', 'Back', 'Spiss', 'Keeper', 'Back']
+        brudd = valider_endring(self.df, '0-15', 'Spiss2', True, 4)
+        self.assertEqual([b['regel'] for b in brudd], [REGEL_KEEPER])
+
+if __name__ == '__main__':
+    unittest.main()
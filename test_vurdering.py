@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+import pandas as pd
+from byttforslag import ByttforslagMotor
+from kampplan import kalkuler_spilletid
+from posisjoner import Posisjonsoverstyringer
+from validering import valider_plan, REGEL_POSISJON
+from vurdering import (
+    posisjonsdata, stable_kandidater, vurder_kandidater, vurder_dataframe, mal_gjennomstromning
+)
+
+class TestVurdering(unittest.TestCase):
+    def setUp(self):
+        """Kjører før hver test"""
+        self.perioder = ['0-10', '10-20', '20-25']
+        self.df = pd.DataFrame({
+            'Aktiv posisjon': ['Keeper', 'Spiss', 'Spiss', 'Spiss', 'Back'],
+            'Tilgjengelig': [True, True, True, True, False],
+            'Mål spilletid': [25, 15, 15, 15, 0],
+            '0-10': [True, True, True, False, False],
+            '10-20': [True, False, True, True, False],
+            '20-25': [True, True, True, True, False]
+        }, index=['Keeper1', 'Spiss1', 'Spiss2', 'Spiss3', 'Back1'])
+
+    def test_lik_dataframe_beregningene(self):
+        """Tester at kjernen gir samme tall som kalkuler_spilletid, byttemotoren og valideringen"""
+        resultat = vurder_dataframe(self.df, self.perioder)
+        forventet = kalkuler_spilletid(self.df.copy(), self.perioder)
+        np.testing.assert_array_equal(resultat['minutter'], forventet['Total spilletid'])
+        np.testing.assert_array_equal(resultat['avvik'], forventet['Differanse'])
+        self.assertEqual(resultat['totalt_avvik'], ByttforslagMotor(self.df, self.perioder, 3).totalt_avvik())
+        np.testing.assert_array_equal(resultat['antall_per_periode'], [3, 3, 4])
+        self.assertEqual(resultat['bytter'], 2)  # Spiss3 inn i 10-20, Spiss1 inn i 20-25
+
+        posisjonsbrudd = [b for b in valider_plan(self.df, self.perioder, 3, 25) if b['regel'] == REGEL_POSISJON]
+        self.assertEqual(len(posisjonsbrudd), 1)
+        self.assertEqual(resultat['posisjonsbrudd'], 1)
+
+    def test_populasjon_og_posisjon_per_periode(self):
+        """Tester en stablet populasjon med mål per kandidat og posisjon per periode"""
+        annen = self.df.copy()
+        annen[self.perioder] = False
+        annen.loc[['Keeper1', 'Spiss3', 'Back1'], self.perioder] = True
+        overstyringer = Posisjonsoverstyringer({('Spiss3', '20-25'): 'Back'})
+        koder, navn, maks = posisjonsdata(annen, self.perioder, overstyringer)
+        self.assertEqual(list(navn), ['Back', 'Keeper', 'Spiss'])
+
+        populasjon = stable_kandidater([self.df, annen], self.perioder)
+        self.assertEqual(populasjon.shape, (2, 5, 3))
+        mal = np.array([[25, 15, 15, 15, 0], [25, 0, 0, 25, 25]])
+        resultat = vurder_kandidater(populasjon, [10, 10, 5], mal, self.df['Tilgjengelig'], koder, maks)
+        np.testing.assert_array_equal(resultat['minutter'][1], [25, 0, 0, 25, 25])
+        self.assertEqual(resultat['totalt_avvik'][1], 0)
+        self.assertEqual(resultat['bytter'][1], 0)
+        np.testing.assert_array_equal(resultat['posisjonstelling'][1][:, 2], [2, 1, 0])
+
+    def test_gjennomstromning(self):
+        """Tester at målingen kjører og gir tallene benchmarken skriver ut"""
+        maling = mal_gjennomstromning(antall_kandidater=200, dataframe_kandidater=5)
+        self.assertEqual(set(maling), {'kandidater', 'kjerne_per_sekund', 'dataframe_per_sekund', 'forhold'})
+        self.assertEqual(maling['kandidater'], 200)
+        for verdi in maling.values():
+            self.assertTrue(np.isfinite(verdi) and verdi > 0)
+
+if __name__ == '__main__':
+    unittest.main()
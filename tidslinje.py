@@ -0,0 +1,258 @@
+# tidslinje.py
+import logging
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+def _slaa_sammen(intervaller):
+    """Sorterer intervaller og slår sammen de som overlapper eller henger sammen"""
+    resultat = []
+    for start, slutt in sorted(intervaller):
+        if slutt <= start:
+            continue
+        if resultat and start <= resultat[-1][1]:
+            resultat[-1] = (resultat[-1][0], max(resultat[-1][1], slutt))
+        else:
+            resultat.append((start, slutt))
+    return resultat
+
+
+class Tidslinje:
+    """
+    Tidslinje for spilletid med minuttoppløsning.
+
+    Hver spiller har en sortert liste med intervaller [start, slutt) på banen.
+    Spørringer (hvem er på banen, minutter per spiller og bytter i et
+    tidsvindu) besvares med binærsøk i indekser som bygges ved første
+    spørring etter en endring.
+    """
+
+    def __init__(self, kamptid, intervaller=None):
+        self.kamptid = kamptid
+        self._intervaller = {}
+        for spiller, liste in (intervaller or {}).items():
+            self._intervaller[spiller] = _slaa_sammen(tuple(i) for i in liste)
+        self._indeks = None
+
+    @classmethod
+    def fra_perioder(cls, df, perioder, kamptid=None):
+        """
+        Bygger en tidslinje fra periodekolonnene i spilletid_df.
+
+        Args:
+            df (pd.DataFrame): Spillerdataframe med periodekolonner
+            perioder (list): Periodene på formen 'start-slutt'
+            kamptid (int): Total kamptid. Standard er slutten på siste periode.
+        """
+        grenser = [tuple(map(int, p.split('-'))) for p in perioder]
+        if kamptid is None:
+            kamptid = grenser[-1][1] if grenser else 0
+        paa_banen = df[list(perioder)].to_numpy(dtype=bool)
+        intervaller = {
+            spiller: [grenser[j] for j in range(len(perioder)) if paa_banen[i, j]]
+            for i, spiller in enumerate(df.index)
+        }
+        return cls(kamptid, intervaller)
+
+    @classmethod
+    def fra_dict(cls, data):
+        """Gjenoppretter en tidslinje lagret med til_dict"""
+        return cls(data['kamptid'], data['intervaller'])
+
+    def til_dict(self):
+        """Returnerer tidslinjen som JSON-vennlig dict"""
+        return {
+            'kamptid': self.kamptid,
+            'intervaller': {s: [list(i) for i in liste] for s, liste in self._intervaller.items() if liste}
+        }
+
+    def til_perioder(self, perioder, spillere=None):
+        """
+        Konverterer tidslinjen til periodekolonner. En spiller regnes som på
+        banen i en periode hvis hun er på banen ved periodens start, slik at
+        antallet per periode stemmer med antallet på banen til enhver tid.
+
+        Returns:
+            pd.DataFrame: Bool-kolonner (spillere × perioder)
+        """
+        if spillere is None:
+            spillere = list(self._intervaller)
+        data = {}
+        for periode in perioder:
+            paa = self.paa_banen(int(periode.split('-')[0]))
+            data[periode] = [spiller in paa for spiller in spillere]
+        return pd.DataFrame(data, index=spillere, columns=list(perioder), dtype=bool)
+
+    def oppdater_fra_perioder(self, df, perioder):
+        """
+        Skriver endringer i periodekolonnene inn i tidslinjen i stedet for å
+        bygge den på nytt. En celle som er satt for en spiller som ikke er på
+        banen ved periodens start, setter henne på hele perioden; en celle som
+        er tatt bort, tar henne av hele perioden. Bytter midt i perioder som
+        ikke er endret, beholdes.
+
+        Returns:
+            int: Antall celler som ble skrevet inn
+        """
+        naa = self.til_perioder(perioder, df.index.tolist())
+        endret = 0
+        for periode in perioder:
+            start, slutt = map(int, periode.split('-'))
+            for spiller in df.index[df[periode].to_numpy(dtype=bool) != naa[periode].to_numpy()]:
+                if df.at[spiller, periode]:
+                    self.sett_paa(spiller, start, slutt)
+                else:
+                    self.ta_av(spiller, start, slutt)
+                endret += 1
+        if endret:
+            logger.debug(f"Tidslinje oppdatert fra {endret} celler i rutenettet")
+        return endret
+
+    def minutter_per_periode(self, perioder, spillere):
+        """
+        Minutter på banen per spiller og periode, også for bytter midt i en
+        periode.
+
+        Returns:
+            np.ndarray: Heltall (spillere × perioder)
+        """
+        grenser = [tuple(map(int, p.split('-'))) for p in perioder]
+        return np.array(
+            [[self.minutter(spiller, start, slutt) for start, slutt in grenser] for spiller in spillere],
+            dtype=np.int64
+        ).reshape(len(spillere), len(perioder))
+
+    def intervaller(self, spiller):
+        """Returnerer spillerens intervaller på banen"""
+        return list(self._intervaller.get(spiller, []))
+
+    def sett_paa(self, spiller, start, slutt=None):
+        """Setter en spiller på banen fra start til slutt (standard kampslutt)"""
+        slutt = self.kamptid if slutt is None else slutt
+        liste = self._intervaller.get(spiller, [])
+        self._intervaller[spiller] = _slaa_sammen(liste + [(start, slutt)])
+        self._indeks = None
+
+    def ta_av(self, spiller, start, slutt=None):
+        """Tar en spiller av banen fra start til slutt (standard kampslutt)"""
+        slutt = self.kamptid if slutt is None else slutt
+        nye = []
+        for a, b in self._intervaller.get(spiller, []):
+            if b <= start or a >= slutt:
+                nye.append((a, b))
+                continue
+            if a < start:
+                nye.append((a, start))
+            if b > slutt:
+                nye.append((slutt, b))
+        self._intervaller[spiller] = nye
+        self._indeks = None
+
+    def bytt(self, minutt, ut, inn):
+        """
+        Bytter ut en spiller med en annen på et vilkårlig minutt. Innbytteren
+        overtar resten av utbytterens sammenhengende intervall.
+        """
+        if ut not in self.paa_banen(minutt):
+            raise ValueError(f"{ut} er ikke på banen i minutt {minutt}")
+        if inn in self.paa_banen(minutt):
+            raise ValueError(f"{inn} er allerede på banen i minutt {minutt}")
+        slutt = next(b for a, b in self._intervaller[ut] if a <= minutt < b)
+        self.ta_av(ut, minutt, slutt)
+        self.sett_paa(inn, minutt, slutt)
+        logger.info(f"Bytte i minutt {minutt}: {ut} ut, {inn} inn")
+
+    def _bygg_indeks(self):
+        """Bygger indeksene som brukes av spørringene"""
+        if self._indeks is not None:
+            return self._indeks
+
+        # Segmenter mellom alle intervallgrenser med spillerne på banen
+        hendelser = sorted(
+            (t, endring, spiller)
+            for spiller, liste in self._intervaller.items()
+            for a, b in liste
+            for t, endring in ((a, 1), (b, -1))
+        )
+        brytepunkter, segmenter = [], []
+        paa = set()
+        for k, (t, endring, spiller) in enumerate(hendelser):
+            if endring > 0:
+                paa.add(spiller)
+            else:
+                paa.discard(spiller)
+            if k + 1 == len(hendelser) or hendelser[k + 1][0] != t:
+                brytepunkter.append(t)
+                segmenter.append(frozenset(paa))
+
+        # Prefikssummer av varighet per spiller
+        spillerindeks = {}
+        for spiller, liste in self._intervaller.items():
+            starter = [a for a, _ in liste]
+            slutter = [b for _, b in liste]
+            kumulativ = [0] + list(accumulate(b - a for a, b in liste))
+            spillerindeks[spiller] = (starter, slutter, kumulativ)
+
+        # Innbytter er starter som ikke skjer ved kampstart
+        bytter = sorted(
+            (a, spiller)
+            for spiller, liste in self._intervaller.items()
+            for a, _ in liste if a > 0
+        )
+
+        self._indeks = (brytepunkter, segmenter, spillerindeks, bytter)
+        return self._indeks
+
+    def paa_banen(self, minutt):
+        """Returnerer spillerne som er på banen i gitt minutt"""
+        brytepunkter, segmenter, _, _ = self._bygg_indeks()
+        k = bisect_right(brytepunkter, minutt) - 1
+        return segmenter[k] if k >= 0 else frozenset()
+
+    def minutter(self, spiller, fra=0, til=None):
+        """Returnerer antall minutter spilleren er på banen i [fra, til)"""
+        til = self.kamptid if til is None else til
+        _, _, spillerindeks, _ = self._bygg_indeks()
+        if spiller not in spillerindeks or til <= fra:
+            return 0
+        starter, slutter, kumulativ = spillerindeks[spiller]
+        forste = bisect_right(slutter, fra)   # Første intervall som slutter etter fra
+        siste = bisect_left(starter, til)     # Intervaller som starter før til
+        if forste >= siste:
+            return 0
+        total = kumulativ[siste] - kumulativ[forste]
+        total -= max(0, fra - starter[forste])
+        total -= max(0, slutter[siste - 1] - til)
+        return total
+
+    def minutter_per_spiller(self, fra=0, til=None):
+        """Returnerer dict med minutter per spiller i [fra, til)"""
+        return {spiller: self.minutter(spiller, fra, til) for spiller in self._intervaller}
+
+    def endringer_i_vindu(self, fra, til):
+        """
+        Byttene i (fra, til), altså etter fra og før til, som liste med
+        (minutt, spillere ut, spillere inn). Brukes for bytter midt i en periode.
+        """
+        brytepunkter, segmenter, _, _ = self._bygg_indeks()
+        endringer = []
+        for k in range(bisect_right(brytepunkter, fra), bisect_left(brytepunkter, til)):
+            for_ = segmenter[k - 1] if k > 0 else frozenset()
+            etter = segmenter[k]
+            if for_ != etter:
+                endringer.append((brytepunkter[k], sorted(for_ - etter), sorted(etter - for_)))
+        return endringer
+
+    def bytter_i_vindu(self, fra, til):
+        """
+        Returnerer innbytterne i [fra, til) som liste med (minutt, spiller).
+        Antallet finnes med to binærsøk.
+        """
+        _, _, _, bytter = self._bygg_indeks()
+        venstre = bisect_left(bytter, (fra,))
+        hoyre = bisect_left(bytter, (til,))
+        return bytter[venstre:hoyre]
@@ -0,0 +1,312 @@
+# tropp.py
+"""
+Spillerregister med faste heltalls-ID-er (data/tropp.db).
+
+Tabellen spillere har én rad per spiller med id, navn, posisjonene spilleren
+kan spille (bitmaske over POSISJONER), aktiv posisjon og om spilleren er i
+troppen nå. Lagrede oppstillinger og arkiverte kamper refererer til
+spillerne med id, så et nytt navn er én oppdatering her i stedet for en
+omskriving av hver kamp. Navnene slås opp først når noe skal vises.
+
+Oppstillingen i en sesjon har navn i index og ID-en i kolonnen spiller_id,
+slik at lagring aldri trenger å slå opp navn. Et navn som er byttet i en
+annen sesjon, lagres da fortsatt på riktig spiller.
+
+Eldre kamper har navn i index; de leses som før, og navnene registreres i
+registeret når noe trenger ID-ene deres.
+"""
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from kompakt import POSISJON_BIT, posisjoner_til_maske, normaliser_spilletid_df
+
+logger = logging.getLogger(__name__)
+
+TROPP_STI = Path("data") / "tropp.db"
+SPILLER_ID = 'spiller_id'  # Kolonne i spilletid_df med spillerens id
+
+# Troppen et nytt register starter med: navn -> aktiv posisjon
+STANDARD_TROPP = {
+    'Susanne': 'Keeper',
+    'Tuva': 'Midtstopper',
+    'Adele': 'Back',
+    'Sarah': 'Back',
+    'Madelen': 'Sentral midtbane',
+    'Ingrid': 'Sentral midtbane',
+    'Karen': 'Spiss',
+    'Diyana': 'Ving',
+    'Martine': 'Back',
+    'Hanna': 'Back',
+    'Veslemøy': 'Ving',
+    'Emilie': 'Ving',
+    'Lilly': 'Ving'
+}
+
+
+def er_ider(index):
+    """Sjekker om index i en lagret kamp eller oppstilling er spiller-ID-er (og ikke navn)"""
+    return len(index) > 0 and all(isinstance(s, (int, np.integer)) and not isinstance(s, bool) for s in index)
+
+
+class Tropp:
+    """
+    Spillerregisteret. Deles av alle sesjoner; tabellen holdes i minnet som
+    en DataFrame indeksert på id og leses på nytt etter hver skriving, eller
+    når en ukjent id slås opp (skrevet av en annen prosess).
+    """
+
+    def __init__(self, sti=TROPP_STI, standard=STANDARD_TROPP):
+        self.sti = Path(sti)
+        self.sti.parent.mkdir(parents=True, exist_ok=True)
+        self._laas = threading.Lock()
+        self._tabell = None
+        self._opprett_tabeller(standard)
+
+    def _koble_til(self):
+        return sqlite3.connect(self.sti)
+
+    def _opprett_tabeller(self, standard):
+        with self._koble_til() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS spillere (
+                    id INTEGER PRIMARY KEY,
+                    navn TEXT NOT NULL UNIQUE,
+                    posisjoner INTEGER NOT NULL DEFAULT 0,
+                    aktiv_posisjon TEXT,
+                    i_troppen INTEGER NOT NULL DEFAULT 1
+                )
+            """)
+            if standard and conn.execute("SELECT COUNT(*) FROM spillere").fetchone()[0] == 0:
+                conn.executemany(
+                    "INSERT INTO spillere (navn, posisjoner, aktiv_posisjon) VALUES (?, ?, ?)",
+                    [(navn, POSISJON_BIT[posisjon], posisjon) for navn, posisjon in standard.items()]
+                )
+                logger.info(f"Nytt spillerregister med {len(standard)} spillere")
+
+    def _les(self):
+        with self._koble_til() as conn:
+            tabell = pd.read_sql_query(
+                "SELECT id, navn, posisjoner, aktiv_posisjon, i_troppen FROM spillere ORDER BY id",
+                conn, index_col='id'
+            )
+        tabell.columns = ['Navn', 'Posisjoner', 'Aktiv posisjon', 'I troppen']
+        tabell['I troppen'] = tabell['I troppen'].astype(bool)
+        return tabell
+
+    def tabell(self):
+        """Hele registeret som en DataFrame indeksert på id. Må ikke endres av kalleren."""
+        with self._laas:
+            if self._tabell is None:
+                self._tabell = self._les()
+            return self._tabell
+
+    def _glem(self):
+        with self._laas:
+            self._tabell = None
+
+    def ider_for(self, navn, posisjoner=None, aktive_posisjoner=None):
+        """
+        ID-ene til spillerne i navn, i samme rekkefølge. Ukjente navn
+        registreres, med posisjonene hvis de er gitt, men ikke i troppen.
+
+        Returns:
+            np.ndarray: ID-er (int64)
+        """
+        navn = [str(n) for n in navn]
+        oppslag = pd.Series(self.tabell().index, index=self.tabell()['Navn'])
+        ider = oppslag.reindex(navn)
+        mangler = np.flatnonzero(ider.isna().to_numpy())
+        if len(mangler):
+            rader = [
+                (
+                    navn[i],
+                    posisjoner_til_maske(posisjoner[i]) if posisjoner is not None else 0,
+                    str(aktive_posisjoner[i]) if aktive_posisjoner is not None else None
+                )
+                for i in mangler
+            ]
+            with self._laas, self._koble_til() as conn:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO spillere (navn, posisjoner, aktiv_posisjon, i_troppen) VALUES (?, ?, ?, 0)",
+                    rader
+                )
+                self._tabell = None
+            logger.info(f"Registrerte {len(rader)} nye spillere")
+            oppslag = pd.Series(self.tabell().index, index=self.tabell()['Navn'])
+            ider = oppslag.reindex(navn)
+        return ider.to_numpy(dtype=np.int64)
+
+    def navn_for(self, ider):
+        """Navnene til spillerne med ID-ene, i samme rekkefølge"""
+        ider = [int(i) for i in ider]
+        navn = self.tabell()['Navn'].reindex(ider)
+        if navn.isna().any():
+            # Kan være registrert av en annen prosess siden sist
+            self._glem()
+            navn = self.tabell()['Navn'].reindex(ider)
+        return [n if isinstance(n, str) else f"Spiller {i}" for i, n in zip(ider, navn)]
+
+    def navn_for_id(self, spiller_id):
+        return self.navn_for([spiller_id])[0]
+
+    def oppdater(self, df):
+        """
+        Registrerer spillerne i en spilletid_df og oppdaterer posisjonene og
+        aktiv posisjon i registeret der de er endret.
+
+        Returns:
+            np.ndarray: ID-ene til spillerne i df, i samme rekkefølge
+        """
+        posisjoner = df['Posisjoner'].tolist() if 'Posisjoner' in df.columns else None
+        aktive = df['Aktiv posisjon'].tolist() if 'Aktiv posisjon' in df.columns else None
+        ider = self.ider_for(df.index, posisjoner, aktive)
+        self.oppdater_posisjoner(ider, posisjoner, aktive)
+        return ider
+
+    def oppdater_posisjoner(self, ider, posisjoner, aktive):
+        """
+        Oppdaterer posisjonene og aktiv posisjon for spillerne med ID-ene der
+        de er endret. Registrerer ingen nye spillere.
+        """
+        if posisjoner is None or aktive is None:
+            return
+        posisjoner, aktive = list(posisjoner), list(aktive)
+        tabell = self.tabell().reindex(ider)
+        masker = [posisjoner_til_maske(p) for p in posisjoner]
+        endret = [
+            (maske, str(aktiv), int(spiller_id))
+            for spiller_id, maske, aktiv, gammel_maske, gammel_aktiv in zip(
+                ider, masker, aktive, tabell['Posisjoner'], tabell['Aktiv posisjon']
+            )
+            if maske != gammel_maske or str(aktiv) != gammel_aktiv
+        ]
+        if endret:
+            with self._laas, self._koble_til() as conn:
+                conn.executemany(
+                    "UPDATE spillere SET posisjoner = ?, aktiv_posisjon = ? WHERE id = ?", endret
+                )
+                self._tabell = None
+
+    def med_ider(self, df):
+        """
+        spilletid_df med kolonnen SPILLER_ID. Brukes når en oppstilling uten
+        ID-er kommer inn i sesjonen (eldre data); ukjente navn registreres.
+        """
+        df = df.copy(deep=False)
+        df[SPILLER_ID] = self.oppdater(df)
+        return df
+
+    def gi_nytt_navn(self, spiller_id, nytt_navn):
+        """Gir en spiller nytt navn. Lagrede kamper trenger ingen endring."""
+        nytt_navn = nytt_navn.strip()
+        if not nytt_navn:
+            raise ValueError("Navnet kan ikke være tomt")
+        try:
+            with self._laas, self._koble_til() as conn:
+                if conn.execute("UPDATE spillere SET navn = ? WHERE id = ?", (nytt_navn, int(spiller_id))).rowcount == 0:
+                    raise ValueError(f"Fant ingen spiller med id {spiller_id}")
+                self._tabell = None
+        except sqlite3.IntegrityError:
+            raise ValueError(f"Det finnes allerede en spiller som heter {nytt_navn}")
+        logger.info(f"Spiller {spiller_id} heter nå {nytt_navn}")
+
+    def spilletid_df(self, perioder):
+        """Ny spilletid_df med spillerne i troppen, uten spilletid"""
+        tropp = self.tabell()
+        tropp = tropp[tropp['I troppen']]
+        df = pd.DataFrame(index=pd.Index(tropp['Navn'].tolist()))
+        df['Posisjoner'] = tropp['Posisjoner'].to_numpy()
+        df['Aktiv posisjon'] = tropp['Aktiv posisjon'].to_numpy()
+        df['Tilgjengelig'] = True
+        df['Total spilletid'] = 0
+        df['Differanse'] = 0
+        df['Mål spilletid'] = 0
+        for periode in perioder:
+            df[periode] = False
+        df[SPILLER_ID] = tropp.index.to_numpy(dtype=np.int64)
+        return normaliser_spilletid_df(df, perioder)
+
+
+def spillerider(index, tropp):
+    """ID-ene til spillerne i index fra en lagret kamp; navn i eldre kamper slås opp i registeret"""
+    if er_ider(index):
+        return [int(s) for s in index]
+    return tropp.ider_for(index).tolist()
+
+
+def arkivider(kamp):
+    """ID-ene i index til en arkivert kamp, eller None for eldre kamper med navn"""
+    spilletid = kamp.get('spilletid_df')
+    if not spilletid:
+        return None
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    return [int(s) for s in spilletid['index']] if er_ider(spilletid['index']) else None
+
+
+def kamp_med_ider(kamp, tropp, ider=None):
+    """
+    Kampen slik den arkiveres: spillerne i spilletid_df, tidslinjen og
+    posisjonsoverstyringene refereres med id. Med ider (navn -> id, fra
+    sesjonens oppstilling) slås ingen navn opp; ellers registreres spillere
+    som ikke finnes i registeret, med posisjonene fra kampen.
+    """
+    spilletid = kamp.get('spilletid_df')
+    if not spilletid:
+        return kamp
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    if er_ider(spilletid['index']):
+        return kamp
+    if ider is not None:
+        id_for = {navn: int(spiller_id) for navn, spiller_id in ider.items()}
+    else:
+        kolonner = spilletid['columns']
+        posisjoner = aktive = None
+        if 'Posisjoner' in kolonner:
+            posisjoner = [rad[kolonner.index('Posisjoner')] for rad in spilletid['data']]
+        if 'Aktiv posisjon' in kolonner:
+            aktive = [rad[kolonner.index('Aktiv posisjon')] for rad in spilletid['data']]
+        id_for = dict(zip(spilletid['index'], tropp.ider_for(spilletid['index'], posisjoner, aktive).tolist()))
+
+    kamp = {**kamp, 'spilletid_df': {**spilletid, 'index': [id_for[s] for s in spilletid['index']]}}
+    if kamp.get('tidslinje'):
+        tidslinje = kamp['tidslinje']
+        kamp['tidslinje'] = {
+            **tidslinje,
+            'intervaller': {str(id_for.get(s, s)): liste for s, liste in tidslinje['intervaller'].items()}
+        }
+    if kamp.get('posisjoner'):
+        kamp['posisjoner'] = [[id_for.get(s, s), periode, posisjon] for s, periode, posisjon in kamp['posisjoner']]
+    return kamp
+
+
+def kamp_med_navn(kamp, tropp):
+    """Kampen med spillernavn i stedet for id, slik den vises og lastes. Eldre kamper returneres som de er."""
+    spilletid = kamp.get('spilletid_df')
+    if not spilletid:
+        return kamp
+    if isinstance(spilletid.get('data'), dict):
+        spilletid = spilletid['data']
+    if not er_ider(spilletid['index']):
+        return kamp
+    navn = tropp.navn_for(spilletid['index'])
+    navn_for = dict(zip(spilletid['index'], navn))
+
+    kamp = {**kamp, 'spilletid_df': {**spilletid, 'index': navn}}
+    if kamp.get('tidslinje'):
+        tidslinje = kamp['tidslinje']
+        kamp['tidslinje'] = {
+            **tidslinje,
+            'intervaller': {
+                navn_for.get(int(s), s) if str(s).isdigit() else s: liste
+                for s, liste in tidslinje['intervaller'].items()
+            }
+        }
+    if kamp.get('posisjoner'):
+        kamp['posisjoner'] = [[navn_for.get(s, s), periode, posisjon] for s, periode, posisjon in kamp['posisjoner']]
+    return kamp
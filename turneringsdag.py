@@ -0,0 +1,369 @@
+# turneringsdag.py
+"""
+Planlegging av en hel turneringsdag med flere korte kamper etter hverandre.
+
+Alle kampene planlegges samlet som én matrise (spillere × alle perioder på
+dagen), slik at spilletiden kan balanseres over hele dagen. Reglene er:
+- riktig antall spillere på banen og nøyaktig én keeper i hver periode
+- ingen posisjon har flere utespillere enn get_max_spillere_per_posisjon
+- utilgjengelige spillere settes ikke på banen
+- ingen spiller er på banen mer enn maks_sammenhengende minutter i strekk
+- mellom to kamper har hver spiller minst min_hvile minutter pause fra
+  siste minutt på banen til første minutt på banen i neste kamp
+
+Flere kandidatplaner med ulikt tilfeldig frø løses i parallell i en
+prosesspool, og den beste planen som er ferdig innen tidsbudsjettet velges.
+"""
+import logging
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+import numpy as np
+import pandas as pd
+from kampplan import generer_perioder, kalkuler_spilletid, generer_kamprapport, generer_detaljert_kampoppsett
+from kompakt import POSISJONER, KEEPER, posisjoner_til_maske
+from posisjoner import Posisjonsoverstyringer
+from validering import get_max_spillere_per_posisjon
+from vurdering import vurder_kandidater
+
+logger = logging.getLogger(__name__)
+
+STRAFF_PER_BRUDD = 10000        # Kostnad per regelbrudd, langt over ubalanse i minutter
+KORT_KAMP_PERIODE = 5           # Periodelengde for kamper kortere enn 30 minutter
+
+
+def turneringsperioder(kamptid):
+    """Perioder for én kamp. Korte kamper deles i like lange perioder på 5 minutter."""
+    if kamptid >= 30:
+        return generer_perioder(kamptid)
+    return [f'{t}-{min(t + KORT_KAMP_PERIODE, kamptid)}' for t in range(0, kamptid, KORT_KAMP_PERIODE)]
+
+
+class Turneringsdag:
+    """
+    Problemoppsettet for en turneringsdag som NumPy-matriser, slik at en
+    kandidatplan kan vurderes vektorisert og sendes til arbeidsprosesser.
+    """
+
+    def __init__(self, df, kamper, maks_sammenhengende=20, min_hvile=15):
+        """
+        Args:
+            df (pd.DataFrame): Spillerdataframe med 'Posisjoner', 'Aktiv posisjon' og 'Tilgjengelig'
+            kamper (list): Dicts med 'kamptid', 'antall_paa_banen' og 'start' (minutter
+                etter første avspark). 'perioder' kan oppgis, ellers brukes turneringsperioder.
+            maks_sammenhengende (int): Maks minutter på banen i strekk
+            min_hvile (int): Minste pause i minutter mellom to kamper for hver spiller
+        """
+        if not kamper:
+            raise ValueError("Turneringsdagen må ha minst én kamp")
+        self.spillere = df.index.tolist()
+        self.maks_sammenhengende = maks_sammenhengende
+        self.min_hvile = min_hvile
+        self.kamper = sorted(
+            [{**k, 'perioder': k.get('perioder') or turneringsperioder(int(k['kamptid']))} for k in kamper],
+            key=lambda k: k['start']
+        )
+
+        self.tilgjengelig = df['Tilgjengelig'].to_numpy(dtype=bool)
+        masker = np.array([posisjoner_til_maske(p) for p in df['Posisjoner']], dtype=np.int64)
+        aktiv = df['Aktiv posisjon'].astype(object).to_numpy()
+        self.kan_keeper = ((masker & KEEPER) != 0) | (aktiv == 'Keeper')
+        # Posisjonen en spiller har som utespiller: aktiv posisjon, eller første posisjon i masken for keepere
+        self.uteposisjon = np.array([
+            a if a != 'Keeper' else next((p for p in POSISJONER[1:] if posisjoner_til_maske(p) & m), None)
+            for a, m in zip(aktiv, masker)
+        ], dtype=object)
+        self.kan_ute = np.array([p is not None for p in self.uteposisjon])
+        self._posisjonsnavn, self.posisjonskode = np.unique(self.uteposisjon.astype(str), return_inverse=True)
+        self.maks_per_posisjon = np.array([get_max_spillere_per_posisjon(p) for p in self._posisjonsnavn])
+
+        kamp, start, slutt, antall = [], [], [], []
+        for k, oppsett in enumerate(self.kamper):
+            for periode in oppsett['perioder']:
+                fra, til = map(int, periode.split('-'))
+                kamp.append(k)
+                start.append(oppsett['start'] + fra)
+                slutt.append(oppsett['start'] + til)
+                antall.append(int(oppsett['antall_paa_banen']))
+        self.kamp = np.array(kamp)
+        self.start = np.array(start, dtype=float)
+        self.slutt = np.array(slutt, dtype=float)
+        self.varighet = self.slutt - self.start
+        self.antall = np.array(antall)
+        self.forste_i_kamp = np.r_[True, self.kamp[1:] != self.kamp[:-1]]
+
+        # Lik andel av dagens spilletid til alle tilgjengelige spillere
+        antall_tilgjengelige = max(1, int(self.tilgjengelig.sum()))
+        self.mal = float(self.varighet @ self.antall) / antall_tilgjengelige
+
+    @property
+    def antall_perioder(self):
+        return len(self.kamp)
+
+    def minutter(self, paa_banen):
+        return paa_banen @ self.varighet
+
+    def brudd(self, paa_banen, keeper):
+        """
+        Teller regelbrudd i en plan.
+
+        Returns:
+            dict: Antall brudd per regel
+        """
+        n, p = paa_banen.shape
+        kolonner = np.arange(p)
+        feil_antall = int((paa_banen.sum(axis=0) != self.antall).sum())
+        feil_keeper = int((~paa_banen[keeper, kolonner] | ~self.kan_keeper[keeper]).sum())
+        utilgjengelige = int((paa_banen & ~self.tilgjengelig[:, None]).sum())
+
+        ute = paa_banen.copy()
+        ute[keeper, kolonner] = False
+        telling = np.zeros((len(self._posisjonsnavn), p), dtype=int)
+        np.add.at(telling, self.posisjonskode, ute.astype(int))
+        posisjonsgrense = int(np.maximum(0, telling - self.maks_per_posisjon[:, None]).sum())
+
+        sammenhengende = 0
+        hvile = 0
+        lop = np.zeros(n)
+        sist_slutt = np.full(n, -np.inf)      # Slutt på siste periode på banen i tidligere kamper
+        spilt_i_kampen = np.zeros(n, dtype=bool)
+        for j in range(p):
+            if self.forste_i_kamp[j]:
+                if j > 0:
+                    forrige = self.kamp == self.kamp[j - 1]
+                    siste = np.where(paa_banen[:, forrige], self.slutt[forrige], -np.inf).max(axis=1)
+                    sist_slutt = np.maximum(sist_slutt, siste)
+                lop[:] = 0
+                spilt_i_kampen[:] = False
+            paa = paa_banen[:, j]
+            lop = np.where(paa, lop + self.varighet[j], 0)
+            sammenhengende += int((lop > self.maks_sammenhengende).sum())
+            forst_inn = paa & ~spilt_i_kampen
+            hvile += int((forst_inn & (self.start[j] - sist_slutt < self.min_hvile)).sum())
+            spilt_i_kampen |= paa
+        return {
+            'antall_paa_banen': feil_antall,
+            'keeper': feil_keeper,
+            'posisjonsgrense': posisjonsgrense,
+            'utilgjengelig': utilgjengelige,
+            'sammenhengende': sammenhengende,
+            'hvile': hvile
+        }
+
+    def kostnad(self, paa_banen, keeper):
+        """Kvadratsum av avvik fra lik spilletid, pluss straff for regelbrudd"""
+        kvadratavvik = vurder_kandidater(paa_banen, self.varighet, self.mal, self.tilgjengelig)['kvadratavvik'][0]
+        return float(kvadratavvik) + STRAFF_PER_BRUDD * sum(self.brudd(paa_banen, keeper).values())
+
+    def konstruer(self, rng):
+        """
+        Bygger en plan grådig periode for periode. Spillerne med størst
+        underskudd av spilletid prioriteres, med litt støy slik at ulike frø
+        gir ulike kandidater. Bare hvis det ikke finnes nok spillere som
+        oppfyller reglene, brukes spillere som bryter dem.
+        """
+        n, p = len(self.spillere), self.antall_perioder
+        paa_banen = np.zeros((n, p), dtype=bool)
+        keeper = np.zeros(p, dtype=int)
+        spilt = np.zeros(n)
+        lop = np.zeros(n)
+        sist_slutt = np.full(n, -np.inf)
+        spilt_i_kampen = np.zeros(n, dtype=bool)
+        stoy = rng.normal(0, max(1.0, self.varighet.mean()), size=(n, p))
+
+        for j in range(p):
+            if self.forste_i_kamp[j]:
+                if j > 0:
+                    forrige = self.kamp == self.kamp[j - 1]
+                    siste = np.where(paa_banen[:, forrige], self.slutt[forrige], -np.inf).max(axis=1)
+                    sist_slutt = np.maximum(sist_slutt, siste)
+                lop[:] = 0
+                spilt_i_kampen[:] = False
+
+            lovlig = (
+                self.tilgjengelig
+                & (lop + self.varighet[j] <= self.maks_sammenhengende)
+                & (spilt_i_kampen | (self.start[j] - sist_slutt >= self.min_hvile))
+            )
+            prioritet = (self.mal - spilt) + stoy[:, j]
+            # Lovlige spillere først, deretter tilgjengelige, sortert på prioritet
+            rangering = np.lexsort((-prioritet, ~self.tilgjengelig, ~lovlig))
+
+            keeperrekke = [i for i in rangering if self.kan_keeper[i]]
+            k = keeperrekke[0] if keeperrekke else rangering[0]
+            valgt = [k]
+            telling = np.zeros(len(self._posisjonsnavn), dtype=int)
+            for i in rangering:
+                if len(valgt) == self.antall[j]:
+                    break
+                kode = self.posisjonskode[i]
+                if i != k and self.kan_ute[i] and telling[kode] < self.maks_per_posisjon[kode]:
+                    valgt.append(i)
+                    telling[kode] += 1
+            if len(valgt) < self.antall[j]:
+                valgt += [i for i in rangering if i not in valgt and self.kan_ute[i]][:self.antall[j] - len(valgt)]
+            keeper[j] = k
+            paa_banen[valgt, j] = True
+
+            spilt += paa_banen[:, j] * self.varighet[j]
+            lop = np.where(paa_banen[:, j], lop + self.varighet[j], 0)
+            spilt_i_kampen |= paa_banen[:, j]
+        return paa_banen, keeper
+
+    def forbedre(self, paa_banen, keeper, rng, frist):
+        """
+        Lokalsøk med tilfeldige bytter i én periode (utespiller mot
+        innbytter, eller ny keeper) som beholdes når kostnaden går ned.
+        Stopper ved frist (time.time()) eller etter mange bytter uten forbedring.
+        """
+        kostnad = self.kostnad(paa_banen, keeper)
+        utespillere = np.flatnonzero(self.tilgjengelig & self.kan_ute)
+        keepere = np.flatnonzero(self.tilgjengelig & self.kan_keeper)
+        uten_forbedring = 0
+        while time.time() < frist and uten_forbedring < 2000:
+            j = rng.integers(self.antall_perioder)
+            ny_paa, ny_keeper = paa_banen.copy(), keeper.copy()
+            if rng.random() < 0.8 or len(keepere) < 2:
+                ute = [i for i in np.flatnonzero(paa_banen[:, j]) if i != keeper[j]]
+                inn = [i for i in utespillere if not paa_banen[i, j]]
+                if not ute or not inn:
+                    uten_forbedring += 1
+                    continue
+                ny_paa[rng.choice(ute), j] = False
+                ny_paa[rng.choice(inn), j] = True
+            else:
+                ny = rng.choice([i for i in keepere if i != keeper[j]])
+                if not paa_banen[ny, j]:
+                    ny_paa[keeper[j], j] = False
+                    ny_paa[ny, j] = True
+                elif not self.kan_ute[keeper[j]]:
+                    uten_forbedring += 1
+                    continue  # Gammel keeper kan ikke bli stående som utespiller
+                ny_keeper[j] = ny
+            ny_kostnad = self.kostnad(ny_paa, ny_keeper)
+            if ny_kostnad < kostnad:
+                paa_banen, keeper, kostnad = ny_paa, ny_keeper, ny_kostnad
+                uten_forbedring = 0
+            else:
+                uten_forbedring += 1
+        return paa_banen, keeper, kostnad
+
+    def til_dataframes(self, df, paa_banen, keeper):
+        """
+        Lager én spilletid_df per kamp, med posisjonsoverstyringer for
+        keeperen i hver periode og for keepere som spiller ute.
+
+        Returns:
+            list: (spilletid_df, Posisjonsoverstyringer) per kamp
+        """
+        resultat = []
+        aktiv = df['Aktiv posisjon'].astype(object).to_numpy()
+        for k, oppsett in enumerate(self.kamper):
+            kolonner = np.flatnonzero(self.kamp == k)
+            kamp_df = df[['Posisjoner', 'Aktiv posisjon', 'Tilgjengelig']].copy()
+            overstyringer = Posisjonsoverstyringer()
+            kamp_df['Total spilletid'] = 0
+            kamp_df['Differanse'] = 0
+            kamp_df['Mål spilletid'] = 0
+            for j, periode in zip(kolonner, oppsett['perioder']):
+                kamp_df[periode] = paa_banen[:, j]
+            for j, periode in zip(kolonner, oppsett['perioder']):
+                posisjoner = np.where(paa_banen[:, j] & (aktiv == 'Keeper'), self.uteposisjon, aktiv)
+                posisjoner[keeper[j]] = 'Keeper'
+                for i in np.flatnonzero(posisjoner != aktiv):
+                    overstyringer[(self.spillere[i], periode)] = posisjoner[i]
+            kamp_df = kalkuler_spilletid(kamp_df, oppsett['perioder'])
+            kamp_df['Mål spilletid'] = kamp_df['Total spilletid']
+            kamp_df['Differanse'] = 0
+            resultat.append((kamp_df, overstyringer))
+        return resultat
+
+
+def _los_kandidat(dag, fro, frist):
+    """Løser én kandidatplan. Kjøres i en arbeidsprosess."""
+    rng = np.random.default_rng(fro)
+    paa_banen, keeper = dag.konstruer(rng)
+    paa_banen, keeper, kostnad = dag.forbedre(paa_banen, keeper, rng, frist)
+    return kostnad, fro, paa_banen, keeper
+
+
+def planlegg_turneringsdag(df, kamper, maks_sammenhengende=20, min_hvile=15,
+                           tidsbudsjett=5.0, kandidater=8, arbeidere=None):
+    """
+    Planlegger alle kampene på en turneringsdag samlet.
+
+    Args:
+        df (pd.DataFrame): Spillerdataframe
+        kamper (list): Dicts med 'kamptid', 'antall_paa_banen' og 'start'
+        maks_sammenhengende (int): Maks minutter på banen i strekk
+        min_hvile (int): Minste pause mellom kampene for hver spiller
+        tidsbudsjett (float): Sekunder solveren kan bruke
+        kandidater (int): Antall kandidatplaner med ulikt frø
+        arbeidere (int): Antall prosesser (standard: antall CPU-er)
+
+    Returns:
+        dict: 'kamper' (spilletid_df og posisjonsoverstyringer per kamp, med
+            'perioder' og 'start'),
+            'minutter' (pd.Series med minutter per spiller over dagen),
+            'brudd', 'kostnad' og 'kandidater_ferdige'
+    """
+    dag = Turneringsdag(df, kamper, maks_sammenhengende, min_hvile)
+    frist = time.time() + tidsbudsjett
+    with ProcessPoolExecutor(max_workers=arbeidere) as executor:
+        fremtider = [executor.submit(_los_kandidat, dag, fro, frist) for fro in range(kandidater)]
+        ferdige, ikke_ferdige = wait(fremtider, timeout=tidsbudsjett + 1.0)
+        for fremtid in ikke_ferdige:
+            fremtid.cancel()
+        resultater = [f.result() for f in ferdige if not f.cancelled()]
+    if not resultater:
+        # Ingen kandidat ble ferdig i tide; en grådig plan er alltid rask å lage
+        paa_banen, keeper = dag.konstruer(np.random.default_rng(0))
+        resultater = [(dag.kostnad(paa_banen, keeper), 0, paa_banen, keeper)]
+
+    kostnad, fro, paa_banen, keeper = min(resultater, key=lambda r: (r[0], r[1]))
+    brudd = dag.brudd(paa_banen, keeper)
+    logger.info(
+        f"Turneringsdag planlagt: {len(resultater)}/{kandidater} kandidater, "
+        f"kostnad {kostnad:.0f}, brudd {sum(brudd.values())}"
+    )
+    kamp_dfs = dag.til_dataframes(df, paa_banen, keeper)
+    return {
+        'kamper': [
+            {'start': oppsett['start'], 'kamptid': int(oppsett['kamptid']),
+             'antall_paa_banen': int(oppsett['antall_paa_banen']),
+             'perioder': oppsett['perioder'], 'spilletid_df': kamp_df, 'posisjoner': overstyringer}
+            for oppsett, (kamp_df, overstyringer) in zip(dag.kamper, kamp_dfs)
+        ],
+        'minutter': pd.Series(dag.minutter(paa_banen), index=dag.spillere, name='Minutter'),
+        'brudd': brudd,
+        'kostnad': kostnad,
+        'kandidater_ferdige': len(resultater)
+    }
+
+
+def eksporter_turneringsdag(kamper, fremdrift=None):
+    """
+    Kamprapport og kampplan for alle kampene i en planlagt turneringsdag.
+
+    Args:
+        kamper (list): plan['kamper'] fra planlegg_turneringsdag
+        fremdrift (callable): Kalles med andelen som er ferdig
+
+    Returns:
+        dict: 'rapport' (tekst) og 'csv' (kampplanen med en kolonne for kampnummer)
+    """
+    rapporter = []
+    oppsett = []
+    for nummer, kamp in enumerate(kamper, start=1):
+        def kampfremdrift(andel, ferdige=nummer - 1):
+            if fremdrift is not None:
+                fremdrift((ferdige + andel) / len(kamper))
+
+        rapporter.append(f"Kamp {nummer} – start {kamp['start']} min, {kamp['kamptid']} min\n" + "=" * 40)
+        rapporter.append(generer_kamprapport(
+            kamp['spilletid_df'], kamp['perioder'], kamp['posisjoner'], fremdrift=kampfremdrift
+        ))
+        detaljert = generer_detaljert_kampoppsett(kamp['spilletid_df'], kamp['perioder'], kamp['posisjoner'])
+        detaljert.insert(0, 'Kamp', nummer)
+        oppsett.append(detaljert)
+    csv = pd.concat(oppsett, ignore_index=True).to_csv(index=False) if oppsett else ''
+    return {'rapport': "\n\n".join(rapporter), 'csv': csv}
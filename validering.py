@@ -0,0 +1,178 @@
+# validering.py
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Maksimalt antall spillere per posisjon i én periode
+MAKS_SPILLERE_PER_POSISJON = {
+    'Keeper': 1,
+    'Back': 4,        # Økt til 4 for å tillate både høyre og venstre back
+    'Midtstopper': 2,
+    'Sentral midtbane': 2,
+    'Ving': 4,        # Økt til 4 for å tillate både høyre og venstre ving
+    'Spiss': 2        # Økt til 2 for mer fleksibilitet
+}
+STANDARD_MAKS_SPILLERE = 2  # Brukes for ukjente posisjoner
+
+# Navn på reglene som brukes i bruddlisten
+REGEL_ANTALL = 'antall_paa_banen'
+REGEL_KEEPER = 'keeper'
+REGEL_POSISJON = 'posisjonsgrense'
+REGEL_TILGJENGELIG = 'utilgjengelig'
+REGEL_SPILLETID = 'total_spilletid'
+
+
+def get_max_spillere_per_posisjon(posisjon):
+    """
+    Returnerer maksimalt antall spillere tillatt i hver posisjon basert på formasjon.
+    """
+    return MAKS_SPILLERE_PER_POSISJON.get(posisjon, STANDARD_MAKS_SPILLERE)
+
+
+def periode_varighet(periode):
+    """Returnerer varigheten til en periode på formen 'start-slutt' i minutter"""
+    start, slutt = map(int, periode.split('-'))
+    return slutt - start
+
+
+def effektive_posisjoner(df, perioder, overstyringer=None):
+    """
+    Returnerer en matrise (spillere × perioder) med posisjonen hver spiller
+    har i hver periode: 'Aktiv posisjon', med overstyringene for
+    (spiller, periode) lagt over.
+    """
+    aktiv = df['Aktiv posisjon'].astype(object).to_numpy()
+    posisjoner = np.repeat(aktiv[:, None], len(perioder), axis=1)
+    if overstyringer:
+        rad = {spiller: i for i, spiller in enumerate(df.index)}
+        kolonne = {periode: j for j, periode in enumerate(perioder)}
+        for (spiller, periode), posisjon in overstyringer.items():
+            if spiller in rad and periode in kolonne:
+                posisjoner[rad[spiller], kolonne[periode]] = posisjon
+    return posisjoner
+
+
+def _brudd(periode, regel, spillere, melding):
+    return {
+        'periode': periode,
+        'regel': regel,
+        'spillere': list(spillere),
+        'melding': melding
+    }
+
+
+def valider_plan(df, perioder, antall_paa_banen, kamptid, overstyringer=None):
+    """
+    Validerer hele kampplanen i én vektorisert gjennomgang.
+
+    Reglene som sjekkes er:
+    - antall spillere på banen er lik antall_paa_banen i hver periode
+    - nøyaktig én keeper i hver periode
+    - ingen posisjon har flere spillere enn get_max_spillere_per_posisjon
+    - utilgjengelige spillere er ikke satt på banen
+    - total spilletid er lik kamptid × antall_paa_banen
+
+    Args:
+        df (pd.DataFrame): Spillerdataframe med periodekolonner
+        perioder (list): Periodene som skal valideres
+        antall_paa_banen (int): Antall spillere på banen
+        kamptid (int): Total kamptid i minutter
+        overstyringer (Posisjonsoverstyringer): Posisjon per (spiller, periode)
+
+    Returns:
+        list: Brudd som dicts med nøklene 'periode', 'regel', 'spillere' og 'melding'
+    """
+    brudd = []
+    spillere = df.index.to_numpy()
+    paa_banen = df[perioder].to_numpy(dtype=bool)
+    posisjoner = effektive_posisjoner(df, perioder, overstyringer)
+    tilgjengelig = df['Tilgjengelig'].to_numpy(dtype=bool)
+
+    antall = paa_banen.sum(axis=0)
+    for j in np.flatnonzero(antall != antall_paa_banen):
+        brudd.append(_brudd(
+            perioder[j], REGEL_ANTALL, spillere[paa_banen[:, j]],
+            f"{antall[j]} spillere på banen, skal være {antall_paa_banen}"
+        ))
+
+    keepere = paa_banen & (posisjoner == 'Keeper')
+    antall_keepere = keepere.sum(axis=0)
+    for j in np.flatnonzero(antall_keepere != 1):
+        brudd.append(_brudd(
+            perioder[j], REGEL_KEEPER, spillere[keepere[:, j]],
+            f"{antall_keepere[j]} keepere på banen, skal være 1"
+        ))
+
+    for posisjon in np.unique(posisjoner[paa_banen]):
+        if posisjon == 'Keeper':
+            continue  # Dekkes av keeperregelen
+        i_posisjon = paa_banen & (posisjoner == posisjon)
+        antall_i_posisjon = i_posisjon.sum(axis=0)
+        maks = get_max_spillere_per_posisjon(posisjon)
+        for j in np.flatnonzero(antall_i_posisjon > maks):
+            brudd.append(_brudd(
+                perioder[j], REGEL_POSISJON, spillere[i_posisjon[:, j]],
+                f"{antall_i_posisjon[j]} spillere på {posisjon}, maks er {maks}"
+            ))
+
+    utilgjengelige = paa_banen & ~tilgjengelig[:, None]
+    for j in np.flatnonzero(utilgjengelige.any(axis=0)):
+        brudd.append(_brudd(
+            perioder[j], REGEL_TILGJENGELIG, spillere[utilgjengelige[:, j]],
+            "Utilgjengelige spillere er satt på banen"
+        ))
+
+    varigheter = np.array([periode_varighet(p) for p in perioder], dtype=int)
+    total_spilletid = int((paa_banen @ varigheter).sum())
+    forventet = kamptid * antall_paa_banen
+    if total_spilletid != forventet:
+        brudd.append(_brudd(
+            None, REGEL_SPILLETID, [],
+            f"Total spilletid ({total_spilletid} min) samsvarer ikke med "
+            f"tilgjengelig spilletid ({forventet} min)"
+        ))
+
+    logger.debug(f"Plan validert: {len(brudd)} brudd")
+    return brudd
+
+
+def valider_endring(df, periode, spiller, ny_status, antall_paa_banen, overstyringer=None):
+    """
+    Validerer én endring av en spillers status i en periode mot de samme
+    reglene som valider_plan. Å ta av en spiller er alltid tillatt.
+
+    Returns:
+        list: Bruddene endringen ville ført til (tom liste hvis den er gyldig)
+    """
+    if not ny_status or df.at[spiller, periode]:
+        return []
+
+    brudd = []
+    paa_banen = df[periode].to_numpy(dtype=bool)
+    spillere = df.index.to_numpy()
+
+    if paa_banen.sum() >= antall_paa_banen:
+        brudd.append(_brudd(
+            periode, REGEL_ANTALL, spillere[paa_banen],
+            f"Laget er fullt ({antall_paa_banen} spillere)"
+        ))
+
+    if not df.at[spiller, 'Tilgjengelig']:
+        brudd.append(_brudd(
+            periode, REGEL_TILGJENGELIG, [spiller],
+            f"{spiller} er ikke tilgjengelig"
+        ))
+
+    posisjoner = effektive_posisjoner(df, [periode], overstyringer)[:, 0]
+    posisjon = posisjoner[df.index.get_loc(spiller)]
+    i_posisjon = paa_banen & (posisjoner == posisjon)
+    maks = get_max_spillere_per_posisjon(posisjon)
+    if i_posisjon.sum() >= maks:
+        regel = REGEL_KEEPER if posisjon == 'Keeper' else REGEL_POSISJON
+        brudd.append(_brudd(
+            periode, regel, spillere[i_posisjon],
+            f"Maks {maks} spillere på {posisjon}"
+        ))
+
+    return brudd
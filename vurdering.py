@@ -0,0 +1,174 @@
+# vurdering.py
+"""
+Vektorisert vurdering av mange kandidatplaner samtidig.
+
+En populasjon med kandidater er en bool-array med form
+kandidater × spillere × perioder. vurder_kandidater regner ut alle
+nøkkeltallene for hele populasjonen med noen få NumPy-operasjoner, i stedet
+for å kjøre kalkuler_spilletid på én DataFrame om gangen. Søk, simuleringer
+og forslag kan dermed vurdere tusenvis av planer i én gjennomgang.
+
+Gjennomstrømningen kan måles fra kommandolinjen:
+
+    python vurdering.py --kandidater 20000
+"""
+import logging
+import time
+import numpy as np
+import pandas as pd
+from kampplan import generer_perioder, kalkuler_spilletid
+from validering import effektive_posisjoner, get_max_spillere_per_posisjon, periode_varighet
+
+logger = logging.getLogger(__name__)
+
+
+def posisjonsdata(df, perioder, overstyringer=None):
+    """
+    Posisjonen hver spiller har i hver periode som heltallskoder, med
+    maksgrensen for hver kode.
+
+    Returns:
+        tuple: (koder spillere × perioder, posisjonsnavn, maks per posisjon)
+    """
+    posisjoner = effektive_posisjoner(df, perioder, overstyringer).astype(str)
+    navn, koder = np.unique(posisjoner, return_inverse=True)
+    maks = np.array([get_max_spillere_per_posisjon(p) for p in navn], dtype=int)
+    return koder.reshape(posisjoner.shape), navn, maks
+
+
+def stable_kandidater(dataframes, perioder):
+    """Stabler periodekolonnene fra flere spilletid_df med samme spillere til én array"""
+    return np.stack([df[list(perioder)].to_numpy(dtype=bool) for df in dataframes])
+
+
+def vurder_kandidater(paa_banen, varigheter, mal, tilgjengelig=None,
+                      posisjonskoder=None, maks_per_posisjon=None):
+    """
+    Vurderer en hel populasjon med kandidatplaner.
+
+    Args:
+        paa_banen (np.ndarray): kandidater × spillere × perioder (bool)
+        varigheter (np.ndarray): Minutter per periode
+        mal (np.ndarray): Mål spilletid per spiller, eller kandidater × spillere
+        tilgjengelig (np.ndarray): Tilgjengelige spillere (standard: alle). Avvik
+            for utilgjengelige spillere telles ikke med i totalene.
+        posisjonskoder (np.ndarray): Posisjonskode per spiller, eller spillere ×
+            perioder (fra posisjonsdata). Uten koder telles ikke posisjonsbrudd.
+        maks_per_posisjon (np.ndarray): Maks antall spillere per posisjonskode
+
+    Returns:
+        dict: 'minutter' og 'avvik' (kandidater × spillere), 'totalt_avvik'
+            (sum av absolutt avvik), 'kvadratavvik', 'bytter' (antall innbytter
+            mellom periodene), 'antall_per_periode' (kandidater × perioder),
+            'posisjonstelling' (kandidater × posisjoner × perioder) og
+            'posisjonsbrudd' (spillere over grensene, summert per kandidat)
+    """
+    paa_banen = np.asarray(paa_banen, dtype=bool)
+    if paa_banen.ndim == 2:
+        paa_banen = paa_banen[None]
+    antall_kandidater, antall_spillere, antall_perioder = paa_banen.shape
+    tall = paa_banen.view(np.uint8)
+
+    minutter = tall @ np.asarray(varigheter)
+    avvik = minutter - np.asarray(mal)
+    telles = np.ones(antall_spillere, dtype=bool) if tilgjengelig is None else np.asarray(tilgjengelig, dtype=bool)
+    telt_avvik = np.where(telles, avvik, 0)
+
+    bytter = (paa_banen[:, :, 1:] & ~paa_banen[:, :, :-1]).sum(axis=(1, 2))
+    antall_per_periode = tall.sum(axis=1, dtype=np.int32)
+
+    if posisjonskoder is None:
+        posisjonstelling = np.zeros((antall_kandidater, 0, antall_perioder), dtype=np.int32)
+        posisjonsbrudd = np.zeros(antall_kandidater, dtype=np.int32)
+    else:
+        koder = np.asarray(posisjonskoder)
+        if koder.ndim == 1:
+            koder = np.broadcast_to(koder[:, None], (antall_spillere, antall_perioder))
+        maks = np.asarray(maks_per_posisjon, dtype=np.int32)
+        # Én gjennomgang per posisjon; antall posisjoner er lite og fast
+        posisjonstelling = np.stack(
+            [(paa_banen & (koder == k)).sum(axis=1, dtype=np.int32) for k in range(len(maks))],
+            axis=1
+        )
+        posisjonsbrudd = np.maximum(0, posisjonstelling - maks[None, :, None]).sum(axis=(1, 2))
+
+    return {
+        'minutter': minutter,
+        'avvik': avvik,
+        'totalt_avvik': np.abs(telt_avvik).sum(axis=1),
+        'kvadratavvik': np.einsum('ij,ij->i', telt_avvik, telt_avvik),
+        'bytter': bytter,
+        'antall_per_periode': antall_per_periode,
+        'posisjonstelling': posisjonstelling,
+        'posisjonsbrudd': posisjonsbrudd
+    }
+
+
+def vurder_dataframe(df, perioder, overstyringer=None):
+    """Vurderer planen i én spilletid_df med kjernen. Gir dicten for den ene kandidaten."""
+    koder, _, maks = posisjonsdata(df, perioder, overstyringer)
+    resultat = vurder_kandidater(
+        stable_kandidater([df], perioder),
+        [periode_varighet(p) for p in perioder],
+        df['Mål spilletid'].to_numpy(dtype=int),
+        df['Tilgjengelig'].to_numpy(dtype=bool),
+        koder, maks
+    )
+    return {navn: verdi[0] for navn, verdi in resultat.items()}
+
+
+def mal_gjennomstromning(antall_kandidater=10000, antall_spillere=14, kamptid=70,
+                         antall_paa_banen=9, dataframe_kandidater=200, fro=0):
+    """
+    Måler hvor mange kandidater per sekund kjernen vurderer, sammenlignet
+    med kalkuler_spilletid på én DataFrame om gangen.
+
+    Returns:
+        dict: Kandidater per sekund for kjernen og DataFrame-veien, og forholdet
+    """
+    rng = np.random.default_rng(fro)
+    perioder = generer_perioder(kamptid)
+    varigheter = np.array([periode_varighet(p) for p in perioder])
+    # Tilfeldige kandidater med riktig antall på banen i hver periode
+    rangering = rng.random((antall_kandidater, antall_spillere, len(perioder))).argsort(axis=1)
+    paa_banen = rangering < antall_paa_banen
+    mal = np.full(antall_spillere, round(kamptid * antall_paa_banen / antall_spillere))
+    koder = rng.integers(0, 5, antall_spillere)
+    maks = np.array([1, 4, 2, 2, 4])
+
+    start = time.perf_counter()
+    vurder_kandidater(paa_banen, varigheter, mal, posisjonskoder=koder, maks_per_posisjon=maks)
+    kjerne = antall_kandidater / (time.perf_counter() - start)
+
+    antall_df = min(dataframe_kandidater, antall_kandidater)
+    dataframes = []
+    for c in range(antall_df):
+        df = pd.DataFrame(paa_banen[c], columns=perioder)
+        df['Mål spilletid'] = mal
+        dataframes.append(df)
+    start = time.perf_counter()
+    for df in dataframes:
+        kalkuler_spilletid(df, perioder)
+    dataframe = antall_df / (time.perf_counter() - start)
+
+    return {
+        'kandidater': antall_kandidater,
+        'kjerne_per_sekund': kjerne,
+        'dataframe_per_sekund': dataframe,
+        'forhold': kjerne / dataframe
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mål gjennomstrømningen til vurderingskjernen")
+    parser.add_argument('--kandidater', type=int, default=10000)
+    parser.add_argument('--spillere', type=int, default=14)
+    parser.add_argument('--kamptid', type=int, default=70)
+    parser.add_argument('--antall-paa-banen', type=int, default=9)
+    args = parser.parse_args()
+    maling = mal_gjennomstromning(args.kandidater, args.spillere, args.kamptid, args.antall_paa_banen)
+    print(f"Kjerne:    {maling['kjerne_per_sekund']:>12,.0f} kandidater/s ({maling['kandidater']} kandidater)")
+    print(f"DataFrame: {maling['dataframe_per_sekund']:>12,.0f} kandidater/s (kalkuler_spilletid)")
+    print(f"Forhold:   {maling['forhold']:>12,.0f}x")